@@ -0,0 +1,65 @@
+"""基准测试公共工具"""
+
+import os
+import sys
+import time
+import resource
+import statistics
+
+SCRIPTS_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "skills", "wiki-tools", "scripts"
+)
+sys.path.insert(0, os.path.abspath(SCRIPTS_DIR))
+
+
+def use_mock_server(server) -> None:
+    """让 wiki_manager 指向本地模拟服务器"""
+    os.environ["WIKI_BASE_URL"] = server.base_url
+    os.environ.setdefault("WIKI_TOKEN", "bench-token")
+
+
+def max_rss_mb() -> float:
+    """当前进程的峰值 RSS（MB）
+
+    优先读取 /proc/self/status 的 VmHWM：fork 出的子进程 ru_maxrss 会继承父进程的
+    峰值（exec 后也不重置），而 VmHWM 随新地址空间重新计算。
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # Linux 下单位为 KB，macOS 下为字节
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def percentile(samples, pct: float) -> float:
+    """计算百分位数（最近秩法）"""
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(name: str, samples) -> str:
+    """格式化延迟统计（毫秒）"""
+    ms = [s * 1000 for s in samples]
+    return (
+        f"{name:<28} n={len(ms):<5} mean={statistics.mean(ms):8.2f}ms "
+        f"p50={percentile(ms, 50):8.2f}ms p99={percentile(ms, 99):8.2f}ms"
+    )
+
+
+class Timer:
+    """简单计时器：with Timer() as t: ...; t.elapsed"""
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.elapsed = time.perf_counter() - self.start
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+追加队列基准：多个写入者向同一页面高频追加时，逐条更新与经追加队列合并发送的对比
+
+用法：
+    python bench_append.py --writers 4 --appends 50 --page-size 204800
+
+两种方式都在同一进程中并发运行 writers 个写入者，每个追加 appends 行：
+    direct  每行调用一次 update_wiki_page_content（GET 整页 + PUT 整页，冲突时重新读取后重试）
+    queued  每行调用 queue_append 写入本地队列，待发送内容达到 --flush-bytes 时合并为
+            一次 PUT，最后发送剩余内容
+统计总耗时、请求数、收发字节数和页面新增的版本数。
+"""
+
+import argparse
+import asyncio
+import tempfile
+
+from _common import use_mock_server, Timer
+from mock_confluence import MockConfluence
+
+MODES = ("direct", "queued")
+
+
+async def append_direct(wm, config, client, page_id: str, lines: list) -> None:
+    for line in lines:
+        await wm.update_wiki_page_content(config, page_id=page_id, content=line,
+                                          format="html", append=True, client=client)
+
+
+async def append_queued(wm, config, client, journal, page_id: str, lines: list,
+                        flush_bytes: int) -> None:
+    for line in lines:
+        await wm.queue_append(config, page_id, line, format="html", journal=journal,
+                              client=client, flush_bytes=flush_bytes, flush_delay=3600)
+
+
+async def run_mode(wm, server, mode: str, args) -> dict:
+    config = wm.WikiConfig()
+    page_id = server.seed_pages(1, page_size=args.page_size)[0]
+    journal = wm.AppendJournal(config, tempfile.mkdtemp(prefix="wiki-bench-append-"))
+    writers = [
+        [f"<p>writer {w} line {i}</p>" for i in range(args.appends)]
+        for w in range(args.writers)
+    ]
+
+    before = server.snapshot_stats()
+    async with wm.WikiClient(config) as client:
+        with Timer() as t:
+            if mode == "direct":
+                await asyncio.gather(*(append_direct(wm, config, client, page_id, lines)
+                                       for lines in writers))
+            else:
+                await asyncio.gather(*(append_queued(wm, config, client, journal, page_id,
+                                                     lines, args.flush_bytes)
+                                       for lines in writers))
+                await wm.flush_appends(config, page_id, journal, client)
+    after = server.snapshot_stats()
+
+    body = server.pages[page_id]["body"]
+    missing = sum(line not in body for lines in writers for line in lines)
+    return {
+        "elapsed": t.elapsed,
+        "requests": after["requests"] - before["requests"],
+        "bytes_in": after["bytes_in"] - before["bytes_in"],
+        "bytes_out": after["bytes_out"] - before["bytes_out"],
+        "versions": server.pages[page_id]["version"] - 1,
+        "missing": missing
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="逐条追加与追加队列合并发送的对比")
+    parser.add_argument("--writers", type=int, default=4, help="并发写入者数")
+    parser.add_argument("--appends", type=int, default=50, help="每个写入者追加的行数")
+    parser.add_argument("--page-size", type=int, default=204800, help="页面初始正文大小（字节）")
+    parser.add_argument("--flush-bytes", type=int, default=1024,
+                        help="queued 模式下待发送内容达到该字节数时发送")
+    parser.add_argument("--latency", type=float, default=0.0, help="模拟服务器请求延迟（秒）")
+    args = parser.parse_args()
+
+    server = MockConfluence(latency=args.latency).start()
+    use_mock_server(server)
+    import wiki_manager as wm
+
+    try:
+        total = args.writers * args.appends
+        print(f"{args.writers} 个写入者 × {args.appends} 行，页面 {args.page_size // 1024}KB")
+        print(f"{'mode':<8} {'time':>9} {'lines/s':>8} {'requests':>9} "
+              f"{'sent':>10} {'received':>10} {'versions':>9}  missing")
+        for mode in MODES:
+            r = asyncio.run(run_mode(wm, server, mode, args))
+            print(f"{mode:<8} {r['elapsed']:>8.2f}s {total / r['elapsed']:>8.0f} "
+                  f"{r['requests']:>9} {r['bytes_in'] / 1024 / 1024:>8.1f}MB "
+                  f"{r['bytes_out'] / 1024 / 1024:>8.1f}MB {r['versions']:>9}  {r['missing']}")
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+连接复用基准：对比每次请求新建连接与共享 WikiClient 连接池的单请求延迟
+
+用法：
+    python bench_connection_pool.py --requests 200 --connect-latency 0.02
+
+--connect-latency 为模拟服务器对每个新连接附加的延迟，用来近似真实环境中
+TCP + TLS 握手的往返开销（本地回环上的握手几乎没有成本）。
+"""
+
+import asyncio
+import argparse
+
+from _common import use_mock_server, summarize, Timer
+from mock_confluence import MockConfluence
+
+
+async def bench_get(config, page_id: str, requests: int, client=None) -> list:
+    import wiki_manager as wm
+
+    samples = []
+    for _ in range(requests):
+        with Timer() as t:
+            await wm.get_wiki_page_content(config, page_id=page_id, format="storage",
+                                           client=client)
+        samples.append(t.elapsed)
+    return samples
+
+
+async def bench_update(config, page_id: str, requests: int, client=None) -> list:
+    import wiki_manager as wm
+
+    samples = []
+    for i in range(requests):
+        with Timer() as t:
+            await wm.update_wiki_page_content(config, page_id=page_id,
+                                              content=f"<p>update {i}</p>",
+                                              format="html", client=client)
+        samples.append(t.elapsed)
+    return samples
+
+
+async def run(args):
+    server = MockConfluence(connect_latency=args.connect_latency).start()
+    use_mock_server(server)
+
+    import wiki_manager as wm
+
+    config = wm.WikiConfig()
+    page_id = server.add_page("bench", "<p>hello world</p>" * 200)
+
+    print(f"模拟握手延迟: {args.connect_latency * 1000:.1f}ms, 请求数: {args.requests}\n")
+
+    before = server.stats["connections"]
+    samples = await bench_get(config, page_id, args.requests)
+    print(summarize("get (每次新建连接)", samples),
+          f"connections={server.stats['connections'] - before}")
+
+    before = server.stats["connections"]
+    async with wm.WikiClient(config) as client:
+        samples = await bench_get(config, page_id, args.requests, client)
+    print(summarize("get (共享 WikiClient)", samples),
+          f"connections={server.stats['connections'] - before}")
+
+    before = server.stats["connections"]
+    samples = await bench_update(config, page_id, args.requests // 4)
+    print(summarize("update (每次新建连接)", samples),
+          f"connections={server.stats['connections'] - before}")
+
+    before = server.stats["connections"]
+    async with wm.WikiClient(config) as client:
+        samples = await bench_update(config, page_id, args.requests // 4, client)
+    print(summarize("update (共享 WikiClient)", samples),
+          f"connections={server.stats['connections'] - before}")
+
+    server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WikiClient 连接复用基准")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--connect-latency", type=float, default=0.02)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
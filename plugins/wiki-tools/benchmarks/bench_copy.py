@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+页面树复制基准：逐页读取、创建与 copy_page_tree 逐层并发复制的对比
+
+用法：
+    python bench_copy.py --pages 60 --fanout 4 --labels 2 --latency 0.02
+
+源页面树共 pages 个页面（每个页面最多 fanout 个子页面，每页 labels 个标签）：
+    serial  手写的递归复制：逐页列出子页面、读取正文、创建副本、添加标签
+    tree    copy_page_tree：正文随子页面列表逐层并发列出，同一层的页面并发创建
+            （--concurrency），每层完成后恢复兄弟页面顺序
+"""
+
+import argparse
+import asyncio
+
+from _common import use_mock_server, Timer
+from mock_confluence import MockConfluence
+
+
+async def copy_serial(wm, config, client, page_id: str, parent_id: str, space: str) -> None:
+    page = await wm.get_wiki_page_content(config, page_id=page_id, format="storage",
+                                          client=client, fields=("content", "labels"))
+    result = await wm.create_wiki_page(config, "Serial " + page["title"], page["content"],
+                                       space, parent_page_id=parent_id, client=client)
+    if page["labels"]:
+        await wm.add_page_labels(config, result["id"], page["labels"], client=client)
+    for child in await wm.list_child_pages(config, page_id, client=client):
+        await copy_serial(wm, config, client, child["id"], result["id"], space)
+
+
+async def run_mode(wm, mode: str, root: str, target: str, concurrency: int) -> None:
+    config = wm.WikiConfig()
+    async with wm.WikiClient(config) as client:
+        if mode == "serial":
+            await copy_serial(wm, config, client, root, target, "DST")
+        else:
+            stats = await wm.copy_page_tree(config, root, target_parent_id=target,
+                                            title_prefix="Tree ", concurrency=concurrency,
+                                            client=client)
+            if stats["failed"]:
+                raise RuntimeError(f"{len(stats['failed'])} 个页面复制失败")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="逐页复制与逐层并发复制页面树的对比")
+    parser.add_argument("--pages", type=int, default=60, help="源页面树的页面数")
+    parser.add_argument("--fanout", type=int, default=4, help="每个页面最多的子页面数")
+    parser.add_argument("--labels", type=int, default=2, help="每个页面的标签数")
+    parser.add_argument("--page-size", type=int, default=8192, help="页面正文大小（字节）")
+    parser.add_argument("--latency", type=float, default=0.02, help="模拟服务器请求延迟（秒）")
+    parser.add_argument("--concurrency", type=int, default=8, help="tree 模式的并发数")
+    args = parser.parse_args()
+
+    server = MockConfluence(latency=args.latency).start()
+    use_mock_server(server)
+    import wiki_manager as wm
+
+    try:
+        page_ids = server.seed_pages(args.pages, page_size=args.page_size, space="TPL",
+                                     fanout=args.fanout)
+        for page_id in page_ids:
+            server.pages[page_id]["labels"] = [f"tpl-{n}" for n in range(args.labels)]
+
+        print(f"{args.pages} 个页面（每页最多 {args.fanout} 个子页面），"
+              f"请求延迟 {args.latency * 1000:.0f}ms")
+        for mode in ("serial", "tree"):
+            target = server.add_page(f"Target {mode}", space="DST")
+            before = server.snapshot_stats()
+            with Timer() as t:
+                asyncio.run(run_mode(wm, mode, page_ids[0], target, args.concurrency))
+            requests = server.snapshot_stats()["requests"] - before["requests"]
+            print(f"{mode:<8} {t.elapsed:>7.2f}s  {args.pages / t.elapsed:>7.1f} 页/秒  "
+                  f"requests={requests}")
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
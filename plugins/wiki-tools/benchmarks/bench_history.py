@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+版本历史基准：逐版本比较一个多版本页面（diff --each）的耗时
+
+用法：
+    python bench_history.py --versions 40 --page-size 102400 --latency 0.02
+
+页面预置 versions 个版本（每个版本修改正文中的一个段落）：
+    fetch serial      逐个获取全部版本（相当于在网页上逐个打开历史版本）
+    fetch concurrent  并发获取全部版本（--concurrency）
+    diff cold         获取全部版本、转换为 Markdown 并计算相邻版本的 diff，不使用缓存
+    diff cached       同上，版本内容和转换结果已在 VersionCache 中，不发请求也不转换
+"""
+
+import argparse
+import asyncio
+import tempfile
+
+from _common import use_mock_server, Timer
+from mock_confluence import MockConfluence, make_storage_body
+
+
+def seed_history(server, versions: int, page_size: int) -> str:
+    body = make_storage_body(page_size)
+    page_id = server.add_page("PRD", body)
+    for n in range(2, versions + 1):
+        body = body.replace(f"Paragraph {n} ", f"Paragraph {n} (revised in v{n}) ", 1)
+        server.add_version(page_id, body + f"<p>changelog v{n}</p>", message=f"revision {n}")
+    return page_id
+
+
+async def run_fetch(wm, page_id: str, versions: int, concurrency: int) -> float:
+    config = wm.WikiConfig()
+    async with wm.WikiClient(config) as client:
+        with Timer() as t:
+            await wm.fetch_page_versions(config, page_id, range(1, versions + 1), client=client,
+                                         concurrency=concurrency, latest=versions)
+    return t.elapsed
+
+
+async def run_diff(wm, page_id: str, versions: int, concurrency: int, cache) -> float:
+    config = wm.WikiConfig()
+    pairs = [(n, n + 1) for n in range(1, versions)]
+    async with wm.WikiClient(config) as client:
+        with Timer() as t:
+            await wm.diff_page_versions(config, page_id, pairs, client=client, cache=cache,
+                                        concurrency=concurrency, latest=versions)
+    return t.elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多版本页面逐版本 diff 的耗时")
+    parser.add_argument("--versions", type=int, default=40, help="页面版本数")
+    parser.add_argument("--page-size", type=int, default=102400, help="页面正文大小（字节）")
+    parser.add_argument("--latency", type=float, default=0.02, help="模拟服务器请求延迟（秒）")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent 模式的并发数")
+    args = parser.parse_args()
+
+    server = MockConfluence(latency=args.latency).start()
+    use_mock_server(server)
+    import wiki_manager as wm
+
+    try:
+        page_id = seed_history(server, args.versions, args.page_size)
+        config = wm.WikiConfig()
+        cache = wm.VersionCache(config, tempfile.mkdtemp(prefix="wiki-bench-history-"))
+        modes = (
+            ("fetch serial", lambda: run_fetch(wm, page_id, args.versions, 1)),
+            ("fetch concurrent", lambda: run_fetch(wm, page_id, args.versions, args.concurrency)),
+            ("diff cold", lambda: run_diff(wm, page_id, args.versions, args.concurrency, None)),
+            ("diff cached", lambda: run_diff(wm, page_id, args.versions, args.concurrency, cache)),
+        )
+        # 预先填充缓存（diff cached 只测量命中）
+        asyncio.run(run_diff(wm, page_id, args.versions, args.concurrency, cache))
+
+        print(f"{args.versions} 个版本，页面 {args.page_size // 1024}KB，"
+              f"请求延迟 {args.latency * 1000:.0f}ms")
+        for name, run in modes:
+            before = server.snapshot_stats()
+            elapsed = asyncio.run(run())
+            requests = server.snapshot_stats()["requests"] - before["requests"]
+            print(f"{name:<18} {elapsed:>7.2f}s  requests={requests}")
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+本地全文索引基准：建立索引的吞吐以及各类查询的延迟
+
+用法：
+    python bench_index.py --pages 3000 --page-size 20480 --repeat 20
+
+直接调用 PageIndex（不访问网络）。页面正文由模拟服务器的 Storage Format 生成器
+产生并转换为 Markdown，每个页面追加一个主题词和唯一 token。查询分为：
+    trigram   3 个字符及以上的词，走 FTS5 索引
+    short     少于 3 个字符的词（如两个汉字），对候选行做 LIKE 扫描
+"""
+
+import os
+import argparse
+import tempfile
+
+from _common import summarize, Timer
+from mock_confluence import make_storage_body
+
+TOPICS = ("部署流程", "灰度发布", "数据库迁移", "接口鉴权", "性能优化")
+
+QUERIES = (
+    ("trigram", "灰度发布"),
+    ("trigram unique", "token1234"),
+    ("trigram + short", "数据库 迁移"),
+    ("phrase + token", '"部署流程" token15'),
+    ("short only", "灰度"),
+)
+
+
+def main():
+    import wiki_manager as wm
+
+    parser = argparse.ArgumentParser(description="本地全文索引基准")
+    parser.add_argument("--pages", type=int, default=3000, help="页面数")
+    parser.add_argument("--page-size", type=int, default=20480, help="页面正文大小（字节）")
+    parser.add_argument("--repeat", type=int, default=20, help="每个查询的执行次数")
+    args = parser.parse_args()
+
+    os.environ.setdefault("WIKI_TOKEN", "bench-token")
+    config = wm.WikiConfig()
+    body = wm.html_to_markdown(make_storage_body(args.page_size))
+
+    path = os.path.join(tempfile.mkdtemp(prefix="wiki-bench-index-"), "index.sqlite")
+    with wm.PageIndex(config, path) as index:
+        with Timer() as t:
+            for i in range(args.pages):
+                topic = TOPICS[i % len(TOPICS)]
+                index.add({
+                    "id": str(i), "title": f"页面 {i} {topic}", "url": "", "space": "BENCH",
+                    "version": 1, "content": f"{body}\n{topic} token{i}"
+                })
+            index.commit()
+        stats = index.stats()
+        print(f"索引 {args.pages} 个页面: {t.elapsed:.2f}s "
+              f"({args.pages / t.elapsed:.0f} 页/秒)，{stats['bytes'] / 1024 / 1024:.1f}MB，"
+              f"分词器 {stats['tokenizer']}")
+
+        for name, text in QUERIES:
+            samples = []
+            for _ in range(args.repeat):
+                with Timer() as t:
+                    index.query(text)
+                samples.append(t.elapsed)
+            print(summarize(f"{name} [{text}]", samples))
+
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+if __name__ == "__main__":
+    main()
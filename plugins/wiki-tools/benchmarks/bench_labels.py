@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+批量标签基准：给大量页面打标签时，逐页逐个标签请求与批量、并发修改的对比
+
+用法：
+    python bench_labels.py --pages 300 --labels 3 --latency 0.02
+
+    loop     逐个页面、逐个标签发送添加请求（手写循环的做法）
+    batched  bulk_update_labels：每个页面一个请求携带全部标签，页面之间并发（--concurrency）
+    set      把这些标签替换为另一个标签，目标页面由 CQL 搜索得到（当前标签随搜索结果返回，
+             不必逐页读取；删除接口每次只能删除一个标签）
+"""
+
+import argparse
+import asyncio
+
+from _common import use_mock_server, Timer
+from mock_confluence import MockConfluence
+
+
+async def run_loop(wm, config, page_ids: list, labels: list) -> None:
+    async with wm.WikiClient(config) as client:
+        for page_id in page_ids:
+            for label in labels:
+                await wm.add_page_labels(config, page_id, [label], client=client)
+
+
+async def run_bulk(wm, config, targets, concurrency: int, **changes) -> None:
+    async with wm.WikiClient(config) as client:
+        if isinstance(targets, str):
+            targets = await wm.collect_label_targets(config, cql=targets, client=client)
+        async for result in wm.bulk_update_labels(config, targets, concurrency=concurrency,
+                                                  client=client, **changes):
+            if "error" in result:
+                raise RuntimeError(result["error"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="逐个请求与批量并发修改标签的对比")
+    parser.add_argument("--pages", type=int, default=300, help="页面数")
+    parser.add_argument("--labels", type=int, default=3, help="每个页面添加的标签数")
+    parser.add_argument("--latency", type=float, default=0.02, help="模拟服务器请求延迟（秒）")
+    parser.add_argument("--concurrency", type=int, default=8, help="同时处理的页面数")
+    args = parser.parse_args()
+
+    server = MockConfluence(latency=args.latency).start()
+    use_mock_server(server)
+    import wiki_manager as wm
+
+    try:
+        config = wm.WikiConfig()
+        labels = [f"team-{n}" for n in range(args.labels)]
+        modes = (
+            ("loop", "LOOP", lambda ids: run_loop(wm, config, ids, labels)),
+            ("batched", "BATCH", lambda ids: run_bulk(
+                wm, config, [{"id": i} for i in ids], args.concurrency, add=labels)),
+            ("set", "SET", lambda ids: run_bulk(
+                wm, config, "space = SET", args.concurrency, replace=["reorg"])),
+        )
+        print(f"{args.pages} 个页面 × {args.labels} 个标签，请求延迟 {args.latency * 1000:.0f}ms")
+        for name, space, run in modes:
+            page_ids = server.seed_pages(args.pages, page_size=256, space=space)
+            if name == "set":
+                for page_id in page_ids:
+                    server.pages[page_id]["labels"] = list(labels)
+            before = server.snapshot_stats()
+            with Timer() as t:
+                asyncio.run(run(page_ids))
+            requests = server.snapshot_stats()["requests"] - before["requests"]
+            print(f"{name:<8} {t.elapsed:>7.2f}s  {args.pages / t.elapsed:>7.0f} 页/秒  "
+                  f"requests={requests}")
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Markdown 转换基准：对比 markdown.markdown() 与复用实例/缓存/进程池的 MarkdownConverter
+
+用法：
+    python bench_markdown.py --repeat 20 --batch 200
+"""
+
+import argparse
+
+from _common import summarize, Timer
+
+SECTION = """## 第 {n} 节
+
+这是一段 **加粗** 和 *斜体* 混排的正文，包含 `inline code` 和 [链接](https://example.com/{n})。
+
+- 列表项 A
+- 列表项 B
+  - 嵌套项
+
+| 列 1 | 列 2 | 列 3 |
+|------|------|------|
+| {n}  | foo  | bar  |
+
+```python
+def section_{n}():
+    return {n}
+```
+
+"""
+
+
+def make_document(size: int) -> str:
+    """生成大约 size 字节的 Markdown 文档"""
+    parts, total, n = [], 0, 0
+    while total < size:
+        part = SECTION.format(n=n)
+        parts.append(part)
+        total += len(part.encode("utf-8"))
+        n += 1
+    return "".join(parts)
+
+
+def bench_single(name: str, text: str, repeat: int) -> None:
+    import markdown
+    import wiki_manager as wm
+
+    samples = []
+    for _ in range(repeat):
+        with Timer() as t:
+            markdown.markdown(text, extensions=list(wm.MARKDOWN_EXTENSIONS))
+        samples.append(t.elapsed)
+    print(summarize(f"{name} markdown.markdown", samples))
+
+    # 每次使用不同内容，排除缓存命中，只测量实例复用的收益
+    converter = wm.MarkdownConverter()
+    samples = []
+    for i in range(repeat):
+        variant = f"{text}\n<!-- {i} -->\n"
+        with Timer() as t:
+            converter.convert(variant)
+        samples.append(t.elapsed)
+    print(summarize(f"{name} 复用实例", samples))
+
+    converter.convert(text)
+    samples = []
+    for _ in range(repeat):
+        with Timer() as t:
+            converter.convert(text)
+        samples.append(t.elapsed)
+    print(summarize(f"{name} 缓存命中", samples))
+
+
+def bench_batch(count: int, size: int) -> None:
+    import wiki_manager as wm
+
+    texts = [make_document(size) + f"\n<!-- doc {i} -->\n" for i in range(count)]
+    for label, processes in (("串行", 1), ("进程池", None)):
+        converter = wm.MarkdownConverter()
+        with Timer() as t:
+            converter.convert_many(texts, processes=processes)
+        print(f"{'批量 ' + label:<28} n={count:<5} total={t.elapsed * 1000:9.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Markdown 转换基准")
+    parser.add_argument("--repeat", type=int, default=20, help="单文档重复次数（默认: 20）")
+    parser.add_argument("--batch", type=int, default=200, help="批量转换的文档数（默认: 200）")
+    parser.add_argument("--batch-size", type=int, default=20 * 1024,
+                        help="批量转换的单文档大小（默认: 20KB）")
+    args = parser.parse_args()
+
+    for name, size, repeat in (("small 1KB", 1024, args.repeat * 10),
+                               ("medium 50KB", 50 * 1024, args.repeat),
+                               ("large 2MB", 2 * 1024 * 1024, max(2, args.repeat // 10))):
+        bench_single(name, make_document(size), repeat)
+        print()
+
+    bench_batch(args.batch, args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
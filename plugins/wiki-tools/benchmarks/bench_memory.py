@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+内存基准：对比整体读入与流式分批创建、流式更新大页面时的峰值内存（RSS）
+
+用法：
+    python bench_memory.py --sizes 8 32 64 --chunk-size 1
+
+每次创建都在独立子进程中执行（峰值 RSS 只增不减），模拟服务器运行在父进程中，
+不计入测量。对每个大小分别测量：
+    read    读入整个文件后调用 create_wiki_page_with_chunks
+    stream  create_wiki_page_from_file，按块读取、边读边切分并流式上传
+    update  update_wiki_page_from_file，覆盖已有页面，请求体从文件流式发送
+baseline 为子进程建立 WikiClient（含 TLS 上下文）后、开始创建前的 RSS。
+批大小固定，因此 stream 模式的增量基本不随页面大小变化（只与批大小有关）；
+update 模式只持有一个读取块，增量同样不随页面大小变化。
+"""
+
+import os
+import sys
+import json
+import asyncio
+import argparse
+import subprocess
+import tempfile
+
+from _common import use_mock_server, max_rss_mb, Timer
+from mock_confluence import MockConfluence
+from bench_splitter import make_storage
+
+MODES = ("read", "stream", "update")
+
+
+async def create_page(mode: str, path: str, chunk_size: int) -> dict:
+    import wiki_manager as wm
+
+    config = wm.WikiConfig()
+    title = f"bench-memory-{mode}-{os.getpid()}"
+    async with wm.WikiClient(config) as client:
+        if mode == "update":
+            page = await wm.create_wiki_page(config, title, "<p>x</p>", "BENCH", client=client)
+        baseline = max_rss_mb()
+        with Timer() as t:
+            if mode == "read":
+                with open(path, 'r', encoding='utf-8') as f:
+                    content = f.read()
+                result = await wm.create_wiki_page_with_chunks(
+                    config, title, content, "BENCH", format="html",
+                    chunk_size=chunk_size, client=client
+                )
+            elif mode == "update":
+                result = await wm.update_wiki_page_from_file(config, page["id"], path,
+                                                             client=client)
+                result["chunks"] = 1
+            else:
+                result = await wm.create_wiki_page_from_file(
+                    config, title, path, "BENCH", format="html",
+                    chunk_size=chunk_size, client=client
+                )
+    return {
+        "baseline": baseline,
+        "peak": max_rss_mb(),
+        "elapsed": t.elapsed,
+        "chunks": result["chunks"]
+    }
+
+
+def run_child(args) -> None:
+    """子进程：创建一个页面并以 JSON 输出峰值内存"""
+    print(json.dumps(asyncio.run(create_page(args.child, args.file, args.chunk_size))))
+
+
+def measure(mode: str, path: str, chunk_size: int) -> dict:
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", mode,
+         "--file", path, "--chunk-size", str(chunk_size)],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="大页面分批创建的峰值内存基准")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[8, 32, 64],
+                        help="页面大小（MB）")
+    parser.add_argument("--chunk-size", type=float, default=1,
+                        help="每批大小（MB，默认: 1）")
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        args.chunk_size = int(args.chunk_size)
+        return run_child(args)
+
+    server = MockConfluence().start()
+    use_mock_server(server)
+    try:
+        print(f"{'size':>6} {'mode':<7} {'chunks':>6} {'baseline':>10} {'peak':>10} "
+              f"{'delta':>10} {'time':>8}")
+        for size_mb in args.sizes:
+            with tempfile.NamedTemporaryFile("w", suffix=".html", encoding="utf-8",
+                                             delete=False) as f:
+                f.write(make_storage(size_mb))
+                path = f.name
+            try:
+                chunk_size = int(args.chunk_size * 1024 * 1024)
+                for mode in MODES:
+                    r = measure(mode, path, chunk_size)
+                    print(f"{size_mb:>4}MB {mode:<7} {r['chunks']:>6} "
+                          f"{r['baseline']:>8.1f}MB {r['peak']:>8.1f}MB "
+                          f"{r['peak'] - r['baseline']:>8.1f}MB {r['elapsed']:>7.2f}s")
+            finally:
+                os.unlink(path)
+                # 释放模拟服务器保存的页面，避免父进程内存持续增长
+                server.pages.clear()
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+常驻服务器基准：对比每次启动新进程执行 CLI 命令与通过 serve 常驻服务器转发的耗时
+
+用法：
+    python bench_server.py --runs 20 --commands head get get-markdown
+
+每个命令以子进程方式运行 wiki_manager.py，测量完整的命令行耗时（解释器启动、
+库导入、连接建立、请求和输出）：
+    cold    设置 WIKI_NO_SERVER，在新进程中执行
+    server  先后台启动 serve，命令经 Unix socket 转发给已导入库、连接池热的服务器
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+
+from _common import SCRIPTS_DIR, use_mock_server, summarize
+from mock_confluence import MockConfluence
+
+SCRIPT = os.path.abspath(os.path.join(SCRIPTS_DIR, "wiki_manager.py"))
+
+MODES = ("cold", "server")
+
+COMMANDS = {
+    "head": ["head", "--page-id", "{page_id}"],
+    "get": ["get", "--page-id", "{page_id}", "--format", "storage"],
+    "get-markdown": ["get", "--page-id", "{page_id}", "--format", "markdown"],
+}
+
+
+def run_cli(argv: list, env: dict) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, SCRIPT] + argv, env=env, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="常驻服务器与冷启动 CLI 的耗时对比")
+    parser.add_argument("--runs", type=int, default=20, help="每个命令的执行次数")
+    parser.add_argument("--commands", nargs="+", choices=list(COMMANDS),
+                        default=list(COMMANDS), help="要测量的命令")
+    parser.add_argument("--page-size", type=int, default=20480, help="页面正文大小（字节）")
+    parser.add_argument("--latency", type=float, default=0.0, help="模拟服务器请求延迟（秒）")
+    args = parser.parse_args()
+
+    server = MockConfluence(latency=args.latency).start()
+    use_mock_server(server)
+    page_id = server.seed_pages(1, page_size=args.page_size)[0]
+
+    workdir = tempfile.mkdtemp(prefix="bench-server-")
+    env = dict(os.environ, WIKI_SERVER_SOCKET=os.path.join(workdir, "server.sock"),
+               WIKI_CACHE_DIR=workdir)
+    env.pop("WIKI_NO_SERVER", None)
+    try:
+        subprocess.run([sys.executable, SCRIPT, "serve", "--background"], env=env, check=True,
+                       stdout=subprocess.DEVNULL)
+        for name in args.commands:
+            argv = [part.format(page_id=page_id) for part in COMMANDS[name]]
+            for mode in MODES:
+                mode_env = dict(env, WIKI_NO_SERVER="1") if mode == "cold" else env
+                run_cli(argv, mode_env)  # 预热
+                samples = [run_cli(argv, mode_env) for _ in range(args.runs)]
+                print(summarize(f"{name} [{mode}]", samples))
+    finally:
+        subprocess.run([sys.executable, SCRIPT, "serve", "--stop"], env=env,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+分批切分基准：对比旧的逐字节回退切分循环与 split_storage_html 的吞吐量
+
+用法：
+    python bench_splitter.py --sizes 10 50 100 --chunk-size 1048576
+
+同时校验切分结果：各批拼接后等于原文，且每批都是完整的顶层元素
+（旧实现会把表格和宏从中间切开，统计在 broken 一列）。
+"""
+
+import argparse
+
+from _common import Timer
+
+BLOCKS = (
+    "<h2>章节 {n}</h2>",
+    "<p>段落 {n}：包含 <strong>加粗</strong>、<em>斜体</em> 和 <a href=\"/pages/{n}?a=1&amp;b=2\">链接</a>。</p>",
+    "<table><tbody>" + "<tr><th>键</th><td>值 {n}</td><td><p>单元格 {n}</p></td></tr>" * 8
+    + "</tbody></table>",
+    "<ac:structured-macro ac:name=\"code\"><ac:parameter ac:name=\"language\">python</ac:parameter>"
+    "<ac:plain-text-body><![CDATA[def f_{n}():\n    return '<p>not a tag</p>'\n]]>"
+    "</ac:plain-text-body></ac:structured-macro>",
+    "<ul>" + "<li>列表项 {n}<br/>换行</li>" * 5 + "</ul>",
+    "<ac:structured-macro ac:name=\"info\"><ac:rich-text-body><p>提示 {n}</p>"
+    "<ri:page ri:content-title=\"页面 {n}\" /></ac:rich-text-body></ac:structured-macro>",
+)
+
+
+def make_storage(size_mb: int) -> str:
+    """生成大约 size_mb MB 的 Storage Format HTML"""
+    target = size_mb * 1024 * 1024
+    parts, total, n = [], 0, 0
+    while total < target:
+        block = BLOCKS[n % len(BLOCKS)].format(n=n)
+        parts.append(block)
+        total += len(block.encode("utf-8"))
+        n += 1
+    return "".join(parts)
+
+
+def legacy_split(content_html: str, chunk_size: int) -> list:
+    """旧版 create_wiki_page_with_chunks 中的切分循环"""
+    content_bytes = content_html.encode("utf-8")
+    total_size = len(content_bytes)
+    chunks = []
+    offset = 0
+    while offset < total_size:
+        chunk_end = min(offset + chunk_size, total_size)
+        chunk_bytes = content_bytes[offset:chunk_end]
+        chunk_text = None
+        try:
+            chunk_text = chunk_bytes.decode("utf-8")
+        except UnicodeDecodeError:
+            while chunk_end > offset:
+                chunk_end -= 1
+                chunk_bytes = content_bytes[offset:chunk_end]
+                try:
+                    chunk_text = chunk_bytes.decode("utf-8")
+                    break
+                except UnicodeDecodeError:
+                    continue
+        if chunk_end < total_size:
+            for tag in ["</p>", "</li>", "</td>", "</div>"]:
+                last_tag_pos = chunk_text.rfind(tag)
+                if last_tag_pos > 0 and last_tag_pos > len(chunk_text) // 2:
+                    chunk_text = chunk_text[:last_tag_pos + len(tag)]
+                    chunk_end = offset + len(chunk_text.encode("utf-8"))
+                    break
+        chunks.append(chunk_text)
+        offset = chunk_end
+    return chunks
+
+
+def count_broken(chunks: list) -> int:
+    """统计没有在顶层边界结束的批次（按 split_storage_html 的标签扫描规则计算嵌套深度）"""
+    import wiki_manager as wm
+
+    broken = 0
+    for chunk in chunks[:-1]:
+        depth = 0
+        for match in wm._MARKUP_RE.finditer(chunk):
+            if match.lastindex == 2:
+                depth += 1
+            elif match.lastindex == 1:
+                depth -= 1
+        broken += depth != 0
+    return broken
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分批切分基准")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 100],
+                        help="输入大小（MB，默认: 10 50 100）")
+    parser.add_argument("--chunk-size", type=int, default=1024 * 1024,
+                        help="每批最大字节数（默认: 1MB）")
+    args = parser.parse_args()
+
+    import wiki_manager as wm
+
+    for size_mb in args.sizes:
+        content = make_storage(size_mb)
+        for name, split in (("legacy", legacy_split), ("split_storage_html", wm.split_storage_html)):
+            with Timer() as t:
+                chunks = split(content, args.chunk_size)
+            assert "".join(chunks) == content, f"{name}: 拼接结果与原文不一致"
+            largest = max(len(c.encode("utf-8")) for c in chunks)
+            print(f"{size_mb:>4}MB {name:<20} {t.elapsed * 1000:9.1f}ms "
+                  f"{size_mb / t.elapsed:8.1f}MB/s chunks={len(chunks):<5} "
+                  f"max={largest:<8} broken={count_broken(chunks)}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+启动开销检查：用 -X importtime 测量各子命令的导入耗时，超出预算或加载了不该加载的
+模块时退出码为 1（可作为回归检查）
+
+用法：
+    python check_import_budget.py
+    python check_import_budget.py --repeat 5 --budget-scale 2    # 较慢的机器放宽预算
+
+每个检查在独立子进程中执行 wiki_manager.py（设置 WIKI_NO_SERVER，不经常驻服务器）：
+    import    脚本自身引入的导入耗时（-X importtime 顶层条目的累计耗时之和，
+              不含解释器启动时已导入的模块），多次运行取中位数
+    forbidden 命令结束时不应已加载的模块（延迟导入的模块只在首次使用时才加载）
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+import tempfile
+
+from _common import SCRIPTS_DIR, use_mock_server
+from mock_confluence import MockConfluence
+
+SCRIPT = os.path.abspath(os.path.join(SCRIPTS_DIR, "wiki_manager.py"))
+
+# 在子进程中运行脚本，结束时把已真正加载（非延迟占位）的模块列表写入文件
+RUNNER = """
+import sys, json, atexit, runpy
+
+report, script = sys.argv[1], sys.argv[2]
+
+def _report():
+    loaded = [name for name, module in list(sys.modules.items())
+              if module is not None and type(module).__name__ != "_LazyModule"]
+    with open(report, "w") as f:
+        json.dump(loaded, f)
+
+atexit.register(_report)
+sys.argv = sys.argv[2:]
+sys.path.insert(0, script.rsplit("/", 1)[0])
+runpy.run_path(script, run_name="__main__")
+"""
+
+# (名称, 参数, 导入耗时预算 ms, 不应加载的模块)
+# 访问网络的命令大部分耗时在 httpx（httpcore、anyio、ssl）本身，频繁调用时应使用 serve
+CHECKS = [
+    ("extract-id", ["extract-id", "https://wiki.example.com/pages/viewpage.action?pageId=12345"],
+     50, ["httpx", "asyncio", "markdownify", "markdown"]),
+    ("help", ["--help"], 50, ["httpx", "asyncio", "markdownify", "markdown"]),
+    ("query", ["query", "content", "--index", "{index}"],
+     50, ["httpx", "asyncio", "markdownify", "markdown"]),
+    ("head", ["head", "--page-id", "{page_id}"], 300, ["markdownify", "markdown"]),
+    ("get --metadata-only", ["get", "--page-id", "{page_id}", "--metadata-only", "--json"],
+     300, ["markdownify", "markdown"]),
+    ("get --format storage", ["get", "--page-id", "{page_id}", "--format", "storage", "--json"],
+     300, ["markdownify", "markdown"]),
+]
+
+IMPORT_LINE = re.compile(r"import time:\s+\d+ \|\s+(\d+) \|( +)(\S+)")
+
+
+def run_traced(argv: list, env: dict) -> tuple:
+    """执行一次，返回（顶层导入条目 {模块: 累计微秒}，结束时已加载的模块集合）"""
+    with tempfile.NamedTemporaryFile("r", suffix=".json") as report:
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", RUNNER, report.name] + argv,
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+        )
+        loaded = set(json.load(report))
+    imports = {}
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match and len(match.group(2)) == 1:
+            imports[match.group(3)] = int(match.group(1))
+    return imports, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="子命令导入耗时预算检查")
+    parser.add_argument("--repeat", type=int, default=3, help="每个检查运行次数（取中位数）")
+    parser.add_argument("--budget-scale", type=float, default=1.0,
+                        help="预算倍数（较慢的机器可放宽）")
+    args = parser.parse_args()
+
+    server = MockConfluence().start()
+    use_mock_server(server)
+    page_id = server.seed_pages(1, page_size=20480)[0]
+    env = dict(os.environ, WIKI_NO_SERVER="1", WIKI_CACHE_DIR=tempfile.mkdtemp())
+    index = os.path.join(env["WIKI_CACHE_DIR"], "index.sqlite")
+
+    failed = False
+    try:
+        # query 检查使用的索引
+        subprocess.run([sys.executable, SCRIPT, "index", "--page-id", page_id, "--index", index],
+                       env=env, check=True, capture_output=True)
+
+        # 解释器启动和运行器本身导入的模块（空脚本）不计入
+        with tempfile.NamedTemporaryFile("w", suffix=".py") as empty:
+            baseline, _ = run_traced([empty.name], env)
+
+        print(f"{'check':<24} {'import':>9} {'budget':>9}  status")
+        for name, argv, budget, forbidden in CHECKS:
+            argv = [SCRIPT] + [part.format(page_id=page_id, index=index) for part in argv]
+            samples = []
+            for _ in range(args.repeat):
+                imports, loaded = run_traced(argv, env)
+                samples.append(sum(us for module, us in imports.items()
+                                   if module not in baseline) / 1000)
+            elapsed = statistics.median(samples)
+            limit = budget * args.budget_scale
+            problems = [f"加载了 {m}" for m in forbidden if m in loaded]
+            if elapsed > limit:
+                problems.append("超出预算")
+            failed = failed or bool(problems)
+            print(f"{name:<24} {elapsed:>7.1f}ms {limit:>7.0f}ms  "
+                  f"{'; '.join(problems) or 'ok'}")
+    finally:
+        server.stop()
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
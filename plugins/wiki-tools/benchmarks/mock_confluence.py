@@ -0,0 +1,887 @@
+#!/usr/bin/env python3
+"""
+本地 Confluence REST 模拟服务器 - 用于 wiki_manager 性能基准测试
+
+实现了 wiki_manager 用到的 /rest/api/content 接口子集，页面数据保存在内存中。
+不依赖真实 Wiki，也不需要任何第三方库。
+
+用法：
+    # 作为独立进程运行
+    python mock_confluence.py --port 8090 --connect-latency 0.02
+
+    # 在基准测试中以线程方式启动
+    server = MockConfluence(connect_latency=0.02).start()
+    page_ids = server.seed_pages(100, page_size=20 * 1024)
+    os.environ["WIKI_BASE_URL"] = server.base_url
+    ...
+    server.stop()
+"""
+
+import io
+import re
+import json
+import time
+import email
+import email.policy
+import random
+import argparse
+import mimetypes
+import threading
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlparse, parse_qs, quote, unquote
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# 生成页面正文时循环使用的 Storage Format 片段
+BODY_BLOCKS = (
+    "<h2>Section {n}</h2>",
+    "<p>Paragraph {n} with <strong>bold</strong>, <em>emphasis</em> and "
+    "<a href=\"/pages/viewpage.action?pageId={n}\">a link</a>.</p>",
+    "<table><tbody>" + "<tr><th>Key</th><td>value {n}</td></tr>" * 6 + "</tbody></table>",
+    "<ac:structured-macro ac:name=\"code\"><ac:plain-text-body><![CDATA[def f_{n}():\n"
+    "    return {n}\n]]></ac:plain-text-body></ac:structured-macro>",
+    "<ul>" + "<li>Item {n}</li>" * 4 + "</ul>",
+)
+
+
+def make_storage_body(size: int) -> str:
+    """生成约 size 字节的 Storage Format 正文（标题、段落、表格、代码宏混合）"""
+    parts, total, n = [], 0, 0
+    while total < size:
+        block = BODY_BLOCKS[n % len(BODY_BLOCKS)].format(n=n)
+        parts.append(block)
+        total += len(block)
+        n += 1
+    return "".join(parts)
+
+
+class MockConfluence:
+    """内存版 Confluence 服务器"""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        connect_latency: float = 0.0,
+        latency: float = 0.0,
+        throttle_rps: float = 0.0,
+        retry_after: float = 1.0,
+        fail_rate: float = 0.0,
+        utc_offset: float = 0.0
+    ):
+        """
+        Args:
+            host: 监听地址
+            port: 监听端口（0 表示随机端口）
+            connect_latency: 每个新连接的额外延迟（秒），模拟 TCP/TLS 握手开销
+            latency: 每个请求的额外延迟（秒），模拟服务端处理时间
+            throttle_rps: 每秒允许的请求数，超出时返回 429 + Retry-After（0 表示不限流）
+            retry_after: 429 响应中 Retry-After 的秒数
+            fail_rate: 随机返回 503 的比例（0~1），模拟服务端过载
+            utc_offset: 服务器时区（相对 UTC 的小时数）：version.when 按该时区输出，
+                CQL 中的日期也按该时区解释
+        """
+        self.connect_latency = connect_latency
+        self.latency = latency
+        self.throttle_rps = throttle_rps
+        self.retry_after = retry_after
+        self.fail_rate = fail_rate
+        self.tz = timezone(timedelta(hours=utc_offset))
+        self._tokens = throttle_rps
+        self._tokens_at = time.monotonic()
+        self.pages = {}
+        self.history = {}
+        self.attachments = {}
+        self.next_id = 100000
+        self.lock = threading.RLock()
+        self.stats = {"connections": 0, "requests": 0, "throttled": 0, "failed": 0,
+                      "bytes_in": 0, "bytes_out": 0}
+        self.faults = []
+        self._httpd = ThreadingHTTPServer((host, port), _make_handler(self))
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockConfluence":
+        """在后台线程中启动服务器"""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """停止服务器"""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    # ------------------------------------------------------------------
+    # 页面数据
+    # ------------------------------------------------------------------
+
+    def add_page(self, title: str, body: str = "", space: str = "BENCH",
+                 parent_id: str = None) -> str:
+        """直接向内存中添加页面，返回页面 ID"""
+        with self.lock:
+            page_id = str(self.next_id)
+            self.next_id += 1
+            self.pages[page_id] = {
+                "id": page_id,
+                "type": "page",
+                "status": "current",
+                "title": title,
+                "space": {"key": space},
+                "body": body,
+                "version": 1,
+                "when": _now(),
+                "parent": parent_id,
+                "position": self.next_id,
+                "labels": []
+            }
+            return page_id
+
+    def seed_pages(self, count: int, page_size: int = 2048, space: str = "BENCH",
+                   parent_id: str = None, fanout: int = 0) -> list:
+        """批量添加 count 个正文约 page_size 字节的页面，返回页面 ID 列表
+
+        fanout > 0 时按广度优先组织成每个页面最多 fanout 个子页面的树
+        （第一个页面挂在 parent_id 下），否则所有页面都挂在 parent_id 下。
+        """
+        body = make_storage_body(page_size)
+        page_ids = []
+        for i in range(count):
+            parent = page_ids[(i - 1) // fanout] if fanout and i else parent_id
+            page_ids.append(self.add_page(f"Bench page {self.next_id}", body,
+                                          space=space, parent_id=parent))
+        return page_ids
+
+    def add_version(self, page_id: str, body: str, title: str = None, message: str = "") -> int:
+        """直接为页面生成一个新版本（旧版本进入历史），返回新版本号"""
+        with self.lock:
+            page = self.pages[page_id]
+            self.archive(page)
+            page["version"] += 1
+            page["when"] = _now()
+            page["message"] = message
+            page["body"] = body
+            if title:
+                page["title"] = title
+            return page["version"]
+
+    def archive(self, page: dict) -> None:
+        """把页面当前版本存入历史（更新前调用）"""
+        with self.lock:
+            self.history.setdefault(page["id"], {})[page["version"]] = dict(page)
+
+    def page_versions(self, page_id: str) -> list:
+        """页面的所有版本（新版本在前）"""
+        with self.lock:
+            page = self.pages[page_id]
+            older = self.history.get(page_id, {})
+            return [page] + [older[n] for n in sorted(older, reverse=True)]
+
+    def render_version(self, page: dict) -> dict:
+        return {
+            "number": page["version"],
+            "when": self.local_time(page["when"]),
+            "by": {"displayName": "bench"},
+            "message": page.get("message", ""),
+            "minorEdit": False
+        }
+
+    def local_time(self, when: str) -> str:
+        """把内部保存的 UTC 时间转换为服务器时区的 ISO 时间"""
+        moment = datetime.fromisoformat(when.replace("Z", "+00:00")).astimezone(self.tz)
+        return moment.isoformat(timespec="milliseconds")
+
+    def snapshot_stats(self) -> dict:
+        """返回统计数据的副本（用于计算一段时间内的增量）"""
+        with self.lock:
+            return dict(self.stats)
+
+    def admit(self) -> int:
+        """限流与故障注入：返回 0 表示正常处理，否则返回应答的错误状态码"""
+        with self.lock:
+            if self.fail_rate and random.random() < self.fail_rate:
+                self.stats["failed"] += 1
+                return 503
+            if self.throttle_rps:
+                now = time.monotonic()
+                self._tokens = min(self.throttle_rps,
+                                   self._tokens + (now - self._tokens_at) * self.throttle_rps)
+                self._tokens_at = now
+                if self._tokens < 1:
+                    self.stats["throttled"] += 1
+                    return 429
+                self._tokens -= 1
+        return 0
+
+    def inject_fault(self, method: str, path: str, status: int = None, applied: bool = True,
+                     retry_after: float = None, count: int = 1) -> None:
+        """让接下来 count 个匹配的请求得到故障响应
+
+        Args:
+            method: 请求方法
+            path: 路径正则（完整匹配）
+            status: 返回的状态码；None 表示不返回响应、直接断开连接（响应丢失）
+            applied: 故障前是否照常处理请求（模拟服务端已执行、响应在途中丢失或网关超时）
+            retry_after: 响应中 Retry-After 的秒数（可选）
+        """
+        with self.lock:
+            self.faults.append({"method": method, "path": re.compile(path), "status": status,
+                                "applied": applied, "retry_after": retry_after,
+                                "remaining": count})
+
+    def take_fault(self, method: str, path: str):
+        """取出与请求匹配的故障（没有时返回 None）"""
+        with self.lock:
+            for fault in self.faults:
+                if fault["method"] == method and fault["path"].fullmatch(path):
+                    fault["remaining"] -= 1
+                    if not fault["remaining"]:
+                        self.faults.remove(fault)
+                    self.stats["failed"] += 1
+                    return fault
+        return None
+
+    def add_attachment(self, page_id: str, filename: str, data: bytes,
+                       media_type: str = None) -> dict:
+        """添加附件；同名附件已存在时新增一个版本"""
+        with self.lock:
+            existing = self.find_attachment(page_id, filename)
+            if existing is not None:
+                existing["data"] = data
+                existing["version"] += 1
+                existing["when"] = _now()
+                return existing
+            attachment = {
+                "id": f"att{self.next_id}",
+                "page_id": page_id,
+                "title": filename,
+                "data": data,
+                "media_type": media_type or mimetypes.guess_type(filename)[0]
+                or "application/octet-stream",
+                "version": 1,
+                "when": _now(),
+            }
+            self.next_id += 1
+            self.attachments[attachment["id"]] = attachment
+            return attachment
+
+    def find_attachment(self, page_id: str, filename: str):
+        for attachment in self.attachments.values():
+            if attachment["page_id"] == page_id and attachment["title"] == filename:
+                return attachment
+        return None
+
+    def page_attachments(self, page_id: str) -> list:
+        return [a for a in self.attachments.values() if a["page_id"] == page_id]
+
+    def render_attachment(self, attachment: dict) -> dict:
+        return {
+            "id": attachment["id"],
+            "type": "attachment",
+            "status": "current",
+            "title": attachment["title"],
+            "version": {"number": attachment["version"], "when": attachment["when"]},
+            "extensions": {"mediaType": attachment["media_type"],
+                           "fileSize": len(attachment["data"])},
+            "_links": {"download": f"/download/attachments/{attachment['page_id']}/"
+                                   f"{quote(attachment['title'], safe='')}"
+                                   f"?version={attachment['version']}&api=v2"}
+        }
+
+    def remove_page(self, page_id: str) -> None:
+        """把页面移入回收站（不再出现在列表和搜索结果中）"""
+        with self.lock:
+            self.pages[page_id]["status"] = "trashed"
+
+    def children(self, page_id: str) -> list:
+        """页面的直接子页面（按位置排序）"""
+        with self.lock:
+            return sorted((p for p in self.pages.values()
+                           if p["parent"] == page_id and p["status"] == "current"),
+                          key=lambda p: p["position"])
+
+    def move_page(self, page_id: str, position: str, target_id: str) -> None:
+        """移动页面（连同子孙页面）：append 移到目标页面下，before/after 移到目标页面旁边"""
+        with self.lock:
+            page, target = self.pages[page_id], self.pages[target_id]
+            parent = target_id if position == "append" else target["parent"]
+            siblings = [p for p in self.children(parent) if p["id"] != page_id]
+            index = len(siblings)
+            if position != "append":
+                index = siblings.index(target) + (position == "after")
+            siblings.insert(index, page)
+            for n, sibling in enumerate(siblings):
+                sibling["position"] = n
+            page["parent"] = parent
+            self.set_space(page, target["space"]["key"])
+
+    def set_space(self, page: dict, space: str) -> None:
+        """修改页面及其子孙页面所在的空间"""
+        with self.lock:
+            page["space"] = {"key": space}
+            for child in self.children(page["id"]):
+                self.set_space(child, space)
+
+    def ancestors(self, page: dict) -> list:
+        """页面的祖先 ID 列表（从根到父）"""
+        chain = []
+        parent = page["parent"]
+        while parent:
+            chain.insert(0, parent)
+            parent = self.pages[parent]["parent"] if parent in self.pages else None
+        return chain
+
+    def render(self, page: dict, expand: set) -> dict:
+        """按 expand 参数渲染页面 JSON（未展开的字段不返回）"""
+        data = {
+            "id": page["id"],
+            "type": page["type"],
+            "status": page["status"],
+            "title": page["title"],
+            "_links": {"webui": f"/pages/viewpage.action?pageId={page['id']}"}
+        }
+        if "space" in expand:
+            data["space"] = page["space"]
+        if "version" in expand:
+            data["version"] = self.render_version(page)
+        body = {}
+        if "body.storage" in expand:
+            body["storage"] = {"value": page["body"], "representation": "storage"}
+        if "body.view" in expand:
+            body["view"] = {"value": page["body"], "representation": "view"}
+        if body:
+            data["body"] = body
+        if "metadata.labels" in expand:
+            data["metadata"] = {"labels": {"results": [
+                {"prefix": "global", "name": name} for name in page["labels"]
+            ]}}
+        if "children.attachment" in expand:
+            # 与真实接口一样，展开字段只返回第一页
+            attachments = self.page_attachments(page["id"])
+            listing = {"results": [self.render_attachment(a) for a in attachments[:25]],
+                       "size": min(25, len(attachments)), "_links": {}}
+            if len(attachments) > 25:
+                listing["_links"]["next"] = (f"/rest/api/content/{page['id']}"
+                                             f"/child/attachment?start=25&limit=25")
+            data["children"] = {"attachment": listing}
+        if "ancestors" in expand:
+            data["ancestors"] = [
+                {"id": pid, "title": self.pages[pid]["title"]} for pid in self.ancestors(page)
+            ]
+        return data
+
+
+# ----------------------------------------------------------------------
+# 极简 CQL 解析（支持 and / or / not / 括号，以及常用字段的比较）
+# ----------------------------------------------------------------------
+
+_CQL_TOKEN = re.compile(r'\s*(\(|\)|!=|>=|<=|=|~|>|<|"(?:[^"\\]|\\.)*"|[^\s()=!<>~"]+)')
+
+
+def _tokenize_cql(cql: str) -> list:
+    tokens = []
+    pos = 0
+    while pos < len(cql):
+        match = _CQL_TOKEN.match(cql, pos)
+        if not match or not match.group(1):
+            break
+        tokens.append(match.group(1))
+        pos = match.end()
+    return tokens
+
+
+def _parse_cql_time(value: str, tz: timezone) -> str:
+    """把 CQL 日期（yyyy/MM/dd HH:mm 或 yyyy-MM-dd，服务器时区）转换为可比较的 UTC ISO 字符串"""
+    value = value.replace("/", "-")
+    if len(value) == 10:
+        value += " 00:00"
+    moment = datetime.strptime(value, "%Y-%m-%d %H:%M").replace(tzinfo=tz)
+    return moment.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+def compile_cql(cql: str, server: "MockConfluence"):
+    """把 CQL 编译为 page -> bool 的谓词"""
+    tokens = _tokenize_cql(cql)
+    pos = 0
+
+    def peek():
+        return tokens[pos].lower() if pos < len(tokens) else None
+
+    def take():
+        nonlocal pos
+        pos += 1
+        return tokens[pos - 1]
+
+    def parse_or():
+        left = parse_and()
+        while peek() == "or":
+            take()
+            right = parse_and()
+            left = (lambda a, b: lambda p: a(p) or b(p))(left, right)
+        return left
+
+    def parse_and():
+        left = parse_factor()
+        while peek() == "and":
+            take()
+            right = parse_factor()
+            left = (lambda a, b: lambda p: a(p) and b(p))(left, right)
+        return left
+
+    def parse_factor():
+        if peek() == "not":
+            take()
+            inner = parse_factor()
+            return lambda p: not inner(p)
+        if peek() == "(":
+            take()
+            inner = parse_or()
+            take()  # )
+            return inner
+        field, op, value = take().lower(), take(), take().strip('"')
+        return _clause(field, op, value, server)
+
+    return parse_or()
+
+
+def _clause(field: str, op: str, value: str, server: "MockConfluence"):
+    def getter(page):
+        if field == "id":
+            return page["id"]
+        if field in ("ancestor", "parent"):
+            return server.ancestors(page) if field == "ancestor" else [page["parent"]]
+        if field == "space":
+            return page["space"]["key"]
+        if field == "type":
+            return page["type"]
+        if field == "title":
+            return page["title"]
+        if field == "text":
+            return page["title"] + " " + page["body"]
+        if field == "label":
+            return page["labels"]
+        if field in ("lastmodified", "created"):
+            return page["when"]
+        return None
+
+    if field in ("lastmodified", "created"):
+        value = _parse_cql_time(value, server.tz)
+
+    def predicate(page):
+        actual = getter(page)
+        if isinstance(actual, list):
+            hit = value in actual
+            return hit if op == "=" else not hit
+        if op == "=":
+            return actual == value
+        if op == "!=":
+            return actual != value
+        if op == "~":
+            return value.lower().strip("*") in (actual or "").lower()
+        if op == ">":
+            return actual > value
+        if op == ">=":
+            return actual >= value
+        if op == "<":
+            return actual < value
+        if op == "<=":
+            return actual <= value
+        return False
+
+    return predicate
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+def _make_handler(server: MockConfluence):
+    """构造绑定到指定 MockConfluence 实例的请求处理器"""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # 支持 keep-alive
+        disable_nagle_algorithm = True  # 头部与正文分开写出，避免 40ms 延迟确认
+
+        def setup(self):
+            super().setup()
+            with server.lock:
+                server.stats["connections"] += 1
+            if server.connect_latency:
+                time.sleep(server.connect_latency)
+
+        def log_message(self, format, *args):
+            pass
+
+        # ---------------------------------------------------------------
+        # 请求分发
+        # ---------------------------------------------------------------
+
+        def do_GET(self):
+            self._dispatch("GET")
+
+        def do_PUT(self):
+            self._dispatch("PUT")
+
+        def do_POST(self):
+            self._dispatch("POST")
+
+        def do_DELETE(self):
+            self._dispatch("DELETE")
+
+        def _dispatch(self, method: str):
+            fault = server.take_fault(method, urlparse(self.path).path)
+            if fault is None:
+                return self._handle(method)
+
+            if fault["applied"]:
+                # 照常处理请求，但丢弃真实响应
+                real, self.wfile = self.wfile, io.BytesIO()
+                try:
+                    self._handle(method)
+                finally:
+                    self.wfile = real
+            else:
+                with server.lock:
+                    server.stats["requests"] += 1
+                self._read_raw()
+            if fault["status"] is None:
+                self.close_connection = True
+                return
+            headers = {}
+            if fault["retry_after"] is not None:
+                headers["Retry-After"] = str(fault["retry_after"])
+            return self._send(fault["status"], {"message": "injected fault"}, headers)
+
+        def _handle(self, method: str):
+            with server.lock:
+                server.stats["requests"] += 1
+            if server.latency:
+                time.sleep(server.latency)
+
+            parsed = urlparse(self.path)
+            query = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+            raw = self._read_raw()
+            content_type = self.headers.get("Content-Type", "")
+            body = json.loads(raw) if raw and "json" in content_type else {}
+
+            status = server.admit()
+            if status == 429:
+                return self._send(429, {"message": "rate limited"},
+                                  {"Retry-After": str(server.retry_after)})
+            if status:
+                return self._send(status, {"message": "service unavailable"})
+
+            match = re.fullmatch(r"/rest/api/content/(\d+)/child/page", parsed.path)
+            if match and method == "GET":
+                return self._send_paginated(parsed.path, query, server.children(match.group(1)))
+            match = re.fullmatch(r"/rest/api/content/(\d+)/move/(before|after|append)/(\d+)",
+                                 parsed.path)
+            if match and method == "PUT":
+                if match.group(1) not in server.pages or match.group(3) not in server.pages:
+                    return self._send(404, {"message": "page not found"})
+                server.move_page(match.group(1), match.group(2), match.group(3))
+                return self._send(200, {"pageId": match.group(1)})
+            match = re.fullmatch(r"/rest/api/space/([^/]+)/content/page", parsed.path)
+            if match and method == "GET":
+                return self._list_pages(parsed.path, query,
+                                        lambda p: p["space"]["key"] == match.group(1)
+                                        and not p["parent"])
+
+            match = re.fullmatch(r"/rest/api/content/(\d+)/label(?:/([^/]+))?", parsed.path)
+            if match:
+                return self._labels(method, match.group(1),
+                                    unquote(match.group(2) or "") or query.get("name"),
+                                    parsed.path, query, body)
+
+            match = re.fullmatch(r"/rest/api/content/(\d+)/version", parsed.path)
+            if match and method == "GET":
+                if match.group(1) not in server.pages:
+                    return self._send(404, {"message": "page not found"})
+                return self._send_paginated(parsed.path, query,
+                                            server.page_versions(match.group(1)),
+                                            server.render_version)
+
+            match = re.fullmatch(r"/rest/api/content/(\d+)/child/attachment(?:/(att\d+)/data)?",
+                                 parsed.path)
+            if match and method == "GET" and not match.group(2):
+                attachments = server.page_attachments(match.group(1))
+                return self._send_paginated(parsed.path, query, attachments,
+                                            server.render_attachment)
+            if match and method == "POST":
+                return self._upload_attachment(match.group(1), match.group(2), raw, content_type)
+            match = re.fullmatch(r"/download/attachments/(\d+)/([^/]+)", parsed.path)
+            if match and method == "GET":
+                return self._download_attachment(match.group(1), unquote(match.group(2)))
+
+            if parsed.path == "/rest/api/content/search" and method == "GET":
+                return self._search(parsed.path, query)
+
+            match = re.fullmatch(r"/rest/api/content/(\d+)", parsed.path)
+            if match and method == "GET":
+                return self._get_page(match.group(1), query)
+            if match and method == "DELETE":
+                server.remove_page(match.group(1))
+                return self._send_empty(204)
+            if match and method == "PUT":
+                return self._update_page(match.group(1), body)
+            if parsed.path == "/rest/api/content" and method == "POST":
+                return self._create_page(body)
+
+            self._send(404, {"message": "not found"})
+
+        # ---------------------------------------------------------------
+        # 接口实现
+        # ---------------------------------------------------------------
+
+        def _get_page(self, page_id: str, query: dict):
+            page = server.pages.get(page_id)
+            if page is None:
+                return self._send(404, {"message": "page not found"})
+            version = int(query.get("version", 0))
+            if version and version != page["version"]:
+                # 历史版本需要 status=historical
+                page = server.history.get(page_id, {}).get(version)
+                if page is None or query.get("status") != "historical":
+                    return self._send(404, {"message": "version not found"})
+                page = dict(page, status="historical")
+            expand = set(filter(None, query.get("expand", "").split(",")))
+            self._send(200, server.render(page, expand))
+
+        def _search(self, path: str, query: dict):
+            try:
+                predicate = compile_cql(query.get("cql", ""), server)
+            except (IndexError, ValueError):
+                return self._send(400, {"message": "invalid cql"})
+            self._list_pages(path, query, predicate)
+
+        def _list_pages(self, path: str, query: dict, predicate):
+            pages = [p for p in server.pages.values()
+                     if p["status"] == "current" and predicate(p)]
+            self._send_paginated(path, query, pages)
+
+        def _send_paginated(self, path: str, query: dict, pages: list, render=None):
+            """按 start/limit 分页返回，存在下一页时带 _links.next"""
+            start = int(query.get("start", 0))
+            limit = int(query.get("limit", 25))
+            expand = set(filter(None, query.get("expand", "").split(",")))
+            window = pages[start:start + limit]
+            render = render or (lambda p: server.render(p, expand))
+            payload = {
+                "results": [render(p) for p in window],
+                "start": start,
+                "limit": limit,
+                "size": len(window),
+                "_links": {}
+            }
+            if start + limit < len(pages):
+                payload["_links"]["next"] = f"{path}?start={start + limit}&limit={limit}"
+            self._send(200, payload)
+
+        def _labels(self, method: str, page_id: str, name, path: str, query: dict, payload):
+            """GET 列出 / POST 批量添加（对象数组）/ DELETE 删除单个标签"""
+            page = server.pages.get(page_id)
+            if page is None:
+                return self._send(404, {"message": "page not found"})
+            render = lambda label: {"prefix": "global", "name": label, "id": label}
+            if method == "GET":
+                return self._send_paginated(path, query, page["labels"], render)
+            if method == "POST":
+                items = payload if isinstance(payload, list) else [payload]
+                with server.lock:
+                    for item in items:
+                        label = str(item.get("name", "")).lower()
+                        if not label or any(c.isspace() for c in label):
+                            return self._send(400, {"message": f"invalid label: {label}"})
+                        if label not in page["labels"]:
+                            page["labels"].append(label)
+                    labels = list(page["labels"])
+                return self._send(200, {"results": [render(label) for label in labels],
+                                        "size": len(labels)})
+            if method == "DELETE" and name:
+                with server.lock:
+                    if name not in page["labels"]:
+                        return self._send(404, {"message": "label not found"})
+                    page["labels"].remove(name)
+                return self._send_empty(204)
+            self._send(405, {"message": "method not allowed"})
+
+        def _update_page(self, page_id: str, payload: dict):
+            with server.lock:
+                page = server.pages.get(page_id)
+                if page is None:
+                    return self._send(404, {"message": "page not found"})
+                new_version = payload.get("version", {}).get("number")
+                if new_version != page["version"] + 1:
+                    return self._send(409, {"message": "version conflict"})
+                server.archive(page)
+                page["version"] = new_version
+                page["message"] = payload.get("version", {}).get("message", "")
+                page["when"] = _now()
+                page["title"] = payload.get("title", page["title"])
+                storage = payload.get("body", {}).get("storage")
+                if storage is not None:
+                    page["body"] = storage.get("value", "")
+                ancestors = payload.get("ancestors")
+                if ancestors:
+                    page["parent"] = ancestors[-1]["id"]
+                space = payload.get("space", {}).get("key")
+                if space and space != page["space"]["key"]:
+                    server.set_space(page, space)
+            self._send(200, server.render(page, {"space", "version"}))
+
+        def _create_page(self, payload: dict):
+            ancestors = payload.get("ancestors") or []
+            title = payload.get("title", "")
+            space = payload.get("space", {}).get("key", "BENCH")
+            with server.lock:
+                duplicate = any(p["title"] == title and p["space"]["key"] == space
+                                and p["status"] == "current" for p in server.pages.values())
+            if duplicate:
+                return self._send(400, {"message": "A page with this title already exists"})
+            page_id = server.add_page(
+                title=title,
+                body=payload.get("body", {}).get("storage", {}).get("value", ""),
+                space=space,
+                parent_id=ancestors[-1]["id"] if ancestors else None
+            )
+            self._send(200, server.render(server.pages[page_id], {"space", "version"}))
+
+        def _upload_attachment(self, page_id: str, attachment_id, raw: bytes,
+                               content_type: str):
+            if self.headers.get("X-Atlassian-Token") != "no-check":
+                return self._send(403, {"message": "XSRF check failed"})
+            if page_id not in server.pages:
+                return self._send(404, {"message": "page not found"})
+            message = email.message_from_bytes(
+                f"Content-Type: {content_type}\r\n\r\n".encode() + raw,
+                policy=email.policy.HTTP  # 文件名按 UTF-8 解析
+            )
+            uploads = [part for part in message.get_payload() if part.get_filename()]
+            if not uploads:
+                return self._send(400, {"message": "no file"})
+
+            with server.lock:
+                if attachment_id:
+                    existing = server.attachments.get(attachment_id)
+                    if existing is None:
+                        return self._send(404, {"message": "attachment not found"})
+                    part = uploads[0]
+                    attachment = server.add_attachment(page_id, existing["title"],
+                                                       part.get_payload(decode=True))
+                    return self._send(200, server.render_attachment(attachment))
+
+                results = []
+                for part in uploads:
+                    filename = part.get_filename()
+                    if server.find_attachment(page_id, filename) is not None:
+                        return self._send(400, {"message": "Cannot add a new attachment with "
+                                                           "same file name as an existing attachment"})
+                    attachment = server.add_attachment(page_id, filename,
+                                                       part.get_payload(decode=True),
+                                                       part.get_content_type())
+                    results.append(server.render_attachment(attachment))
+            self._send(200, {"results": results, "size": len(results)})
+
+        def _download_attachment(self, page_id: str, filename: str):
+            attachment = server.find_attachment(page_id, filename)
+            if attachment is None:
+                return self._send(404, {"message": "attachment not found"})
+            data = attachment["data"]
+            self.send_response(200)
+            self.send_header("Content-Type", attachment["media_type"])
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            with server.lock:
+                server.stats["bytes_out"] += len(data)
+
+        # ---------------------------------------------------------------
+        # 工具方法
+        # ---------------------------------------------------------------
+
+        def _read_raw(self) -> bytes:
+            if "chunked" in self.headers.get("Transfer-Encoding", "").lower():
+                raw = self._read_chunked()
+            else:
+                length = int(self.headers.get("Content-Length") or 0)
+                if not length:
+                    return b""
+                raw = self.rfile.read(length)
+            with server.lock:
+                server.stats["bytes_in"] += len(raw)
+            return raw
+
+        def _read_chunked(self) -> bytes:
+            """读取 Transfer-Encoding: chunked 的请求体（流式上传）"""
+            parts = []
+            while True:
+                size = int(self.rfile.readline().split(b";")[0].strip(), 16)
+                if not size:
+                    # 跳过 trailer，直到空行
+                    while self.rfile.readline() not in (b"\r\n", b"\n", b""):
+                        pass
+                    return b"".join(parts)
+                parts.append(self.rfile.read(size))
+                self.rfile.readline()
+
+        def _send_empty(self, status: int):
+            self.send_response(status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def _send(self, status: int, payload: dict, headers: dict = None):
+            raw = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(raw)))
+            self.end_headers()
+            self.wfile.write(raw)
+            with server.lock:
+                server.stats["bytes_out"] += len(raw)
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地 Confluence REST 模拟服务器")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--connect-latency", type=float, default=0.0,
+                        help="每个新连接的额外延迟（秒），模拟 TLS 握手")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="每个请求的额外延迟（秒）")
+    parser.add_argument("--throttle-rps", type=float, default=0.0,
+                        help="每秒允许的请求数，超出返回 429（0 表示不限流）")
+    parser.add_argument("--retry-after", type=float, default=1.0,
+                        help="429 响应中 Retry-After 的秒数")
+    parser.add_argument("--fail-rate", type=float, default=0.0,
+                        help="随机返回 503 的比例（0~1）")
+    parser.add_argument("--utc-offset", type=float, default=0.0,
+                        help="服务器时区（相对 UTC 的小时数）")
+    parser.add_argument("--seed-pages", type=int, default=1,
+                        help="预置页面数量")
+    parser.add_argument("--page-size", type=int, default=1200,
+                        help="预置页面的正文大小（字节）")
+    args = parser.parse_args()
+
+    server = MockConfluence(args.host, args.port, args.connect_latency, args.latency,
+                            throttle_rps=args.throttle_rps, retry_after=args.retry_after,
+                            fail_rate=args.fail_rate, utc_offset=args.utc_offset)
+    for page_id in server.seed_pages(args.seed_pages, page_size=args.page_size):
+        print(f"seed page: {page_id}")
+    print(f"Mock Confluence listening on {server.base_url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
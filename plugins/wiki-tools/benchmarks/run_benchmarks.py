@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+"""
+wiki_manager 热路径基准套件：在本地模拟服务器上运行各场景并汇总指标
+
+用法：
+    python run_benchmarks.py                          # 运行全部场景
+    python run_benchmarks.py -s get update --repeat 100 --page-size 65536
+    python run_benchmarks.py --latency 0.005 --throttle-rps 200
+    python run_benchmarks.py --save baseline.json     # 保存结果
+    python run_benchmarks.py --compare baseline.json  # 与保存的结果对比，退化时退出码为 1
+
+模拟服务器运行在当前进程中，每个场景在独立子进程中执行，因此峰值内存只统计
+客户端。每个场景报告：
+    items/s    吞吐量（单页面场景为请求数，批量场景为页面数/文件数）
+    MB/s       收发总字节数 / 耗时
+    p50 / p99  单次操作延迟（批量场景为每轮整体耗时）
+    sent/recv  服务端统计的请求体 / 响应体字节数
+    peak       子进程峰值 RSS 相对场景开始前的增量
+    retries    客户端重试次数（含 429 限流）
+"""
+
+import os
+import sys
+import json
+import shutil
+import asyncio
+import argparse
+import tempfile
+import subprocess
+
+from _common import use_mock_server, max_rss_mb, percentile, Timer
+from mock_confluence import MockConfluence, make_storage_body
+
+SCENARIOS = (
+    "get", "get-markdown", "update", "update-skip", "append",
+    "create-chunked", "bulk-get", "export", "search", "search-content", "attachments"
+)
+
+# 对比时视为退化的指标：(字段, 越大越好)
+COMPARE_METRICS = (("throughput", True), ("p50", False), ("p99", False), ("peak_mb", False))
+
+
+# ============================================================================
+# 场景（在子进程中执行）
+# ============================================================================
+
+async def scenario_get(wm, config, client, fixture, args):
+    samples = []
+    for _ in range(args.repeat):
+        with Timer() as t:
+            await wm.get_wiki_page_content(config, page_id=fixture["page"], format="storage",
+                                           client=client)
+        samples.append(t.elapsed)
+    return samples, len(samples)
+
+
+async def scenario_get_markdown(wm, config, client, fixture, args):
+    samples = []
+    for _ in range(args.repeat):
+        with Timer() as t:
+            await wm.get_wiki_page_content(config, page_id=fixture["page"], format="markdown",
+                                           client=client)
+        samples.append(t.elapsed)
+    return samples, len(samples)
+
+
+async def scenario_update(wm, config, client, fixture, args):
+    body = make_storage_body(args.page_size)
+    samples = []
+    for i in range(args.repeat):
+        with Timer() as t:
+            await wm.update_wiki_page_content(config, page_id=fixture["update_page"],
+                                              content=f"{body}<p>revision {i}</p>",
+                                              format="html", client=client)
+        samples.append(t.elapsed)
+    return samples, len(samples)
+
+
+async def scenario_update_skip(wm, config, client, fixture, args):
+    # 内容与页面现有内容一致，走比对后跳过 PUT 的路径
+    body = make_storage_body(args.page_size)
+    samples = []
+    for _ in range(args.repeat):
+        with Timer() as t:
+            await wm.update_wiki_page_content(config, page_id=fixture["page"], content=body,
+                                              format="html", client=client)
+        samples.append(t.elapsed)
+    return samples, len(samples)
+
+
+async def scenario_append(wm, config, client, fixture, args):
+    samples = []
+    for i in range(args.repeat):
+        with Timer() as t:
+            await wm.update_wiki_page_content(config, page_id=fixture["append_page"],
+                                              content=f"<p>appended line {i}</p>",
+                                              format="html", append=True, client=client)
+        samples.append(t.elapsed)
+    return samples, len(samples)
+
+
+async def scenario_create_chunked(wm, config, client, fixture, args):
+    content = make_storage_body(args.create_size)
+    samples = []
+    for i in range(args.rounds):
+        with Timer() as t:
+            await wm.create_wiki_page_with_chunks(
+                config, f"bench chunked {os.getpid()}-{i}", content, "BENCH",
+                format="html", chunk_size=args.chunk_size, client=client
+            )
+        samples.append(t.elapsed)
+    return samples, len(samples)
+
+
+async def scenario_bulk_get(wm, config, client, fixture, args):
+    samples, items = [], 0
+    for _ in range(args.rounds):
+        with Timer() as t:
+            async for result in wm.iter_wiki_pages(config, fixture["pages"], format="storage",
+                                                   concurrency=args.concurrency, client=client):
+                if "error" in result:
+                    raise RuntimeError(result["error"])
+                items += 1
+        samples.append(t.elapsed)
+    return samples, items
+
+
+async def scenario_export(wm, config, client, fixture, args):
+    samples, items = [], 0
+    for _ in range(args.rounds):
+        output_dir = tempfile.mkdtemp(prefix="wiki-bench-export-")
+        try:
+            with Timer() as t:
+                stats = await wm.export_page_tree(config, output_dir,
+                                                  root_page_id=fixture["tree_root"],
+                                                  format="storage",
+                                                  concurrency=args.concurrency, client=client)
+            items += stats["pages"]
+        finally:
+            shutil.rmtree(output_dir, ignore_errors=True)
+        samples.append(t.elapsed)
+    return samples, items
+
+
+async def scenario_search(wm, config, client, fixture, args):
+    samples, items = [], 0
+    for _ in range(args.rounds):
+        with Timer() as t:
+            async for _result in wm.iter_cql_search(config, 'space = "BENCH" and type = page',
+                                                    expand="version", client=client):
+                items += 1
+        samples.append(t.elapsed)
+    return samples, items
+
+
+async def scenario_search_content(wm, config, client, fixture, args):
+    samples, items = [], 0
+    for _ in range(args.rounds):
+        with Timer() as t:
+            async for result in wm.search_wiki_pages(
+                config, f"ancestor = {fixture['tree_root']}", format="storage",
+                with_content=True, concurrency=args.concurrency, client=client, batch_size=25
+            ):
+                if "error" in result:
+                    raise RuntimeError(result["error"])
+                items += 1
+        samples.append(t.elapsed)
+    return samples, items
+
+
+async def scenario_attachments(wm, config, client, fixture, args):
+    samples, items = [], 0
+    for _ in range(args.rounds):
+        output_dir = tempfile.mkdtemp(prefix="wiki-bench-attachments-")
+        try:
+            with Timer() as t:
+                stats = await wm.pull_attachments(config, fixture["attachment_page"],
+                                                  output_dir, concurrency=args.concurrency,
+                                                  client=client)
+            items += stats["downloaded"]
+        finally:
+            shutil.rmtree(output_dir, ignore_errors=True)
+        samples.append(t.elapsed)
+    return samples, items
+
+
+async def run_scenario(name: str, fixture: dict, args) -> dict:
+    import wiki_manager as wm
+
+    config = wm.WikiConfig()
+    scenario = globals()["scenario_" + name.replace("-", "_")]
+    async with wm.WikiClient(config) as client:
+        # 预热：建立连接并加载格式转换库，不计入延迟统计
+        await wm.get_wiki_page_content(config, page_id=fixture["page"], format="storage",
+                                       client=client)
+        wm.html_to_markdown("<p>warm up</p>")
+        wm.markdown_to_storage("warm up")
+        client.stats.update(requests=0, retries=0, throttled=0)
+        # 通知父进程记录服务端统计的起点，收到确认后再开始
+        print("ready", flush=True)
+        sys.stdin.readline()
+
+        baseline = max_rss_mb()
+        with Timer() as t:
+            samples, items = await scenario(wm, config, client, fixture, args)
+        client_stats = client.stats_summary()
+    return {
+        "samples": samples,
+        "items": items,
+        "elapsed": t.elapsed,
+        "peak_mb": max_rss_mb() - baseline,
+        "retries": client_stats["retries"],
+        "throttled": client_stats["throttled"]
+    }
+
+
+def run_child(args) -> None:
+    """子进程：执行单个场景并以 JSON 输出原始结果"""
+    fixture = json.loads(args.fixture)
+    print(json.dumps(asyncio.run(run_scenario(args.child, fixture, args))))
+
+
+# ============================================================================
+# 汇总（父进程）
+# ============================================================================
+
+def seed_fixture(server: MockConfluence, args) -> dict:
+    """在模拟服务器中预置各场景用到的页面和附件"""
+    page = server.seed_pages(1, page_size=args.page_size)[0]
+    update_page = server.seed_pages(1, page_size=args.page_size)[0]
+    append_page = server.seed_pages(1, page_size=args.page_size)[0]
+    tree_root = server.seed_pages(1, page_size=args.page_size)[0]
+    pages = server.seed_pages(args.pages, page_size=args.page_size,
+                              parent_id=tree_root, fanout=args.fanout)
+    attachment_page = server.seed_pages(1, page_size=256)[0]
+    data = os.urandom(args.attachment_size)
+    for i in range(args.attachments):
+        server.add_attachment(attachment_page, f"file-{i:04d}.bin", data)
+    return {
+        "page": page,
+        "update_page": update_page,
+        "append_page": append_page,
+        "tree_root": tree_root,
+        "pages": pages,
+        "attachment_page": attachment_page
+    }
+
+
+def child_args(args) -> list:
+    """把影响场景行为的参数透传给子进程"""
+    return [
+        "--repeat", str(args.repeat), "--rounds", str(args.rounds),
+        "--page-size", str(args.page_size), "--create-size", str(args.create_size),
+        "--chunk-size", str(args.chunk_size), "--concurrency", str(args.concurrency)
+    ]
+
+
+def measure(server: MockConfluence, name: str, fixture: dict, args) -> dict:
+    proc = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--child", name,
+         "--fixture", json.dumps(fixture), *child_args(args)],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+    )
+    # 子进程预热完成后才记录起点，预热请求不计入字节统计
+    while True:
+        line = proc.stdout.readline()
+        if not line or line.strip() == "ready":
+            break
+    before = server.snapshot_stats()
+    output, errors = proc.communicate("go\n")
+    if proc.returncode:
+        raise RuntimeError(f"场景 {name} 执行失败:\n{errors}")
+    raw = json.loads(output.strip().splitlines()[-1])
+    after = server.snapshot_stats()
+
+    elapsed = raw["elapsed"]
+    sent = after["bytes_in"] - before["bytes_in"]
+    received = after["bytes_out"] - before["bytes_out"]
+    return {
+        "scenario": name,
+        "items": raw["items"],
+        "requests": after["requests"] - before["requests"],
+        "elapsed": round(elapsed, 4),
+        "throughput": round(raw["items"] / elapsed, 2) if elapsed else 0.0,
+        "mb_per_s": round((sent + received) / 1024 / 1024 / elapsed, 2) if elapsed else 0.0,
+        "p50": round(percentile(raw["samples"], 50) * 1000, 3),
+        "p99": round(percentile(raw["samples"], 99) * 1000, 3),
+        "bytes_sent": sent,
+        "bytes_received": received,
+        "peak_mb": round(raw["peak_mb"], 1),
+        "retries": raw["retries"],
+        "throttled": raw["throttled"]
+    }
+
+
+def print_table(results: list) -> None:
+    print(f"{'scenario':<16} {'items':>6} {'items/s':>9} {'MB/s':>7} {'p50':>9} {'p99':>9} "
+          f"{'sent':>10} {'recv':>10} {'peak':>8} {'retries':>7}")
+    for r in results:
+        print(f"{r['scenario']:<16} {r['items']:>6} {r['throughput']:>9.1f} {r['mb_per_s']:>7.1f} "
+              f"{r['p50']:>7.2f}ms {r['p99']:>7.2f}ms {_format_bytes(r['bytes_sent']):>10} "
+              f"{_format_bytes(r['bytes_received']):>10} {r['peak_mb']:>6.1f}MB {r['retries']:>7}")
+
+
+def _format_bytes(size: int) -> str:
+    for unit in ("B", "KB", "MB"):
+        if size < 1024 or unit == "MB":
+            return f"{size:.0f}{unit}" if unit == "B" else f"{size:.1f}{unit}"
+        size /= 1024
+
+
+def compare_results(results: list, baseline_path: str, tolerance: float) -> list:
+    """与保存的结果对比，返回退化描述列表"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {r["scenario"]: r for r in json.load(f)["results"]}
+
+    regressions = []
+    for r in results:
+        old = baseline.get(r["scenario"])
+        if old is None:
+            continue
+        for metric, higher_is_better in COMPARE_METRICS:
+            before, after = old[metric], r[metric]
+            if not before:
+                continue
+            change = (after - before) / before
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append(
+                    f"{r['scenario']}: {metric} {before} -> {after} ({change:+.0%})"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="wiki_manager 热路径基准套件")
+    parser.add_argument("-s", "--scenarios", nargs="+", choices=SCENARIOS,
+                        default=list(SCENARIOS), help="要运行的场景（默认全部）")
+    parser.add_argument("--repeat", type=int, default=50,
+                        help="单页面场景的请求次数（默认: 50）")
+    parser.add_argument("--rounds", type=int, default=3,
+                        help="批量场景与分批创建的轮数（默认: 3）")
+    parser.add_argument("--page-size", type=int, default=20 * 1024,
+                        help="页面正文大小（字节，默认: 20KB）")
+    parser.add_argument("--pages", type=int, default=200,
+                        help="批量场景的页面数（默认: 200）")
+    parser.add_argument("--fanout", type=int, default=10,
+                        help="导出场景页面树每个页面的子页面数（默认: 10）")
+    parser.add_argument("--create-size", type=int, default=4 * 1024 * 1024,
+                        help="分批创建的内容大小（字节，默认: 4MB）")
+    parser.add_argument("--chunk-size", type=int, default=512 * 1024,
+                        help="分批创建的批大小（字节，默认: 512KB）")
+    parser.add_argument("--attachments", type=int, default=50,
+                        help="附件数（默认: 50）")
+    parser.add_argument("--attachment-size", type=int, default=256 * 1024,
+                        help="单个附件大小（字节，默认: 256KB）")
+    parser.add_argument("--concurrency", type=int, default=8,
+                        help="批量场景的并发数（默认: 8）")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="模拟服务器每个请求的额外延迟（秒）")
+    parser.add_argument("--connect-latency", type=float, default=0.0,
+                        help="模拟服务器每个新连接的额外延迟（秒）")
+    parser.add_argument("--throttle-rps", type=float, default=0.0,
+                        help="模拟服务器每秒允许的请求数，超出返回 429（0 表示不限流）")
+    parser.add_argument("--retry-after", type=float, default=0.1,
+                        help="429 响应中 Retry-After 的秒数（默认: 0.1）")
+    parser.add_argument("--save", metavar="FILE", help="把结果保存为 JSON")
+    parser.add_argument("--compare", metavar="FILE", help="与 --save 保存的结果对比")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="对比时允许的退化比例（默认: 0.2，即 20%%）")
+    parser.add_argument("--child", choices=SCENARIOS, help=argparse.SUPPRESS)
+    parser.add_argument("--fixture", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return run_child(args)
+
+    server = MockConfluence(connect_latency=args.connect_latency, latency=args.latency,
+                            throttle_rps=args.throttle_rps,
+                            retry_after=args.retry_after).start()
+    use_mock_server(server)
+    try:
+        fixture = seed_fixture(server, args)
+        results = []
+        for name in args.scenarios:
+            print(f"⏱️  {name}...", file=sys.stderr)
+            results.append(measure(server, name, fixture, args))
+    finally:
+        server.stop()
+
+    print_table(results)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({"args": {k: v for k, v in vars(args).items()
+                                if k not in ("child", "fixture", "save", "compare")},
+                       "results": results}, f, ensure_ascii=False, indent=2)
+        print(f"\n✅ 结果已保存到: {args.save}")
+
+    if args.compare:
+        regressions = compare_results(results, args.compare, args.tolerance)
+        if regressions:
+            print(f"\n❌ 与 {args.compare} 相比有 {len(regressions)} 项退化"
+                  f"（阈值 {args.tolerance:.0%}）:")
+            for line in regressions:
+                print(f"  - {line}")
+            sys.exit(1)
+        print(f"\n✅ 与 {args.compare} 相比没有超过 {args.tolerance:.0%} 的退化")
+
+
+if __name__ == "__main__":
+    main()
@@ -16,26 +16,62 @@ Confluence Wiki tools - 完整的 Wiki 页面管理工具
 - WIKI_DEFAULT_PARENT_PAGE: 默认父页面 ID（可选，例如: 217851921）
 """
 
+from __future__ import annotations
+
 import os
-import re
 import sys
+
+if __name__ == '__main__':
+    # 常驻服务器（serve 命令）在线时直接转发命令，不再导入下面的库
+    import wiki_server
+    _exit_code = wiki_server.forward(sys.argv[1:], os.path.abspath(__file__))
+    if _exit_code is not None:
+        sys.exit(_exit_code)
+
+import re
 import json
-import asyncio
+import time
+import bisect
+import random
+import itertools
+import threading
+import collections
+import hashlib
 import argparse
-from typing import Optional
-from markdownify import markdownify as md
+import mimetypes
+import contextlib
+import contextvars
+import importlib.util
+from typing import TYPE_CHECKING, AsyncIterator, Iterable, Iterator, Optional
+
+if TYPE_CHECKING:
+    # 仅用于类型注解；运行时在用到的地方延迟导入
+    import concurrent.futures
+
 
-try:
-    import httpx
-except ImportError:
-    print("错误：需要安装 httpx 库")
-    print("运行: pip install httpx")
-    sys.exit(1)
+def _lazy_import(name: str):
+    """延迟导入模块：首次访问其属性时才真正加载，未安装时返回 None
+
+    extract-id 这类不访问网络的命令无需为 httpx、asyncio 的导入付出启动时间；
+    只取元数据的 get 也不会加载 markdownify。
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        return None
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
 
-try:
-    import markdown
-except ImportError:
-    markdown = None
+
+asyncio = _lazy_import("asyncio")
+httpx = _lazy_import("httpx")
+markdownify = _lazy_import("markdownify")
+markdown = _lazy_import("markdown")
 
 
 # ============================================================================
@@ -66,118 +102,1105 @@ class WikiConfig:
         }
 
 
+# ============================================================================
+# 性能追踪
+# ============================================================================
+
+# 当前生效的追踪器和所在的 span（contextvar 会随 asyncio 任务和 to_thread 传播）
+_active_tracer = contextvars.ContextVar("wiki_tracer", default=None)
+_current_span = contextvars.ContextVar("wiki_span", default=None)
+
+
+class Tracer:
+    """按阶段和 HTTP 请求记录耗时的追踪器
+
+    每个 span 记录名称、类别（phase 或 http）、开始时间、耗时、父 span 和属性。
+    HTTP span 的属性包括 method、path、status、bytes_in、bytes_out、attempt
+    （第几次重试）和 wait_ms（等待限流/并发许可的时间）。
+
+    结果可以导出为 JSON 汇总（summary()），也可以导出为 Chrome trace 格式
+    （chrome_trace()/save()，在 chrome://tracing 或 https://ui.perfetto.dev 打开）。
+    每个 span 结束时依次调用 add_hook() 注册的函数 hook(span)，可用于实时上报。
+
+    用法：
+        tracer = Tracer()
+        tracer.add_hook(lambda span: print(span["name"], span["duration"]))
+        with tracer.activate():
+            await update_wiki_page_content(config, page_id, content)
+        print(json.dumps(tracer.summary(), indent=2))
+    """
+
+    def __init__(self, max_spans: int = 100000):
+        self.spans = []
+        self.max_spans = max_spans
+        self.dropped = 0
+        self.hooks = []
+        self._origin = time.perf_counter()
+        self._ids = itertools.count(1)
+        self._lanes = {}
+        self._lock = threading.Lock()
+
+    def add_hook(self, hook) -> None:
+        """注册 span 结束回调 hook(span)"""
+        self.hooks.append(hook)
+
+    @contextlib.contextmanager
+    def activate(self):
+        """在当前上下文（及其中创建的任务）中启用该追踪器"""
+        token = _active_tracer.set(self)
+        try:
+            yield self
+        finally:
+            _active_tracer.reset(token)
+
+    def _lane(self) -> int:
+        """span 所在的泳道（Chrome trace 的 tid）：每个 asyncio 任务或线程一条"""
+        try:
+            owner = asyncio.current_task()
+        except RuntimeError:
+            owner = None
+        key = id(owner) if owner is not None else threading.get_ident()
+        with self._lock:
+            return self._lanes.setdefault(key, len(self._lanes) + 1)
+
+    @contextlib.contextmanager
+    def span(self, name: str, category: str = "phase", **attrs):
+        """记录一个 span，产出属性字典（可在 with 块内补充属性）"""
+        span = {
+            "id": next(self._ids),
+            "name": name,
+            "cat": category,
+            "parent": _current_span.get(),
+            "lane": self._lane(),
+            "start": time.perf_counter() - self._origin,
+            "attrs": attrs
+        }
+        token = _current_span.set(span["id"])
+        try:
+            yield attrs
+        except BaseException as e:
+            attrs.setdefault("error", type(e).__name__)
+            raise
+        finally:
+            _current_span.reset(token)
+            span["duration"] = time.perf_counter() - self._origin - span["start"]
+            self._finish(span)
+
+    def _finish(self, span: dict) -> None:
+        with self._lock:
+            if len(self.spans) < self.max_spans:
+                self.spans.append(span)
+            else:
+                self.dropped += 1
+        for hook in self.hooks:
+            try:
+                hook(span)
+            except Exception as e:
+                print(f"⚠️  追踪回调出错: {e}", file=sys.stderr)
+
+    def summary(self) -> dict:
+        """按阶段和接口汇总耗时、请求数、重试与字节数（毫秒）"""
+        phases = {}
+        endpoints = {}
+        statuses = collections.Counter()
+        durations = []
+        http = {"requests": 0, "retries": 0, "errors": 0,
+                "bytes_in": 0, "bytes_out": 0, "wait_ms": 0.0}
+
+        for span in self.spans:
+            attrs = span["attrs"]
+            ms = span["duration"] * 1000
+            if span["cat"] != "http":
+                phase = phases.setdefault(span["name"], {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+                phase["count"] += 1
+                phase["total_ms"] += ms
+                phase["max_ms"] = max(phase["max_ms"], ms)
+                continue
+
+            durations.append(ms)
+            http["requests"] += 1
+            http["retries"] += 1 if attrs.get("attempt") else 0
+            status = attrs.get("status")
+            if status is None or status >= 400:
+                http["errors"] += 1
+            statuses[str(status or attrs.get("error", "error"))] += 1
+            http["bytes_in"] += attrs.get("bytes_in") or 0
+            http["bytes_out"] += attrs.get("bytes_out") or 0
+            http["wait_ms"] += attrs.get("wait_ms", 0.0)
+
+            endpoint = endpoints.setdefault(
+                f"{attrs.get('method')} {_endpoint_pattern(attrs.get('path', ''))}",
+                {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "bytes_in": 0, "bytes_out": 0}
+            )
+            endpoint["count"] += 1
+            endpoint["total_ms"] += ms
+            endpoint["max_ms"] = max(endpoint["max_ms"], ms)
+            endpoint["bytes_in"] += attrs.get("bytes_in") or 0
+            endpoint["bytes_out"] += attrs.get("bytes_out") or 0
+
+        durations.sort()
+        http["total_ms"] = sum(durations)
+        http["p50_ms"] = durations[len(durations) // 2] if durations else 0.0
+        http["p99_ms"] = durations[min(len(durations) - 1, int(len(durations) * 0.99))] \
+            if durations else 0.0
+        http["by_status"] = dict(statuses)
+        http["by_endpoint"] = endpoints
+
+        return _round_floats({
+            "wall_ms": (time.perf_counter() - self._origin) * 1000,
+            "spans": len(self.spans),
+            "dropped": self.dropped,
+            "phases": phases,
+            "http": http
+        })
+
+    def chrome_trace(self) -> dict:
+        """导出为 Chrome trace 格式（完整事件 ph=X，时间单位微秒）"""
+        pid = os.getpid()
+        events = [{"name": "process_name", "ph": "M", "pid": pid, "tid": 0,
+                   "args": {"name": "wiki_manager"}}]
+        for span in self.spans:
+            events.append({
+                "name": span["name"],
+                "cat": span["cat"],
+                "ph": "X",
+                "ts": round(span["start"] * 1e6, 1),
+                "dur": round(span["duration"] * 1e6, 1),
+                "pid": pid,
+                "tid": span["lane"],
+                "args": {**span["attrs"], "id": span["id"], "parent": span["parent"]}
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def save(self, path: str) -> None:
+        """把 Chrome trace 写入文件"""
+        _write_json_atomic(path, self.chrome_trace())
+
+
+def _endpoint_pattern(path: str) -> str:
+    """把 URL 路径中的 ID 替换为占位符，便于按接口汇总"""
+    return re.sub(r"/(?:att)?\d+(?=/|$)", "/{id}", path)
+
+
+def _round_floats(value):
+    if isinstance(value, float):
+        return round(value, 3)
+    if isinstance(value, dict):
+        return {k: _round_floats(v) for k, v in value.items()}
+    return value
+
+
+def get_tracer() -> Optional[Tracer]:
+    """当前上下文中生效的追踪器（未启用时为 None）"""
+    return _active_tracer.get()
+
+
+def trace_span(name: str, category: str = "phase", **attrs):
+    """在当前追踪器上记录 span；未启用追踪时返回空上下文，几乎没有开销
+
+    用法：
+        with trace_span("markdown.convert", bytes=len(text)) as attrs:
+            ...
+            attrs["cached"] = False
+    """
+    tracer = _active_tracer.get()
+    if tracer is None:
+        return contextlib.nullcontext({})
+    return tracer.span(name, category, **attrs)
+
+
+async def _count_bytes(body: AsyncIterator[bytes], counter: dict) -> AsyncIterator[bytes]:
+    """透传流式请求体并统计字节数"""
+    async for part in body:
+        counter["bytes"] += len(part)
+        yield part
+
+
 # ============================================================================
 # HTTP 客户端
 # ============================================================================
 
+def _accept_encoding() -> str:
+    """根据已安装的解码库生成 Accept-Encoding（br 需要 brotli 或 brotlicffi）"""
+    encodings = ["gzip", "deflate"]
+    if (importlib.util.find_spec("brotli") is not None
+            or importlib.util.find_spec("brotlicffi") is not None):
+        encodings.append("br")
+    return ", ".join(encodings)
+
+
+class TokenBucket:
+    """令牌桶限流器：平均速率 rate 次/秒，允许 burst 次突发，所有在途请求共享"""
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> float:
+        """取一个令牌，返回等待的秒数"""
+        async with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+
+            # 持锁等待，保证等待者按先后顺序取得令牌
+            wait = (1 - self.tokens) / self.rate
+            await asyncio.sleep(wait)
+            self.tokens = 0.0
+            self.updated = time.monotonic()
+            return wait
+
+
+class AdaptiveConcurrency:
+    """自适应并发上限（AIMD）
+
+    请求被限流（429/503）时上限减半，成功时缓慢加回（每轮上限个成功请求 +1），
+    使并发度自动收敛到服务端能承受的水平。
+    """
+
+    def __init__(self, limit: int, minimum: int = 1, cooldown: float = 1.0):
+        self.maximum = max(1, limit)
+        self.minimum = max(1, minimum)
+        self.limit = float(self.maximum)
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._cond = asyncio.Condition()
+
+    async def acquire(self) -> None:
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self, throttled: bool = False) -> None:
+        async with self._cond:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if throttled:
+                # 同一波限流只减半一次
+                if now - self._last_decrease >= self.cooldown:
+                    self.limit = max(self.minimum, self.limit / 2)
+                    self._last_decrease = now
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+
+# 可重试的状态码：429/503 视为限流，502/504 视为网关临时故障
+THROTTLE_STATUSES = (429, 503)
+RETRY_STATUSES = (429, 502, 503, 504)
+# 幂等方法在连接中断时可以安全重试。PUT 携带版本号，首次提交已生效时重复提交
+# 会得到 409：响应标记为 replayed，由调用方用 _confirm_replayed_put 确认
+IDEMPOTENT_METHODS = ("GET", "HEAD", "PUT", "DELETE", "OPTIONS")
+
+
+def _retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    """解析 Retry-After 响应头（秒数或 HTTP 日期）"""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        from email.utils import parsedate_to_datetime
+        when = parsedate_to_datetime(value)
+        return max(0.0, when.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class WikiClient:
+    """长连接 Wiki HTTP 客户端
+
+    持有一个带连接池的 httpx.AsyncClient，一次 CLI 运行或一个库会话内的
+    所有请求复用同一组 keep-alive 连接，避免每个请求都重新进行 TCP/TLS 握手。
+
+    所有请求共享同一个令牌桶限流器和自适应并发上限；429/502/503/504 和连接
+    中断按带抖动的指数退避自动重试，并遵守 Retry-After。重试、限流和等待
+    统计见 stats 属性。
+
+    用法：
+        async with WikiClient(config, http2=True) as client:
+            page = await get_wiki_page_content(config, page_id="123", client=client)
+    """
+
+    def __init__(
+        self,
+        config: Optional[WikiConfig] = None,
+        http2: bool = False,
+        compress: bool = True,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 60.0,
+        timeout: float = 30.0,
+        rate_limit: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0
+    ):
+        """
+        Args:
+            config: Wiki 配置（可选，仅用于调用方取用）
+            http2: 是否启用 HTTP/2（需要安装 h2，未安装时回退到 HTTP/1.1）
+            compress: 是否请求 gzip/br 压缩响应
+            max_connections: 连接池最大连接数
+            max_keepalive_connections: 最大空闲 keep-alive 连接数
+            keepalive_expiry: 空闲连接保留秒数
+            timeout: 默认请求超时（秒）
+            rate_limit: 每秒最多发出的请求数（默认 WIKI_RATE_LIMIT，0 或未设置表示不限）
+            max_retries: 单个请求的最大重试次数（默认 WIKI_MAX_RETRIES 或 3）
+            backoff_base: 指数退避的基础等待秒数
+            backoff_max: 单次退避的最长等待秒数
+        """
+        if httpx is None:
+            raise RuntimeError("需要安装 httpx 库（运行: pip install httpx）")
+        self.config = config
+        self.compress = compress
+        self.timeout = timeout
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+
+        if http2 and importlib.util.find_spec("h2") is None:
+            print("⚠️  未安装 h2，回退到 HTTP/1.1（运行: pip install 'httpx[http2]'）",
+                  file=sys.stderr)
+            http2 = False
+        self.http2 = http2
+
+        if rate_limit is None:
+            rate_limit = float(os.getenv("WIKI_RATE_LIMIT", 0))
+        if max_retries is None:
+            max_retries = int(os.getenv("WIKI_MAX_RETRIES", 3))
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.bucket = TokenBucket(rate_limit) if rate_limit > 0 else None
+        self.concurrency = AdaptiveConcurrency(max_connections)
+        self._pause_until = 0.0
+        self.stats = {
+            "requests": 0,
+            "retries": 0,
+            "throttled": 0,
+            "wait_seconds": 0.0,
+        }
+
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        """底层 httpx.AsyncClient（首次使用时创建）"""
+        if self._client is None:
+            headers = {
+                "Accept-Encoding": _accept_encoding() if self.compress else "identity"
+            }
+            # 创建客户端时加载 CA 证书（TLS 上下文），耗时单独记录
+            with trace_span("http.client_init", http2=self.http2):
+                self._client = httpx.AsyncClient(
+                    http2=self.http2,
+                    limits=self.limits,
+                    timeout=self.timeout,
+                    headers=headers
+                )
+        return self._client
+
+    def _backoff(self, attempt: int) -> float:
+        """第 attempt 次重试的等待时间（full jitter 指数退避）"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    async def _wait_turn(self) -> None:
+        """等待全局暂停（Retry-After）和令牌桶"""
+        pause = self._pause_until - time.monotonic()
+        if pause > 0:
+            self.stats["wait_seconds"] += pause
+            await asyncio.sleep(pause)
+        if self.bucket is not None:
+            self.stats["wait_seconds"] += await self.bucket.acquire()
+
+    async def request(self, method: str, url: str, stream: bool = False,
+                      **kwargs) -> httpx.Response:
+        """发送请求（复用连接池，限流并自动重试）
+
+        stream=True 时只读取响应头就返回，调用方负责读取并关闭响应，
+        通常应使用 stream() 上下文管理器。
+
+        content 可以是返回（异步）迭代器的函数，用于流式请求体：每次重试都会
+        重新调用它生成新的请求体。
+
+        之前的某次尝试可能已被服务端执行（请求发出后连接中断，或网关返回 502/504）
+        时，返回的响应 extensions["wiki_replayed"] 为 True。
+        """
+        method = method.upper()
+        tracing = _active_tracer.get() is not None
+        attempt = 0
+        replayed = False
+        while True:
+            waited = time.perf_counter()
+            await self._wait_turn()
+            await self.concurrency.acquire()
+            waited = time.perf_counter() - waited
+            self.stats["requests"] += 1
+            try:
+                send_kwargs = kwargs
+                sent = None
+                if callable(kwargs.get("content")):
+                    body = kwargs["content"]()
+                    if tracing:
+                        sent = {"bytes": 0}
+                        body = _count_bytes(body, sent)
+                    send_kwargs = dict(kwargs, content=body)
+                request = self.http.build_request(method, url, **send_kwargs)
+                with trace_span(f"{method} {request.url.path}", "http", method=method,
+                                path=request.url.path, attempt=attempt,
+                                wait_ms=round(waited * 1000, 3)) as attrs:
+                    response = await self.http.send(request, stream=stream)
+                    attrs["status"] = response.status_code
+                    attrs["bytes_out"] = sent["bytes"] if sent is not None else \
+                        int(request.headers.get("Content-Length", 0))
+                    if stream:
+                        # 流式响应读完后由 stream() 更新为实际字节数
+                        attrs["bytes_in"] = int(response.headers.get("Content-Length", 0))
+                        response.extensions["wiki_trace"] = attrs
+                    else:
+                        attrs["bytes_in"] = response.num_bytes_downloaded
+            except httpx.TransportError as e:
+                await self.concurrency.release()
+                # 连接阶段失败时请求未发出，任何方法都可重试
+                retryable = (method in IDEMPOTENT_METHODS
+                             or isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout)))
+                if not retryable or attempt >= self.max_retries:
+                    raise
+                if not isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout)):
+                    replayed = True
+                delay = self._backoff(attempt)
+            else:
+                status = response.status_code
+                throttled = status in THROTTLE_STATUSES
+                await self.concurrency.release(throttled=throttled)
+                # POST 非幂等，只在明确被拒绝（429）时重试，避免重复创建
+                retryable = status in RETRY_STATUSES and (method != "POST" or status == 429)
+                if not retryable or attempt >= self.max_retries:
+                    response.extensions["wiki_replayed"] = replayed
+                    return response
+
+                if not throttled:
+                    # 网关错误时请求可能已经转发给了后端
+                    replayed = True
+                if throttled:
+                    self.stats["throttled"] += 1
+                retry_after = _retry_after_seconds(response)
+                if retry_after is not None:
+                    # Retry-After 对所有在途请求生效
+                    delay = retry_after + random.uniform(0, self.backoff_base)
+                    self._pause_until = max(self._pause_until, time.monotonic() + delay)
+                else:
+                    delay = self._backoff(attempt)
+                # 读完错误响应体，连接才能放回连接池复用
+                await response.aread()
+                await response.aclose()
+
+            self.stats["retries"] += 1
+            self.stats["wait_seconds"] += delay
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    @contextlib.asynccontextmanager
+    async def stream(self, method: str, url: str, **kwargs) -> AsyncIterator[httpx.Response]:
+        """流式请求：响应体通过 response.aiter_bytes() 逐块读取，不整体驻留内存
+
+        用法：
+            async with client.stream("GET", url, headers=headers) as response:
+                async for chunk in response.aiter_bytes():
+                    ...
+        """
+        response = await self.request(method, url, stream=True, **kwargs)
+        try:
+            yield response
+        finally:
+            await response.aclose()
+            attrs = response.extensions.get("wiki_trace")
+            if attrs is not None:
+                attrs["bytes_in"] = response.num_bytes_downloaded
+
+    def stats_summary(self) -> dict:
+        """请求统计（含当前自适应并发上限）"""
+        return {
+            **self.stats,
+            "wait_seconds": round(self.stats["wait_seconds"], 3),
+            "concurrency_limit": int(self.concurrency.limit)
+        }
+
+    async def aclose(self):
+        """关闭连接池"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def __aenter__(self) -> "WikiClient":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+
+async def _request_json(
+    method: str,
+    url: str,
+    headers: dict,
+    error_map: dict,
+    client: Optional[WikiClient] = None,
+    **kwargs
+) -> dict:
+    """发送请求并解析 JSON 响应，HTTP 错误映射为友好的错误信息"""
+    if client is None:
+        # 未提供客户端时使用一次性连接（兼容旧的调用方式）
+        async with WikiClient() as owned:
+            return await _request_json(method, url, headers, error_map, client=owned, **kwargs)
+
+    try:
+        if "json" in kwargs:
+            # 自行序列化请求体（UTF-8 原文，不转义非 ASCII 字符），便于追踪编码耗时
+            with trace_span("json.encode") as attrs:
+                body = json.dumps(kwargs.pop("json"), ensure_ascii=False).encode("utf-8")
+                attrs["bytes"] = len(body)
+            kwargs["content"] = body
+            headers = {**headers, "Content-Type": "application/json"}
+
+        response = await client.request(method, url, headers=headers, **kwargs)
+        response.raise_for_status()
+        with trace_span("json.decode", bytes=len(response.content)):
+            # DELETE 等请求成功时响应体可能为空（204）
+            data = response.json() if response.content else None
+        return {
+            "success": True,
+            "data": data,
+            "bytes_sent": int(response.request.headers.get("Content-Length", 0)),
+            "bytes_received": response.num_bytes_downloaded
+        }
+
+    except httpx.HTTPStatusError as e:
+        status = e.response.status_code
+        return {
+            "success": False,
+            "error": error_map.get(status, f"HTTP {status} 错误"),
+            "status_code": status,
+            "replayed": e.response.extensions.get("wiki_replayed", False)
+        }
+
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
 async def fetch_json(
     url: str,
     headers: dict,
     params: Optional[dict] = None,
-    timeout: float = 30.0
+    timeout: float = 30.0,
+    client: Optional[WikiClient] = None
 ) -> dict:
     """通用 HTTP GET 请求"""
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(
-                url,
-                headers=headers,
-                params=params,
-                timeout=timeout
-            )
-            response.raise_for_status()
-            return {"success": True, "data": response.json()}
-
-        except httpx.HTTPStatusError as e:
-            status = e.response.status_code
-            error_map = {
-                401: "认证失败，请检查 Token",
-                403: "权限不足",
-                404: "资源不存在",
-                429: "请求过于频繁，请稍后重试"
-            }
-            return {
-                "success": False,
-                "error": error_map.get(status, f"HTTP {status} 错误"),
-                "status_code": status
-            }
+    error_map = {
+        401: "认证失败，请检查 Token",
+        403: "权限不足",
+        404: "资源不存在",
+        429: "请求过于频繁，请稍后重试"
+    }
+    return await _request_json(
+        "GET", url, headers, error_map, client=client,
+        params=params, timeout=timeout
+    )
+
+
+PUT_ERRORS = {
+    401: "认证失败，请检查 Token",
+    403: "权限不足，请检查是否有编辑权限",
+    404: "资源不存在",
+    409: "版本冲突，页面已被其他人修改",
+    429: "请求过于频繁，请稍后重试"
+}
 
-        except Exception as e:
-            return {"success": False, "error": str(e)}
+
+async def _confirm_replayed_put(
+    config: WikiConfig,
+    page_id: str,
+    version: int,
+    client: Optional[WikiClient] = None
+) -> Optional[dict]:
+    """确认重试后得到 409 的 PUT 是否其实已经生效
+
+    首次 PUT 可能已被服务端执行但响应丢失（连接中断、网关 502/504），重试时版本号
+    已被占用而得到 409。页面当前版本等于提交的版本号时视为写入成功。
+
+    Returns:
+        页面数据（与 PUT 响应格式相同），版本不一致时返回 None
+    """
+    result = await fetch_json(f"{config.base_url}/rest/api/content/{page_id}",
+                              config.get_auth_headers(), {"expand": "version"}, client=client)
+    if result["success"] and result["data"].get("version", {}).get("number") == version:
+        return result["data"]
+    return None
 
 
 async def put_json(
     url: str,
     headers: dict,
     data: dict,
-    timeout: float = 30.0
+    timeout: float = 30.0,
+    client: Optional[WikiClient] = None
 ) -> dict:
     """通用 HTTP PUT 请求"""
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.put(
-                url,
-                headers=headers,
-                json=data,
-                timeout=timeout
-            )
-            response.raise_for_status()
-            return {"success": True, "data": response.json()}
-
-        except httpx.HTTPStatusError as e:
-            status = e.response.status_code
-            error_map = {
-                401: "认证失败，请检查 Token",
-                403: "权限不足，请检查是否有编辑权限",
-                404: "资源不存在",
-                409: "版本冲突，页面已被其他人修改",
-                429: "请求过于频繁，请稍后重试"
-            }
-            return {
-                "success": False,
-                "error": error_map.get(status, f"HTTP {status} 错误"),
-                "status_code": status
-            }
-
-        except Exception as e:
-            return {"success": False, "error": str(e)}
+    return await _request_json(
+        "PUT", url, headers, PUT_ERRORS, client=client,
+        json=data, timeout=timeout
+    )
 
 
 async def post_json(
     url: str,
     headers: dict,
     data: dict,
-    timeout: float = 30.0
+    timeout: float = 30.0,
+    client: Optional[WikiClient] = None
 ) -> dict:
     """通用 HTTP POST 请求"""
-    async with httpx.AsyncClient() as client:
+    error_map = {
+        401: "认证失败，请检查 Token",
+        403: "权限不足，请检查是否有创建页面权限",
+        404: "资源不存在",
+        400: "请求参数错误",
+        429: "请求过于频繁，请稍后重试"
+    }
+    return await _request_json(
+        "POST", url, headers, error_map, client=client,
+        json=data, timeout=timeout
+    )
+
+
+# ============================================================================
+# 本地缓存
+# ============================================================================
+
+def default_cache_dir() -> str:
+    """本地缓存根目录（WIKI_CACHE_DIR > $XDG_CACHE_HOME/wiki-tools > ~/.cache/wiki-tools）"""
+    if os.getenv("WIKI_CACHE_DIR"):
+        return os.path.expanduser(os.environ["WIKI_CACHE_DIR"])
+    base = os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "wiki-tools")
+
+
+def _write_json_atomic(path: str, data) -> None:
+    """原子写入 JSON 文件（先写临时文件再替换，避免并发读到半个文件）"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+class PageCache:
+    """页面内容磁盘缓存
+
+    按 (page_id, version, format) 缓存已解析（含已转换 Markdown）的页面，
+    页面版本不变时直接从磁盘返回。总大小超过上限时按最近访问时间（LRU）淘汰。
+    总大小只在首次写入时扫描目录统计，之后随写入增量估算；估算值超过上限时
+    才重新扫描（其他进程可能同时写入同一缓存）并淘汰到上限的 EVICT_RATIO 以下，
+    留出余量，之后的写入不必每次都重新扫描。
+
+    目录结构: <cache_dir>/pages/<base_url 摘要>/<page_id>/<version>.<format>.json
+
+    memory_entries > 0 时额外在内存中保留最近读写的若干页面（常驻服务器使用），
+    命中时不再读取和解析磁盘文件。
+    """
+
+    EVICT_RATIO = 0.9
+
+    def __init__(
+        self,
+        config: WikiConfig,
+        cache_dir: Optional[str] = None,
+        max_bytes: Optional[int] = None,
+        memory_entries: int = 0
+    ):
+        """
+        Args:
+            config: Wiki 配置（按 base_url 隔离不同 Wiki 的缓存）
+            cache_dir: 缓存根目录（默认 default_cache_dir()）
+            max_bytes: 缓存总大小上限（默认 WIKI_CACHE_MAX_BYTES 或 256MB）
+            memory_entries: 内存中保留的页面数（默认 0，不使用内存层）
+        """
+        namespace = hashlib.sha1(config.base_url.encode("utf-8")).hexdigest()[:12]
+        self.root = os.path.join(cache_dir or default_cache_dir(), "pages", namespace)
+        self.max_bytes = max_bytes or int(os.getenv("WIKI_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+        self.memory_entries = memory_entries
+        self._memory = collections.OrderedDict()
+        self._size: Optional[int] = None  # 估算的缓存总大小（None 表示尚未扫描）
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _page_dir(self, page_id: str) -> str:
+        return os.path.join(self.root, str(page_id))
+
+    def _path(self, page_id: str, version: int, format: str) -> str:
+        return os.path.join(self._page_dir(page_id), f"{version}.{format}.json")
+
+    def has_page(self, page_id: str, format: str) -> bool:
+        """是否缓存过该页面的任意版本（没有时可跳过版本探测直接完整读取）"""
         try:
-            response = await client.post(
-                url,
-                headers=headers,
-                json=data,
-                timeout=timeout
-            )
-            response.raise_for_status()
-            return {"success": True, "data": response.json()}
-
-        except httpx.HTTPStatusError as e:
-            status = e.response.status_code
-            error_map = {
-                401: "认证失败，请检查 Token",
-                403: "权限不足，请检查是否有创建页面权限",
-                404: "资源不存在",
-                400: "请求参数错误",
-                429: "请求过于频繁，请稍后重试"
-            }
-            return {
-                "success": False,
-                "error": error_map.get(status, f"HTTP {status} 错误"),
-                "status_code": status
-            }
+            return any(name.endswith(f".{format}.json")
+                       for name in os.listdir(self._page_dir(page_id)))
+        except FileNotFoundError:
+            return False
+
+    def get(self, page_id: str, version: int, format: str) -> Optional[dict]:
+        """读取缓存，命中时刷新访问时间"""
+        path = self._path(page_id, version, format)
+        if path in self._memory:
+            self._memory.move_to_end(path)
+            with contextlib.suppress(OSError):
+                os.utime(path)
+            self.hits += 1
+            return dict(self._memory[path])
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                page = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._remember(path, page)
+        return page
+
+    def _remember(self, path: str, page: dict) -> None:
+        if self.memory_entries <= 0:
+            return
+        self._memory[path] = dict(page)
+        self._memory.move_to_end(path)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def put(self, page_id: str, version: int, format: str, page: dict) -> None:
+        """写入缓存，同时删除该页面同格式的旧版本，估算总大小超过上限时淘汰"""
+        page_dir = self._page_dir(page_id)
+        suffix = f".{format}.json"
+        delta = 0
+        if os.path.isdir(page_dir):
+            for name in os.listdir(page_dir):
+                if name.endswith(suffix):
+                    old = os.path.join(page_dir, name)
+                    with contextlib.suppress(OSError):
+                        delta -= os.path.getsize(old)
+                        if name != f"{version}{suffix}":
+                            os.remove(old)
+        path = self._path(page_id, version, format)
+        _write_json_atomic(path, page)
+        delta += os.path.getsize(path)
+        self._remember(path, page)
+        if self._size is None or self._size + delta > self.max_bytes:
+            self.evict()
+        else:
+            self._size += delta
+
+    def evict(self) -> None:
+        """总大小超过上限时，按最近访问时间从旧到新删除缓存文件，直到低于上限的 EVICT_RATIO"""
+        entries = []
+        total = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+
+        self._size = total
+        if total <= self.max_bytes:
+            return
+
+        for _, size, path in sorted(entries):
+            try:
+                os.remove(path)
+                os.rmdir(os.path.dirname(path))  # 页面目录已空时一并删除
+            except OSError:
+                pass
+            self.evictions += 1
+            total -= size
+            self._size = total
+            if total <= self.max_bytes * self.EVICT_RATIO:
+                break
+
+    def iter_pages(self, format: str) -> Iterator[dict]:
+        """遍历缓存中指定格式的所有页面（每个页面只保留最新版本）"""
+        suffix = f".{format}.json"
+        try:
+            page_dirs = os.listdir(self.root)
+        except FileNotFoundError:
+            return
+        for page_id in page_dirs:
+            try:
+                names = [n for n in os.listdir(self._page_dir(page_id)) if n.endswith(suffix)]
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+            for name in names:
+                try:
+                    with open(os.path.join(self._page_dir(page_id), name), 'r',
+                              encoding='utf-8') as f:
+                        yield json.load(f)
+                except (OSError, ValueError):
+                    continue
 
-        except Exception as e:
-            return {"success": False, "error": str(e)}
+    def stats(self) -> dict:
+        """命中统计"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "dir": self.root
+        }
+
+
+# ============================================================================
+# 格式转换
+# ============================================================================
+
+MARKDOWN_EXTENSIONS = ("extra", "nl2br")
+
+# 批量转换时，待转换内容总量超过该值才启用进程池（进程启动本身约几十毫秒）
+PARALLEL_MIN_BYTES = 512 * 1024
+
+
+class MarkdownConverter:
+    """Markdown -> Storage Format HTML 转换器
+
+    markdown.markdown() 每次都会新建 Markdown 实例并重新加载扩展；这里每个线程
+    复用一个实例（转换前 reset()），并按内容哈希缓存转换结果（LRU，按字节数限制）。
+    convert_many() 在批量转换大量内容时使用进程池并行。
+    """
+
+    def __init__(self, extensions: Iterable[str] = MARKDOWN_EXTENSIONS,
+                 cache_bytes: int = 32 * 1024 * 1024):
+        if markdown is None:
+            raise RuntimeError("需要安装 markdown 库: pip install markdown")
+        self.extensions = list(extensions)
+        self.cache_bytes = cache_bytes
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._cache = collections.OrderedDict()
+        self._cached_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _instance(self):
+        """当前线程复用的 Markdown 实例（Markdown 实例不是线程安全的）"""
+        instance = getattr(self._local, "instance", None)
+        if instance is None:
+            instance = self._local.instance = markdown.Markdown(extensions=self.extensions)
+        return instance
+
+    @staticmethod
+    def _key(text: str) -> str:
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def _lookup(self, key: str) -> Optional[str]:
+        with self._lock:
+            html = self._cache.get(key)
+            if html is None:
+                self.misses += 1
+                return None
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return html
+
+    def _store(self, key: str, html: str) -> None:
+        size = len(html)
+        if size > self.cache_bytes // 4:
+            return  # 过大的结果不缓存，避免挤掉其他条目
+        with self._lock:
+            if key in self._cache:
+                return
+            self._cache[key] = html
+            self._cached_bytes += size
+            while self._cached_bytes > self.cache_bytes:
+                _, evicted = self._cache.popitem(last=False)
+                self._cached_bytes -= len(evicted)
+
+    def convert(self, text: str) -> str:
+        """转换单个文档"""
+        with trace_span("markdown.convert", bytes=len(text)) as attrs:
+            key = self._key(text)
+            html = self._lookup(key)
+            attrs["cached"] = html is not None
+            if html is None:
+                html = self._instance().reset().convert(text)
+                self._store(key, html)
+            return html
+
+    def convert_many(self, texts: list, processes: Optional[int] = None) -> list:
+        """批量转换，结果顺序与输入一致
+
+        已缓存和重复的内容只转换一次；待转换内容总量较大时使用进程池
+        （processes 默认为 CPU 核数，设为 1 强制在当前线程转换）。
+        """
+        keys = [self._key(text) for text in texts]
+        results = {}
+        pending = {}
+        for key, text in zip(keys, texts):
+            if key in results or key in pending:
+                continue
+            html = self._lookup(key)
+            if html is None:
+                pending[key] = text
+            else:
+                results[key] = html
+
+        processes = processes or os.cpu_count() or 1
+        total = sum(len(text) for text in pending.values())
+        parallel = processes > 1 and len(pending) > 1 and total >= PARALLEL_MIN_BYTES
+        with trace_span("markdown.convert_many", documents=len(texts), pending=len(pending),
+                        bytes=total, parallel=parallel):
+            if parallel:
+                import concurrent.futures
+
+                workers = min(processes, len(pending))
+                with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+                    converted = pool.map(_convert_markdown_worker, pending.values(),
+                                         itertools.repeat(self.extensions))
+                    for key, html in zip(pending, converted):
+                        results[key] = html
+                        self._store(key, html)
+            else:
+                instance = self._instance()
+                for key, text in pending.items():
+                    results[key] = instance.reset().convert(text)
+                    self._store(key, results[key])
+
+        return [results[key] for key in keys]
+
+    def stats(self) -> dict:
+        """缓存统计"""
+        return {"hits": self.hits, "misses": self.misses,
+                "entries": len(self._cache), "bytes": self._cached_bytes}
+
+
+_worker_converter = None
+
+
+def _convert_markdown_worker(text: str, extensions: list) -> str:
+    """进程池中的转换函数（每个工作进程复用一个 Markdown 实例）"""
+    global _worker_converter
+    if _worker_converter is None:
+        _worker_converter = markdown.Markdown(extensions=extensions)
+    return _worker_converter.reset().convert(text)
+
+
+_default_converter = None
+
+
+def get_markdown_converter() -> MarkdownConverter:
+    """进程内共享的默认转换器"""
+    global _default_converter
+    if _default_converter is None:
+        _default_converter = MarkdownConverter()
+    return _default_converter
+
+
+def markdown_to_storage(content: str) -> str:
+    """把 Markdown 转换为 Storage Format HTML（使用共享转换器）"""
+    return get_markdown_converter().convert(content)
+
+
+# HTML -> Markdown 转换方式：thread（默认）、process 或 inline
+CONVERT_MODES = ("thread", "process", "inline")
+
+# 小于该大小的页面直接在事件循环中转换（投递到工作池的开销反而更大）
+OFFLOAD_MIN_BYTES = 64 * 1024
+
+
+def html_to_markdown(html_content: str) -> str:
+    """把 Storage Format HTML 转换为 Markdown"""
+    if markdownify is None:
+        raise RuntimeError("需要安装 markdownify 库（运行: pip install markdownify）")
+    return markdownify.markdownify(html_content, heading_style="ATX")
+
+
+class ConversionPool:
+    """HTML -> Markdown 转换工作池
+
+    markdownify 是纯 Python 实现，多 MB 页面转换要数秒；直接在事件循环中执行
+    会阻塞所有进行中的请求。较大的页面投递到工作池转换，使网络 I/O 与转换重叠：
+    - thread: 线程池，事件循环保持响应，但转换本身受 GIL 限制不能并行
+    - process: 进程池，多页面转换可利用多核（需要序列化 HTML 和结果）
+    - inline: 在事件循环中直接转换（旧行为）
+    """
+
+    def __init__(self, mode: Optional[str] = None, workers: Optional[int] = None):
+        mode = mode or os.environ.get("WIKI_CONVERT_MODE", "thread")
+        if mode not in CONVERT_MODES:
+            raise ValueError(f"未知转换方式: {mode}（可选: {', '.join(CONVERT_MODES)}）")
+        self.mode = mode
+        self.workers = workers
+        self._executor = None
+
+    def _get_executor(self) -> concurrent.futures.Executor:
+        import concurrent.futures
+
+        if self._executor is None:
+            if self.mode == "process":
+                self._executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                # 多个线程同时首次访问延迟导入的模块会拿到未初始化完的模块
+                # （Python 3.12 之前的 LazyLoader 不是线程安全的），先在当前线程加载
+                if markdownify is not None:
+                    markdownify.markdownify
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="wiki-convert"
+                )
+        return self._executor
+
+    async def html_to_markdown(self, html_content: str) -> str:
+        """转换单个页面（较大的页面在工作池中执行）"""
+        offload = self.mode != "inline" and len(html_content) >= OFFLOAD_MIN_BYTES
+        with trace_span("markdownify", bytes=len(html_content),
+                        mode=self.mode if offload else "inline"):
+            if not offload:
+                return html_to_markdown(html_content)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), html_to_markdown,
+                                              html_content)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+
+_default_conversion_pool = None
+
+
+def get_conversion_pool() -> ConversionPool:
+    """进程内共享的默认转换池（转换方式取自 WIKI_CONVERT_MODE）"""
+    global _default_conversion_pool
+    if _default_conversion_pool is None:
+        _default_conversion_pool = ConversionPool()
+    return _default_conversion_pool
 
 
 # ============================================================================
@@ -204,11 +1227,112 @@ def extract_page_id(page_url: str) -> str:
     raise ValueError(f"无法从 URL 提取页面 ID: {page_url}")
 
 
+def _build_create_payload(
+    title: str,
+    content_html: str,
+    space_key: str,
+    parent_page_id: Optional[str] = None
+) -> dict:
+    """构造创建页面的请求体"""
+    create_data = {
+        "type": "page",
+        "title": title,
+        "space": {"key": space_key},
+        "status": "current",
+        "body": {
+            "storage": {
+                "value": content_html,
+                "representation": "storage"
+            }
+        }
+    }
+    if parent_page_id:
+        create_data["ancestors"] = [{"id": parent_page_id}]
+    return create_data
+
+
+def _build_update_payload(version: int, title: str, content_html: str) -> dict:
+    """构造更新页面的请求体（version 为新版本号）"""
+    return {
+        "version": {"number": version},
+        "title": title,
+        "type": "page",
+        "body": {
+            "storage": {
+                "value": content_html,
+                "representation": "storage"
+            }
+        }
+    }
+
+
+def _parse_created_page(config: WikiConfig, data: dict) -> dict:
+    """解析创建页面的返回数据"""
+    return {
+        "id": data["id"],
+        "title": data["title"],
+        "url": f"{config.base_url}/pages/viewpage.action?pageId={data['id']}",
+        "space": data.get("space", {}).get("key", ""),
+        "version": data.get("version", {}).get("number", 0),
+        "created": data.get("version", {}).get("when", ""),
+        "created_by": data.get("version", {}).get("by", {}).get("displayName", ""),
+        "message": f"页面已成功创建，ID: {data['id']}"
+    }
+
+
+def _parse_updated_page(config: WikiConfig, data: dict) -> dict:
+    """解析更新页面的返回数据"""
+    return {
+        "id": data["id"],
+        "title": data["title"],
+        "url": f"{config.base_url}/pages/viewpage.action?pageId={data['id']}",
+        "version": data.get("version", {}).get("number", 0),
+        "last_updated": data.get("version", {}).get("when", ""),
+        "last_updated_by": data.get("version", {}).get("by", {}).get("displayName", ""),
+        "message": f"页面已成功更新到版本 {data.get('version', {}).get('number', 0)}"
+    }
+
+
+# 页面读取可投影的字段，以及每个字段需要的 expand 参数
+PAGE_FIELDS = ("content", "space", "version", "labels", "attachments")
+_FIELD_EXPANSIONS = {
+    "space": "space",
+    "version": "version",
+    "labels": "metadata.labels",
+    "attachments": "children.attachment",
+}
+
+
+def _page_expand(fields, format: str) -> str:
+    """根据请求的字段生成最小的 expand 参数"""
+    expand = []
+    for field in fields:
+        if field == "content":
+            expand.append("body.view" if format == "view" else "body.storage")
+        else:
+            expand.append(_FIELD_EXPANSIONS[field])
+    return ",".join(expand)
+
+
+def _parse_version_info(data: dict) -> dict:
+    """解析 version 展开字段"""
+    version = data.get("version", {})
+    return {
+        "version": version.get("number", 0),
+        "last_updated": version.get("when", ""),
+        "last_updated_by": version.get("by", {}).get("displayName", ""),
+    }
+
+
 async def get_wiki_page_content(
     config: WikiConfig,
     page_id: Optional[str] = None,
     page_url: Optional[str] = None,
-    format: str = "markdown"
+    format: str = "markdown",
+    client: Optional[WikiClient] = None,
+    fields: Optional[Iterable[str]] = None,
+    cache: Optional[PageCache] = None,
+    converter: Optional[ConversionPool] = None
 ) -> dict:
     """获取 Wiki 页面内容
 
@@ -217,6 +1341,13 @@ async def get_wiki_page_content(
         page_id: 页面 ID
         page_url: 页面 URL（如果提供则自动提取 page_id）
         format: 输出格式，'markdown'（默认）、'storage'（HTML）或 'view'
+        client: 复用的 WikiClient（可选，未提供时使用一次性连接）
+        fields: 需要返回的字段（PAGE_FIELDS 的子集，默认全部）。
+            只展开请求的字段，id/title/url 始终返回
+        cache: 页面磁盘缓存（可选）。先用版本探测校验，版本未变时直接返回缓存，
+            返回值中 cache 字段为 'hit' 或 'miss'
+        converter: HTML -> Markdown 转换池（可选，默认使用 get_conversion_pool()）。
+            只需要元数据时请用 fields 排除 content，既不下载正文也不转换
 
     Returns:
         包含页面信息的字典
@@ -228,13 +1359,19 @@ async def get_wiki_page_content(
     if not page_id:
         raise ValueError("必须提供 page_id 或 page_url")
 
+    fields = PAGE_FIELDS if fields is None else tuple(fields)
+    unknown = set(fields) - set(PAGE_FIELDS)
+    if unknown:
+        raise ValueError(f"未知字段: {', '.join(sorted(unknown))}")
+
+    if cache is not None and "content" in fields:
+        return await _get_page_cached(config, page_id, format, client, fields, cache, converter)
+
     url = f"{config.base_url}/rest/api/content/{page_id}"
     headers = config.get_auth_headers()
-    params = {
-        "expand": "body.storage,body.view,version,space,metadata.labels,children.attachment"
-    }
+    params = {"expand": _page_expand(fields, format)}
 
-    result = await fetch_json(url, headers, params)
+    result = await fetch_json(url, headers, params, client=client)
 
     if not result["success"]:
         raise RuntimeError(result["error"])
@@ -242,128 +1379,389 @@ async def get_wiki_page_content(
     # 解析数据
     data = result["data"]
 
-    # 选择内容格式
-    if format == "storage":
-        content = data.get("body", {}).get("storage", {}).get("value", "")
-    elif format == "view":
-        content = data.get("body", {}).get("view", {}).get("value", "")
-    else:  # markdown
-        html_content = data.get("body", {}).get("storage", {}).get("value", "")
-        content = md(html_content, heading_style="ATX")
-
     parsed = {
         "id": data["id"],
         "title": data["title"],
         "url": f"{config.base_url}/pages/viewpage.action?pageId={data['id']}",
-        "space": data.get("space", {}).get("key", ""),
-        "content": content,
-        "version": data.get("version", {}).get("number", 0),
-        "last_updated": data.get("version", {}).get("when", ""),
-        "last_updated_by": data.get("version", {}).get("by", {}).get("displayName", ""),
-        "labels": [
+    }
+
+    if "space" in fields:
+        parsed["space"] = data.get("space", {}).get("key", "")
+
+    # 选择内容格式
+    if "content" in fields:
+        if format == "storage":
+            content = data.get("body", {}).get("storage", {}).get("value", "")
+        elif format == "view":
+            content = data.get("body", {}).get("view", {}).get("value", "")
+        else:  # markdown
+            html_content = data.get("body", {}).get("storage", {}).get("value", "")
+            content = await (converter or get_conversion_pool()).html_to_markdown(html_content)
+        parsed["content"] = content
+
+    if "version" in fields:
+        parsed.update(_parse_version_info(data))
+
+    if "labels" in fields:
+        parsed["labels"] = [
             label["name"]
             for label in data.get("metadata", {}).get("labels", {}).get("results", [])
         ]
-    }
 
     # 附件
-    attachments = data.get("children", {}).get("attachment", {}).get("results", [])
-    parsed["attachments"] = [
-        {
-            "filename": a.get("title", ""),
-            "size": a.get("extensions", {}).get("fileSize", 0),
-            "url": f"{config.base_url}{a.get('_links', {}).get('download', '')}"
-        }
-        for a in attachments
-    ]
+    if "attachments" in fields:
+        listing = data.get("children", {}).get("attachment", {})
+        attachments = listing.get("results", [])
+        if listing.get("_links", {}).get("next"):
+            # 展开字段只包含第一页，其余附件分页补齐
+            url = f"{config.base_url}/rest/api/content/{data['id']}/child/attachment"
+            attachments = [item async for item in iter_paginated(config, url, client=client)]
+        parsed["attachments"] = [
+            {
+                "filename": a.get("title", ""),
+                "size": a.get("extensions", {}).get("fileSize", 0),
+                "url": f"{config.base_url}{a.get('_links', {}).get('download', '')}"
+            }
+            for a in attachments
+        ]
 
     return parsed
 
 
-async def update_wiki_page_content(
+async def _get_page_cached(
     config: WikiConfig,
     page_id: str,
-    content: Optional[str] = None,
-    title: Optional[str] = None,
-    format: str = "markdown",
-    append: bool = False
+    format: str,
+    client: Optional[WikiClient],
+    fields: tuple,
+    cache: PageCache,
+    converter: Optional[ConversionPool] = None
 ) -> dict:
-    """更新 Wiki 页面内容
+    """带缓存的页面读取：版本探测 -> 命中则读盘，未命中则完整读取并写入缓存"""
+    if cache.has_page(page_id, format):
+        probe = await get_wiki_page_version(config, page_id=page_id, client=client)
+        cached = cache.get(page_id, probe["version"], format)
+        if cached is not None:
+            # 标题和更新信息以探测结果为准
+            cached.update(probe)
+            page = _project_page(cached, fields)
+            page["cache"] = "hit"
+            return page
+    else:
+        cache.misses += 1
 
-    Args:
-        config: Wiki 配置
-        page_id: 页面 ID
-        content: 新内容（如果为空则不修改内容）
-        title: 新标题（如果为空则不修改标题）
-        format: 内容格式，'markdown'（默认）或 'html'
-        append: 是否追加内容（True=追加到末尾，False=覆盖）
+    page = await get_wiki_page_content(
+        config, page_id=page_id, format=format, client=client, converter=converter
+    )
+    cache.put(page_id, page["version"], format, page)
+    page = _project_page(page, fields)
+    page["cache"] = "miss"
+    return page
 
-    Returns:
-        更新后的页面信息
-    """
-    if not content and not title:
-        raise ValueError("至少需要提供 content 或 title")
 
-    # 1. 获取当前页面信息（需要版本号）
-    current_page = await get_wiki_page_content(config, page_id=page_id, format="storage")
-    current_version = current_page["version"]
-    current_title = current_page["title"]
-    current_content_html = current_page["content"]
+def _project_page(page: dict, fields) -> dict:
+    """从完整的解析结果中只保留请求的字段"""
+    version_keys = ("last_updated", "last_updated_by")
+    return {
+        k: v for k, v in page.items()
+        if k in ("id", "title", "url")
+        or k in fields
+        or (k in version_keys and "version" in fields)
+    }
 
-    # 2. 处理新内容
-    if content:
-        # 转换 Markdown 为 HTML（如果需要）
-        if format == "markdown":
-            if markdown is None:
-                raise RuntimeError("需要安装 markdown 库: pip install markdown")
-            new_content_html = markdown.markdown(content, extensions=['extra', 'nl2br'])
-        else:  # html
-            new_content_html = content
 
-        # 追加模式：在原有内容后添加
-        if append:
-            final_content_html = current_content_html + "\n" + new_content_html
-        else:
-            final_content_html = new_content_html
-    else:
-        # 不修改内容
-        final_content_html = current_content_html
+async def get_wiki_page_version(
+    config: WikiConfig,
+    page_id: Optional[str] = None,
+    page_url: Optional[str] = None,
+    client: Optional[WikiClient] = None
+) -> dict:
+    """轻量探测页面版本（只展开 version，不返回正文）
 
-    # 3. 处理标题
-    final_title = title if title else current_title
+    用于"页面是否变化"之类的检查，响应体和服务端渲染开销远小于完整读取。
 
-    # 4. 构造更新请求
-    url = f"{config.base_url}/rest/api/content/{page_id}"
-    headers = config.get_auth_headers()
+    Returns:
+        包含 id、title、url、version、last_updated、last_updated_by 的字典
+    """
+    return await get_wiki_page_content(
+        config, page_id=page_id, page_url=page_url, client=client, fields=("version",)
+    )
 
-    update_data = {
-        "version": {"number": current_version + 1},
-        "title": final_title,
-        "type": "page",
-        "body": {
-            "storage": {
-                "value": final_content_html,
-                "representation": "storage"
-            }
-        }
-    }
 
-    # 5. 发送 PUT 请求
-    result = await put_json(url, headers, update_data)
+async def iter_wiki_pages(
+    config: WikiConfig,
+    page_refs: Iterable[str],
+    format: str = "markdown",
+    concurrency: int = 8,
+    client: Optional[WikiClient] = None,
+    fields: Optional[Iterable[str]] = None,
+    cache: Optional[PageCache] = None,
+    converter: Optional[ConversionPool] = None
+) -> AsyncIterator[dict]:
+    """并发获取多个页面，按完成顺序逐个产出结果
+
+    Args:
+        config: Wiki 配置
+        page_refs: 页面 ID 或 URL 列表
+        format: 输出格式，同 get_wiki_page_content
+        concurrency: 最大并发请求数
+        client: 复用的 WikiClient（可选，未提供时创建一个供所有页面共享）
+        fields: 需要返回的字段，同 get_wiki_page_content
+        cache: 页面磁盘缓存（可选）
+        converter: HTML -> Markdown 转换池（可选）。大页面在池中转换，
+            与其他页面的网络请求重叠
+
+    Yields:
+        页面信息字典；单个页面失败时产出 {"ref": ..., "error": ...}，不影响其他页面
+    """
+    if client is None:
+        async with WikiClient(config) as owned:
+            async for page in iter_wiki_pages(config, page_refs, format, concurrency,
+                                              owned, fields, cache, converter):
+                yield page
+        return
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def fetch(ref: str) -> dict:
+        async with semaphore:
+            try:
+                page_id = ref if ref.isdigit() else extract_page_id(ref)
+                return await get_wiki_page_content(
+                    config, page_id=page_id, format=format, client=client,
+                    fields=fields, cache=cache, converter=converter
+                )
+            except Exception as e:
+                return {"ref": ref, "error": str(e)}
+
+    tasks = [asyncio.ensure_future(fetch(ref)) for ref in page_refs]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+# 空白有意义、规范化时原样保留的片段：CDATA（代码宏正文）和 <pre> 元素
+_VERBATIM_RE = re.compile(r"<!\[CDATA\[.*?\]\]>|<pre\b[^>]*>.*?</pre>", re.S | re.I)
+_VERBATIM_MARK_RE = re.compile(r"<\x00(\d+)\x00>")
+
+# 块级元素：与它们相邻的标签间空白不影响渲染
+BLOCK_ELEMENTS = frozenset({
+    "p", "h1", "h2", "h3", "h4", "h5", "h6", "div", "blockquote", "pre", "hr", "br",
+    "ul", "ol", "li", "dl", "dt", "dd", "table", "caption", "colgroup", "col",
+    "thead", "tbody", "tfoot", "tr", "td", "th",
+    "ac:layout", "ac:layout-section", "ac:layout-cell", "ac:rich-text-body",
+    "ac:plain-text-body", "ac:parameter", "ac:task-list", "ac:task", "ac:task-id",
+    "ac:task-status", "ac:task-body",
+})
+
+# 两个标签之间的空白：分组为前一个标签名和后一个标签名（占位标签的名称为 \x00）
+_GAP_BETWEEN_TAGS_RE = re.compile(r"<(\x00|/?[\w:-]*)[^<>]*>(\s+)(?=<(\x00|/?[\w:-]*))")
+
+
+def _collapse_block_gap(match: re.Match) -> str:
+    """与块级元素（或原样保留片段的占位标签）相邻的空白删除，行内元素之间的空白保留"""
+    before = match.group(1).lstrip("/").lower()
+    after = match.group(3).lstrip("/").lower()
+    if before in BLOCK_ELEMENTS or after in BLOCK_ELEMENTS or "\x00" in (before, after):
+        return match.group()[:-len(match.group(2))]
+    return match.group()
+
+
+def normalize_storage(content_html: str) -> str:
+    """规范化 Storage Format，消除不影响渲染的差异（换行符、块级元素间空白、自闭合写法）
+
+    行内元素之间的空白会显示为空格（如 <strong>a</strong> <em>b</em>），予以保留；
+    CDATA 和 <pre> 中的空白会影响显示（例如代码缩进），这些片段只统一换行符，
+    其余内容不做修改。
+    """
+    text = content_html.replace("\r\n", "\n").replace("\r", "\n")
+    verbatim = []
+
+    def stash(match: re.Match) -> str:
+        verbatim.append(match.group())
+        return f"<\x00{len(verbatim) - 1}\x00>"
+
+    # 先用占位标签替换原样保留的片段，占位标签两侧的空白照常规范化
+    text = _VERBATIM_RE.sub(stash, text)
+    text = _GAP_BETWEEN_TAGS_RE.sub(_collapse_block_gap, text)
+    text = re.sub(r"\s*/>", "/>", text)
+    if verbatim:
+        text = _VERBATIM_MARK_RE.sub(lambda match: verbatim[int(match.group(1))], text)
+    return text.strip()
+
+
+def content_hash(content_html: str) -> str:
+    """规范化后 Storage Format 的 SHA-256"""
+    with trace_span("content.hash", bytes=len(content_html)):
+        return hashlib.sha256(normalize_storage(content_html).encode("utf-8")).hexdigest()
+
+
+class HashManifest:
+    """页面内容哈希清单
+
+    记录每个页面最近一次写入内容的哈希、标题和写入后的版本号。再次更新时
+    如果内容哈希和标题都未变、且页面版本仍是上次写入的版本（没有被其他人修改），
+    只需一次轻量版本探测即可跳过，连正文都不用下载。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.pages = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.pages = json.load(f).get("pages", {})
+
+    def get(self, page_id: str) -> Optional[dict]:
+        return self.pages.get(str(page_id))
+
+    def record(self, page_id: str, digest: str, title: str, version: int) -> None:
+        self.pages[str(page_id)] = {"hash": digest, "title": title, "version": version}
+
+    def save(self) -> None:
+        _write_json_atomic(self.path, {"pages": self.pages})
+
+
+async def update_wiki_page_content(
+    config: WikiConfig,
+    page_id: str,
+    content: Optional[str] = None,
+    title: Optional[str] = None,
+    format: str = "markdown",
+    append: bool = False,
+    client: Optional[WikiClient] = None,
+    hash_manifest: Optional[HashManifest] = None
+) -> dict:
+    """更新 Wiki 页面内容
+
+    覆盖模式下，如果规范化后的内容与页面现有内容一致且标题不变，则跳过 PUT，
+    不产生空版本。返回值的 status 为 'written' 或 'skipped'。追加模式下遇到
+    409 版本冲突时重新读取版本和正文后重试（最多 APPEND_REBASE_ATTEMPTS 次）；
+    409 来自重试的 PUT、且重新读取的页面正是提交的版本并以新内容结尾时，说明
+    首次提交已生效（响应丢失），不再重复追加。
+
+    Args:
+        config: Wiki 配置
+        page_id: 页面 ID
+        content: 新内容（如果为空则不修改内容）
+        title: 新标题（如果为空则不修改标题）
+        format: 内容格式，'markdown'（默认）或 'html'
+        append: 是否追加内容（True=追加到末尾，False=覆盖）
+        client: 复用的 WikiClient（可选，未提供时使用一次性连接）
+        hash_manifest: 内容哈希清单（可选）。命中时只做版本探测即可跳过，
+            写入后自动记录（调用方负责 save()）
+
+    Returns:
+        更新后的页面信息
+    """
+    if not content and not title:
+        raise ValueError("至少需要提供 content 或 title")
+
+    # 1. 处理新内容（转换 Markdown 为 HTML）
+    new_content_html = None
+    if content:
+        if format == "markdown":
+            new_content_html = markdown_to_storage(content)
+        else:  # html
+            new_content_html = content
+
+    # 2. 哈希清单快速路径：内容和标题与上次写入一致，且页面未被他人修改
+    new_hash = content_hash(new_content_html) if new_content_html and not append else None
+    if new_hash and hash_manifest is not None:
+        entry = hash_manifest.get(page_id)
+        if entry and entry["hash"] == new_hash and (not title or title == entry["title"]):
+            probe = await get_wiki_page_version(config, page_id=page_id, client=client)
+            if probe["version"] == entry["version"]:
+                return _skipped_result(probe)
+
+    # 3. 获取当前页面信息（需要版本号）；追加时遇到版本冲突（409）重新读取后重试
+    attempts = APPEND_REBASE_ATTEMPTS if append else 0
+    replayed_version = None  # 上一次 PUT 重试后得到 409 时提交的版本号
+    applied = None
+    for attempt in range(attempts + 1):
+        current_page = await get_wiki_page_content(
+            config, page_id=page_id, format="storage", client=client,
+            fields=("content", "version")
+        )
+        current_version = current_page["version"]
+        current_title = current_page["title"]
+        current_content_html = current_page["content"]
+
+        if (replayed_version == current_version
+                and normalize_storage(current_content_html).endswith(normalize_storage(new_content_html))):
+            # 上一次追加其实已经生效，只是响应丢失
+            applied = current_page
+            break
+
+        # 4. 确定最终内容和标题
+        if new_content_html is None:
+            # 不修改内容
+            final_content_html = current_content_html
+        elif append:
+            # 追加模式：在原有内容后添加
+            final_content_html = current_content_html + "\n" + new_content_html
+        else:
+            final_content_html = new_content_html
+
+        final_title = title if title else current_title
 
+        # 5. 内容与标题均未变化时跳过写入
+        unchanged_content = (
+            new_content_html is None
+            or (new_hash is not None and new_hash == content_hash(current_content_html))
+        )
+        if unchanged_content and final_title == current_title:
+            if new_hash and hash_manifest is not None:
+                hash_manifest.record(page_id, new_hash, final_title, current_version)
+            return _skipped_result(current_page)
+
+        # 6. 构造更新请求
+        url = f"{config.base_url}/rest/api/content/{page_id}"
+        headers = config.get_auth_headers()
+
+        update_data = _build_update_payload(current_version + 1, final_title, final_content_html)
+
+        # 7. 发送 PUT 请求
+        result = await put_json(url, headers, update_data, client=client)
+        if result.get("status_code") == 409 and result.get("replayed") and not append:
+            data = await _confirm_replayed_put(config, page_id, current_version + 1, client)
+            if data is not None:
+                result = {"success": True, "data": data}
+        if result["success"] or result.get("status_code") != 409 or attempt == attempts:
+            break
+        replayed_version = current_version + 1 if result.get("replayed") else None
+        await asyncio.sleep(random.uniform(0, 0.1 * (2 ** attempt)))
+
+    if applied is not None:
+        return {
+            **_skipped_result(applied),
+            "status": "written",
+            "message": f"页面已成功更新到版本 {applied['version']}"
+        }
     if not result["success"]:
         raise RuntimeError(f"更新 Wiki 页面失败: {result['error']}")
 
-    # 6. 解析返回数据
-    data = result["data"]
+    # 8. 解析返回数据
+    updated = _parse_updated_page(config, result["data"])
+    updated["status"] = "written"
+    if new_hash and hash_manifest is not None:
+        hash_manifest.record(page_id, new_hash, updated["title"], updated["version"])
+    return updated
+
+
+def _skipped_result(page: dict) -> dict:
+    """内容未变化、跳过写入时的返回值"""
     return {
-        "id": data["id"],
-        "title": data["title"],
-        "url": f"{config.base_url}/pages/viewpage.action?pageId={data['id']}",
-        "version": data.get("version", {}).get("number", 0),
-        "last_updated": data.get("version", {}).get("when", ""),
-        "last_updated_by": data.get("version", {}).get("by", {}).get("displayName", ""),
-        "message": f"页面已成功更新到版本 {data.get('version', {}).get('number', 0)}"
+        "id": page["id"],
+        "title": page["title"],
+        "url": page["url"],
+        "version": page["version"],
+        "last_updated": page.get("last_updated", ""),
+        "last_updated_by": page.get("last_updated_by", ""),
+        "status": "skipped",
+        "message": f"内容未变化，已跳过更新（版本 {page['version']}）"
     }
 
 
@@ -373,7 +1771,8 @@ async def create_wiki_page(
     content: str,
     space_key: str,
     format: str = "html",
-    parent_page_id: Optional[str] = None
+    parent_page_id: Optional[str] = None,
+    client: Optional[WikiClient] = None
 ) -> dict:
     """创建新的 Wiki 页面
 
@@ -384,6 +1783,7 @@ async def create_wiki_page(
         space_key: 空间 key（例如: "~ht", "SPACE" 等）
         format: 内容格式，'html'（默认，推荐）或 'markdown'
         parent_page_id: 父页面 ID（如果为空则创建顶级页面）
+        client: 复用的 WikiClient（可选，未提供时使用一次性连接）
 
     Returns:
         新创建的页面信息
@@ -399,9 +1799,7 @@ async def create_wiki_page(
 
     # 1. 处理内容格式
     if format == "markdown":
-        if markdown is None:
-            raise RuntimeError("需要安装 markdown 库: pip install markdown")
-        content_html = markdown.markdown(content, extensions=['extra', 'nl2br'])
+        content_html = markdown_to_storage(content)
     else:  # html
         content_html = content
 
@@ -409,41 +1807,358 @@ async def create_wiki_page(
     url = f"{config.base_url}/rest/api/content"
     headers = config.get_auth_headers()
 
-    create_data = {
-        "type": "page",
-        "title": title,
-        "space": {"key": space_key},
-        "status": "current",
-        "body": {
-            "storage": {
-                "value": content_html,
-                "representation": "storage"
-            }
-        }
-    }
-
     # 3. 如果指定了父页面，添加到 ancestors
-    if parent_page_id:
-        create_data["ancestors"] = [{"id": parent_page_id}]
+    create_data = _build_create_payload(title, content_html, space_key, parent_page_id)
 
     # 4. 发送 POST 请求
-    result = await post_json(url, headers, create_data)
+    result = await post_json(url, headers, create_data, client=client)
 
     if not result["success"]:
         raise RuntimeError(f"创建 Wiki 页面失败: {result['error']}")
 
     # 5. 解析返回数据
-    data = result["data"]
-    return {
-        "id": data["id"],
-        "title": data["title"],
-        "url": f"{config.base_url}/pages/viewpage.action?pageId={data['id']}",
-        "space": data.get("space", {}).get("key", ""),
-        "version": data.get("version", {}).get("number", 0),
-        "created": data.get("version", {}).get("when", ""),
-        "created_by": data.get("version", {}).get("by", {}).get("displayName", ""),
-        "message": f"页面已成功创建，ID: {data['id']}"
-    }
+    return _parse_created_page(config, result["data"])
+
+
+# 不需要闭合标签的 HTML 空元素
+VOID_ELEMENTS = (
+    "area", "base", "br", "col", "embed", "hr", "img", "input",
+    "link", "meta", "param", "source", "track", "wbr",
+)
+
+# 标签扫描：注释、CDATA、处理指令/DOCTYPE、空元素和自闭合标签不改变嵌套深度；
+# 闭合标签匹配第 1 组，开始标签匹配第 2 组（通过 lastindex 区分，避免逐个取组）。
+# 属性值中可以包含 '>' 和 '/'
+_TAG_ATTRS = r"""[^>"']*(?:(?:"[^"]*"|'[^']*')[^>"']*)*"""
+_MARKUP_RE = re.compile(
+    r"<!--.*?-->"
+    r"|<!\[CDATA\[.*?\]\]>"
+    r"|<[!?][^>]*>"
+    r"|(</)[^>]*>"
+    r"|<(?i:" + "|".join(VOID_ELEMENTS) + r")(?![\w:.-])" + _TAG_ATTRS + r">"
+    r"|<[A-Za-z]" + _TAG_ATTRS + r"(?:(?<!/)(>)|>)",
+    re.S,
+)
+
+# 顶层元素的标签名（开始标签 '<' 之后）
+_TAG_NAME_RE = re.compile(r"[A-Za-z][^\s/>]*")
+_element_tag_res = {}
+
+
+def _element_end(content_html: str, start_tag: re.Match) -> Optional[int]:
+    """顶层元素的结束位置（闭合标签之后），无法快速确定时返回 None
+
+    只查找同名的开始/闭合标签来匹配嵌套，不必逐个扫描元素内部的标签。Storage Format
+    是 XHTML，注释和 CDATA 之外的 '<' 只能是标签，因此同名标签配对即为元素边界；
+    元素内含注释、CDATA 或处理指令（其中的文本可能像标签），或者闭合标签尚未读入时
+    返回 None，由调用方逐个扫描。
+    """
+    name = _TAG_NAME_RE.match(content_html, start_tag.start() + 1).group()
+    open_tag, close_tag = "<" + name, "</" + name
+    level = 1
+    pos = start_tag.end()
+    while level:
+        close = content_html.find(close_tag, pos)
+        if close < 0:
+            return None
+        # 之间的同名开始标签（"<p" 也会匹配 "<pre"，需逐个确认）
+        if content_html.count(open_tag, pos, close):
+            pattern = _element_tag_res.get(name)
+            if pattern is None:
+                pattern = _element_tag_res[name] = re.compile(
+                    re.escape(open_tag) + r"(?=[\s/>])"
+                )
+            for tag in pattern.finditer(content_html, pos, close):
+                inner = _MARKUP_RE.match(content_html, tag.start())
+                if inner is None:
+                    return None
+                if inner.lastindex == 2:
+                    level += 1
+        pos = close + len(close_tag)
+        if pos >= len(content_html):
+            return None
+        if content_html[pos] in "> \t\r\n":
+            level -= 1
+
+    end = content_html.find(">", pos)
+    if end < 0:
+        return None
+    end += 1
+    start = start_tag.start()
+    if content_html.find("<!", start, end) >= 0 or content_html.find("<?", start, end) >= 0:
+        return None
+    return end
+
+
+def iter_storage_chunks(blocks: Iterable[str], chunk_size: int) -> Iterator[str]:
+    """流式切分 Storage Format HTML：输入为文本块迭代器，逐批产出，只在顶层元素边界处切分
+
+    扫描标签时跟踪嵌套深度，深度回到 0 的位置即顶层边界；表格、宏
+    （ac:structured-macro）、CDATA 和注释等都不会被拆开。顶层元素通过查找同名闭合
+    标签整体跳过（_element_end），只有含注释/CDATA 的元素才逐个扫描内部标签。
+    每批只需把 chunk_size 个字符编码一次，求出放得下的字符数，再二分查找其中最后
+    一个顶层边界。
+    单个顶层元素本身超过 chunk_size 时独占一批（因此该批会超过 chunk_size）。
+
+    内存中只保留尚未输出的内容（约一批加一个输入块），可以直接切分任意大小的文件。
+
+    Args:
+        blocks: 文本块（例如 iter_text_file() 的结果），块边界可以在任意位置
+        chunk_size: 每批内容的最大字节数
+
+    Yields:
+        各批内容，按顺序拼接即为原文
+    """
+    if chunk_size <= 0:
+        raise ValueError("chunk_size 必须大于 0")
+
+    buffer = ""
+    boundaries = []   # buffer 内已知的顶层边界
+    depth = 0
+    scan_pos = 0      # buffer 中已扫描到的位置
+
+    for block in itertools.chain(blocks, [None]):
+        eof = block is None
+        if not eof:
+            buffer += block
+
+        # 1. 扫描新到达的文本（跨块的注释/CDATA 等到下一块再处理）
+        while True:
+            match = _MARKUP_RE.search(buffer, scan_pos)
+            if match is None:
+                break
+            kind = match.lastindex
+            if kind is None and not eof and buffer.startswith("<!", match.start()):
+                token = match.group()
+                if (token.startswith("<!--") and not token.endswith("-->")) or \
+                        (token.startswith("<![CDATA[") and not token.endswith("]]>")):
+                    break
+            if kind == 2 and not depth:
+                end = _element_end(buffer, match)
+                if end is not None:
+                    scan_pos = end
+                    boundaries.append(scan_pos)
+                    continue
+            scan_pos = match.end()
+            if kind == 2:
+                depth += 1
+                continue
+            if kind == 1 and depth:
+                depth -= 1
+            if not depth:
+                boundaries.append(scan_pos)
+
+        # 2. 输出已经能确定切分点的批次
+        start = 0
+        while start < len(buffer):
+            # UTF-8 每个字符至少 1 字节，chunk_size 个字符一定覆盖本批的所有候选位置
+            window = buffer[start:start + chunk_size]
+            if window.isascii():
+                limit = start + len(window)
+            else:
+                fitting = window.encode("utf-8")[:chunk_size].decode("utf-8", "ignore")
+                limit = start + len(fitting)
+
+            if eof and limit >= len(buffer):
+                yield buffer[start:]
+                start = len(buffer)
+                break
+            if not eof and limit >= scan_pos:
+                break  # 切分点之前还有未扫描的内容，等待更多输入
+
+            index = bisect.bisect_right(boundaries, limit) - 1
+            if index < 0 or boundaries[index] <= start:
+                # 放不下任何一个完整的顶层元素：把下一个顶层元素整个作为一批
+                index = bisect.bisect_right(boundaries, start)
+                if index == len(boundaries):
+                    if eof:
+                        yield buffer[start:]
+                        start = len(buffer)
+                    break
+            cut = boundaries[index]
+            yield buffer[start:cut]
+            start = cut
+
+        # 3. 丢弃已输出的内容
+        if start:
+            buffer = buffer[start:]
+            scan_pos = max(0, scan_pos - start)
+            boundaries = [b - start for b in boundaries if b > start]
+
+
+def split_storage_html(content_html: str, chunk_size: int) -> list:
+    """把 Storage Format HTML 按字节数切分为多批（iter_storage_chunks 的列表版本）
+
+    Args:
+        content_html: Storage Format HTML
+        chunk_size: 每批内容的最大字节数
+
+    Returns:
+        各批内容，按顺序拼接即为原文
+    """
+    return list(iter_storage_chunks([content_html], chunk_size))
+
+
+def iter_text_file(path: str, block_size: int = 1024 * 1024) -> Iterator[str]:
+    """按块读取 UTF-8 文本文件（每块 block_size 个字符），不把整个文件读入内存"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for block in iter(lambda: f.read(block_size), ""):
+            yield block
+
+
+# 流式请求体中正文的占位符（序列化后替换为逐块转义的正文）
+_BODY_PLACEHOLDER = "\x00wiki-body\x00"
+
+# 流式请求体每次从暂存文件读取的字符数
+_BODY_BLOCK_SIZE = 1024 * 1024
+
+
+async def _stream_json_body(payload: dict, blocks: Iterable[str], sent: dict) -> AsyncIterator[bytes]:
+    """生成 JSON 请求体：payload 中的 _BODY_PLACEHOLDER 替换为 blocks 拼接的正文
+
+    正文逐块 JSON 转义后发送，不在内存中拼出完整请求体。sent["bytes"] 累计已发送字节数。
+    """
+    prefix, suffix = json.dumps(payload, ensure_ascii=False).split(
+        json.dumps(_BODY_PLACEHOLDER, ensure_ascii=False)
+    )
+    sent["bytes"] = 0
+
+    def emit(text: str) -> bytes:
+        data = text.encode("utf-8")
+        sent["bytes"] += len(data)
+        return data
+
+    yield emit(prefix + '"')
+    for block in blocks:
+        yield emit(json.dumps(block, ensure_ascii=False)[1:-1])
+    yield emit('"' + suffix)
+
+
+class ChunkUploader:
+    """分批上传器
+
+    第一批通过 POST 创建页面，之后在本地跟踪版本号，每次追加直接 PUT 新版本，
+    不再回读页面（省去每批一次带 body.view 渲染的 GET）。
+
+    Confluence REST 没有增量追加接口，每次 PUT 仍需携带完整的累计内容。
+    已上传的内容暂存在临时文件中，PUT 请求体从暂存文件逐块转义、流式发送，
+    内存占用只与单批大小有关，与页面总大小无关。
+
+    用法：
+        uploader = ChunkUploader(config, title, space_key, parent_page_id, client=client)
+        try:
+            await uploader.create(chunks[0])
+            for chunk in chunks[1:]:
+                await uploader.append(chunk)
+        finally:
+            uploader.close()
+    """
+
+    def __init__(
+        self,
+        config: WikiConfig,
+        title: str,
+        space_key: str,
+        parent_page_id: Optional[str] = None,
+        client: Optional[WikiClient] = None
+    ):
+        self.config = config
+        self.title = title
+        self.space_key = space_key
+        self.parent_page_id = parent_page_id
+        self.client = client
+        self.page_id: Optional[str] = None
+        self.version = 0
+        self.batches = []
+        self._spool = None
+
+    @property
+    def bytes_sent(self) -> int:
+        """所有批次请求体的总字节数"""
+        return sum(b["bytes_sent"] for b in self.batches)
+
+    @property
+    def bytes_received(self) -> int:
+        """所有批次响应体的总字节数"""
+        return sum(b["bytes_received"] for b in self.batches)
+
+    @property
+    def total_bytes(self) -> int:
+        """已上传内容的总字节数"""
+        return sum(b["chunk_bytes"] for b in self.batches)
+
+    def _record(self, result: dict, chunk: str) -> dict:
+        batch = {
+            "batch": len(self.batches) + 1,
+            "chunk_bytes": len(chunk.encode("utf-8")),
+            "bytes_sent": result.get("bytes_sent", 0),
+            "bytes_received": result.get("bytes_received", 0),
+            "version": self.version
+        }
+        self.batches.append(batch)
+        return batch
+
+    async def create(self, chunk: str) -> dict:
+        """用第一批内容创建页面，返回页面信息"""
+        import tempfile
+
+        url = f"{self.config.base_url}/rest/api/content"
+        create_data = _build_create_payload(
+            self.title, chunk, self.space_key, self.parent_page_id
+        )
+        result = await post_json(url, self.config.get_auth_headers(), create_data,
+                                 client=self.client)
+        if not result["success"]:
+            raise RuntimeError(f"创建 Wiki 页面失败: {result['error']}")
+
+        page = _parse_created_page(self.config, result["data"])
+        self.page_id = page["id"]
+        self.version = page["version"] or 1
+        self._spool = tempfile.TemporaryFile("w+", encoding="utf-8")
+        self._spool.write(chunk)
+        self._record(result, chunk)
+        return page
+
+    def _iter_body(self, payload: dict, chunk: str, sent: dict) -> AsyncIterator[bytes]:
+        """生成 PUT 请求体：暂存文件中的已上传内容 + 本批内容，逐块 JSON 转义"""
+        def blocks() -> Iterator[str]:
+            self._spool.seek(0)
+            yield from iter(lambda: self._spool.read(_BODY_BLOCK_SIZE), "")
+            yield "\n" + chunk
+
+        return _stream_json_body(payload, blocks(), sent)
+
+    async def append(self, chunk: str) -> dict:
+        """追加一批内容（基于本地跟踪的版本号直接 PUT），返回本批统计"""
+        if self.page_id is None:
+            raise RuntimeError("必须先调用 create() 创建页面")
+
+        url = f"{self.config.base_url}/rest/api/content/{self.page_id}"
+        payload = _build_update_payload(self.version + 1, self.title, _BODY_PLACEHOLDER)
+        sent = {"bytes": 0}
+        result = await _request_json(
+            "PUT", url, self.config.get_auth_headers(), PUT_ERRORS, client=self.client,
+            content=lambda: self._iter_body(payload, chunk, sent)
+        )
+        if result.get("status_code") == 409 and result.get("replayed"):
+            data = await _confirm_replayed_put(self.config, self.page_id, self.version + 1,
+                                               self.client)
+            if data is not None:
+                result = {"success": True, "data": data}
+        if not result["success"]:
+            raise RuntimeError(f"追加内容失败: {result['error']}")
+
+        result["bytes_sent"] = sent["bytes"]
+        self._spool.seek(0, os.SEEK_END)
+        self._spool.write("\n" + chunk)
+        self.version = result["data"].get("version", {}).get("number", self.version + 1)
+        return self._record(result, chunk)
+
+    def close(self) -> None:
+        """删除暂存文件"""
+        if self._spool is not None:
+            self._spool.close()
+            self._spool = None
 
 
 async def create_wiki_page_with_chunks(
@@ -453,7 +2168,8 @@ async def create_wiki_page_with_chunks(
     space_key: str,
     format: str = "html",
     parent_page_id: Optional[str] = None,
-    chunk_size: int = 1024 * 1024  # 默认 1MB
+    chunk_size: int = 1024 * 1024,  # 默认 1MB
+    client: Optional[WikiClient] = None
 ) -> dict:
     """创建 Wiki 页面，如果内容过长则分批追加
 
@@ -465,6 +2181,66 @@ async def create_wiki_page_with_chunks(
         format: 内容格式，'html'（默认，推荐）或 'markdown'
         parent_page_id: 父页面 ID（如果为空则创建顶级页面）
         chunk_size: 每批内容的最大字节数（默认: 1MB）
+        client: 复用的 WikiClient（可选，未提供时创建一个供所有批次共享）
+
+    Returns:
+        创建的页面信息，包含分批统计
+    """
+    if not title:
+        raise ValueError("必须提供页面标题")
+
+    if not content:
+        raise ValueError("必须提供页面内容")
+
+    if not space_key:
+        raise ValueError("必须提供空间 key")
+
+    if client is None:
+        # 所有批次共享一个连接池，避免每批重新握手
+        async with WikiClient(config) as owned:
+            return await create_wiki_page_with_chunks(
+                config, title, content, space_key, format,
+                parent_page_id, chunk_size, client=owned
+            )
+
+    # 1. 处理内容格式
+    if format == "markdown":
+        content_html = markdown_to_storage(content)
+    else:  # html
+        content_html = content
+
+    # 2. 只在顶层元素边界切分（按需逐批生成）
+    chunks = iter_storage_chunks([content_html], chunk_size)
+    return await _create_page_from_chunks(
+        config, title, chunks, space_key, parent_page_id, chunk_size, client
+    )
+
+
+async def create_wiki_page_from_file(
+    config: WikiConfig,
+    title: str,
+    path: str,
+    space_key: str,
+    format: str = "html",
+    parent_page_id: Optional[str] = None,
+    chunk_size: int = 1024 * 1024,
+    client: Optional[WikiClient] = None
+) -> dict:
+    """从文件创建 Wiki 页面，内容过长时分批追加（流式，内存占用与文件大小无关）
+
+    HTML 文件按块读取、边读边切分，已上传的内容暂存在临时文件中，
+    追加时请求体从暂存文件流式发送。Markdown 文件需要先整体转换为 HTML
+    （markdown 库不支持增量转换），转换后同样逐批上传。
+
+    Args:
+        config: Wiki 配置
+        title: 页面标题（必需）
+        path: 内容文件路径
+        space_key: 空间 key
+        format: 文件格式，'html'（默认，推荐）或 'markdown'
+        parent_page_id: 父页面 ID（如果为空则创建顶级页面）
+        chunk_size: 每批内容的最大字节数（默认: 1MB）
+        client: 复用的 WikiClient（可选）
 
     Returns:
         创建的页面信息，包含分批统计
@@ -472,155 +2248,3399 @@ async def create_wiki_page_with_chunks(
     if not title:
         raise ValueError("必须提供页面标题")
 
-    if not content:
-        raise ValueError("必须提供页面内容")
+    if not space_key:
+        raise ValueError("必须提供空间 key")
+
+    if client is None:
+        async with WikiClient(config) as owned:
+            return await create_wiki_page_from_file(
+                config, title, path, space_key, format,
+                parent_page_id, chunk_size, client=owned
+            )
+
+    if format == "markdown":
+        with open(path, 'r', encoding='utf-8') as f:
+            blocks = [markdown_to_storage(f.read())]
+    else:  # html
+        blocks = iter_text_file(path)
+
+    chunks = iter_storage_chunks(blocks, chunk_size)
+    return await _create_page_from_chunks(
+        config, title, chunks, space_key, parent_page_id, chunk_size, client
+    )
+
+
+# update --file --format html 覆盖写入超过该大小时流式发送请求体（不做内容去重）
+STREAM_UPDATE_BYTES = 1024 * 1024
+
+
+async def update_wiki_page_from_file(
+    config: WikiConfig,
+    page_id: str,
+    path: str,
+    title: Optional[str] = None,
+    client: Optional[WikiClient] = None
+) -> dict:
+    """用 HTML 文件覆盖页面内容（流式，内存占用与文件大小无关）
+
+    只探测版本号，不下载现有正文；PUT 请求体从文件逐块读取、转义后流式发送，
+    重试时重新打开文件。规范化比较需要完整内容，因此不做去重，每次都写入新版本。
+
+    Args:
+        config: Wiki 配置
+        page_id: 页面 ID
+        path: Storage Format HTML 文件路径
+        title: 新标题（如果为空则不修改标题）
+        client: 复用的 WikiClient（可选）
+
+    Returns:
+        更新后的页面信息
+    """
+    current_page = await get_wiki_page_version(config, page_id=page_id, client=client)
+    version = current_page["version"] + 1
+    payload = _build_update_payload(version, title or current_page["title"], _BODY_PLACEHOLDER)
+    sent = {"bytes": 0}
+    result = await _request_json(
+        "PUT", f"{config.base_url}/rest/api/content/{page_id}", config.get_auth_headers(),
+        PUT_ERRORS, client=client,
+        content=lambda: _stream_json_body(payload, iter_text_file(path, _BODY_BLOCK_SIZE), sent)
+    )
+    if result.get("status_code") == 409 and result.get("replayed"):
+        data = await _confirm_replayed_put(config, page_id, version, client)
+        if data is not None:
+            result = {"success": True, "data": data}
+    if not result["success"]:
+        raise RuntimeError(f"更新 Wiki 页面失败: {result['error']}")
+
+    updated = _parse_updated_page(config, result["data"])
+    updated["status"] = "written"
+    updated["bytes_sent"] = sent["bytes"]
+    return updated
+
+
+def _next_chunk(chunks: Iterator[str], batch: int) -> Optional[str]:
+    """取下一批内容（切分按需进行，耗时记入 chunk.split）"""
+    with trace_span("chunk.split", batch=batch) as attrs:
+        chunk = next(chunks, None)
+        attrs["chars"] = len(chunk) if chunk is not None else 0
+        return chunk
+
+
+async def _create_page_from_chunks(
+    config: WikiConfig,
+    title: str,
+    chunks: Iterator[str],
+    space_key: str,
+    parent_page_id: Optional[str],
+    chunk_size: int,
+    client: WikiClient
+) -> dict:
+    """用逐批生成的内容创建页面：只有一批时直接创建，否则首批创建、其余批次追加"""
+    first = _next_chunk(chunks, 1) or ""
+    second = _next_chunk(chunks, 2)
+
+    # 内容不超过限制，直接创建
+    if second is None:
+        result = await create_wiki_page(
+            config=config,
+            title=title,
+            content=first,
+            space_key=space_key,
+            format="html",  # 已经转换过了
+            parent_page_id=parent_page_id,
+            client=client
+        )
+        result["chunked"] = False
+        result["total_size"] = len(first.encode("utf-8"))
+        result["chunks"] = 1
+        return result
+
+    # 内容过长，分批处理
+    print(f"📦 内容超过限制 {chunk_size} 字节，将分批创建...")
+
+    uploader = ChunkUploader(config, title, space_key, parent_page_id, client=client)
+    try:
+        # 创建页面（使用第一批内容）
+        print(f"📝 创建页面（第 1 批，{len(first.encode('utf-8'))} 字节）...")
+        with trace_span("chunk.create", batch=1):
+            result = await uploader.create(first)
+
+        page_id = result["id"]
+        print(f"✅ 页面已创建，ID: {page_id}")
+
+        # 追加剩余内容（本地跟踪版本号，不回读页面）
+        i, chunk = 2, second
+        while chunk is not None:
+            print(f"📝 追加内容（第 {i} 批，{len(chunk.encode('utf-8'))} 字节）...")
+            with trace_span("chunk.append", batch=i):
+                batch = await uploader.append(chunk)
+            print(f"✅ 第 {i} 批已追加（发送 {batch['bytes_sent']} 字节，接收 {batch['bytes_received']} 字节）")
+            i += 1
+            chunk = _next_chunk(chunks, i)
+    finally:
+        uploader.close()
+
+    # 返回最终结果
+    total_size = uploader.total_bytes
+    chunk_count = len(uploader.batches)
+    print(f"🎉 所有内容已成功添加到页面")
+    result["version"] = uploader.version
+    result["chunked"] = True
+    result["total_size"] = total_size
+    result["chunks"] = chunk_count
+    result["batches"] = uploader.batches
+    result["bytes_sent"] = uploader.bytes_sent
+    result["bytes_received"] = uploader.bytes_received
+    result["message"] = f"页面已成功创建（分 {chunk_count} 批添加内容，总大小 {total_size} 字节），ID: {page_id}"
+
+    return result
+
+
+# ============================================================================
+# 追加队列
+# ============================================================================
+
+# 队列中待追加内容达到该字节数时立即发送（默认 WIKI_APPEND_FLUSH_BYTES）
+APPEND_FLUSH_BYTES = 64 * 1024
+# 追加内容在队列中最多等待的秒数（默认 WIKI_APPEND_FLUSH_DELAY）
+APPEND_FLUSH_DELAY = 10.0
+# 409 版本冲突时重新读取页面并重试的最大次数
+APPEND_REBASE_ATTEMPTS = 5
+
+
+@contextlib.contextmanager
+def _file_lock(path: str, blocking: bool = True) -> Iterator[bool]:
+    """跨进程文件锁（flock），非阻塞模式下锁已被占用时产出 False"""
+    import fcntl
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            yield False
+            return
+        yield True
+    finally:
+        os.close(fd)  # 关闭文件描述符即释放锁
+
+
+class AppendJournal:
+    """页面追加队列（本地日志）
+
+    高频追加（构建日志、进度记录）先写入本地队列，再合并为一次 PUT 发送，
+    避免每条记录都要 GET 整页、PUT 整页并产生一个新版本。多个进程可以同时
+    向同一页面的队列写入（文件锁保护）。
+
+    每个页面还记录上次成功写入后的版本、标题和正文（base）：下次发送直接
+    基于它 PUT，不必先 GET；页面被他人修改（409）时才重新读取版本和正文。
+
+    目录结构: <cache_dir>/journal/<base_url 摘要>/<page_id>.jsonl|.base.json|.lock
+    """
+
+    def __init__(self, config: WikiConfig, journal_dir: Optional[str] = None):
+        """
+        Args:
+            config: Wiki 配置（按 base_url 隔离不同 Wiki 的队列）
+            journal_dir: 队列根目录（默认 default_cache_dir()）
+        """
+        namespace = hashlib.sha1(config.base_url.encode("utf-8")).hexdigest()[:12]
+        self.root = os.path.join(journal_dir or default_cache_dir(), "journal", namespace)
+
+    def _path(self, page_id: str, suffix: str) -> str:
+        return os.path.join(self.root, f"{page_id}{suffix}")
+
+    def lock(self, page_id: str) -> contextlib.AbstractContextManager:
+        """队列文件锁（读写队列时短暂持有）"""
+        return _file_lock(self._path(page_id, ".lock"))
+
+    @contextlib.asynccontextmanager
+    async def flush_lock(self, page_id: str) -> AsyncIterator[None]:
+        """发送锁：同一页面同时只有一个发送者（轮询等待，不阻塞事件循环）"""
+        path = self._path(page_id, ".flush.lock")
+        while True:
+            with _file_lock(path, blocking=False) as acquired:
+                if acquired:
+                    yield
+                    return
+            await asyncio.sleep(0.05)
+
+    def waiter_lock(self, page_id: str) -> contextlib.AbstractContextManager:
+        """延迟发送进程锁：每个页面最多一个后台进程在等待发送"""
+        return _file_lock(self._path(page_id, ".waiter.lock"), blocking=False)
+
+    def add(self, page_id: str, content_html: str) -> dict:
+        """追加一条待发送内容，返回队列状态"""
+        line = json.dumps({"html": content_html, "at": time.time()}, ensure_ascii=False)
+        with self.lock(page_id):
+            with open(self._path(page_id, ".jsonl"), 'a', encoding='utf-8') as f:
+                f.write(line + "\n")
+            entries, _ = self._read(page_id)
+        return self._summary(entries)
+
+    def _read(self, page_id: str) -> tuple:
+        """读取队列（调用方持有队列锁），返回（条目列表，已读取的字节数）"""
+        try:
+            with open(self._path(page_id, ".jsonl"), 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return [], 0
+        # 只处理完整的行（写入中途崩溃留下的半行留待清理）
+        end = data.rfind(b"\n") + 1
+        entries = []
+        for line in data[:end].splitlines():
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue
+        return entries, end
+
+    @staticmethod
+    def _summary(entries: list) -> dict:
+        return {
+            "entries": len(entries),
+            "bytes": sum(len(e["html"].encode("utf-8")) for e in entries),
+            "oldest": min((e["at"] for e in entries), default=None)
+        }
+
+    def pending(self, page_id: str) -> tuple:
+        """待发送的条目和它们在队列文件中占用的字节数"""
+        with self.lock(page_id):
+            return self._read(page_id)
+
+    def status(self, page_id: str) -> dict:
+        return self._summary(self.pending(page_id)[0])
+
+    def pending_pages(self) -> list:
+        """有待发送内容的页面 ID"""
+        try:
+            names = os.listdir(self.root)
+        except FileNotFoundError:
+            return []
+        return sorted(
+            name[:-len(".jsonl")] for name in names
+            if name.endswith(".jsonl") and os.path.getsize(os.path.join(self.root, name)) > 0
+        )
+
+    def discard(self, page_id: str, size: int) -> None:
+        """删除已发送的前 size 字节（发送期间新加入的条目保留）"""
+        path = self._path(page_id, ".jsonl")
+        with self.lock(page_id):
+            with open(path, 'rb') as f:
+                f.seek(size)
+                rest = f.read()
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(rest)
+            os.replace(tmp_path, path)
+
+    def load_base(self, page_id: str) -> Optional[dict]:
+        try:
+            with open(self._path(page_id, ".base.json"), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save_base(self, page_id: str, version: int, title: str, content_html: str) -> None:
+        _write_json_atomic(self._path(page_id, ".base.json"),
+                           {"version": version, "title": title, "content": content_html})
+
+
+async def flush_appends(
+    config: WikiConfig,
+    page_id: str,
+    journal: Optional[AppendJournal] = None,
+    client: Optional[WikiClient] = None
+) -> dict:
+    """把页面追加队列中的所有内容合并为一次 PUT 发送
+
+    基于上次写入后记录的版本和正文直接 PUT；返回 409 时重新读取版本和正文
+    （变基）后重试。变基时如果页面正文已经以本批内容结尾（上次发送成功但
+    响应丢失或未及清理队列），视为已发送，不会重复追加（status 为 skipped，bytes 为 0）。
+
+    Returns:
+        {"id", "status": "written" | "skipped" | "empty", "entries", "bytes", "rebases",
+         "version", ...}
+    """
+    journal = journal or AppendJournal(config)
+    async with journal.flush_lock(page_id):
+        entries, size = journal.pending(page_id)
+        if not entries:
+            return {"id": page_id, "status": "empty", "entries": 0, "bytes": 0, "rebases": 0}
+
+        addition = "\n".join(entry["html"] for entry in entries)
+        url = f"{config.base_url}/rest/api/content/{page_id}"
+        headers = config.get_auth_headers()
+        base = journal.load_base(page_id)
+        rebases = 0
+        result = None
+
+        for attempt in range(APPEND_REBASE_ATTEMPTS + 1):
+            if base is None:
+                page = await get_wiki_page_content(
+                    config, page_id=page_id, format="storage", client=client,
+                    fields=("content", "version")
+                )
+                base = {"version": page["version"], "title": page["title"],
+                        "content": page["content"]}
+                if rebases and normalize_storage(page["content"]).endswith(normalize_storage(addition)):
+                    result = {**_skipped_result(page), "message": f"内容已在页面中（版本 {page['version']}）"}
+                    body = page["content"]
+                    break
+
+            body = base["content"] + "\n" + addition
+            with trace_span("append.flush", entries=len(entries), attempt=attempt):
+                response = await put_json(
+                    url, headers, _build_update_payload(base["version"] + 1, base["title"], body),
+                    client=client
+                )
+            if response["success"]:
+                result = _parse_updated_page(config, response["data"])
+                result["status"] = "written"
+                break
+            if response.get("status_code") != 409 or attempt == APPEND_REBASE_ATTEMPTS:
+                raise RuntimeError(f"追加内容失败: {response['error']}")
+            # 页面已被他人修改：重新读取版本和正文后重试（随机退避，错开并发写入者）
+            rebases += 1
+            base = None
+            await asyncio.sleep(random.uniform(0, 0.1 * (2 ** attempt)))
+
+        journal.discard(page_id, size)
+        journal.save_base(page_id, result["version"], result["title"], body)
+
+    result.update({
+        "entries": len(entries),
+        "bytes": len(addition.encode("utf-8")) if result["status"] == "written" else 0,
+        "rebases": rebases
+    })
+    return result
+
+
+async def queue_append(
+    config: WikiConfig,
+    page_id: str,
+    content: str,
+    format: str = "markdown",
+    journal: Optional[AppendJournal] = None,
+    client: Optional[WikiClient] = None,
+    flush_bytes: Optional[int] = None,
+    flush_delay: Optional[float] = None
+) -> dict:
+    """把内容加入页面追加队列，达到大小或时间阈值时立即发送
+
+    Args:
+        config: Wiki 配置
+        page_id: 页面 ID
+        content: 追加内容
+        format: 'markdown'（默认）或 'html'
+        journal: 追加队列（可选）
+        client: 复用的 WikiClient（可选）
+        flush_bytes: 待发送内容达到该字节数时立即发送（默认 WIKI_APPEND_FLUSH_BYTES 或 64KB）
+        flush_delay: 最早的待发送内容等待超过该秒数时立即发送
+            （默认 WIKI_APPEND_FLUSH_DELAY 或 10，0 表示每次都发送）
+
+    Returns:
+        已发送时同 flush_appends；否则为 {"id", "status": "queued", "entries", "bytes", "oldest"}
+    """
+    journal = journal or AppendJournal(config)
+    if flush_bytes is None:
+        flush_bytes = int(os.getenv("WIKI_APPEND_FLUSH_BYTES", APPEND_FLUSH_BYTES))
+    if flush_delay is None:
+        flush_delay = float(os.getenv("WIKI_APPEND_FLUSH_DELAY", APPEND_FLUSH_DELAY))
+
+    content_html = markdown_to_storage(content) if format == "markdown" else content
+    status = journal.add(page_id, content_html)
+    if status["bytes"] >= flush_bytes or time.time() - status["oldest"] >= flush_delay:
+        return await flush_appends(config, page_id, journal, client)
+    return {"id": page_id, "status": "queued", **status}
+
+
+# ============================================================================
+# 分页列表与页面树导出
+# ============================================================================
+
+async def iter_paginated(
+    config: WikiConfig,
+    url: str,
+    params: Optional[dict] = None,
+    client: Optional[WikiClient] = None,
+    limit: int = 100,
+    prefetch: bool = False
+) -> AsyncIterator[dict]:
+    """遍历 Confluence 分页列表接口（start/limit + _links.next），逐条产出结果
+
+    prefetch=True 时产出当前页结果之前就发出下一页请求，调用方处理当前页
+    （例如并发获取正文）的同时下一页已在传输。
+    """
+    headers = config.get_auth_headers()
+
+    def fetch_page(start: int):
+        page_params = dict(params or {}, start=start, limit=limit)
+        return fetch_json(url, headers, page_params, client=client)
+
+    start = 0
+    next_page = None
+    try:
+        result = await fetch_page(start)
+        while True:
+            if not result["success"]:
+                raise RuntimeError(result["error"])
+
+            data = result["data"]
+            results = data.get("results", [])
+            has_next = bool(results) and bool(data.get("_links", {}).get("next"))
+            start += len(results)
+            if has_next and prefetch:
+                next_page = asyncio.ensure_future(fetch_page(start))
+
+            for item in results:
+                yield item
+
+            if not has_next:
+                break
+            if next_page is not None:
+                result, next_page = await next_page, None
+            else:
+                result = await fetch_page(start)
+    finally:
+        # 调用方提前结束遍历时取消预取的请求
+        if next_page is not None:
+            next_page.cancel()
+
+
+async def list_child_pages(
+    config: WikiConfig,
+    page_id: str,
+    client: Optional[WikiClient] = None
+) -> list:
+    """列出页面的所有直接子页面（自动翻页，包含 version 信息）"""
+    url = f"{config.base_url}/rest/api/content/{page_id}/child/page"
+    return [
+        item async for item in iter_paginated(
+            config, url, {"expand": "version"}, client=client
+        )
+    ]
+
+
+async def list_space_root_pages(
+    config: WikiConfig,
+    space_key: str,
+    client: Optional[WikiClient] = None
+) -> list:
+    """列出空间的所有顶级页面（自动翻页，包含 version 信息）"""
+    url = f"{config.base_url}/rest/api/space/{space_key}/content/page"
+    return [
+        item async for item in iter_paginated(
+            config, url, {"depth": "root", "expand": "version"}, client=client
+        )
+    ]
+
+
+def _safe_filename(title: str, fallback: str) -> str:
+    """把页面标题转换为安全的文件名"""
+    name = re.sub(r'[\\/:*?"<>|\x00-\x1f]', '_', title).strip().strip('.')
+    return name[:100] or fallback
+
+
+def _assign_child_dirs(parent_dir: str, children: list) -> dict:
+    """为一组兄弟页面分配相对目录路径，标题重名时追加页面 ID"""
+    names = {}
+    for child in children:
+        name = _safe_filename(child["title"], child["id"])
+        names.setdefault(name.lower(), []).append(child)
+
+    paths = {}
+    for group in names.values():
+        for child in group:
+            name = _safe_filename(child["title"], child["id"])
+            if len(group) > 1:
+                name = f"{name}_{child['id']}"
+            paths[child["id"]] = os.path.join(parent_dir, name) if parent_dir else name
+    return paths
+
+
+class ExportManifest:
+    """导出清单（manifest.json）
+
+    记录导出根、所在空间、格式以及每个页面的 id、标题、版本、父页面和相对路径，
+    用于断点续传和增量同步。页面文件为 <path>.<ext>，子页面位于 <path>/ 目录下。
+    """
+
+    FILENAME = "manifest.json"
+
+    def __init__(self, output_dir: str):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, self.FILENAME)
+        self.data = {"root": {}, "format": "markdown", "pages": {}}
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.data = json.load(f)
+
+    @property
+    def pages(self) -> dict:
+        return self.data["pages"]
+
+    @property
+    def extension(self) -> str:
+        return "md" if self.data.get("format") == "markdown" else "html"
+
+    def file_path(self, rel_path: str) -> str:
+        """页面相对路径对应的本地文件"""
+        return os.path.join(self.output_dir, f"{rel_path}.{self.extension}")
+
+    def save(self) -> None:
+        _write_json_atomic(self.path, self.data)
+
+
+def _relocate_page_file(manifest: ExportManifest, page_id: str, new_path: str) -> bool:
+    """页面路径变化（改名或移动）时移动本地文件，返回是否发生了移动"""
+    entry = manifest.pages.get(page_id)
+    if not entry or entry.get("path") == new_path:
+        return False
+    old_file = manifest.file_path(entry["path"])
+    if os.path.exists(old_file):
+        new_file = manifest.file_path(new_path)
+        os.makedirs(os.path.dirname(new_file), exist_ok=True)
+        os.replace(old_file, new_file)
+    entry["path"] = new_path
+    return True
+
+
+def _remove_page_file(manifest: ExportManifest, page_id: str) -> None:
+    """删除页面的本地文件并从清单中移除，顺带清理空目录"""
+    entry = manifest.pages.pop(page_id, None)
+    if not entry:
+        return
+    file_path = manifest.file_path(entry["path"])
+    if os.path.exists(file_path):
+        os.remove(file_path)
+    directory = os.path.dirname(file_path)
+    while directory and os.path.abspath(directory) != os.path.abspath(manifest.output_dir):
+        try:
+            os.rmdir(directory)
+        except OSError:
+            break
+        directory = os.path.dirname(directory)
+
+
+async def _download_page_file(
+    config: WikiConfig,
+    manifest: ExportManifest,
+    page_id: str,
+    semaphore: asyncio.Semaphore,
+    stats: dict,
+    client: Optional[WikiClient]
+) -> None:
+    """下载页面正文写入清单中记录的路径，并更新清单版本号"""
+    entry = manifest.pages[page_id]
+    async with semaphore:
+        page = await get_wiki_page_content(
+            config, page_id=page_id, format=manifest.data["format"], client=client,
+            fields=("content", "version")
+        )
+    file_path = manifest.file_path(entry["path"])
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, 'w', encoding='utf-8') as f:
+        f.write(page["content"])
+    entry["version"] = page["version"]
+    stats["fetched"] += 1
+    print(f"📥 [{stats['fetched']}] {entry['path']}", file=sys.stderr)
+    if stats["fetched"] % 50 == 0:
+        manifest.save()
+
+
+def _rebuild_paths(manifest: ExportManifest) -> dict:
+    """根据清单中的父子关系重新计算所有页面的相对路径"""
+    children = {}
+    for page_id, entry in manifest.pages.items():
+        parent = entry.get("parent")
+        if parent not in manifest.pages:
+            parent = None
+        children.setdefault(parent, []).append({"id": page_id, "title": entry["title"]})
+
+    paths = {}
+    stack = [(None, "")]
+    while stack:
+        parent, parent_path = stack.pop()
+        for page_id, path in _assign_child_dirs(parent_path, children.get(parent, [])).items():
+            paths[page_id] = path
+            stack.append((page_id, path))
+    return paths
+
+
+def _prune_empty_dirs(root: str) -> None:
+    """删除导出目录下因页面移动或删除而留下的空目录"""
+    for dirpath, _, _ in sorted(os.walk(root), key=lambda item: -len(item[0])):
+        if os.path.abspath(dirpath) != os.path.abspath(root):
+            try:
+                os.rmdir(dirpath)
+            except OSError:
+                pass
+
+
+async def export_page_tree(
+    config: WikiConfig,
+    output_dir: str,
+    root_page_id: Optional[str] = None,
+    space_key: Optional[str] = None,
+    format: str = "markdown",
+    concurrency: int = 8,
+    client: Optional[WikiClient] = None
+) -> dict:
+    """把页面树（或整个空间）导出为本地目录
+
+    从根页面（或空间的所有顶级页面）开始分页遍历子页面，并发下载正文，
+    写出镜像目录结构和 manifest.json。清单中版本未变且文件存在的页面不会
+    重新下载，因此中断后重新运行即可续传；标题或位置变化的页面会移动本地文件，
+    服务端已不存在的页面会被删除。
+
+    Args:
+        config: Wiki 配置
+        output_dir: 导出目录
+        root_page_id: 根页面 ID（与 space_key 二选一）
+        space_key: 空间 key，导出该空间下的所有页面
+        format: 文件格式，'markdown'（默认）或 'storage'
+        concurrency: 最大并发请求数
+        client: 复用的 WikiClient（可选）
+
+    Returns:
+        导出统计
+    """
+    if not root_page_id and not space_key:
+        raise ValueError("必须提供 root_page_id 或 space_key")
+
+    if client is None:
+        async with WikiClient(config) as owned:
+            return await export_page_tree(config, output_dir, root_page_id, space_key,
+                                          format, concurrency, client=owned)
+
+    manifest = ExportManifest(output_dir)
+    root = {"page_id": root_page_id} if root_page_id else {"space": space_key}
+    if manifest.pages and (manifest.data.get("root") != root
+                           or manifest.data.get("format") != format):
+        raise ValueError(f"{output_dir} 已包含其他根页面或格式的导出，请换一个目录")
+    manifest.data["root"] = root
+    manifest.data["format"] = format
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    stats = {"pages": 0, "fetched": 0, "skipped": 0, "moved": 0, "removed": 0}
+    seen = set()
+    latest = None   # 遍历到的最新修改时间（服务端时间），作为同步水位线
+
+    async def fetch_body(page_id: str) -> None:
+        await _download_page_file(config, manifest, page_id, semaphore, stats, client)
+
+    async def visit(node: dict, parent_id: Optional[str], path: str) -> None:
+        nonlocal latest
+        page_id = node["id"]
+        version = node.get("version", {}).get("number", 0)
+        latest = _later_when(latest, node.get("version", {}).get("when"))
+        seen.add(page_id)
+        stats["pages"] += 1
+
+        entry = manifest.pages.get(page_id)
+        if entry is not None and _relocate_page_file(manifest, page_id, path):
+            stats["moved"] += 1
+        up_to_date = (entry is not None and entry.get("version") == version
+                      and os.path.exists(manifest.file_path(path)))
+        if entry is None:
+            entry = manifest.pages[page_id] = {"version": 0}
+        entry.update({"title": node["title"], "parent": parent_id, "path": path})
+
+        jobs = []
+        if up_to_date:
+            stats["skipped"] += 1
+        else:
+            jobs.append(fetch_body(page_id))
+
+        async with semaphore:
+            children = await list_child_pages(config, page_id, client=client)
+        child_paths = _assign_child_dirs(path, children)
+        jobs.extend(visit(child, page_id, child_paths[child["id"]]) for child in children)
+        await asyncio.gather(*jobs)
+
+    try:
+        if root_page_id:
+            async with semaphore:
+                root_node = await fetch_json(
+                    f"{config.base_url}/rest/api/content/{root_page_id}",
+                    config.get_auth_headers(), {"expand": "version,space"}, client=client
+                )
+            if not root_node["success"]:
+                raise RuntimeError(root_node["error"])
+            roots = [root_node["data"]]
+            # 页面树不会跨空间，记录根页面所在空间（建立索引等离线操作使用）
+            manifest.data["space"] = roots[0].get("space", {}).get("key", "")
+        else:
+            roots = await list_space_root_pages(config, space_key, client=client)
+            manifest.data["space"] = space_key
+
+        root_paths = _assign_child_dirs("", roots)
+        await asyncio.gather(*(visit(node, None, root_paths[node["id"]]) for node in roots))
+
+        # 完整遍历结束后，删除服务端已不存在的页面
+        for page_id in [pid for pid in manifest.pages if pid not in seen]:
+            _remove_page_file(manifest, page_id)
+            stats["removed"] += 1
+        _prune_empty_dirs(output_dir)
+
+        # 完整导出成功后记录水位线，供增量同步使用
+        manifest.data["watermark"] = latest
+    finally:
+        manifest.data["exported_at"] = time.strftime("%Y-%m-%dT%H:%M:%S%z")
+        manifest.save()
+
+    stats["manifest"] = manifest.path
+    return stats
+
+
+# 同步查询 lastmodified 时向前多看的秒数（CQL 只精确到分钟，并覆盖列表期间发生的修改）
+SYNC_WATERMARK_MARGIN = 600
+
+
+def _parse_when(when: str):
+    """解析服务端返回的 ISO 8601 时间（version.when）"""
+    from datetime import datetime
+
+    return datetime.fromisoformat(when.replace("Z", "+00:00"))
+
+
+def _later_when(current: Optional[str], when: Optional[str]) -> Optional[str]:
+    """两个服务端时间中较晚的一个（任一为空时返回另一个）"""
+    if not when:
+        return current
+    if not current:
+        return when
+    return max(current, when, key=_parse_when)
+
+
+def _watermark_cql(watermark: str) -> str:
+    """水位线对应的 CQL 条件
+
+    水位线是服务端返回的修改时间，按它自带的时区（服务器时区）格式化，
+    不使用本机时钟和时区；向前多看 SYNC_WATERMARK_MARGIN 秒。
+    """
+    from datetime import timedelta
+
+    since = _parse_when(watermark) - timedelta(seconds=SYNC_WATERMARK_MARGIN)
+    return f'lastmodified > "{since:%Y/%m/%d %H:%M}"'
+
+
+def iter_cql_search(
+    config: WikiConfig,
+    cql: str,
+    expand: Optional[str] = None,
+    client: Optional[WikiClient] = None,
+    limit: int = 100,
+    prefetch: bool = False
+) -> AsyncIterator[dict]:
+    """执行 CQL 搜索（/rest/api/content/search），自动翻页逐条产出结果"""
+    params = {"cql": cql}
+    if expand:
+        params["expand"] = expand
+    url = f"{config.base_url}/rest/api/content/search"
+    return iter_paginated(config, url, params, client=client, limit=limit, prefetch=prefetch)
+
+
+async def search_wiki_pages(
+    config: WikiConfig,
+    cql: str,
+    format: str = "markdown",
+    with_content: bool = False,
+    concurrency: int = 8,
+    client: Optional[WikiClient] = None,
+    fields: Optional[Iterable[str]] = None,
+    cache: Optional[PageCache] = None,
+    converter: Optional[ConversionPool] = None,
+    max_results: Optional[int] = None,
+    batch_size: int = 100,
+    known_versions: Optional[dict] = None
+) -> AsyncIterator[dict]:
+    """CQL 搜索页面，边翻页边产出结果，可并发获取正文
+
+    搜索结果分页预取：处理当前页时下一页请求已经发出。with_content=True 时
+    每个命中页面的正文在后台并发获取（最多 concurrency 个），按完成顺序产出；
+    搜索结果带有版本号，缓存中已有该版本时直接使用，无需再探测版本。
+
+    Args:
+        config: Wiki 配置
+        cql: CQL 查询语句
+        format: 正文格式，同 get_wiki_page_content
+        with_content: 是否获取正文（否则只产出搜索结果中的元数据）
+        concurrency: 获取正文的最大并发数
+        client: 复用的 WikiClient（可选，未提供时创建一个供所有请求共享）
+        fields: 获取正文时需要返回的字段，同 get_wiki_page_content（默认全部）
+        cache: 页面磁盘缓存（可选）
+        converter: HTML -> Markdown 转换池（可选）
+        max_results: 最多产出的结果数（默认不限）
+        batch_size: 每次搜索请求返回的结果数
+        known_versions: 调用方已有的 {页面 ID: 版本号}（可选）。版本相同的页面
+            不获取正文，直接产出带 "unchanged": True 的搜索结果
+
+    Yields:
+        页面信息字典；单个页面获取失败时产出 {"id": ..., "title": ..., "error": ...}
+    """
+    if client is None:
+        async with WikiClient(config) as owned:
+            async for page in search_wiki_pages(config, cql, format, with_content, concurrency,
+                                                owned, fields, cache, converter,
+                                                max_results, batch_size, known_versions):
+                yield page
+        return
+
+    fields = PAGE_FIELDS if fields is None else tuple(fields)
+
+    def parse_hit(item: dict) -> dict:
+        hit = {
+            "id": item["id"],
+            "title": item["title"],
+            "url": f"{config.base_url}/pages/viewpage.action?pageId={item['id']}",
+            "space": item.get("space", {}).get("key", ""),
+        }
+        hit.update(_parse_version_info(item))
+        return hit
+
+    async def fetch(hit: dict) -> dict:
+        try:
+            if cache is not None and "content" in fields:
+                cached = cache.get(hit["id"], hit["version"], format)
+                if cached is not None:
+                    cached.update(hit)
+                    page = _project_page(cached, fields)
+                    page["cache"] = "hit"
+                    return page
+                page = await get_wiki_page_content(
+                    config, page_id=hit["id"], format=format, client=client,
+                    converter=converter
+                )
+                cache.put(page["id"], page["version"], format, page)
+                page = _project_page(page, fields)
+                page["cache"] = "miss"
+                return page
+            return await get_wiki_page_content(
+                config, page_id=hit["id"], format=format, client=client,
+                fields=fields, converter=converter
+            )
+        except Exception as e:
+            return {"id": hit["id"], "title": hit["title"], "error": str(e)}
+
+    hits = iter_cql_search(config, cql, expand="space,version", client=client,
+                           limit=batch_size, prefetch=True)
+    pending = set()
+    count = 0
+    try:
+        async for item in hits:
+            if max_results is not None and count >= max_results:
+                break
+            count += 1
+            hit = parse_hit(item)
+            if not with_content:
+                yield hit
+                continue
+            if known_versions is not None and known_versions.get(hit["id"]) == hit["version"]:
+                hit["unchanged"] = True
+                yield hit
+                continue
+
+            if len(pending) >= max(1, concurrency):
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+            pending.add(asyncio.ensure_future(fetch(hit)))
+
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        await hits.aclose()
+        for task in pending:
+            task.cancel()
+
+
+async def sync_page_tree(
+    config: WikiConfig,
+    output_dir: str,
+    concurrency: int = 8,
+    full: bool = False,
+    prune: bool = True,
+    client: Optional[WikiClient] = None
+) -> dict:
+    """基于 lastmodified 水位线增量同步 export 生成的本地镜像
+
+    水位线是上次导出/同步时见到的最新 version.when（服务端时间），因此与本机时钟
+    和时区无关。用 CQL 查询上次同步以来修改过的页面，只重新下载版本号变化的页面，
+    原地更新文件和清单；标题或父页面变化时移动本地文件（包括其子孙页面）。
+    prune=True 时额外列出范围内所有页面 ID（不展开任何字段），删除服务端
+    已不存在或已移出范围的页面。
+
+    Args:
+        config: Wiki 配置
+        output_dir: export 生成的目录（必须包含 manifest.json）
+        concurrency: 最大并发请求数
+        full: 忽略水位线，检查范围内所有页面的版本（仍只下载有变化的页面）
+        prune: 是否处理删除
+        client: 复用的 WikiClient（可选）
+
+    Returns:
+        同步统计
+    """
+    if client is None:
+        async with WikiClient(config) as owned:
+            return await sync_page_tree(config, output_dir, concurrency, full, prune,
+                                        client=owned)
+
+    manifest = ExportManifest(output_dir)
+    if not manifest.pages:
+        raise ValueError(f"{output_dir} 中没有导出清单，请先运行 export")
+
+    root = manifest.data["root"]
+    root_page_id = root.get("page_id")
+    if root_page_id:
+        scope = f"(id = {root_page_id} or ancestor = {root_page_id}) and type = page"
+    else:
+        scope = f'space = "{root["space"]}" and type = page'
+
+    # 旧版清单的水位线是本机时间戳，无法换算为服务器时间，按 full 处理一次
+    watermark = manifest.data.get("watermark")
+    if not isinstance(watermark, str):
+        watermark = None
+    cql = scope
+    if watermark and not full:
+        cql += f" and {_watermark_cql(watermark)}"
+    latest = watermark
+
+    stats = {"changed": 0, "added": 0, "fetched": 0, "moved": 0, "removed": 0}
+
+    # 1. 查询修改过的页面，更新标题和父页面
+    to_fetch = []
+    async for item in iter_cql_search(config, cql, expand="version,ancestors", client=client):
+        page_id = item["id"]
+        ancestors = item.get("ancestors") or []
+        parent = ancestors[-1]["id"] if ancestors and page_id != root_page_id else None
+        version = item.get("version", {}).get("number", 0)
+        latest = _later_when(latest, item.get("version", {}).get("when"))
+
+        entry = manifest.pages.get(page_id)
+        if entry is None:
+            entry = manifest.pages[page_id] = {"version": 0, "path": None}
+            stats["added"] += 1
+        entry["title"] = item["title"]
+        entry["parent"] = parent
+        if entry["version"] != version:
+            stats["changed"] += 1
+            to_fetch.append(page_id)
+
+    # 2. 处理删除（以及移出范围的页面）
+    if prune:
+        alive = {item["id"] async for item in iter_cql_search(config, scope, client=client)}
+        for page_id in [pid for pid in manifest.pages if pid not in alive]:
+            _remove_page_file(manifest, page_id)
+            stats["removed"] += 1
+        to_fetch = [pid for pid in to_fetch if pid in manifest.pages]
+
+    # 3. 标题或父页面变化时移动本地文件（子孙页面随之移动）
+    for page_id, path in _rebuild_paths(manifest).items():
+        entry = manifest.pages[page_id]
+        if entry.get("path") is None:
+            entry["path"] = path
+        elif _relocate_page_file(manifest, page_id, path):
+            stats["moved"] += 1
+    _prune_empty_dirs(output_dir)
+
+    # 4. 并发下载版本变化的页面
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    try:
+        await asyncio.gather(*(
+            _download_page_file(config, manifest, page_id, semaphore, stats, client)
+            for page_id in to_fetch
+        ))
+        manifest.data["watermark"] = latest
+    finally:
+        manifest.data["synced_at"] = time.strftime("%Y-%m-%dT%H:%M:%S%z")
+        manifest.save()
+
+    stats["pages"] = len(manifest.pages)
+    stats["manifest"] = manifest.path
+    return stats
+
+
+# ============================================================================
+# 本地目录发布
+# ============================================================================
+
+# 可发布的文件扩展名及其内容格式
+PUSH_EXTENSIONS = {".md": "markdown", ".markdown": "markdown", ".html": "html", ".htm": "html"}
+# 目录页正文文件名（不含扩展名）
+PUSH_INDEX_NAMES = ("index", "README")
+# 没有正文文件的目录页使用的占位内容：列出子页面
+PUSH_PLACEHOLDER = '<ac:structured-macro ac:name="children" />'
+
+
+def _push_source_file(directory: str, stem: str) -> Optional[str]:
+    """在目录中查找指定文件名（任意可发布扩展名）的文件"""
+    found = [
+        os.path.join(directory, stem + ext) for ext in PUSH_EXTENSIONS
+        if os.path.isfile(os.path.join(directory, stem + ext))
+    ]
+    if len(found) > 1:
+        raise ValueError(f"同一页面存在多个源文件: {', '.join(found)}")
+    return found[0] if found else None
+
+
+def scan_push_tree(source_dir: str, title_prefix: str = "") -> list:
+    """扫描本地目录，构造待发布的页面树
+
+    映射规则：
+    - foo.md / foo.html -> 标题为 title_prefix + foo 的页面
+    - 子目录 foo/ -> 标题为 title_prefix + foo 的页面，其下文件为子页面；正文取
+      foo/index.md、foo/README.md 或同级的 foo.md，都没有时使用子页面列表占位
+    - 以 . 开头的文件和目录会被忽略
+
+    Confluence 要求同一空间内标题唯一，不同目录下的同名文件会映射为同一标题，
+    扫描时发现即报错（不会发布任何页面）。
+
+    Returns:
+        根节点列表，每个节点为 {"title", "file", "rel", "children"}
+    """
+    def scan(directory: str, rel_dir: str) -> list:
+        entries = sorted(e for e in os.listdir(directory) if not e.startswith("."))
+        dirs = {e for e in entries if os.path.isdir(os.path.join(directory, e))}
+        nodes = {}
+
+        for name in entries:
+            stem, ext = os.path.splitext(name)
+            if name in dirs or ext.lower() not in PUSH_EXTENSIONS:
+                continue
+            if rel_dir and stem in PUSH_INDEX_NAMES:
+                continue  # 目录页正文，由上一层处理
+            if stem in nodes:
+                raise ValueError(f"同一页面存在多个源文件: {os.path.join(rel_dir, stem)}.*")
+            nodes[stem] = {
+                "title": title_prefix + stem,
+                "file": os.path.join(directory, name),
+                "rel": os.path.join(rel_dir, name),
+                "children": [],
+            }
+
+        for name in sorted(dirs):
+            sub_dir = os.path.join(directory, name)
+            sub_rel = os.path.join(rel_dir, name)
+            index_files = [f for f in (_push_source_file(sub_dir, stem) for stem in PUSH_INDEX_NAMES) if f]
+            node = nodes.get(name)
+            if node is None:
+                node = nodes[name] = {"title": title_prefix + name, "file": None, "rel": sub_rel,
+                                      "children": []}
+            if index_files:
+                if node["file"] or len(index_files) > 1:
+                    raise ValueError(f"目录页 {sub_rel} 存在多个正文文件")
+                node["file"] = index_files[0]
+            node["children"] = scan(sub_dir, sub_rel)
+
+        return [nodes[key] for key in sorted(nodes)]
+
+    if not os.path.isdir(source_dir):
+        raise ValueError(f"目录不存在: {source_dir}")
+    roots = scan(source_dir, "")
+
+    paths = collections.defaultdict(list)
+    stack = list(roots)
+    while stack:
+        node = stack.pop()
+        paths[node["title"]].append(node["rel"])
+        stack.extend(node["children"])
+    duplicates = sorted((title, sorted(rels)) for title, rels in paths.items() if len(rels) > 1)
+    if duplicates:
+        detail = "; ".join(f"{title}: {', '.join(rels)}" for title, rels in duplicates)
+        raise ValueError(f"同一空间内页面标题必须唯一，以下文件映射为相同标题"
+                         f"（请重命名或使用 --title-prefix）: {detail}")
+    return roots
+
+
+def _load_push_contents(roots: list) -> None:
+    """读取所有源文件并写入节点的 html 字段（目录页没有正文时为 None）
+
+    Markdown 文件通过 convert_many 批量转换，文件较多时使用进程池并行。
+    """
+    nodes, stack = [], list(roots)
+    while stack:
+        node = stack.pop()
+        nodes.append(node)
+        stack.extend(node["children"])
+
+    markdown_nodes, texts = [], []
+    for node in nodes:
+        node["html"] = None
+        if not node["file"]:
+            continue
+        with open(node["file"], 'r', encoding='utf-8') as f:
+            content = f.read()
+        if PUSH_EXTENSIONS[os.path.splitext(node["file"])[1].lower()] == "markdown":
+            markdown_nodes.append(node)
+            texts.append(content)
+        else:
+            node["html"] = content
+
+    if texts:
+        for node, html in zip(markdown_nodes, get_markdown_converter().convert_many(texts)):
+            node["html"] = html
+
+
+async def push_directory(
+    config: WikiConfig,
+    source_dir: str,
+    parent_page_id: str,
+    concurrency: int = 8,
+    hash_manifest: Optional[HashManifest] = None,
+    title_prefix: str = "",
+    client: Optional[WikiClient] = None
+) -> dict:
+    """把本地 Markdown/HTML 目录发布为父页面下的页面树
+
+    按标题匹配父页面下已有的子页面：存在则更新（内容未变化时跳过），不存在则创建。
+    页面之间按依赖关系调度：父页面就绪（拿到 ID）后立即开始处理其子页面，
+    互不依赖的子树并行上传，总并发受 concurrency 限制。某个页面失败时只跳过
+    它的子树，其余页面继续发布。
+
+    Args:
+        config: Wiki 配置
+        source_dir: 本地源目录
+        parent_page_id: 发布到的父页面 ID
+        concurrency: 最大并发请求数
+        hash_manifest: 内容哈希清单（可选，调用方负责 save()）
+        title_prefix: 所有页面标题的前缀（同一目录发布到同一空间的不同位置时使用）
+        client: 复用的 WikiClient（可选）
+
+    Returns:
+        发布统计，pages 为每个页面的结果列表（按源文件路径排序）
+    """
+    if client is None:
+        async with WikiClient(config) as owned:
+            return await push_directory(config, source_dir, parent_page_id, concurrency,
+                                        hash_manifest, title_prefix, client=owned)
+
+    roots = scan_push_tree(source_dir, title_prefix)
+    await asyncio.to_thread(_load_push_contents, roots)
+    parent = await get_wiki_page_content(
+        config, page_id=parent_page_id, client=client, fields=("space",)
+    )
+    space_key = parent["space"]
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    stats = {"created": 0, "updated": 0, "skipped": 0, "failed": 0, "blocked": 0}
+    pages = []
+
+    async def existing_children(page_id: str) -> dict:
+        async with semaphore:
+            children = await list_child_pages(config, page_id, client=client)
+        return {child["title"]: child for child in children}
+
+    def block_subtree(node: dict) -> None:
+        for child in node["children"]:
+            stats["blocked"] += 1
+            pages.append({"path": child["rel"], "title": child["title"], "status": "blocked"})
+            block_subtree(child)
+
+    async def publish(node: dict, parent_id: str, siblings: dict) -> None:
+        record = {"path": node["rel"], "title": node["title"]}
+        pages.append(record)
+        try:
+            content_html = node["html"]
+            existing = siblings.get(node["title"])
+            if existing is None:
+                async with semaphore:
+                    result = await create_wiki_page(
+                        config, node["title"], content_html or PUSH_PLACEHOLDER, space_key,
+                        format="html", parent_page_id=parent_id, client=client
+                    )
+                if content_html and hash_manifest is not None:
+                    hash_manifest.record(result["id"], content_hash(content_html),
+                                         result["title"], result["version"])
+                status = "created"
+                children = {}
+            else:
+                result = {"id": existing["id"], "version": existing.get("version", {}).get("number", 0)}
+                status = "skipped"
+                if content_html:
+                    async with semaphore:
+                        result = await update_wiki_page_content(
+                            config, existing["id"], content=content_html, format="html",
+                            client=client, hash_manifest=hash_manifest
+                        )
+                    status = "updated" if result["status"] == "written" else "skipped"
+                children = await existing_children(existing["id"]) if node["children"] else {}
+        except Exception as e:
+            stats["failed"] += 1
+            record.update({"status": "failed", "error": str(e)})
+            block_subtree(node)
+            return
+
+        stats[status] += 1
+        record.update({"id": result["id"], "version": result["version"], "status": status})
+        await asyncio.gather(*(publish(child, result["id"], children) for child in node["children"]))
+
+    siblings = await existing_children(parent_page_id)
+    await asyncio.gather(*(publish(node, parent_page_id, siblings) for node in roots))
+
+    pages.sort(key=lambda p: p["path"])
+    stats["pages"] = pages
+    return stats
+
+
+# ============================================================================
+# 附件
+# ============================================================================
+
+# 记录已同步附件的状态文件（位于附件所在目录，用于跳过未变化的文件）
+ATTACHMENT_STATE_FILE = ".wiki-attachments.json"
+
+# 流式下载/上传的块大小
+ATTACHMENT_CHUNK_SIZE = 64 * 1024
+
+
+def _parse_attachment(config: WikiConfig, data: dict) -> dict:
+    """解析附件 JSON"""
+    return {
+        "id": data["id"],
+        "filename": data.get("title", ""),
+        "size": data.get("extensions", {}).get("fileSize", 0),
+        "media_type": data.get("extensions", {}).get("mediaType", ""),
+        "version": data.get("version", {}).get("number", 0),
+        "url": f"{config.base_url}{data.get('_links', {}).get('download', '')}"
+    }
+
+
+async def list_attachments(
+    config: WikiConfig,
+    page_id: str,
+    client: Optional[WikiClient] = None
+) -> list:
+    """列出页面的所有附件（自动翻页，包含版本号和文件大小）"""
+    url = f"{config.base_url}/rest/api/content/{page_id}/child/attachment"
+    return [
+        _parse_attachment(config, item) async for item in iter_paginated(
+            config, url, {"expand": "version"}, client=client
+        )
+    ]
+
+
+class AttachmentState:
+    """目录内附件的同步状态
+
+    记录每个文件最近一次下载/上传时的附件 ID、版本号、大小、修改时间和
+    SHA-256。版本号和本地文件（大小 + 修改时间）都未变化时跳过传输。
+    """
+
+    def __init__(self, directory: str, page_id: str):
+        self.path = os.path.join(directory, ATTACHMENT_STATE_FILE)
+        self.page_id = str(page_id)
+        self.files = {}
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("page_id") == self.page_id:
+                self.files = data.get("files", {})
+
+    def unchanged(self, filename: str, local_path: str, version: int) -> bool:
+        """本地文件是否就是记录中该版本的附件"""
+        entry = self.files.get(filename)
+        if entry is None or entry["version"] != version or not os.path.exists(local_path):
+            return False
+        st = os.stat(local_path)
+        if st.st_size != entry["size"]:
+            return False
+        if st.st_mtime_ns == entry["mtime_ns"]:
+            return True
+        # 只是修改时间变化（如重新检出），比较内容哈希
+        if _file_sha256(local_path) != entry["sha256"]:
+            return False
+        entry["mtime_ns"] = st.st_mtime_ns
+        return True
+
+    def record(self, filename: str, local_path: str, attachment: dict, sha256: str) -> None:
+        st = os.stat(local_path)
+        self.files[filename] = {
+            "id": attachment["id"],
+            "version": attachment["version"],
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "sha256": sha256,
+        }
+
+    def save(self) -> None:
+        _write_json_atomic(self.path, {"page_id": self.page_id, "files": self.files})
+
+
+def _assign_attachment_paths(output_dir: str, attachments: list) -> dict:
+    """为附件分配本地路径，清理后文件名重复（忽略大小写）时在扩展名前追加附件 ID"""
+    names = {}
+    for attachment in attachments:
+        name = _safe_filename(attachment["filename"], attachment["id"])
+        names.setdefault(name.lower(), []).append((attachment, name))
+
+    paths = {}
+    for group in names.values():
+        for attachment, name in group:
+            if len(group) > 1:
+                stem, ext = os.path.splitext(name)
+                name = f"{stem}_{attachment['id']}{ext}"
+            paths[attachment["id"]] = os.path.join(output_dir, name)
+    return paths
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(ATTACHMENT_CHUNK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+async def download_attachment(
+    config: WikiConfig,
+    attachment: dict,
+    path: str,
+    client: WikiClient
+) -> dict:
+    """流式下载附件到文件（先写临时文件，完成后原子替换），返回字节数和 SHA-256"""
+    headers = config.get_auth_headers()
+    headers.pop("Content-Type", None)
+    headers["Accept"] = "*/*"
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.part"
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with client.stream("GET", attachment["url"], headers=headers) as response:
+            if response.status_code >= 400:
+                raise RuntimeError(f"下载附件失败: HTTP {response.status_code}")
+            with open(tmp_path, 'wb') as f:
+                async for block in response.aiter_bytes(ATTACHMENT_CHUNK_SIZE):
+                    f.write(block)
+                    digest.update(block)
+                    size += len(block)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return {"bytes": size, "sha256": digest.hexdigest()}
+
+
+async def upload_attachment(
+    config: WikiConfig,
+    page_id: str,
+    path: str,
+    attachment_id: Optional[str] = None,
+    comment: Optional[str] = None,
+    client: Optional[WikiClient] = None,
+    filename: Optional[str] = None
+) -> dict:
+    """以 multipart 流式上传附件（文件不整体读入内存）
+
+    attachment_id 为空时新建附件，否则为已有附件上传新版本。filename 为附件名
+    （默认取本地文件名）。
+
+    Returns:
+        上传后的附件信息
+    """
+    url = f"{config.base_url}/rest/api/content/{page_id}/child/attachment"
+    if attachment_id:
+        url += f"/{attachment_id}/data"
+
+    headers = config.get_auth_headers()
+    headers.pop("Content-Type", None)  # 由 httpx 生成 multipart 边界
+    headers["X-Atlassian-Token"] = "no-check"
+
+    filename = filename or os.path.basename(path)
+    media_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    data = {"minorEdit": "true"}
+    if comment:
+        data["comment"] = comment
+
+    with open(path, 'rb') as f:
+        result = await _request_json(
+            "POST", url, headers,
+            error_map={
+                400: "上传失败：请求无效（同名附件可能已存在）",
+                401: "认证失败：请检查 WIKI_TOKEN 是否正确",
+                403: "权限不足：无法向该页面上传附件",
+                404: "页面或附件不存在",
+                413: "文件超过服务器允许的附件大小",
+            },
+            client=client,
+            data=data,
+            files={"file": (filename, f, media_type)}
+        )
+
+    if not result["success"]:
+        raise RuntimeError(f"上传附件失败: {result['error']}")
+
+    # 新建接口返回 {"results": [...]}，更新接口直接返回附件
+    payload = result["data"]
+    item = payload["results"][0] if "results" in payload else payload
+    return _parse_attachment(config, item)
+
+
+async def pull_attachments(
+    config: WikiConfig,
+    page_id: str,
+    output_dir: str,
+    filenames: Optional[Iterable[str]] = None,
+    concurrency: int = 8,
+    client: Optional[WikiClient] = None
+) -> dict:
+    """并发下载页面的附件到本地目录
+
+    版本号未变且本地文件未被修改的附件会跳过；下载过程流式写盘，
+    不会把文件整体读入内存。文件名中的非法字符替换为 _ 并截断，
+    替换后重名的附件在扩展名前追加附件 ID（按全部附件判断，与 filenames 无关）。
+
+    Args:
+        config: Wiki 配置
+        page_id: 页面 ID
+        output_dir: 保存目录
+        filenames: 只下载指定文件名的附件（默认全部）
+        concurrency: 最大并发下载数
+        client: 复用的 WikiClient（可选）
+
+    Returns:
+        下载统计，files 为每个附件的结果列表
+    """
+    if client is None:
+        async with WikiClient(config) as owned:
+            return await pull_attachments(config, page_id, output_dir, filenames,
+                                          concurrency, client=owned)
+
+    attachments = await list_attachments(config, page_id, client=client)
+    paths = _assign_attachment_paths(output_dir, attachments)
+    if filenames is not None:
+        wanted = set(filenames)
+        attachments = [a for a in attachments if a["filename"] in wanted]
+
+    os.makedirs(output_dir, exist_ok=True)
+    state = AttachmentState(output_dir, page_id)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    stats = {"total": len(attachments), "downloaded": 0, "skipped": 0, "failed": 0,
+             "bytes": 0, "files": []}
+
+    async def pull(attachment: dict) -> None:
+        filename = attachment["filename"]
+        path = paths[attachment["id"]]
+        record = {"filename": filename, "path": path, "version": attachment["version"]}
+        stats["files"].append(record)
+
+        if state.unchanged(filename, path, attachment["version"]):
+            stats["skipped"] += 1
+            record["status"] = "skipped"
+            return
+
+        try:
+            async with semaphore:
+                result = await download_attachment(config, attachment, path, client)
+        except Exception as e:
+            stats["failed"] += 1
+            record.update({"status": "failed", "error": str(e)})
+            return
+
+        state.record(filename, path, attachment, result["sha256"])
+        stats["downloaded"] += 1
+        stats["bytes"] += result["bytes"]
+        record.update({"status": "downloaded", "bytes": result["bytes"]})
+
+    try:
+        await asyncio.gather(*(pull(a) for a in attachments))
+    finally:
+        state.save()
+
+    return stats
+
+
+async def push_attachments(
+    config: WikiConfig,
+    page_id: str,
+    paths: Iterable[str],
+    comment: Optional[str] = None,
+    concurrency: int = 8,
+    client: Optional[WikiClient] = None
+) -> dict:
+    """并发上传本地文件为页面附件
+
+    同名附件已存在时上传新版本；附件版本和本地文件都与上次同步时一致的文件
+    会跳过。目录会展开为其中的文件（不递归，忽略以 . 开头的文件）。
+    附件按文件名区分，多个输入文件同名时直接报错，不上传任何文件。
+
+    Args:
+        config: Wiki 配置
+        page_id: 页面 ID
+        paths: 文件或目录列表
+        comment: 附件版本说明（可选）
+        concurrency: 最大并发上传数
+        client: 复用的 WikiClient（可选）
+
+    Returns:
+        上传统计，files 为每个文件的结果列表
+    """
+    if client is None:
+        async with WikiClient(config) as owned:
+            return await push_attachments(config, page_id, paths, comment,
+                                          concurrency, client=owned)
+
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(
+                os.path.join(path, name) for name in sorted(os.listdir(path))
+                if not name.startswith(".") and os.path.isfile(os.path.join(path, name))
+            )
+        elif os.path.isfile(path):
+            files.append(path)
+        else:
+            raise ValueError(f"文件不存在: {path}")
+
+    by_name = collections.defaultdict(list)
+    for path in files:
+        by_name[os.path.basename(path)].append(path)
+    duplicates = sorted(paths for paths in by_name.values() if len(paths) > 1)
+    if duplicates:
+        detail = "; ".join(", ".join(paths) for paths in duplicates)
+        raise ValueError(f"附件文件名必须唯一，以下文件同名: {detail}")
+
+    remote = {a["filename"]: a for a in await list_attachments(config, page_id, client=client)}
+    states = {}
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    stats = {"total": len(files), "uploaded": 0, "skipped": 0, "failed": 0,
+             "bytes": 0, "files": []}
+
+    async def push(path: str) -> None:
+        filename = os.path.basename(path)
+        directory = os.path.dirname(os.path.abspath(path))
+        state = states.setdefault(directory, AttachmentState(directory, page_id))
+        existing = remote.get(filename)
+        record = {"filename": filename, "path": path}
+        stats["files"].append(record)
+
+        if existing and state.unchanged(filename, path, existing["version"]):
+            stats["skipped"] += 1
+            record.update({"status": "skipped", "version": existing["version"]})
+            return
+
+        try:
+            sha256 = await asyncio.to_thread(_file_sha256, path)
+            async with semaphore:
+                attachment = await upload_attachment(
+                    config, page_id, path,
+                    attachment_id=existing["id"] if existing else None,
+                    comment=comment, client=client
+                )
+        except Exception as e:
+            stats["failed"] += 1
+            record.update({"status": "failed", "error": str(e)})
+            return
+
+        state.record(filename, path, attachment, sha256)
+        stats["uploaded"] += 1
+        stats["bytes"] += attachment["size"]
+        record.update({"status": "uploaded", "version": attachment["version"]})
+
+    try:
+        await asyncio.gather(*(push(path) for path in files))
+    finally:
+        for state in states.values():
+            state.save()
+
+    return stats
+
+
+# ============================================================================
+# 页面树复制与移动
+# ============================================================================
+
+# 列出子页面时同时展开正文：每页结果较大，使用较小的分页
+COPY_LIST_LIMIT = 25
+
+# 页面链接中的标题引用（<ri:page ri:content-title="..." />）
+_PAGE_LINK_RE = re.compile(r'<ri:page\b[^>]*>')
+_LINK_TITLE_RE = re.compile(r'ri:content-title="([^"]*)"')
+_LINK_SPACE_RE = re.compile(r'ri:space-key="([^"]*)"')
+
+
+async def walk_page_tree(
+    config: WikiConfig,
+    root_page_id: str,
+    with_content: bool = False,
+    client: Optional[WikiClient] = None,
+    concurrency: int = 8
+) -> list:
+    """逐层并发列出页面树
+
+    同一层的所有页面并发列出子页面；需要正文时随子页面列表一起展开，
+    不再逐页读取。
+
+    Returns:
+        按层（广度优先）排列的节点列表，同一父页面的子页面保持原有顺序。
+        节点: {"id", "title", "parent", "depth", "labels", "content"（with_content 时）}
+    """
+    fields = ("content", "space", "labels") if with_content else ("space", "labels")
+    root = await get_wiki_page_content(config, page_id=root_page_id, format="storage",
+                                       client=client, fields=fields)
+    root.update(parent=None, depth=0)
+    nodes = [root]
+
+    expand = "body.storage,metadata.labels" if with_content else "metadata.labels"
+    limit = COPY_LIST_LIMIT if with_content else 100
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def children(node: dict) -> list:
+        url = f"{config.base_url}/rest/api/content/{node['id']}/child/page"
+        async with semaphore:
+            items = [item async for item in iter_paginated(config, url, {"expand": expand},
+                                                           client=client, limit=limit)]
+        result = []
+        for item in items:
+            child = {
+                "id": item["id"],
+                "title": item["title"],
+                "parent": node["id"],
+                "depth": node["depth"] + 1,
+                "labels": [label["name"] for label in
+                           item.get("metadata", {}).get("labels", {}).get("results", [])]
+            }
+            if with_content:
+                child["content"] = item.get("body", {}).get("storage", {}).get("value", "")
+            result.append(child)
+        return result
+
+    level = [root]
+    while level:
+        with trace_span("tree.level", depth=level[0]["depth"], pages=len(level)):
+            groups = await asyncio.gather(*(children(node) for node in level))
+        level = [child for group in groups for child in group]
+        nodes.extend(level)
+    return nodes
+
+
+def _copy_title(title: str, prefix: str = "", replacements: Iterable = ()) -> str:
+    """复制后的标题：先做替换，再加前缀"""
+    for old, new in replacements:
+        title = title.replace(old, new)
+    return prefix + title
+
+
+def _rewrite_page_links(content_html: str, titles: dict, space_key: str) -> str:
+    """把指向被复制页面的链接改为指向副本（标题改变时）
+
+    只改写没有 ri:space-key 或 space-key 为目标空间的链接；
+    显式指向其他空间的链接保持不变。
+    """
+    import html
+
+    def rewrite_link(match: re.Match) -> str:
+        link = match.group(0)
+        space = _LINK_SPACE_RE.search(link)
+        if space and space.group(1) != space_key:
+            return link
+
+        def rewrite_title(title_match: re.Match) -> str:
+            title = html.unescape(title_match.group(1))
+            if title not in titles:
+                return title_match.group(0)
+            return f'ri:content-title="{html.escape(titles[title], quote=True)}"'
+
+        return _LINK_TITLE_RE.sub(rewrite_title, link)
+
+    return _PAGE_LINK_RE.sub(rewrite_link, content_html)
+
+
+async def move_page(
+    config: WikiConfig,
+    page_id: str,
+    target_id: str,
+    position: str = "append",
+    client: Optional[WikiClient] = None
+) -> None:
+    """移动页面（子孙页面、附件和历史随之移动）
+
+    position: 'append' 移到 target_id 下作为最后一个子页面，
+    'before'/'after' 移到兄弟页面 target_id 之前/之后。
+
+    使用 /rest/api/content/{id}/move 接口；不支持该接口的旧版 Confluence 上，
+    append 改为更新页面的 ancestors（和空间），before/after 无法实现时抛出异常。
+    """
+    url = f"{config.base_url}/rest/api/content/{page_id}/move/{position}/{target_id}"
+    result = await _request_json("PUT", url, config.get_auth_headers(), PUT_ERRORS,
+                                 client=client)
+    if result["success"]:
+        return
+    if result.get("status_code") != 404 or position != "append":
+        raise RuntimeError(f"移动页面 {page_id} 失败: {result['error']}")
+
+    # 旧版接口：带上新的父页面重新保存页面（版本号 +1）
+    page, target = await asyncio.gather(
+        get_wiki_page_content(config, page_id=page_id, format="storage", client=client,
+                              fields=("content", "version")),
+        get_wiki_page_content(config, page_id=target_id, client=client, fields=("space",))
+    )
+    payload = _build_update_payload(page["version"] + 1, page["title"], page["content"])
+    payload["ancestors"] = [{"id": target_id}]
+    payload["space"] = {"key": target["space"]}
+    result = await put_json(f"{config.base_url}/rest/api/content/{page_id}",
+                            config.get_auth_headers(), payload, client=client)
+    if result.get("status_code") == 409 and result.get("replayed") and \
+            await _confirm_replayed_put(config, page_id, page["version"] + 1, client):
+        return
+    if not result["success"]:
+        raise RuntimeError(f"移动页面 {page_id} 失败: {result['error']}")
+
+
+async def restore_child_order(
+    config: WikiConfig,
+    parent_id: str,
+    ordered_ids: list,
+    client: Optional[WikiClient] = None
+) -> int:
+    """按 ordered_ids 调整子页面顺序（已经一致时只需一次列表请求），返回移动次数
+
+    子页面列表中暂时还没有出现的页面（刚创建、列表尚未更新）不参与排序。
+    """
+    current = [child["id"] for child in await list_child_pages(config, parent_id, client=client)]
+    present = set(current)
+    ordered_ids = [page_id for page_id in ordered_ids if page_id in present]
+    wanted = set(ordered_ids)
+    current = [page_id for page_id in current if page_id in wanted]
+    moves = 0
+    for previous, page_id in zip(ordered_ids, ordered_ids[1:]):
+        if current.index(page_id) == current.index(previous) + 1:
+            continue
+        await move_page(config, page_id, previous, "after", client=client)
+        current.remove(page_id)
+        current.insert(current.index(previous) + 1, page_id)
+        moves += 1
+    return moves
+
+
+class CopyProgress:
+    """页面树复制进度（源页面 ID -> 副本 ID 及已完成的步骤）
+
+    每个页面完成一个步骤后立即写盘，中断后用相同参数重新运行即可从断点继续，
+    已创建的页面不会重复创建。path 为 None 时只在内存中记录。
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.pages = {}
+        if path and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.pages = json.load(f).get("pages", {})
+
+    def get(self, page_id: str) -> dict:
+        return self.pages.get(page_id, {})
+
+    def update(self, page_id: str, **values) -> None:
+        self.pages.setdefault(page_id, {}).update(values)
+        if self.path:
+            _write_json_atomic(self.path, {"pages": self.pages})
+
+    def remove(self) -> None:
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def default_copy_progress_path(config: WikiConfig, root_page_id: str, options: dict) -> str:
+    """复制进度文件的默认路径（按源页面、目标和复制选项区分）"""
+    key = json.dumps({"base_url": config.base_url, **options}, sort_keys=True)
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+    return os.path.join(default_cache_dir(), "copy-tree", f"{root_page_id}-{digest}.json")
+
+
+async def _copy_page_attachments(
+    config: WikiConfig,
+    source_id: str,
+    target_id: str,
+    semaphore: asyncio.Semaphore,
+    client: WikiClient
+) -> int:
+    """把源页面的附件并发下载到临时目录再上传到副本（跳过副本已有的同名附件）
+
+    临时文件名按 _assign_attachment_paths 清理（附件名可能包含 / 或 ..），
+    上传时使用原附件名。每个附件的下载和上传占用 semaphore 的一个名额。
+    """
+    import tempfile
+
+    async with semaphore:
+        existing, source = await asyncio.gather(
+            list_attachments(config, target_id, client=client),
+            list_attachments(config, source_id, client=client)
+        )
+    names = {a["filename"] for a in existing}
+    pending = [a for a in source if a["filename"] not in names]
+
+    with tempfile.TemporaryDirectory(prefix="wiki-copy-") as workdir:
+        paths = _assign_attachment_paths(workdir, pending)
+
+        async def copy(attachment: dict) -> None:
+            path = paths[attachment["id"]]
+            async with semaphore:
+                await download_attachment(config, attachment, path, client)
+                await upload_attachment(config, target_id, path, client=client,
+                                        filename=attachment["filename"])
+            os.remove(path)
+
+        # 等所有传输结束再清理临时目录，然后报告第一个错误
+        results = await asyncio.gather(*(copy(a) for a in pending), return_exceptions=True)
+    errors = [r for r in results if isinstance(r, BaseException)]
+    if errors:
+        raise errors[0]
+    return len(pending)
+
+
+async def copy_page_tree(
+    config: WikiConfig,
+    root_page_id: str,
+    target_parent_id: Optional[str] = None,
+    space_key: Optional[str] = None,
+    title_prefix: str = "",
+    title_replacements: Iterable = (),
+    attachments: bool = False,
+    concurrency: int = 8,
+    progress: Optional[CopyProgress] = None,
+    client: Optional[WikiClient] = None,
+    on_page=None
+) -> dict:
+    """复制页面树（含正文和标签，可选附件）
+
+    先逐层并发列出整棵源页面树（正文随子页面列表返回），再逐层创建副本：
+    同一层的页面并发创建（父页面都已在上一层创建），每层完成后恢复兄弟页面的
+    原有顺序。副本中指向树内页面的链接随标题改写。
+
+    Args:
+        config: Wiki 配置
+        root_page_id: 源根页面 ID
+        target_parent_id: 目标父页面 ID（与 space_key 至少提供一个）
+        space_key: 目标空间（只提供空间时复制为空间顶级页面）
+        title_prefix: 副本标题前缀
+        title_replacements: 副本标题替换 [(旧, 新), ...]
+        attachments: 是否复制附件
+        concurrency: 最大并发请求数
+        progress: 复制进度（可选，用于断点续传）
+        client: 复用的 WikiClient（可选）
+        on_page: 每个页面完成（或失败）时的回调 on_page(result)
+
+    Returns:
+        {"root", "url", "pages", "created", "resumed", "attachments", "reordered", "failed"}
+    """
+    if client is None:
+        async with WikiClient(config) as owned:
+            return await copy_page_tree(
+                config, root_page_id, target_parent_id, space_key, title_prefix,
+                title_replacements, attachments, concurrency, progress, owned, on_page
+            )
+    if not target_parent_id and not space_key:
+        raise ValueError("必须提供目标父页面或目标空间")
+
+    # 1. 目标空间（以目标父页面所在空间为准）
+    if target_parent_id:
+        parent = await get_wiki_page_content(config, page_id=target_parent_id, client=client,
+                                             fields=("space",))
+        if space_key and space_key != parent["space"]:
+            raise ValueError(f"目标父页面不在空间 {space_key} 中（位于 {parent['space']}）")
+        space_key = parent["space"]
+
+    # 2. 列出整棵源页面树（含正文）
+    nodes = await walk_page_tree(config, root_page_id, with_content=True, client=client,
+                                 concurrency=concurrency)
+    titles = {node["title"]: _copy_title(node["title"], title_prefix, title_replacements)
+              for node in nodes}
+    renamed = {old: new for old, new in titles.items() if old != new}
+    progress = progress or CopyProgress()
+    copies = {page_id: state["copy_id"] for page_id, state in progress.pages.items()
+              if state.get("copy_id")}
+
+    stats = {"pages": len(nodes), "created": 0, "resumed": 0, "attachments": 0,
+             "reordered": 0, "failed": []}
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def copy_node(node: dict) -> None:
+        state = progress.get(node["id"])
+        parent_copy = copies.get(node["parent"]) if node["parent"] else target_parent_id
+        if node["parent"] and parent_copy is None:
+            raise RuntimeError("父页面未能复制")
+        async with semaphore:
+            if state.get("copy_id"):
+                stats["resumed"] += 1
+            else:
+                content_html = _rewrite_page_links(node["content"], renamed, space_key)
+                payload = _build_create_payload(titles[node["title"]], content_html,
+                                                space_key, parent_copy)
+                result = await post_json(f"{config.base_url}/rest/api/content",
+                                         config.get_auth_headers(), payload, client=client)
+                if not result["success"]:
+                    hint = ("（同一空间内标题不能重复，可使用标题前缀或替换）"
+                            if result.get("status_code") == 400 else "")
+                    raise RuntimeError(f"创建页面失败: {result['error']}{hint}")
+                copies[node["id"]] = result["data"]["id"]
+                progress.update(node["id"], copy_id=result["data"]["id"])
+                stats["created"] += 1
+            if node["labels"] and not state.get("labels"):
+                await add_page_labels(config, copies[node["id"]], node["labels"], client=client)
+                progress.update(node["id"], labels=True)
+        if attachments and not state.get("attachments"):
+            # 附件逐个占用并发名额，与其他页面的复制共享 concurrency
+            stats["attachments"] += await _copy_page_attachments(
+                config, node["id"], copies[node["id"]], semaphore, client
+            )
+            progress.update(node["id"], attachments=True)
+
+    async def run(node: dict) -> None:
+        try:
+            await copy_node(node)
+            result = {"id": node["id"], "title": titles[node["title"]],
+                      "copy_id": copies[node["id"]], "depth": node["depth"]}
+        except Exception as e:
+            stats["failed"].append(node["id"])
+            result = {"id": node["id"], "title": titles[node["title"]], "error": str(e),
+                      "depth": node["depth"]}
+        if on_page is not None:
+            on_page(result)
+
+    # 3. 逐层创建副本，每层完成后恢复兄弟页面顺序
+    for depth in range(max(node["depth"] for node in nodes) + 1):
+        level = [node for node in nodes if node["depth"] == depth]
+        with trace_span("copy.level", depth=depth, pages=len(level)):
+            await asyncio.gather(*(run(node) for node in level))
+
+        siblings = collections.defaultdict(list)
+        for node in level:
+            if node["parent"] and node["id"] in copies:
+                siblings[copies[node["parent"]]].append(copies[node["id"]])
+        # 页面本身都已复制，某个父页面下的顺序无法恢复只给出警告
+        moves = await asyncio.gather(*(
+            restore_child_order(config, parent_id, ordered, client=client)
+            for parent_id, ordered in siblings.items() if len(ordered) > 1
+        ), return_exceptions=True)
+        for result in moves:
+            if isinstance(result, Exception):
+                print(f"⚠️  无法恢复子页面顺序: {result}", file=sys.stderr)
+            else:
+                stats["reordered"] += result
+
+    stats["root"] = copies.get(root_page_id)
+    stats["url"] = ""
+    if stats["root"]:
+        stats["url"] = f"{config.base_url}/pages/viewpage.action?pageId={stats['root']}"
+    return stats
+
+
+async def move_page_tree(
+    config: WikiConfig,
+    root_page_id: str,
+    target_parent_id: str,
+    client: Optional[WikiClient] = None
+) -> dict:
+    """把页面树移动到另一个父页面下（可以在另一个空间）
+
+    只需移动根页面：子孙页面、附件、标签和历史版本都随之移动，页面 ID 不变。
+
+    Returns:
+        {"id", "title", "target", "space"}
+    """
+    url = f"{config.base_url}/rest/api/content/{target_parent_id}"
+    result = await fetch_json(url, config.get_auth_headers(), {"expand": "ancestors,space"},
+                              client=client)
+    if not result["success"]:
+        raise RuntimeError(f"获取目标父页面失败: {result['error']}")
+    target = result["data"]
+    ancestors = [item["id"] for item in target.get("ancestors", [])]
+    if root_page_id == target["id"] or root_page_id in ancestors:
+        raise ValueError("不能把页面移动到它自身或其子孙页面下")
+
+    root = await get_wiki_page_version(config, page_id=root_page_id, client=client)
+    await move_page(config, root_page_id, target_parent_id, "append", client=client)
+    return {
+        "id": root_page_id,
+        "title": root["title"],
+        "target": target_parent_id,
+        "space": target.get("space", {}).get("key", "")
+    }
+
+
+# ============================================================================
+# 标签
+# ============================================================================
+
+# 每个添加标签请求携带的最大标签数
+LABEL_BATCH_SIZE = 50
+
+LABEL_ERRORS = {
+    400: "标签名无效",
+    401: "认证失败，请检查 Token",
+    403: "权限不足，请检查是否有编辑权限",
+    404: "页面或标签不存在",
+    429: "请求过于频繁，请稍后重试"
+}
+
+
+def parse_label_names(values: Iterable[str]) -> list:
+    """整理标签名：支持逗号分隔，转为小写（Confluence 标签不区分大小写）并去重"""
+    names = []
+    for value in values:
+        for name in value.split(","):
+            name = name.strip().lower()
+            if not name:
+                continue
+            if any(c.isspace() for c in name):
+                raise ValueError(f"标签名不能包含空白: {name}")
+            if name not in names:
+                names.append(name)
+    return names
+
+
+async def list_page_labels(
+    config: WikiConfig,
+    page_id: str,
+    client: Optional[WikiClient] = None
+) -> list:
+    """列出页面的全部标签名（自动翻页）"""
+    url = f"{config.base_url}/rest/api/content/{page_id}/label"
+    return [label["name"] async for label in iter_paginated(config, url, client=client, limit=200)]
+
+
+async def add_page_labels(
+    config: WikiConfig,
+    page_id: str,
+    names: list,
+    client: Optional[WikiClient] = None
+) -> list:
+    """添加标签（每个请求携带最多 LABEL_BATCH_SIZE 个），返回添加后页面的标签名"""
+    url = f"{config.base_url}/rest/api/content/{page_id}/label"
+    headers = config.get_auth_headers()
+    labels = []
+    for start in range(0, len(names), LABEL_BATCH_SIZE):
+        batch = [{"prefix": "global", "name": name}
+                 for name in names[start:start + LABEL_BATCH_SIZE]]
+        result = await _request_json("POST", url, headers, LABEL_ERRORS, client=client,
+                                     json=batch)
+        if not result["success"]:
+            raise RuntimeError(f"添加标签失败: {result['error']}")
+        labels = [label["name"] for label in result["data"].get("results", [])]
+    return labels
+
+
+async def remove_page_label(
+    config: WikiConfig,
+    page_id: str,
+    name: str,
+    client: Optional[WikiClient] = None
+) -> bool:
+    """删除一个标签（接口不支持批量删除），标签不存在时返回 False"""
+    url = f"{config.base_url}/rest/api/content/{page_id}/label"
+    result = await _request_json("DELETE", url, config.get_auth_headers(), LABEL_ERRORS,
+                                 client=client, params={"name": name})
+    if result["success"]:
+        return True
+    if result.get("status_code") == 404:
+        return False
+    raise RuntimeError(f"删除标签 {name} 失败: {result['error']}")
+
+
+async def update_page_labels(
+    config: WikiConfig,
+    page_id: str,
+    add: Iterable[str] = (),
+    remove: Iterable[str] = (),
+    replace: Optional[Iterable[str]] = None,
+    current: Optional[list] = None,
+    client: Optional[WikiClient] = None,
+    dry_run: bool = False
+) -> dict:
+    """修改单个页面的标签
+
+    Args:
+        add: 要添加的标签
+        remove: 要删除的标签
+        replace: 替换为这组标签（不为 None 时忽略 add/remove）
+        current: 页面当前的标签（已知时传入，省去读取；
+            未知时 add/remove 直接发送，只有 replace 和 dry_run 需要先读取）
+        dry_run: 只计算变化，不修改
+
+    Returns:
+        {"id", "added", "removed", "labels", "status": "changed" | "unchanged" | "planned"}，
+        未读取当前标签时 labels 为 None
+    """
+    if replace is not None or dry_run:
+        if current is None:
+            current = await list_page_labels(config, page_id, client=client)
+    if replace is not None:
+        replace = list(replace)
+        add = [name for name in replace if name not in current]
+        remove = [name for name in current if name not in replace]
+    elif current is not None:
+        add = [name for name in add if name not in current]
+        remove = [name for name in remove if name in current]
+    add, remove = list(add), list(remove)
+
+    labels = None
+    if current is not None:
+        labels = [name for name in current if name not in remove] + add
+    if dry_run or not (add or remove):
+        status = "planned" if dry_run and (add or remove) else "unchanged"
+        return {"id": page_id, "added": add, "removed": remove, "labels": labels,
+                "status": status}
+
+    # 删除接口每次只能删除一个标签；页面之间的并发由调用方控制
+    remove = [name for name in remove
+              if await remove_page_label(config, page_id, name, client=client)]
+    if add:
+        labels = await add_page_labels(config, page_id, add, client=client)
+    return {"id": page_id, "added": add, "removed": remove, "labels": labels,
+            "status": "changed" if add or remove else "unchanged"}
+
+
+async def collect_label_targets(
+    config: WikiConfig,
+    page_refs: Iterable[str] = (),
+    cql: Optional[str] = None,
+    client: Optional[WikiClient] = None
+) -> list:
+    """汇总要修改标签的页面：页面 ID/URL 列表和 CQL 搜索结果（去重）
+
+    CQL 搜索时同时展开 metadata.labels，页面带有当前标签，修改时不必再读取。
+    搜索结果需要在修改前全部列出：按标签搜索再修改这些标签会改变结果集，
+    边翻页边修改会漏掉页面。
+
+    Returns:
+        [{"id", "title", "labels"}, ...]，未知的字段为 None
+    """
+    targets = {}
+    for ref in page_refs:
+        page_id = ref if ref.isdigit() else extract_page_id(ref)
+        targets.setdefault(page_id, {"id": page_id, "title": None, "labels": None})
+    if cql:
+        async for item in iter_cql_search(config, cql, expand="metadata.labels",
+                                          client=client, prefetch=True):
+            if item["id"] in targets:
+                continue
+            # 展开字段只包含第一页标签；还有更多时视为未知，修改前再读取
+            listing = item.get("metadata", {}).get("labels")
+            labels = None
+            if listing is not None and not listing.get("_links", {}).get("next"):
+                labels = [label["name"] for label in listing.get("results", [])]
+            targets[item["id"]] = {"id": item["id"], "title": item.get("title"), "labels": labels}
+    return list(targets.values())
+
+
+async def bulk_update_labels(
+    config: WikiConfig,
+    targets: Iterable[dict],
+    add: Iterable[str] = (),
+    remove: Iterable[str] = (),
+    replace: Optional[Iterable[str]] = None,
+    concurrency: int = 8,
+    client: Optional[WikiClient] = None,
+    dry_run: bool = False
+) -> AsyncIterator[dict]:
+    """并发修改多个页面的标签，按完成顺序产出每个页面的结果
+
+    Args:
+        targets: collect_label_targets 的结果（或只含 id 的字典列表）
+        concurrency: 同时处理的最大页面数
+
+    Yields:
+        update_page_labels 的结果（附带 title）；单个页面失败时为 {"id", "title", "error"}
+    """
+    add, remove = list(add), list(remove)
+    replace = list(replace) if replace is not None else None
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def update(target: dict) -> dict:
+        async with semaphore:
+            try:
+                result = await update_page_labels(
+                    config, target["id"], add=add, remove=remove, replace=replace,
+                    current=target.get("labels"), client=client, dry_run=dry_run
+                )
+            except Exception as e:
+                result = {"id": target["id"], "error": str(e)}
+        result["title"] = target.get("title")
+        return result
+
+    tasks = [asyncio.ensure_future(update(target)) for target in targets]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+# ============================================================================
+# 版本历史
+# ============================================================================
+
+# 版本列表每页的条数
+HISTORY_PAGE_SIZE = 200
+
+
+def _parse_history_entry(data: dict) -> dict:
+    """解析版本列表中的一条记录"""
+    return {
+        "number": data.get("number", 0),
+        "when": data.get("when", ""),
+        "by": data.get("by", {}).get("displayName", ""),
+        "message": data.get("message", ""),
+        "minor_edit": data.get("minorEdit", False)
+    }
+
+
+async def iter_page_history(
+    config: WikiConfig,
+    page_id: str,
+    client: Optional[WikiClient] = None,
+    limit: Optional[int] = None
+) -> AsyncIterator[dict]:
+    """分页列出页面的版本（新版本在前），预取下一页
+
+    优先使用 /rest/api/content/{id}/version；不支持该接口的旧版 Confluence Server
+    （返回 404）改用 /rest/experimental/content/{id}/version。
+
+    Yields:
+        {"number", "when", "by", "message", "minor_edit"}
+    """
+    count = 0
+    for prefix in ("/rest/api", "/rest/experimental"):
+        url = f"{config.base_url}{prefix}/content/{page_id}/version"
+        try:
+            async for item in iter_paginated(config, url, client=client,
+                                             limit=HISTORY_PAGE_SIZE, prefetch=True):
+                yield _parse_history_entry(item)
+                count += 1
+                if limit and count >= limit:
+                    return
+            return
+        except RuntimeError:
+            if count or prefix != "/rest/api":
+                raise
+            # 区分"接口不存在"与"页面不存在"：页面存在时再尝试 experimental 接口
+            await get_wiki_page_version(config, page_id=page_id, client=client)
+
+
+class VersionCache:
+    """页面历史版本磁盘缓存
+
+    历史版本的内容不会再改变，缓存后永久有效：不做版本探测，也不淘汰
+    （与 PageCache 分开存放，不占用其大小上限）。比较差异时转换得到的 Markdown
+    也一并缓存（markdown 字段）。
+
+    目录结构: <cache_dir>/history/<base_url 摘要>/<page_id>/<version>.json
+    """
+
+    def __init__(self, config: WikiConfig, cache_dir: Optional[str] = None):
+        """
+        Args:
+            config: Wiki 配置（按 base_url 隔离不同 Wiki 的缓存）
+            cache_dir: 缓存根目录（默认 default_cache_dir()）
+        """
+        namespace = hashlib.sha1(config.base_url.encode("utf-8")).hexdigest()[:12]
+        self.root = os.path.join(cache_dir or default_cache_dir(), "history", namespace)
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, page_id: str, version: int) -> str:
+        return os.path.join(self.root, str(page_id), f"{version}.json")
+
+    def get(self, page_id: str, version: int) -> Optional[dict]:
+        try:
+            with open(self._path(page_id, version), 'r', encoding='utf-8') as f:
+                page = json.load(f)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return page
+
+    def put(self, page_id: str, version: int, page: dict) -> None:
+        _write_json_atomic(self._path(page_id, version), page)
+
+
+async def get_page_version_content(
+    config: WikiConfig,
+    page_id: str,
+    version: int,
+    client: Optional[WikiClient] = None,
+    cache: Optional[VersionCache] = None,
+    current: bool = False
+) -> dict:
+    """获取页面指定版本的 Storage Format 内容
+
+    Args:
+        config: Wiki 配置
+        page_id: 页面 ID
+        version: 版本号
+        client: 复用的 WikiClient（可选）
+        cache: 历史版本缓存（可选，命中时不发请求）
+        current: 该版本是否为当前版本（当前版本不能用 status=historical 查询）
+
+    Returns:
+        {"id", "title", "version", "when", "by", "message", "content", "cache"}
+    """
+    if cache is not None:
+        cached = cache.get(page_id, version)
+        if cached is not None:
+            return {**cached, "cache": "hit"}
+
+    url = f"{config.base_url}/rest/api/content/{page_id}"
+    params = {"version": version, "expand": "body.storage,version"}
+    if not current:
+        params["status"] = "historical"
+    result = await fetch_json(url, config.get_auth_headers(), params, client=client)
+    if not result["success"] and not current and result.get("status_code") == 404:
+        # 版本号可能就是当前版本（调用方不知道最新版本号时）
+        params.pop("status")
+        result = await fetch_json(url, config.get_auth_headers(), params, client=client)
+    if not result["success"]:
+        raise RuntimeError(f"获取页面 {page_id} 版本 {version} 失败: {result['error']}")
+
+    data = result["data"]
+    page = {
+        "id": data["id"],
+        "title": data["title"],
+        **_parse_history_entry(data.get("version", {})),
+        "content": data.get("body", {}).get("storage", {}).get("value", "")
+    }
+    page["version"] = page.pop("number")
+    if cache is not None:
+        cache.put(page_id, version, page)
+    return {**page, "cache": "miss"}
+
+
+async def fetch_page_versions(
+    config: WikiConfig,
+    page_id: str,
+    versions: Iterable[int],
+    client: Optional[WikiClient] = None,
+    cache: Optional[VersionCache] = None,
+    concurrency: int = 8,
+    latest: Optional[int] = None
+) -> dict:
+    """并发获取页面的多个版本（已缓存的版本不发请求）
+
+    Args:
+        latest: 当前版本号（已知时用于选择查询方式，省去一次 404 重试）
+
+    Returns:
+        {版本号: get_page_version_content 的结果}
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def fetch(version: int) -> dict:
+        async with semaphore:
+            return await get_page_version_content(
+                config, page_id, version, client=client, cache=cache,
+                current=version == latest
+            )
+
+    versions = sorted(set(versions))
+    pages = await asyncio.gather(*(fetch(version) for version in versions))
+    return dict(zip(versions, pages))
+
+
+def _storage_lines(content_html: str) -> list:
+    """把 Storage Format 按标签边界拆成行（便于逐行比较）"""
+    return re.sub(r">\s*<", ">\n<", normalize_storage(content_html)).splitlines()
+
+
+def diff_versions(old: dict, new: dict, old_text: str, new_text: str, context: int = 3) -> dict:
+    """计算两个版本文本的统一 diff
+
+    Returns:
+        {"from", "to", "added", "removed", "diff"}，diff 为 unified diff 文本
+    """
+    import difflib
+
+    lines = list(difflib.unified_diff(
+        old_text.splitlines(), new_text.splitlines(),
+        fromfile=f"v{old['version']} {old['when']} {old['by']}".rstrip(),
+        tofile=f"v{new['version']} {new['when']} {new['by']}".rstrip(),
+        n=context, lineterm=""
+    ))
+    return {
+        "from": old["version"],
+        "to": new["version"],
+        "added": sum(1 for line in lines if line.startswith("+") and not line.startswith("+++")),
+        "removed": sum(1 for line in lines if line.startswith("-") and not line.startswith("---")),
+        "diff": "\n".join(lines)
+    }
+
+
+async def diff_page_versions(
+    config: WikiConfig,
+    page_id: str,
+    pairs: list,
+    format: str = "markdown",
+    context: int = 3,
+    client: Optional[WikiClient] = None,
+    cache: Optional[VersionCache] = None,
+    converter: Optional[ConversionPool] = None,
+    concurrency: int = 8,
+    latest: Optional[int] = None
+) -> list:
+    """计算页面若干对版本之间的差异
+
+    涉及的版本并发获取（已缓存的不发请求），每个版本只转换一次（转换结果写入缓存），
+    diff 在本地计算。
+
+    Args:
+        pairs: [(旧版本号, 新版本号), ...]
+        format: 'markdown'（默认，先转换为 Markdown 再比较）或 'storage'（按标签拆行比较）
+
+    Returns:
+        与 pairs 对应的 diff_versions 结果列表（附带新版本的 message）
+    """
+    pages = await fetch_page_versions(
+        config, page_id, [n for pair in pairs for n in pair], client=client, cache=cache,
+        concurrency=concurrency, latest=latest
+    )
+
+    if format == "markdown":
+        # 转换结果同样不会变化，与版本内容一起缓存
+        converter = converter or get_conversion_pool()
+        missing = [n for n, page in pages.items() if "markdown" not in page]
+        converted = await asyncio.gather(*(converter.html_to_markdown(pages[n]["content"])
+                                           for n in missing))
+        for n, text in zip(missing, converted):
+            pages[n]["markdown"] = text
+            if cache is not None:
+                cache.put(page_id, n, {k: v for k, v in pages[n].items() if k != "cache"})
+        texts = {n: page["markdown"] for n, page in pages.items()}
+    else:
+        texts = {n: "\n".join(_storage_lines(page["content"])) for n, page in pages.items()}
+
+    results = []
+    for old, new in pairs:
+        result = diff_versions(pages[old], pages[new], texts[old], texts[new], context)
+        result["message"] = pages[new]["message"]
+        results.append(result)
+    return results
+
+
+# ============================================================================
+# 本地全文索引
+# ============================================================================
+
+# trigram 分词器（SQLite 3.34+）只能匹配至少 3 个字符的子串，更短的词改用 LIKE
+TRIGRAM_MIN_CHARS = 3
+
+# bm25 中各列的权重：标题 > 标签 > 正文
+INDEX_COLUMN_WEIGHTS = (10.0, 5.0, 1.0)
+
+_QUERY_TERM = re.compile(r'"([^"]+)"|(\S+)')
+
+
+def default_index_path(config: WikiConfig) -> str:
+    """全文索引文件路径（<缓存目录>/index/<base_url 摘要>.sqlite）"""
+    namespace = hashlib.sha1(config.base_url.encode("utf-8")).hexdigest()[:12]
+    return os.path.join(default_cache_dir(), "index", f"{namespace}.sqlite")
+
+
+class PageIndex:
+    """本地全文索引（SQLite FTS5）
+
+    保存页面的标题、标签、空间、版本和 Markdown 正文，按版本号增量更新
+    （版本未变的页面不重复写入）。查询完全在本地完成，返回按 bm25 排序的片段，
+    避免为每次查找都发起远程 CQL 搜索。
+
+    中文没有空格分词，默认使用 trigram 分词器做子串匹配；SQLite 不支持时
+    回退到 unicode61（按词匹配）。trigram 下少于 3 个字符的词（如两个汉字）
+    无法走索引，改为对候选行做 LIKE 过滤。
+
+    用法：
+        with PageIndex(config) as index:
+            index.add(page)
+            results = index.query("部署 流程", space="DEV")
+    """
+
+    def __init__(self, config: WikiConfig, path: Optional[str] = None):
+        """
+        Args:
+            config: Wiki 配置（按 base_url 隔离不同 Wiki 的索引）
+            path: 索引文件路径（默认 default_index_path(config)）
+        """
+        import sqlite3
+
+        self.config = config
+        self.path = path or default_index_path(config)
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.db = sqlite3.connect(self.path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.tokenizer = self._create_schema(sqlite3)
+
+    def _create_schema(self, sqlite3) -> str:
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                id TEXT UNIQUE NOT NULL,
+                title TEXT NOT NULL,
+                url TEXT NOT NULL,
+                space TEXT NOT NULL DEFAULT '',
+                labels TEXT NOT NULL DEFAULT '',
+                version INTEGER NOT NULL DEFAULT 0,
+                last_updated TEXT NOT NULL DEFAULT '',
+                source TEXT NOT NULL DEFAULT '',
+                indexed_at REAL NOT NULL
+            )
+        """)
+        # 每个建立过索引的 CQL 范围包含哪些页面，用于删除已不在范围内的页面
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS scope_pages (
+                scope TEXT NOT NULL,
+                id TEXT NOT NULL,
+                PRIMARY KEY (scope, id)
+            )
+        """)
+        row = self.db.execute(
+            "SELECT sql FROM sqlite_master WHERE name = 'pages_fts'"
+        ).fetchone()
+        if row is not None:
+            return "trigram" if "trigram" in row[0] else "unicode61"
+        for tokenizer in ("trigram", "unicode61"):
+            try:
+                self.db.execute(
+                    f"CREATE VIRTUAL TABLE pages_fts USING fts5("
+                    f"title, labels, body, tokenize='{tokenizer}')"
+                )
+                return tokenizer
+            except sqlite3.OperationalError:
+                continue
+        raise RuntimeError("当前 SQLite 不支持 FTS5，无法建立全文索引")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self) -> None:
+        self.db.commit()
+        self.db.close()
+
+    def commit(self) -> None:
+        self.db.commit()
+
+    def versions(self) -> dict:
+        """已索引页面的 {页面 ID: 版本号}"""
+        return dict(self.db.execute("SELECT id, version FROM pages"))
+
+    def space_of(self, page_id: Optional[str]) -> str:
+        """已索引页面的空间（未索引时为空字符串）"""
+        row = self.db.execute("SELECT space FROM pages WHERE id = ?", (page_id,)).fetchone()
+        return row[0] if row else ""
+
+    def add(self, page: dict, source: str = "api") -> bool:
+        """写入或更新一个页面，版本未变时跳过，返回是否写入
+
+        Args:
+            page: get_wiki_page_content 返回的页面（需要 content 为 Markdown）
+            source: 来源标记（api/cache/export）
+        """
+        version = page.get("version", 0)
+        row = self.db.execute(
+            "SELECT rowid, version FROM pages WHERE id = ?", (page["id"],)
+        ).fetchone()
+        if row is not None and row[1] == version and version:
+            return False
+
+        labels = " ".join(page.get("labels") or [])
+        values = (
+            page["title"], page.get("url", ""), page.get("space", ""), labels, version,
+            page.get("last_updated", ""), source, time.time()
+        )
+        with trace_span("index.add", bytes=len(page.get("content", ""))):
+            if row is None:
+                rowid = self.db.execute(
+                    "INSERT INTO pages (title, url, space, labels, version, last_updated, "
+                    "source, indexed_at, id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    values + (page["id"],)
+                ).lastrowid
+            else:
+                rowid = row[0]
+                self.db.execute(
+                    "UPDATE pages SET title = ?, url = ?, space = ?, labels = ?, version = ?, "
+                    "last_updated = ?, source = ?, indexed_at = ? WHERE rowid = ?",
+                    values + (rowid,)
+                )
+                self.db.execute("DELETE FROM pages_fts WHERE rowid = ?", (rowid,))
+            self.db.execute(
+                "INSERT INTO pages_fts (rowid, title, labels, body) VALUES (?, ?, ?, ?)",
+                (rowid, page["title"], labels, page.get("content", ""))
+            )
+        return True
+
+    def remove(self, page_id: str) -> bool:
+        """从索引中删除页面，返回是否存在"""
+        self.db.execute("DELETE FROM scope_pages WHERE id = ?", (page_id,))
+        row = self.db.execute("SELECT rowid FROM pages WHERE id = ?", (page_id,)).fetchone()
+        if row is None:
+            return False
+        self.db.execute("DELETE FROM pages_fts WHERE rowid = ?", row)
+        self.db.execute("DELETE FROM pages WHERE rowid = ?", row)
+        return True
+
+    def update_scope(self, scope: str, page_ids: Iterable[str]) -> int:
+        """记录范围内的页面（完整列出后调用），删除上次在范围内、这次不在的页面
+
+        页面仍属于其他已索引范围时只解除与本范围的关联，不从索引中删除。
+
+        Returns:
+            从索引中删除的页面数
+        """
+        current = set(page_ids)
+        previous = {pid for pid, in self.db.execute(
+            "SELECT id FROM scope_pages WHERE scope = ?", (scope,))}
+        removed = 0
+        for page_id in previous - current:
+            self.db.execute("DELETE FROM scope_pages WHERE scope = ? AND id = ?", (scope, page_id))
+            other = self.db.execute(
+                "SELECT 1 FROM scope_pages WHERE id = ? LIMIT 1", (page_id,)
+            ).fetchone()
+            if other is None and self.remove(page_id):
+                removed += 1
+        self.db.executemany(
+            "INSERT OR IGNORE INTO scope_pages (scope, id) VALUES (?, ?)",
+            ((scope, page_id) for page_id in current - previous)
+        )
+        return removed
+
+    def _split_terms(self, text: str) -> tuple:
+        """把查询拆成（走 FTS 索引的词，需要 LIKE 过滤的短词）"""
+        indexed, short = [], []
+        for match in _QUERY_TERM.finditer(text):
+            term = match.group(1) or match.group(2)
+            if self.tokenizer == "trigram" and len(term) < TRIGRAM_MIN_CHARS:
+                short.append(term)
+            else:
+                indexed.append(term)
+        return indexed, short
+
+    def query(
+        self,
+        text: str,
+        space: Optional[str] = None,
+        label: Optional[str] = None,
+        limit: int = 10,
+        snippet_chars: int = 64
+    ) -> list:
+        """全文查询，所有词都必须出现（空格分隔，双引号包围短语）
+
+        Returns:
+            按相关度排序的结果列表，每项包含 id、title、url、space、labels、
+            version、last_updated、snippet（命中词以 ** 标出）和 score
+        """
+        indexed, short = self._split_terms(text)
+        if not indexed and not short:
+            raise ValueError("查询内容为空")
+
+        where, params = [], []
+        if indexed:
+            where.append("pages_fts MATCH ?")
+            params.append(" AND ".join('"' + term.replace('"', '""') + '"' for term in indexed))
+        for term in short:
+            pattern = "%" + _like_pattern(term) + "%"
+            where.append("(pages_fts.title LIKE ? ESCAPE '\\' OR pages_fts.labels LIKE ? "
+                         "ESCAPE '\\' OR pages_fts.body LIKE ? ESCAPE '\\')")
+            params.extend([pattern] * 3)
+        if space:
+            where.append("p.space = ?")
+            params.append(space)
+        if label:
+            where.append("(' ' || p.labels || ' ') LIKE ? ESCAPE '\\'")
+            params.append(f"% {_like_pattern(label)} %")
+
+        if indexed:
+            # trigram 的 token 是单个字符位置，unicode61 的 token 是词，片段长度按此折算
+            tokens = snippet_chars if self.tokenizer == "trigram" else max(8, snippet_chars // 4)
+            weights = ", ".join(str(w) for w in INDEX_COLUMN_WEIGHTS)
+            snippet = f"snippet(pages_fts, 2, '**', '**', '…', {min(tokens, 64)})"
+            score = f"bm25(pages_fts, {weights})"
+            order = "score"
+        else:
+            # 只有短词时没有相关度，按最近更新排序，片段在 Python 中截取
+            snippet, score, order = "pages_fts.body", "0.0", "p.last_updated DESC"
+
+        sql = (
+            f"SELECT p.id, p.title, p.url, p.space, p.labels, p.version, p.last_updated, "
+            f"{snippet}, {score} AS score "
+            f"FROM pages_fts JOIN pages p ON p.rowid = pages_fts.rowid "
+            f"WHERE {' AND '.join(where)} ORDER BY {order} LIMIT ?"
+        )
+        params.append(limit)
+
+        results = []
+        with trace_span("index.query", terms=len(indexed) + len(short)):
+            for row in self.db.execute(sql, params):
+                snippet = row[7] if indexed else _text_snippet(row[7], short[0], snippet_chars)
+                results.append({
+                    "id": row[0],
+                    "title": row[1],
+                    "url": row[2],
+                    "space": row[3],
+                    "labels": row[4].split(),
+                    "version": row[5],
+                    "last_updated": row[6],
+                    "snippet": snippet,
+                    "score": round(abs(row[8]), 3)
+                })
+        return results
+
+    def stats(self) -> dict:
+        pages, = self.db.execute("SELECT COUNT(*) FROM pages").fetchone()
+        return {
+            "pages": pages,
+            "tokenizer": self.tokenizer,
+            "bytes": os.path.getsize(self.path),
+            "path": self.path
+        }
+
+
+def _like_pattern(text: str) -> str:
+    """转义 LIKE 通配符（%、_ 和转义符 \\ 本身），配合 ESCAPE '\\' 使用"""
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _text_snippet(text: str, term: str, chars: int) -> str:
+    """截取 term 首次出现位置附近的片段（命中词以 ** 标出）"""
+    index = text.lower().find(term.lower())
+    if index < 0:
+        return text[:chars]
+    start = max(0, index - chars // 2)
+    end = min(len(text), index + len(term) + chars // 2)
+    return ("…" if start else "") + text[start:index] + f"**{text[index:index + len(term)]}**" \
+        + text[index + len(term):end] + ("…" if end < len(text) else "")
+
+
+# 建立索引时获取的页面字段
+INDEX_FIELDS = ("content", "space", "version", "labels")
+
+
+def _index_scope_cql(space_key: Optional[str] = None, root_page_id: Optional[str] = None) -> str:
+    """空间或页面树对应的 CQL"""
+    if root_page_id:
+        return f"(id = {root_page_id} or ancestor = {root_page_id}) and type = page"
+    return f'space = "{space_key}" and type = page'
+
+
+async def index_pages(
+    config: WikiConfig,
+    index: PageIndex,
+    cql: str,
+    concurrency: int = 8,
+    client: Optional[WikiClient] = None,
+    cache: Optional[PageCache] = None,
+    converter: Optional[ConversionPool] = None
+) -> dict:
+    """把 CQL 搜索到的页面写入索引，只获取版本与索引中不同的页面
+
+    完整列出后，删除上次用同一 CQL 建立索引时存在、这次已不在结果中的页面
+    （已删除或移出范围）；获取正文失败的页面仍视为在范围内。
+
+    Returns:
+        统计 {"checked", "indexed", "unchanged", "failed", "removed"}
+    """
+    stats = {"checked": 0, "indexed": 0, "unchanged": 0, "failed": 0, "removed": 0}
+    listed = []
+    async for page in search_wiki_pages(
+        config, cql, format="markdown", with_content=True, concurrency=concurrency,
+        client=client, fields=INDEX_FIELDS, cache=cache, converter=converter,
+        known_versions=index.versions()
+    ):
+        stats["checked"] += 1
+        listed.append(page["id"])
+        if page.get("unchanged"):
+            stats["unchanged"] += 1
+        elif "error" in page:
+            stats["failed"] += 1
+            print(f"⚠️  {page['id']} {page['title']}: {page['error']}", file=sys.stderr)
+        else:
+            index.add(page, source="api")
+            stats["indexed"] += 1
+            print(f"🔎 [{stats['indexed']}] {page['title']}", file=sys.stderr)
+            if stats["indexed"] % 100 == 0:
+                index.commit()
+    stats["removed"] = index.update_scope(cql, listed)
+    index.commit()
+    return stats
+
+
+def index_export(config: WikiConfig, index: PageIndex, output_dir: str) -> dict:
+    """把 export 生成的本地镜像写入索引（不访问网络）
+
+    清单中没有标签信息，导出的页面索引后 labels 为空；Storage Format 镜像
+    会先转换为 Markdown。空间取导出的空间，以页面为根的导出取清单中记录的
+    根页面空间（旧版清单没有记录时沿用索引中根页面已有的空间）。
+
+    Returns:
+        统计 {"checked", "indexed", "unchanged", "missing"}
+    """
+    manifest = ExportManifest(output_dir)
+    if not manifest.pages:
+        raise ValueError(f"{output_dir} 中没有导出清单，请先运行 export")
+
+    known = index.versions()
+    root = manifest.data["root"]
+    space = root.get("space") or manifest.data.get("space") or index.space_of(root.get("page_id"))
+    stats = {"checked": 0, "indexed": 0, "unchanged": 0, "missing": 0}
+    for page_id, entry in manifest.pages.items():
+        stats["checked"] += 1
+        if known.get(page_id) == entry.get("version"):
+            stats["unchanged"] += 1
+            continue
+        file_path = manifest.file_path(entry["path"])
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                content = f.read()
+        except FileNotFoundError:
+            stats["missing"] += 1
+            continue
+        if manifest.data.get("format") != "markdown":
+            content = html_to_markdown(content)
+        index.add({
+            "id": page_id,
+            "title": entry["title"],
+            "url": f"{config.base_url}/pages/viewpage.action?pageId={page_id}",
+            "space": space,
+            "version": entry.get("version", 0),
+            "content": content
+        }, source="export")
+        stats["indexed"] += 1
+    index.commit()
+    return stats
+
+
+def index_cached_pages(index: PageIndex, cache: PageCache) -> dict:
+    """把页面缓存中的 Markdown 页面写入索引（不访问网络）
+
+    Returns:
+        统计 {"checked", "indexed", "unchanged"}
+    """
+    stats = {"checked": 0, "indexed": 0, "unchanged": 0}
+    for page in cache.iter_pages("markdown"):
+        stats["checked"] += 1
+        if index.add(page, source="cache"):
+            stats["indexed"] += 1
+        else:
+            stats["unchanged"] += 1
+    index.commit()
+    return stats
+
+
+# ============================================================================
+# CLI 接口
+# ============================================================================
+
+# 常驻服务器中跨命令复用的连接池和页面缓存（普通 CLI 运行时为 None）
+_resident_clients: Optional[dict] = None
+_resident_caches: Optional[dict] = None
+
+# 常驻服务器中每个 Wiki 的页面缓存在内存中保留的页面数
+RESIDENT_CACHE_ENTRIES = 256
+
+
+def page_cache(config: WikiConfig) -> PageCache:
+    """本次命令使用的页面缓存（常驻服务器中按 Wiki 共享，并启用内存层）"""
+    if _resident_caches is None:
+        return PageCache(config)
+    cache = _resident_caches.get(config.base_url)
+    if cache is None:
+        cache = _resident_caches[config.base_url] = PageCache(
+            config, memory_entries=RESIDENT_CACHE_ENTRIES
+        )
+    cache.hits = cache.misses = cache.evictions = 0
+    return cache
+
+
+@contextlib.asynccontextmanager
+async def open_client(config: WikiConfig, args) -> AsyncIterator[WikiClient]:
+    """根据命令行参数创建本次运行共享的 WikiClient，结束时报告重试/限流统计
+
+    在常驻服务器中，相同配置的命令复用同一个 WikiClient（连接池保持热状态），
+    命令结束时不关闭。
+    """
+    options = dict(
+        http2=getattr(args, "http2", False),
+        compress=not getattr(args, "no_compress", False),
+        rate_limit=getattr(args, "rate_limit", None),
+        max_retries=getattr(args, "max_retries", None)
+    )
+    if _resident_clients is not None:
+        key = (config.base_url, config.token, *sorted(options.items()))
+        client = _resident_clients.get(key)
+        if client is None:
+            client = _resident_clients[key] = WikiClient(config, **options)
+        client.stats.update(requests=0, retries=0, throttled=0, wait_seconds=0.0)
+    else:
+        client = WikiClient(config, **options)
+    try:
+        yield client
+    finally:
+        if _resident_clients is None:
+            await client.aclose()
+        stats = client.stats_summary()
+        if stats["retries"] or stats["throttled"] or stats["wait_seconds"]:
+            print(
+                f"📊 请求 {stats['requests']} 次，重试 {stats['retries']} 次，"
+                f"限流 {stats['throttled']} 次，等待 {stats['wait_seconds']:.1f} 秒，"
+                f"当前并发上限 {stats['concurrency_limit']}",
+                file=sys.stderr
+            )
+
+
+@contextlib.contextmanager
+def tracing(args):
+    """按 --trace/--metrics 启用追踪，命令结束（包括出错退出）时输出结果"""
+    trace_path = getattr(args, "trace", None)
+    metrics = getattr(args, "metrics", None)
+    if not trace_path and not metrics:
+        yield None
+        return
+
+    tracer = Tracer()
+    try:
+        with tracer.activate(), tracer.span(f"command.{args.command}"):
+            yield tracer
+    finally:
+        if trace_path:
+            tracer.save(trace_path)
+            print(f"📈 追踪已保存到: {trace_path}（{len(tracer.spans)} 个 span）", file=sys.stderr)
+        if metrics:
+            text = json.dumps(tracer.summary(), ensure_ascii=False, indent=2)
+            if metrics == "-":
+                print(text, file=sys.stderr)
+            else:
+                with open(metrics, 'w', encoding='utf-8') as f:
+                    f.write(text + "\n")
+                print(f"📈 耗时汇总已保存到: {metrics}", file=sys.stderr)
+
+
+def _read_page_refs(args) -> list:
+    """汇总命令行中的页面 ID / URL（--page-id、--url、--input-file）
+
+    --input-file 可以是每行一个 ID/URL 的文本文件，也可以是 export 生成的
+    目录或其中的 manifest.json（取清单中的所有页面）。
+    """
+    refs = list(args.page_id or []) + list(args.url or [])
+    if args.input_file:
+        if args.input_file == '-':
+            text = sys.stdin.read()
+        elif os.path.isdir(args.input_file):
+            manifest = ExportManifest(args.input_file)
+            if not manifest.pages:
+                raise ValueError(f"{args.input_file} 中没有导出清单")
+            return refs + list(manifest.pages)
+        else:
+            with open(args.input_file, 'r', encoding='utf-8') as f:
+                text = f.read()
+        if text.lstrip().startswith('{'):
+            pages = json.loads(text).get("pages")
+            if not isinstance(pages, dict):
+                raise ValueError(f"{args.input_file} 不是 export 生成的 manifest.json")
+            return refs + list(pages)
+        refs.extend(
+            line.strip() for line in text.splitlines()
+            if line.strip() and not line.strip().startswith('#')
+        )
+    return refs
+
+
+def _save_page_content(result: dict, output_dir: str, format: str) -> None:
+    """把页面正文写入 <目录>/<页面ID>.md|.html，结果中用 output 字段代替 content"""
+    extension = "md" if format == "markdown" else "html"
+    path = os.path.join(output_dir, f"{result['id']}.{extension}")
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(result.pop("content"))
+    result["output"] = path
+
+
+async def _get_many(config: WikiConfig, args, refs: list, fields, cache, converter) -> int:
+    """并发获取多个页面，每完成一个输出一行 NDJSON，返回失败数量"""
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    failures = 0
+    async with open_client(config, args) as client:
+        async for result in iter_wiki_pages(
+            config, refs, format=args.format, concurrency=args.concurrency,
+            client=client, fields=fields, cache=cache, converter=converter
+        ):
+            if "error" in result:
+                failures += 1
+            elif args.output_dir and "content" in result:
+                _save_page_content(result, args.output_dir, args.format)
+            print(json.dumps(result, ensure_ascii=False), flush=True)
+
+    if cache is not None:
+        print(json.dumps({"cache": cache.stats()}, ensure_ascii=False), file=sys.stderr)
+    return failures
+
+
+async def cmd_get(args):
+    """获取页面内容命令"""
+    config = WikiConfig()
+
+    try:
+        fields = args.fields.split(",") if args.fields else None
+        if args.metadata_only:
+            fields = [f for f in (fields or PAGE_FIELDS) if f != "content"]
+        cache = None if args.no_cache else page_cache(config)
+        converter = ConversionPool(args.convert_mode)
+
+        refs = _read_page_refs(args)
+        if not refs:
+            raise ValueError("必须提供 --page-id、--url 或 --input-file")
+
+        # 多个页面（或显式要求 NDJSON / 输出目录）时并发获取并流式输出
+        if len(refs) > 1 or args.ndjson or args.output_dir:
+            if args.output:
+                raise ValueError("多页面获取请使用 --output-dir 代替 --output")
+            with converter:
+                failures = await _get_many(config, args, refs, fields, cache, converter)
+            if failures:
+                sys.exit(1)
+            return
+
+        ref = refs[0]
+        with converter:
+            async with open_client(config, args) as client:
+                result = await get_wiki_page_content(
+                    config,
+                    page_id=ref if ref.isdigit() else None,
+                    page_url=None if ref.isdigit() else ref,
+                    format=args.format,
+                    client=client,
+                    fields=fields,
+                    cache=cache,
+                    converter=converter
+                )
+
+        if cache is not None and "cache" in result:
+            result["cache"] = {"status": result["cache"], **cache.stats()}
+
+        if args.output and "content" in result:
+            # 写出后不再保留正文（--json 输出中用 output 字段代替 content）
+            with open(args.output, 'w', encoding='utf-8') as f:
+                f.write(result.pop("content"))
+            result["output"] = args.output
+            print(f"✅ 内容已保存到: {args.output}")
+
+        if args.json:
+            print(json.dumps(result, ensure_ascii=False, indent=2))
+        else:
+            print(f"📄 标题: {result['title']}")
+            print(f"🔗 URL: {result['url']}")
+            if "space" in result:
+                print(f"📁 空间: {result['space']}")
+            if "version" in result:
+                print(f"📌 版本: {result['version']}")
+                print(f"👤 最后更新: {result['last_updated_by']} ({result['last_updated']})")
+            if result.get('labels'):
+                print(f"🏷️  标签: {', '.join(result['labels'])}")
+            if result.get('attachments'):
+                print(f"📎 附件数: {len(result['attachments'])}")
+            if "content" in result and not args.output:
+                print(f"\n--- 内容 ---\n{result['content']}")
+
+    except Exception as e:
+        print(f"❌ 错误: {e}", file=sys.stderr)
+        sys.exit(1)
+
 
-    if not space_key:
-        raise ValueError("必须提供空间 key")
+def _build_search_cql(args) -> str:
+    """由 search 命令的 CQL 和 --text/--space 组合出查询语句"""
+    clauses = []
+    if args.cql:
+        clauses.append(f"({args.cql})")
+    if args.text:
+        escaped = args.text.replace('\\', '\\\\').replace('"', '\\"')
+        clauses.append(f'text ~ "{escaped}"')
+    if args.space:
+        clauses.append(f'space = "{args.space}"')
+    if not clauses:
+        raise ValueError("必须提供 CQL 查询语句或 --text")
+    return " and ".join(clauses)
 
-    # 1. 处理内容格式
-    if format == "markdown":
-        if markdown is None:
-            raise RuntimeError("需要安装 markdown 库: pip install markdown")
-        content_html = markdown.markdown(content, extensions=['extra', 'nl2br'])
-    else:  # html
-        content_html = content
 
-    # 2. 计算内容大小
-    content_bytes = content_html.encode('utf-8')
-    total_size = len(content_bytes)
+async def cmd_search(args):
+    """CQL 搜索命令（逐条输出 NDJSON）"""
+    config = WikiConfig()
 
-    # 3. 如果内容不超过限制，直接创建
-    if total_size <= chunk_size:
-        result = await create_wiki_page(
-            config=config,
-            title=title,
-            content=content_html,
-            space_key=space_key,
-            format="html",  # 已经转换过了
-            parent_page_id=parent_page_id
-        )
-        result["chunked"] = False
-        result["total_size"] = total_size
-        result["chunks"] = 1
-        return result
+    try:
+        cql = _build_search_cql(args)
+        fields = args.fields.split(",") if args.fields else None
+        with_content = args.content or bool(args.output_dir)
+        cache = None if args.no_cache or not with_content else page_cache(config)
+        if args.output_dir:
+            os.makedirs(args.output_dir, exist_ok=True)
+
+        count = failures = 0
+        with ConversionPool(args.convert_mode) as converter:
+            async with open_client(config, args) as client:
+                async for result in search_wiki_pages(
+                    config, cql, format=args.format, with_content=with_content,
+                    concurrency=args.concurrency, client=client, fields=fields,
+                    cache=cache, converter=converter, max_results=args.limit
+                ):
+                    count += 1
+                    if "error" in result:
+                        failures += 1
+                    elif args.output_dir and "content" in result:
+                        _save_page_content(result, args.output_dir, args.format)
+                    print(json.dumps(result, ensure_ascii=False), flush=True)
+
+        summary = {"results": count, "failures": failures}
+        if cache is not None:
+            summary["cache"] = cache.stats()
+        print(json.dumps({"search": summary}, ensure_ascii=False), file=sys.stderr)
+        if failures:
+            sys.exit(1)
+
+    except Exception as e:
+        print(f"❌ 错误: {e}", file=sys.stderr)
+        sys.exit(1)
 
-    # 4. 内容过长，需要分批处理
-    print(f"📦 内容大小 {total_size} 字节超过限制 {chunk_size} 字节，将分批创建...")
 
-    # 5. 将内容分割成多个批次（智能切分，保证 HTML 完整性）
-    chunks = []
-    offset = 0
-    while offset < total_size:
-        chunk_end = min(offset + chunk_size, total_size)
-        chunk_bytes = content_bytes[offset:chunk_end]
+def _print_index_stats(label: str, stats: dict) -> None:
+    details = "，".join(f"{key} {value}" for key, value in stats.items() if key != "checked")
+    print(f"📚 {label}: 检查 {stats['checked']} 个页面（{details}）")
 
-        # 首先尝试 UTF-8 解码
-        chunk_text = None
-        try:
-            chunk_text = chunk_bytes.decode('utf-8')
-        except UnicodeDecodeError:
-            # 回退到前一个完整字符
-            while chunk_end > offset:
-                chunk_end -= 1
-                chunk_bytes = content_bytes[offset:chunk_end]
-                try:
-                    chunk_text = chunk_bytes.decode('utf-8')
-                    break
-                except UnicodeDecodeError:
-                    continue
 
-        if chunk_text is None:
-            raise RuntimeError("无法正确分割 UTF-8 内容")
-
-        # 如果不是最后一块，尝试在 HTML 标签边界处切分（优化切分点）
-        if chunk_end < total_size:
-            # 尝试找到最近的闭合标签作为切分点（</p>, </li>, </td> 等）
-            # 按优先级查找：</p> > </li> > </td> > </div>
-            for tag in ['</p>', '</li>', '</td>', '</div>']:
-                last_tag_pos = chunk_text.rfind(tag)
-                if last_tag_pos > 0 and last_tag_pos > len(chunk_text) // 2:  # 至少在中点之后
-                    # 从标签后面开始下一块
-                    chunk_text = chunk_text[:last_tag_pos + len(tag)]
-                    chunk_end = offset + len(chunk_text.encode('utf-8'))
-                    break
+async def cmd_index(args):
+    """建立/更新本地全文索引命令"""
+    config = WikiConfig()
 
-        chunks.append(chunk_text)
-        offset = chunk_end
+    try:
+        scopes = list(args.cql or [])
+        if args.space:
+            scopes.append(_index_scope_cql(space_key=args.space))
+        if args.page_id:
+            scopes.append(_index_scope_cql(root_page_id=args.page_id))
+        if not scopes and not args.export and not args.from_cache and not args.stats:
+            raise ValueError("必须提供 --space、--page-id、--cql、--export 或 --from-cache")
+
+        failed = 0
+        with PageIndex(config, args.index) as index:
+            for output_dir in args.export or []:
+                _print_index_stats(f"导出目录 {output_dir}", index_export(config, index, output_dir))
+            if args.from_cache:
+                _print_index_stats("页面缓存", index_cached_pages(index, PageCache(config)))
+            if scopes:
+                cache = None if args.no_cache else page_cache(config)
+                with ConversionPool(args.convert_mode) as converter:
+                    async with open_client(config, args) as client:
+                        for cql in scopes:
+                            stats = await index_pages(
+                                config, index, cql, concurrency=args.concurrency,
+                                client=client, cache=cache, converter=converter
+                            )
+                            _print_index_stats(cql, stats)
+                            failed += stats["failed"]
+            stats = index.stats()
+
+        print(f"✅ 索引: {stats['path']}（{stats['pages']} 个页面，"
+              f"{stats['bytes'] / 1024 / 1024:.1f}MB，分词器 {stats['tokenizer']}）")
+        if failed:
+            sys.exit(1)
 
-    print(f"📊 内容已分为 {len(chunks)} 批")
+    except Exception as e:
+        print(f"❌ 错误: {e}", file=sys.stderr)
+        sys.exit(1)
 
-    # 6. 创建页面（使用第一批内容）
-    print(f"📝 创建页面（第 1/{len(chunks)} 批，{len(chunks[0].encode('utf-8'))} 字节）...")
-    result = await create_wiki_page(
-        config=config,
-        title=title,
-        content=chunks[0],
-        space_key=space_key,
-        format="html",
-        parent_page_id=parent_page_id
-    )
 
-    page_id = result["id"]
-    print(f"✅ 页面已创建，ID: {page_id}")
+def cmd_query(args):
+    """查询本地全文索引命令"""
+    config = WikiConfig()
 
-    # 7. 追加剩余内容
-    for i, chunk in enumerate(chunks[1:], start=2):
-        print(f"📝 追加内容（第 {i}/{len(chunks)} 批，{len(chunk.encode('utf-8'))} 字节）...")
-        await update_wiki_page_content(
-            config=config,
-            page_id=page_id,
-            content=chunk,
-            format="html",
-            append=True
-        )
-        print(f"✅ 第 {i} 批已追加")
+    try:
+        index_path = args.index or default_index_path(config)
+        if not os.path.exists(index_path):
+            raise ValueError(f"索引不存在: {index_path}（请先运行 index）")
 
-    # 8. 返回最终结果
-    print(f"🎉 所有内容已成功添加到页面")
-    result["chunked"] = True
-    result["total_size"] = total_size
-    result["chunks"] = len(chunks)
-    result["message"] = f"页面已成功创建（分 {len(chunks)} 批添加内容，总大小 {total_size} 字节），ID: {page_id}"
+        with PageIndex(config, index_path) as index:
+            results = index.query(" ".join(args.terms), space=args.space, label=args.label,
+                                  limit=args.limit)
 
-    return result
+        if args.json:
+            for result in results:
+                print(json.dumps(result, ensure_ascii=False))
+            return
+        if not results:
+            print("ℹ️  没有匹配的页面")
+            return
+        for rank, result in enumerate(results, 1):
+            print(f"{rank}. 📄 {result['title']}（{result['space']}，版本 {result['version']}，"
+                  f"得分 {result['score']}）")
+            print(f"   🔗 {result['url']}")
+            print(f"   {' '.join(result['snippet'].split())}")
 
+    except Exception as e:
+        print(f"❌ 错误: {e}", file=sys.stderr)
+        sys.exit(1)
 
-# ============================================================================
-# CLI 接口
-# ============================================================================
 
-async def cmd_get(args):
-    """获取页面内容命令"""
+async def cmd_head(args):
+    """轻量探测页面版本命令"""
     config = WikiConfig()
 
     try:
-        result = await get_wiki_page_content(
-            config,
-            page_id=args.page_id,
-            page_url=args.url,
-            format=args.format
-        )
-
-        if args.output:
-            with open(args.output, 'w', encoding='utf-8') as f:
-                f.write(result["content"])
-            print(f"✅ 内容已保存到: {args.output}")
+        async with open_client(config, args) as client:
+            result = await get_wiki_page_version(
+                config,
+                page_id=args.page_id,
+                page_url=args.url,
+                client=client
+            )
 
         if args.json:
             print(json.dumps(result, ensure_ascii=False, indent=2))
         else:
             print(f"📄 标题: {result['title']}")
-            print(f"🔗 URL: {result['url']}")
-            print(f"📁 空间: {result['space']}")
             print(f"📌 版本: {result['version']}")
             print(f"👤 最后更新: {result['last_updated_by']} ({result['last_updated']})")
-            if result['labels']:
-                print(f"🏷️  标签: {', '.join(result['labels'])}")
-            if result['attachments']:
-                print(f"📎 附件数: {len(result['attachments'])}")
-            if not args.output:
-                print(f"\n--- 内容 ---\n{result['content']}")
+
+    except Exception as e:
+        print(f"❌ 错误: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+def _print_label_result(result: dict) -> None:
+    name = f"{result['id']} {result['title']}" if result.get("title") else result["id"]
+    if "error" in result:
+        print(f"❌ {name}: {result['error']}")
+        return
+    changes = " ".join([f"+{label}" for label in result["added"]] +
+                       [f"-{label}" for label in result["removed"]])
+    if result["status"] == "unchanged":
+        print(f"⏭️  {name}: 无需修改")
+    elif result["status"] == "planned":
+        print(f"📝 {name}: {changes}")
+    else:
+        print(f"✅ {name}: {changes}")
+
+
+async def cmd_labels(args):
+    """批量修改页面标签命令"""
+    config = WikiConfig()
+
+    try:
+        names = parse_label_names(args.labels)
+        if args.action != 'set' and not names:
+            raise ValueError("至少需要提供一个标签")
+        refs = _read_page_refs(args)
+        if not refs and not args.cql:
+            raise ValueError("必须提供 --page-id、--url、--input-file 或 --cql")
+
+        counts = collections.Counter()
+        async with open_client(config, args) as client:
+            targets = await collect_label_targets(config, refs, cql=args.cql, client=client)
+            async for result in bulk_update_labels(
+                config, targets,
+                add=names if args.action == 'add' else (),
+                remove=names if args.action == 'remove' else (),
+                replace=names if args.action == 'set' else None,
+                concurrency=args.concurrency, client=client, dry_run=args.dry_run
+            ):
+                counts["failed" if "error" in result else result["status"]] += 1
+                if args.json:
+                    print(json.dumps(result, ensure_ascii=False), flush=True)
+                else:
+                    _print_label_result(result)
+
+        verb = "将修改" if args.dry_run else "已修改"
+        print(f"🏷️  共 {sum(counts.values())} 个页面：{verb} "
+              f"{counts['changed'] + counts['planned']}，无需修改 {counts['unchanged']}，"
+              f"失败 {counts['failed']}", file=sys.stderr)
+        if counts["failed"]:
+            sys.exit(1)
+
+    except Exception as e:
+        print(f"❌ 错误: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+async def cmd_history(args):
+    """列出页面版本历史命令"""
+    config = WikiConfig()
+
+    try:
+        page_id = args.page_id or (extract_page_id(args.url) if args.url else None)
+        if not page_id:
+            raise ValueError("必须提供 --page-id 或 --url")
+
+        async with open_client(config, args) as client:
+            async for entry in iter_page_history(config, page_id, client=client,
+                                                 limit=args.limit):
+                if args.json:
+                    print(json.dumps(entry, ensure_ascii=False), flush=True)
+                else:
+                    message = f"  {entry['message']}" if entry["message"] else ""
+                    minor = " (小修改)" if entry["minor_edit"] else ""
+                    print(f"v{entry['number']:<5} {entry['when']}  {entry['by']}{minor}{message}",
+                          flush=True)
+
+    except Exception as e:
+        print(f"❌ 错误: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+async def cmd_diff(args):
+    """比较页面版本差异命令"""
+    config = WikiConfig()
+
+    try:
+        page_id = args.page_id or (extract_page_id(args.url) if args.url else None)
+        if not page_id:
+            raise ValueError("必须提供 --page-id 或 --url")
+
+        cache = None if args.no_cache else VersionCache(config)
+        async with open_client(config, args) as client:
+            latest = None
+            to_version = args.to_version
+            if to_version is None:
+                latest = (await get_wiki_page_version(config, page_id=page_id,
+                                                      client=client))["version"]
+                to_version = latest
+            from_version = args.from_version
+            if from_version is None:
+                from_version = 1 if args.each else to_version - 1
+            if from_version < 1 or from_version >= to_version:
+                raise ValueError(f"无效的版本范围: {from_version} → {to_version}")
+
+            if args.each:
+                pairs = [(n, n + 1) for n in range(from_version, to_version)]
+            else:
+                pairs = [(from_version, to_version)]
+
+            with ConversionPool(args.convert_mode) as converter:
+                results = await diff_page_versions(
+                    config, page_id, pairs, format=args.format, context=args.context,
+                    client=client, cache=cache, converter=converter,
+                    concurrency=args.concurrency, latest=latest
+                )
+
+        for result in results:
+            if args.json:
+                if args.stat:
+                    result = {k: v for k, v in result.items() if k != "diff"}
+                print(json.dumps(result, ensure_ascii=False))
+                continue
+            message = f"  {result['message']}" if result["message"] else ""
+            print(f"🔀 v{result['from']} → v{result['to']}  "
+                  f"+{result['added']} -{result['removed']}{message}")
+            if not args.stat and result["diff"]:
+                print(result["diff"])
+                print()
+
+        if cache is not None:
+            print(f"📦 获取 {cache.misses} 个版本，缓存命中 {cache.hits} 个", file=sys.stderr)
 
     except Exception as e:
         print(f"❌ 错误: {e}", file=sys.stderr)
@@ -640,25 +5660,48 @@ async def cmd_update(args):
         if not page_id:
             raise ValueError("必须提供 --page-id 或 --url")
 
+        # 大 HTML 文件覆盖写入时流式发送，不读入内存（需要去重时除外）
+        stream = (args.file and not args.content and args.format == "html"
+                  and not args.append and not args.queue and not args.hash_manifest
+                  and os.path.getsize(args.file) > STREAM_UPDATE_BYTES)
+
         # 读取内容
         content = None
         if args.content:
             content = args.content
-        elif args.file:
+        elif args.file and not stream:
             with open(args.file, 'r', encoding='utf-8') as f:
                 content = f.read()
 
-        # 执行更新
-        result = await update_wiki_page_content(
-            config,
-            page_id=page_id,
-            content=content,
-            title=args.title,
-            format=args.format,
-            append=args.append
-        )
+        if args.queue:
+            await _queue_update(config, args, page_id, content)
+            return
 
-        print(f"✅ {result['message']}")
+        hash_manifest = HashManifest(args.hash_manifest) if args.hash_manifest else None
+
+        # 执行更新
+        async with open_client(config, args) as client:
+            if stream:
+                result = await update_wiki_page_from_file(
+                    config, page_id, args.file, title=args.title, client=client
+                )
+            else:
+                result = await update_wiki_page_content(
+                    config,
+                    page_id=page_id,
+                    content=content,
+                    title=args.title,
+                    format=args.format,
+                    append=args.append,
+                    client=client,
+                    hash_manifest=hash_manifest
+                )
+
+        if hash_manifest is not None:
+            hash_manifest.save()
+
+        icon = "⏭️" if result["status"] == "skipped" else "✅"
+        print(f"{icon} {result['message']}")
         print(f"📄 标题: {result['title']}")
         print(f"🔗 URL: {result['url']}")
         print(f"📌 版本: {result['version']}")
@@ -669,18 +5712,129 @@ async def cmd_update(args):
         sys.exit(1)
 
 
+async def _queue_update(config: WikiConfig, args, page_id: str, content: Optional[str]) -> None:
+    """update --append --queue：加入追加队列，未达到阈值时交给后台进程延迟发送"""
+    if not args.append or not content:
+        raise ValueError("--queue 需要与 --append 和 --content/--file 一起使用")
+    if args.title:
+        raise ValueError("--queue 不支持修改标题")
+
+    journal = AppendJournal(config)
+    async with open_client(config, args) as client:
+        result = await queue_append(
+            config, page_id, content, format=args.format, journal=journal, client=client,
+            flush_bytes=args.flush_bytes, flush_delay=args.flush_delay
+        )
+
+    if result["status"] == "queued":
+        _spawn_append_flusher(journal, page_id, args.flush_delay)
+        print(f"🕒 已加入追加队列（待发送 {result['entries']} 条，{result['bytes']} 字节），"
+              f"稍后合并发送")
+        return
+
+    icon = "⏭️" if result["status"] == "skipped" else "✅"
+    print(f"{icon} {result['message']}")
+    print(f"📦 合并发送 {result['entries']} 条追加（{result['bytes']} 字节，"
+          f"变基 {result['rebases']} 次）")
+    print(f"🔗 URL: {result['url']}")
+    print(f"📌 版本: {result['version']}")
+
+
+def _spawn_append_flusher(journal: AppendJournal, page_id: str,
+                          flush_delay: Optional[float]) -> None:
+    """启动后台进程，在等待时间到达后发送页面的追加队列（已有等待进程时不启动）"""
+    import subprocess
+
+    with journal.waiter_lock(page_id) as free:
+        if not free:
+            return
+    argv = [sys.executable, os.path.abspath(__file__), "flush", "--page-id", page_id, "--wait"]
+    if flush_delay is not None:
+        argv += ["--flush-delay", str(flush_delay)]
+    # 后台进程会等待较长时间，不能经常驻服务器执行（服务器串行执行命令）
+    subprocess.Popen(
+        argv, env=dict(os.environ, WIKI_NO_SERVER="1"), stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True
+    )
+
+
+async def _flush_when_due(
+    config: WikiConfig,
+    journal: AppendJournal,
+    page_id: str,
+    flush_delay: float,
+    client: WikiClient
+) -> list:
+    """等到最早的待发送内容到期后发送，直到队列清空（每个页面只有一个等待进程）"""
+    results = []
+    while True:
+        with journal.waiter_lock(page_id) as acquired:
+            if not acquired:
+                return results
+            while True:
+                status = journal.status(page_id)
+                if not status["entries"]:
+                    break
+                await asyncio.sleep(max(0.0, status["oldest"] + flush_delay - time.time()))
+                results.append(await flush_appends(config, page_id, journal, client))
+        # 释放锁前后可能有新内容加入（对应的进程因锁被占用已退出），再检查一次
+        if not journal.status(page_id)["entries"]:
+            return results
+
+
+async def cmd_flush(args):
+    """发送追加队列命令"""
+    config = WikiConfig()
+
+    try:
+        journal = AppendJournal(config)
+        page_id = args.page_id or (extract_page_id(args.url) if args.url else None)
+        page_ids = [page_id] if page_id else journal.pending_pages()
+        flush_delay = args.flush_delay
+        if flush_delay is None:
+            flush_delay = float(os.getenv("WIKI_APPEND_FLUSH_DELAY", APPEND_FLUSH_DELAY))
+
+        async with open_client(config, args) as client:
+            if args.wait:
+                batches = await asyncio.gather(*(
+                    _flush_when_due(config, journal, page_id, flush_delay, client)
+                    for page_id in page_ids
+                ))
+                results = [result for batch in batches for result in batch]
+            else:
+                results = [await flush_appends(config, page_id, journal, client)
+                           for page_id in page_ids]
+
+        results = [result for result in results if result["status"] != "empty"]
+        if not results:
+            print("📭 追加队列为空")
+        for result in results:
+            if result["status"] == "skipped":
+                print(f"⏭️  页面 {result['id']}: {result['entries']} 条追加已在页面中"
+                      f"（版本 {result['version']}），已从队列移除")
+                continue
+            print(f"✅ 页面 {result['id']}: 合并 {result['entries']} 条追加"
+                  f"（{result['bytes']} 字节）→ 版本 {result['version']}，"
+                  f"变基 {result['rebases']} 次")
+
+    except Exception as e:
+        print(f"❌ 错误: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
 async def cmd_create(args):
     """创建页面命令"""
     config = WikiConfig()
 
     try:
-        # 读取内容
+        # 读取内容（分批创建时文件按块流式读取，不整体读入内存）
         content = None
         if args.content:
             content = args.content
         elif args.file:
-            with open(args.file, 'r', encoding='utf-8') as f:
-                content = f.read()
+            if not args.chunk_size:
+                with open(args.file, 'r', encoding='utf-8') as f:
+                    content = f.read()
         else:
             raise ValueError("必须提供 --content 或 --file")
 
@@ -694,25 +5848,39 @@ async def cmd_create(args):
         parent_page_id = parent_page_id if parent_page_id else None
 
         # 执行创建（如果指定了 chunk_size 则使用分批创建）
-        if args.chunk_size:
-            result = await create_wiki_page_with_chunks(
-                config,
-                title=args.title,
-                content=content,
-                space_key=space_key,
-                format=args.format,
-                parent_page_id=parent_page_id,
-                chunk_size=args.chunk_size
-            )
-        else:
-            result = await create_wiki_page(
-                config,
-                title=args.title,
-                content=content,
-                space_key=space_key,
-                format=args.format,
-                parent_page_id=parent_page_id
-            )
+        async with open_client(config, args) as client:
+            if args.chunk_size and content is None:
+                result = await create_wiki_page_from_file(
+                    config,
+                    title=args.title,
+                    path=args.file,
+                    space_key=space_key,
+                    format=args.format,
+                    parent_page_id=parent_page_id,
+                    chunk_size=args.chunk_size,
+                    client=client
+                )
+            elif args.chunk_size:
+                result = await create_wiki_page_with_chunks(
+                    config,
+                    title=args.title,
+                    content=content,
+                    space_key=space_key,
+                    format=args.format,
+                    parent_page_id=parent_page_id,
+                    chunk_size=args.chunk_size,
+                    client=client
+                )
+            else:
+                result = await create_wiki_page(
+                    config,
+                    title=args.title,
+                    content=content,
+                    space_key=space_key,
+                    format=args.format,
+                    parent_page_id=parent_page_id,
+                    client=client
+                )
 
         print(f"✅ {result['message']}")
         print(f"📄 标题: {result['title']}")
@@ -724,13 +5892,283 @@ async def cmd_create(args):
         # 显示分批信息
         if result.get('chunked'):
             print(f"📦 分批创建: {result['chunks']} 批，总大小: {result['total_size']} 字节")
+            print(f"📡 传输: 发送 {result['bytes_sent']} 字节，接收 {result['bytes_received']} 字节")
+
+    except Exception as e:
+        print(f"❌ 错误: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+async def cmd_export(args):
+    """导出页面树命令"""
+    config = WikiConfig()
+
+    try:
+        if not args.page_id and not args.space:
+            raise ValueError("必须提供 --page-id 或 --space")
+
+        async with open_client(config, args) as client:
+            stats = await export_page_tree(
+                config,
+                output_dir=args.output_dir,
+                root_page_id=args.page_id,
+                space_key=args.space,
+                format=args.format,
+                concurrency=args.concurrency,
+                client=client
+            )
+
+        print(f"✅ 导出完成: {args.output_dir}")
+        print(f"📄 页面总数: {stats['pages']}（下载 {stats['fetched']}，未变化跳过 {stats['skipped']}）")
+        if stats['moved'] or stats['removed']:
+            print(f"🔀 移动 {stats['moved']}，🗑️  删除 {stats['removed']}")
+        print(f"📋 清单: {stats['manifest']}")
+
+    except Exception as e:
+        print(f"❌ 错误: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+async def cmd_sync(args):
+    """增量同步本地镜像命令"""
+    config = WikiConfig()
+
+    try:
+        async with open_client(config, args) as client:
+            stats = await sync_page_tree(
+                config,
+                output_dir=args.output_dir,
+                concurrency=args.concurrency,
+                full=args.full,
+                prune=not args.no_prune,
+                client=client
+            )
+
+        print(f"✅ 同步完成: {args.output_dir}")
+        print(f"📄 变化页面: {stats['changed']}（新增 {stats['added']}，下载 {stats['fetched']}）")
+        print(f"🔀 移动 {stats['moved']}，🗑️  删除 {stats['removed']}，当前共 {stats['pages']} 个页面")
+
+    except Exception as e:
+        print(f"❌ 错误: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+async def cmd_push(args):
+    """发布本地目录命令"""
+    config = WikiConfig()
+
+    try:
+        parent_id = args.parent_id
+        if args.parent_url and not parent_id:
+            parent_id = extract_page_id(args.parent_url)
+
+        if not parent_id:
+            raise ValueError("必须提供 --parent-id 或 --parent-url")
+
+        hash_manifest = HashManifest(args.hash_manifest) if args.hash_manifest else None
+
+        async with open_client(config, args) as client:
+            try:
+                stats = await push_directory(
+                    config,
+                    source_dir=args.source_dir,
+                    parent_page_id=parent_id,
+                    concurrency=args.concurrency,
+                    hash_manifest=hash_manifest,
+                    title_prefix=args.title_prefix,
+                    client=client
+                )
+            finally:
+                if hash_manifest is not None:
+                    hash_manifest.save()
+
+        for page in stats["pages"]:
+            if page["status"] == "failed":
+                print(f"❌ {page['path']}: {page['error']}", file=sys.stderr)
+
+        print(f"✅ 发布完成: {args.source_dir}")
+        print(f"📄 新建 {stats['created']}，更新 {stats['updated']}，未变化跳过 {stats['skipped']}")
+        if stats['failed']:
+            print(f"❌ 失败 {stats['failed']}，因父页面失败未处理 {stats['blocked']}", file=sys.stderr)
+            sys.exit(1)
+
+    except Exception as e:
+        print(f"❌ 错误: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+def _print_page_tree(nodes: list, describe) -> None:
+    """按层级缩进打印 walk_page_tree 返回的页面树（子页面紧跟在父页面之后）"""
+    children = collections.defaultdict(list)
+    for node in nodes[1:]:
+        children[node["parent"]].append(node)
+
+    def show(node: dict) -> None:
+        print(f"{'  ' * node['depth']}📄 {describe(node)}")
+        for child in children[node["id"]]:
+            show(child)
+
+    show(nodes[0])
+
+
+async def cmd_copy_tree(args):
+    """复制页面树命令"""
+    config = WikiConfig()
+
+    try:
+        page_id = args.page_id or (extract_page_id(args.url) if args.url else None)
+        if not page_id:
+            raise ValueError("必须提供 --page-id 或 --url")
+        parent_id = args.parent_id
+        if args.parent_url and not parent_id:
+            parent_id = extract_page_id(args.parent_url)
+        if not parent_id and not args.space:
+            raise ValueError("必须提供 --parent-id、--parent-url 或 --space")
+
+        replacements = [tuple(pair) for pair in args.title_replace or ()]
+        progress_path = args.progress or default_copy_progress_path(config, page_id, {
+            "root": page_id, "parent": parent_id, "space": args.space,
+            "prefix": args.title_prefix, "replace": replacements,
+            "attachments": args.attachments
+        })
+        progress = CopyProgress(progress_path)
+
+        async with open_client(config, args) as client:
+            if args.dry_run:
+                nodes = await walk_page_tree(config, page_id, client=client,
+                                             concurrency=args.concurrency)
+
+                def describe(node: dict) -> str:
+                    title = _copy_title(node["title"], args.title_prefix, replacements)
+                    done = "（已复制，将跳过）" if progress.get(node["id"]).get("copy_id") else ""
+                    return f"{title}{done}"
+
+                _print_page_tree(nodes, describe)
+                target = f"页面 {parent_id}" if parent_id else f"空间 {args.space} 顶层"
+                print(f"📝 将复制 {len(nodes)} 个页面到{target}", file=sys.stderr)
+                return
+
+            def on_page(result: dict) -> None:
+                indent = "  " * result["depth"]
+                if "error" in result:
+                    print(f"❌ {indent}{result['title']}: {result['error']}", flush=True)
+                else:
+                    print(f"✅ {indent}{result['title']} ({result['copy_id']})", flush=True)
+
+            stats = await copy_page_tree(
+                config,
+                page_id,
+                target_parent_id=parent_id,
+                space_key=args.space,
+                title_prefix=args.title_prefix,
+                title_replacements=replacements,
+                attachments=args.attachments,
+                concurrency=args.concurrency,
+                progress=progress,
+                client=client,
+                on_page=on_page
+            )
+
+        print(f"📄 页面总数: {stats['pages']}（新建 {stats['created']}，"
+              f"续传跳过 {stats['resumed']}），附件 {stats['attachments']}，"
+              f"调整顺序 {stats['reordered']}")
+        if stats["failed"]:
+            print(f"❌ 失败 {len(stats['failed'])} 个页面", file=sys.stderr)
+            if progress.pages:
+                print(f"💾 进度已保存到 {progress_path}，重新运行相同命令即可继续",
+                      file=sys.stderr)
+            sys.exit(1)
+        progress.remove()
+        print(f"✅ 复制完成: {stats['url']}")
+
+    except Exception as e:
+        print(f"❌ 错误: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+async def cmd_move_tree(args):
+    """移动页面树命令"""
+    config = WikiConfig()
+
+    try:
+        page_id = args.page_id or (extract_page_id(args.url) if args.url else None)
+        if not page_id:
+            raise ValueError("必须提供 --page-id 或 --url")
+        parent_id = args.parent_id
+        if args.parent_url and not parent_id:
+            parent_id = extract_page_id(args.parent_url)
+        if not parent_id:
+            raise ValueError("必须提供 --parent-id 或 --parent-url")
+
+        async with open_client(config, args) as client:
+            if args.dry_run:
+                nodes = await walk_page_tree(config, page_id, client=client)
+                if parent_id in {node["id"] for node in nodes}:
+                    raise ValueError("不能把页面移动到它自身或其子孙页面下")
+                _print_page_tree(nodes, lambda node: node["title"])
+                print(f"📝 将移动 {len(nodes)} 个页面到页面 {parent_id} 下", file=sys.stderr)
+                return
+
+            result = await move_page_tree(config, page_id, parent_id, client=client)
+
+        print(f"✅ 已移动: {result['title']} → 页面 {result['target']}（空间 {result['space']}）")
+        print(f"🔗 {config.base_url}/pages/viewpage.action?pageId={result['id']}")
+
+    except Exception as e:
+        print(f"❌ 错误: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+async def cmd_attachments(args):
+    """附件下载/上传命令"""
+    config = WikiConfig()
+
+    try:
+        page_id = args.page_id
+        if args.url and not page_id:
+            page_id = extract_page_id(args.url)
+
+        if not page_id:
+            raise ValueError("必须提供 --page-id 或 --url")
+
+        async with open_client(config, args) as client:
+            if args.action == 'pull':
+                stats = await pull_attachments(
+                    config, page_id, args.output_dir,
+                    filenames=args.names or None,
+                    concurrency=args.concurrency,
+                    client=client
+                )
+            else:
+                stats = await push_attachments(
+                    config, page_id, args.paths,
+                    comment=args.comment,
+                    concurrency=args.concurrency,
+                    client=client
+                )
+
+        for item in stats["files"]:
+            if item["status"] == "failed":
+                print(f"❌ {item['filename']}: {item['error']}", file=sys.stderr)
+
+        if args.action == 'pull':
+            print(f"✅ 附件下载完成: {args.output_dir}")
+            print(f"📎 共 {stats['total']} 个（下载 {stats['downloaded']}，未变化跳过 {stats['skipped']}，"
+                  f"{stats['bytes']} 字节）")
+        else:
+            print(f"✅ 附件上传完成")
+            print(f"📎 共 {stats['total']} 个（上传 {stats['uploaded']}，未变化跳过 {stats['skipped']}，"
+                  f"{stats['bytes']} 字节）")
+        if stats['failed']:
+            print(f"❌ 失败 {stats['failed']} 个", file=sys.stderr)
+            sys.exit(1)
 
     except Exception as e:
         print(f"❌ 错误: {e}", file=sys.stderr)
         sys.exit(1)
 
 
-async def cmd_extract_id(args):
+def cmd_extract_id(args):
     """提取页面 ID 命令"""
     try:
         page_id = extract_page_id(args.url)
@@ -740,8 +6178,122 @@ async def cmd_extract_id(args):
         sys.exit(1)
 
 
-def main():
-    """主函数"""
+# 后台启动服务器时等待其就绪的最长时间（秒）
+SERVER_START_TIMEOUT = 10.0
+
+
+def _import_wiki_server():
+    """导入与本脚本同目录的 wiki_server 模块
+
+    wiki_manager 作为模块被导入（而非脚本运行）时，脚本目录不一定在 sys.path 中，
+    因此按文件路径加载，并登记到 sys.modules 供后续复用。
+    """
+    module = sys.modules.get("wiki_server")
+    if module is not None:
+        return module
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "wiki_server.py")
+    spec = importlib.util.spec_from_file_location("wiki_server", path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["wiki_server"] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        del sys.modules["wiki_server"]
+        raise
+    return module
+
+
+async def cmd_serve(args):
+    """常驻服务器命令"""
+    wiki_server = _import_wiki_server()
+
+    global _resident_clients, _resident_caches
+    socket_path = args.socket or wiki_server.default_socket_path()
+
+    try:
+        if args.status or args.stop:
+            status = wiki_server.control("stop" if args.stop else "status", socket_path)
+            if status is None:
+                print(f"ℹ️  服务器未运行: {socket_path}")
+                sys.exit(1)
+            if args.stop:
+                print(f"✅ 服务器已停止（PID {status['pid']}，共执行 {status['commands']} 条命令）")
+            else:
+                print(json.dumps(status, ensure_ascii=False, indent=2))
+            return
+
+        if args.background:
+            await _start_server_background(args, socket_path)
+            return
+
+        _resident_clients, _resident_caches = {}, {}
+        server = wiki_server.ResidentServer(
+            run_resident,
+            script_path=os.path.abspath(__file__),
+            socket_path=socket_path,
+            idle_timeout=args.idle_timeout
+        )
+        print(f"🚀 常驻服务器已启动: {socket_path}（PID {os.getpid()}，"
+              f"空闲 {server.idle_timeout:.0f} 秒后退出）", file=sys.stderr, flush=True)
+        try:
+            await server.serve_forever()
+        finally:
+            for client in _resident_clients.values():
+                await client.aclose()
+            _resident_clients = _resident_caches = None
+
+    except Exception as e:
+        print(f"❌ 错误: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+async def _start_server_background(args, socket_path: str) -> None:
+    """以独立会话启动后台服务器进程，等待 socket 就绪"""
+    import subprocess
+    wiki_server = _import_wiki_server()
+
+    if wiki_server.control("status", socket_path) is not None:
+        print(f"ℹ️  服务器已在运行: {socket_path}")
+        return
+
+    command = [sys.executable, os.path.abspath(__file__), "serve", "--socket", socket_path]
+    if args.idle_timeout is not None:
+        command += ["--idle-timeout", str(args.idle_timeout)]
+    os.makedirs(os.path.dirname(os.path.abspath(socket_path)), exist_ok=True)
+    log_path = os.path.splitext(socket_path)[0] + ".log"
+    with open(log_path, 'ab') as log:
+        process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=log, stderr=log,
+                                   start_new_session=True)
+
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        status = wiki_server.control("status", socket_path)
+        if status is not None:
+            print(f"✅ 服务器已在后台启动（PID {status['pid']}），日志: {log_path}")
+            return
+        if process.poll() is not None:
+            break
+        await asyncio.sleep(0.05)
+    raise RuntimeError(f"服务器启动失败，详见日志: {log_path}")
+
+
+async def run_resident(argv: list) -> None:
+    """在常驻服务器中执行一条命令（argv 不含程序名）"""
+    args = build_parser().parse_args(argv)
+    if not args.command:
+        build_parser().print_help()
+        sys.exit(1)
+    if args.command == 'serve':
+        raise ValueError("serve 命令不能在服务器中执行")
+    with tracing(args):
+        if args.command in SYNC_COMMANDS:
+            command_handler(args.command)(args)
+        else:
+            await command_handler(args.command)(args)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """构建命令行解析器"""
     parser = argparse.ArgumentParser(
         description="Confluence Wiki tools - Wiki 页面管理工具",
         formatter_class=argparse.RawDescriptionHelpFormatter
@@ -749,17 +6301,90 @@ def main():
 
     subparsers = parser.add_subparsers(dest='command', help='可用命令')
 
+    # 网络命令共享的连接选项
+    http_parser = argparse.ArgumentParser(add_help=False)
+    http_parser.add_argument('--http2', action='store_true',
+                             help='启用 HTTP/2（需要安装 h2）')
+    http_parser.add_argument('--no-compress', action='store_true',
+                             help='不请求 gzip/br 压缩响应')
+    http_parser.add_argument('--rate-limit', type=float,
+                             help='每秒最多发出的请求数（默认 WIKI_RATE_LIMIT，不设置表示不限）')
+    http_parser.add_argument('--max-retries', type=int,
+                             help='限流/网关错误/连接中断时的最大重试次数（默认 WIKI_MAX_RETRIES 或 3）')
+    http_parser.add_argument('--trace', metavar='FILE',
+                             help='把各阶段和每个 HTTP 请求的耗时写入 Chrome trace 文件')
+    http_parser.add_argument('--metrics', nargs='?', const='-', metavar='FILE',
+                             help='输出 JSON 耗时汇总（默认输出到标准错误，可指定文件）')
+
     # get 命令
-    get_parser = subparsers.add_parser('get', help='获取页面内容')
-    get_parser.add_argument('--page-id', help='页面 ID')
-    get_parser.add_argument('--url', help='页面 URL')
+    get_parser = subparsers.add_parser('get', help='获取页面内容', parents=[http_parser])
+    get_parser.add_argument('--page-id', nargs='+', action='extend',
+                           help='页面 ID（可指定多个）')
+    get_parser.add_argument('--url', nargs='+', action='extend',
+                           help='页面 URL（可指定多个）')
+    get_parser.add_argument('--input-file', '-i',
+                           help='从文件读取页面 ID 或 URL（每行一个，- 表示标准输入），'
+                                '或 export 目录 / manifest.json')
     get_parser.add_argument('--format', choices=['markdown', 'storage', 'view'],
                            default='markdown', help='输出格式（默认: markdown）')
     get_parser.add_argument('--output', '-o', help='保存内容到文件')
     get_parser.add_argument('--json', action='store_true', help='输出 JSON 格式')
+    get_parser.add_argument('--fields',
+                           help=f'只获取指定字段（逗号分隔，可选: {",".join(PAGE_FIELDS)}；默认全部）')
+    get_parser.add_argument('--metadata-only', action='store_true',
+                           help='只获取元数据（不下载正文，也不做格式转换）')
+    get_parser.add_argument('--convert-mode', choices=CONVERT_MODES,
+                           help='大页面 HTML -> Markdown 的转换方式（默认 WIKI_CONVERT_MODE 或 thread）')
+    get_parser.add_argument('--no-cache', action='store_true',
+                           help='不使用本地页面缓存（默认版本未变时从 ~/.cache/wiki-tools 读取）')
+    get_parser.add_argument('--concurrency', type=int, default=8,
+                           help='多页面获取时的最大并发数（默认: 8）')
+    get_parser.add_argument('--ndjson', action='store_true',
+                           help='每个页面输出一行 JSON（多页面时默认启用）')
+    get_parser.add_argument('--output-dir',
+                           help='多页面获取时将每个页面内容保存为 <目录>/<页面ID>.md|.html')
+
+    # head 命令
+    head_parser = subparsers.add_parser('head', aliases=['version'], parents=[http_parser],
+                                        help='只获取页面标题和版本号（轻量探测）')
+    head_parser.add_argument('--page-id', help='页面 ID')
+    head_parser.add_argument('--url', help='页面 URL')
+    head_parser.add_argument('--json', action='store_true', help='输出 JSON 格式')
+
+    # history 命令
+    history_parser = subparsers.add_parser('history', help='列出页面的版本历史',
+                                           parents=[http_parser])
+    history_parser.add_argument('--page-id', help='页面 ID')
+    history_parser.add_argument('--url', help='页面 URL')
+    history_parser.add_argument('--limit', type=int, help='最多列出的版本数（从最新版本开始）')
+    history_parser.add_argument('--json', action='store_true', help='每个版本输出一行 JSON')
+
+    # diff 命令
+    diff_parser = subparsers.add_parser('diff', help='比较页面两个版本（或一段版本范围）的差异',
+                                        parents=[http_parser])
+    diff_parser.add_argument('--page-id', help='页面 ID')
+    diff_parser.add_argument('--url', help='页面 URL')
+    diff_parser.add_argument('--from', dest='from_version', type=int,
+                             help='旧版本号（默认 --to 的前一个版本；--each 时默认 1）')
+    diff_parser.add_argument('--to', dest='to_version', type=int,
+                             help='新版本号（默认当前版本）')
+    diff_parser.add_argument('--each', action='store_true',
+                             help='逐个输出范围内每两个相邻版本之间的差异')
+    diff_parser.add_argument('--stat', action='store_true', help='只输出增删行数')
+    diff_parser.add_argument('--format', choices=['markdown', 'storage'], default='markdown',
+                             help='比较的文本格式（默认: markdown）')
+    diff_parser.add_argument('--context', '-U', type=int, default=3,
+                             help='差异上下文行数（默认: 3）')
+    diff_parser.add_argument('--json', action='store_true', help='每个差异输出一行 JSON')
+    diff_parser.add_argument('--concurrency', type=int, default=8,
+                             help='获取历史版本的最大并发数（默认: 8）')
+    diff_parser.add_argument('--convert-mode', choices=CONVERT_MODES,
+                             help='大页面 HTML -> Markdown 的转换方式（默认 WIKI_CONVERT_MODE 或 thread）')
+    diff_parser.add_argument('--no-cache', action='store_true',
+                             help='不使用历史版本缓存（默认永久缓存在 <缓存目录>/history）')
 
     # update 命令
-    update_parser = subparsers.add_parser('update', help='更新页面内容')
+    update_parser = subparsers.add_parser('update', help='更新页面内容', parents=[http_parser])
     update_parser.add_argument('--page-id', help='页面 ID')
     update_parser.add_argument('--url', help='页面 URL')
     update_parser.add_argument('--content', '-c', help='新内容（直接提供文本）')
@@ -769,9 +6394,27 @@ def main():
                               default='markdown', help='内容格式（默认: markdown）')
     update_parser.add_argument('--append', '-a', action='store_true',
                               help='追加内容（不覆盖原有内容）')
+    update_parser.add_argument('--hash-manifest', metavar='FILE',
+                              help='内容哈希清单文件；内容未变化时跳过写入，且只需一次版本探测')
+    update_parser.add_argument('--queue', action='store_true',
+                              help='与 --append 一起使用：写入本地追加队列，多次追加合并为一次更新')
+    update_parser.add_argument('--flush-bytes', type=int,
+                              help='队列内容达到该字节数时立即发送（默认 WIKI_APPEND_FLUSH_BYTES 或 65536）')
+    update_parser.add_argument('--flush-delay', type=float,
+                              help='队列内容最多等待的秒数（默认 WIKI_APPEND_FLUSH_DELAY 或 10，0 表示立即发送）')
+
+    # flush 命令
+    flush_parser = subparsers.add_parser('flush', help='发送追加队列中的待追加内容',
+                                         parents=[http_parser])
+    flush_parser.add_argument('--page-id', help='页面 ID（默认所有有待发送内容的页面）')
+    flush_parser.add_argument('--url', help='页面 URL')
+    flush_parser.add_argument('--wait', action='store_true',
+                              help='等到最早的待发送内容到期后再发送，直到队列清空')
+    flush_parser.add_argument('--flush-delay', type=float,
+                              help='与 --wait 一起使用的等待秒数（默认 WIKI_APPEND_FLUSH_DELAY 或 10）')
 
     # create 命令
-    create_parser = subparsers.add_parser('create', help='创建新页面')
+    create_parser = subparsers.add_parser('create', help='创建新页面', parents=[http_parser])
     create_parser.add_argument('--title', '-t', required=True, help='页面标题（必需）')
     create_parser.add_argument('--content', '-c', help='页面内容（直接提供文本）')
     create_parser.add_argument('--file', '-f', help='页面内容（从文件读取）')
@@ -782,10 +6425,199 @@ def main():
     create_parser.add_argument('--chunk-size', type=int, help='当内容超过此字节数时分批创建（如: 1048576 表示 1MB）')
 
 
+    # export 命令
+    export_parser = subparsers.add_parser('export', help='导出页面树到本地目录',
+                                          parents=[http_parser])
+    export_parser.add_argument('--page-id', help='根页面 ID')
+    export_parser.add_argument('--space', '-s', help='空间 key（导出整个空间）')
+    export_parser.add_argument('--output-dir', '-o', required=True, help='导出目录')
+    export_parser.add_argument('--format', choices=['markdown', 'storage'],
+                               default='markdown', help='文件格式（默认: markdown）')
+    export_parser.add_argument('--concurrency', type=int, default=8,
+                               help='最大并发请求数（默认: 8）')
+
+    # sync 命令
+    sync_parser = subparsers.add_parser('sync', help='增量同步 export 生成的本地镜像',
+                                        parents=[http_parser])
+    sync_parser.add_argument('--output-dir', '-o', required=True, help='export 生成的目录')
+    sync_parser.add_argument('--concurrency', type=int, default=8,
+                             help='最大并发请求数（默认: 8）')
+    sync_parser.add_argument('--full', action='store_true',
+                             help='忽略水位线，检查所有页面的版本号')
+    sync_parser.add_argument('--no-prune', action='store_true',
+                             help='不检查已删除的页面（省去一次 ID 列表查询）')
+
+    # push 命令
+    push_parser = subparsers.add_parser('push', help='把本地 Markdown/HTML 目录发布为页面树',
+                                        parents=[http_parser])
+    push_parser.add_argument('source_dir', help='本地源目录')
+    push_parser.add_argument('--parent-id', help='父页面 ID')
+    push_parser.add_argument('--parent-url', help='父页面 URL')
+    push_parser.add_argument('--concurrency', type=int, default=8,
+                             help='最大并发请求数（默认: 8）')
+    push_parser.add_argument('--hash-manifest', metavar='FILE',
+                             help='内容哈希清单文件；重复发布时未变化的页面只需一次版本探测')
+    push_parser.add_argument('--title-prefix', default='',
+                             help='所有页面标题的前缀（空间内标题必须唯一）')
+
+    # attachments 命令
+    attachments_parser = subparsers.add_parser('attachments', help='下载/上传页面附件')
+    attachments_sub = attachments_parser.add_subparsers(dest='action', required=True)
+
+    pull_parser = attachments_sub.add_parser('pull', help='并发下载页面的附件',
+                                             parents=[http_parser])
+    pull_parser.add_argument('--page-id', help='页面 ID')
+    pull_parser.add_argument('--url', help='页面 URL')
+    pull_parser.add_argument('--output-dir', '-o', required=True, help='保存目录')
+    pull_parser.add_argument('--concurrency', type=int, default=8,
+                             help='最大并发下载数（默认: 8）')
+    pull_parser.add_argument('names', nargs='*', help='只下载指定文件名的附件（默认全部）')
+
+    push_att_parser = attachments_sub.add_parser('push', help='并发上传文件为页面附件',
+                                                 parents=[http_parser])
+    push_att_parser.add_argument('--page-id', help='页面 ID')
+    push_att_parser.add_argument('--url', help='页面 URL')
+    push_att_parser.add_argument('--comment', help='附件版本说明')
+    push_att_parser.add_argument('--concurrency', type=int, default=8,
+                                 help='最大并发上传数（默认: 8）')
+    push_att_parser.add_argument('paths', nargs='+', help='要上传的文件或目录')
+
+    # copy-tree 命令
+    copy_tree_parser = subparsers.add_parser('copy-tree', help='复制页面树（可复制到其他空间）',
+                                             parents=[http_parser])
+    copy_tree_parser.add_argument('--page-id', help='源根页面 ID')
+    copy_tree_parser.add_argument('--url', help='源根页面 URL')
+    copy_tree_parser.add_argument('--parent-id', help='目标父页面 ID')
+    copy_tree_parser.add_argument('--parent-url', help='目标父页面 URL')
+    copy_tree_parser.add_argument('--space', '-s',
+                                  help='目标空间 key（不指定父页面时复制为空间顶级页面）')
+    copy_tree_parser.add_argument('--title-prefix', default='', help='副本标题前缀')
+    copy_tree_parser.add_argument('--title-replace', nargs=2, action='append',
+                                  metavar=('OLD', 'NEW'), help='副本标题替换（可指定多次）')
+    copy_tree_parser.add_argument('--attachments', action='store_true', help='同时复制附件')
+    copy_tree_parser.add_argument('--concurrency', type=int, default=8,
+                                  help='最大并发请求数（默认: 8）')
+    copy_tree_parser.add_argument('--progress',
+                                  help='进度文件（默认保存在缓存目录，失败后重新运行即可续传）')
+    copy_tree_parser.add_argument('--dry-run', action='store_true',
+                                  help='只显示将要创建的页面树，不实际复制')
+
+    # move-tree 命令
+    move_tree_parser = subparsers.add_parser('move-tree', help='移动页面树到另一个父页面下',
+                                             parents=[http_parser])
+    move_tree_parser.add_argument('--page-id', help='根页面 ID')
+    move_tree_parser.add_argument('--url', help='根页面 URL')
+    move_tree_parser.add_argument('--parent-id', help='目标父页面 ID')
+    move_tree_parser.add_argument('--parent-url', help='目标父页面 URL')
+    move_tree_parser.add_argument('--dry-run', action='store_true',
+                                  help='只显示将要移动的页面树，不实际移动')
+
+    # labels 命令
+    labels_parser = subparsers.add_parser('labels', help='批量添加/删除/替换页面标签')
+    labels_sub = labels_parser.add_subparsers(dest='action', required=True)
+
+    labels_target_parser = argparse.ArgumentParser(add_help=False, parents=[http_parser])
+    labels_target_parser.add_argument('--page-id', nargs='+', action='extend',
+                                      help='页面 ID（可指定多个）')
+    labels_target_parser.add_argument('--url', nargs='+', action='extend',
+                                      help='页面 URL（可指定多个）')
+    labels_target_parser.add_argument('--input-file', '-i',
+                                      help='从文件读取页面 ID 或 URL（每行一个，- 表示标准输入），'
+                                           '或 export 目录 / manifest.json')
+    labels_target_parser.add_argument('--cql', help='修改 CQL 搜索到的所有页面')
+    labels_target_parser.add_argument('--concurrency', type=int, default=8,
+                                      help='同时处理的最大页面数（默认: 8）')
+    labels_target_parser.add_argument('--dry-run', action='store_true',
+                                      help='只显示每个页面将要做的修改，不实际修改')
+    labels_target_parser.add_argument('--json', action='store_true',
+                                      help='每个页面输出一行 JSON')
+
+    labels_add_parser = labels_sub.add_parser('add', help='添加标签',
+                                              parents=[labels_target_parser])
+    labels_add_parser.add_argument('labels', nargs='+', help='标签（可用逗号分隔）')
+
+    labels_remove_parser = labels_sub.add_parser('remove', help='删除标签',
+                                                 parents=[labels_target_parser])
+    labels_remove_parser.add_argument('labels', nargs='+', help='标签（可用逗号分隔）')
+
+    labels_set_parser = labels_sub.add_parser('set', help='替换为指定的标签（不指定则清空）',
+                                              parents=[labels_target_parser])
+    labels_set_parser.add_argument('labels', nargs='*', help='标签（可用逗号分隔）')
+
+    # search 命令
+    search_parser = subparsers.add_parser('search', help='CQL 搜索页面（NDJSON 流式输出）',
+                                          parents=[http_parser])
+    search_parser.add_argument('cql', nargs='?',
+                               help='CQL 查询语句，例如 \'title ~ "设计" and type = page\'')
+    search_parser.add_argument('--text', '-t', help='全文搜索关键词（相当于 text ~ "..."）')
+    search_parser.add_argument('--space', '-s', help='限定空间 key')
+    search_parser.add_argument('--limit', type=int, help='最多输出的结果数（默认不限）')
+    search_parser.add_argument('--content', action='store_true',
+                               help='同时并发获取每个结果的正文')
+    search_parser.add_argument('--format', choices=['markdown', 'storage', 'view'],
+                               default='markdown', help='正文格式（默认: markdown）')
+    search_parser.add_argument('--fields',
+                               help=f'获取正文时只返回指定字段（逗号分隔，可选: {",".join(PAGE_FIELDS)}）')
+    search_parser.add_argument('--output-dir',
+                               help='将正文保存为 <目录>/<页面ID>.md|.html（隐含 --content）')
+    search_parser.add_argument('--concurrency', type=int, default=8,
+                               help='获取正文的最大并发数（默认: 8）')
+    search_parser.add_argument('--convert-mode', choices=CONVERT_MODES,
+                               help='大页面 HTML -> Markdown 的转换方式（默认 WIKI_CONVERT_MODE 或 thread）')
+    search_parser.add_argument('--no-cache', action='store_true', help='不使用本地页面缓存')
+
+    # index 命令
+    index_parser = subparsers.add_parser('index', help='建立/增量更新本地全文索引',
+                                         parents=[http_parser])
+    index_parser.add_argument('--space', '-s', help='索引整个空间')
+    index_parser.add_argument('--page-id', help='索引页面及其所有子孙页面')
+    index_parser.add_argument('--cql', action='append', help='索引 CQL 搜索到的页面（可重复）')
+    index_parser.add_argument('--export', action='append', metavar='DIR',
+                              help='索引 export 生成的本地目录（不访问网络，可重复）')
+    index_parser.add_argument('--from-cache', action='store_true',
+                              help='索引页面缓存中的 Markdown 页面（不访问网络）')
+    index_parser.add_argument('--stats', action='store_true', help='只显示索引统计')
+    index_parser.add_argument('--index', help='索引文件路径（默认 <缓存目录>/index/<Wiki>.sqlite）')
+    index_parser.add_argument('--concurrency', type=int, default=8,
+                              help='获取正文的最大并发数（默认: 8）')
+    index_parser.add_argument('--convert-mode', choices=CONVERT_MODES,
+                              help='大页面 HTML -> Markdown 的转换方式（默认 WIKI_CONVERT_MODE 或 thread）')
+    index_parser.add_argument('--no-cache', action='store_true', help='不使用本地页面缓存')
+
+    # query 命令
+    query_parser = subparsers.add_parser('query', help='查询本地全文索引（不访问网络）')
+    query_parser.add_argument('terms', nargs='+',
+                              help='查询词（全部命中，双引号包围短语）')
+    query_parser.add_argument('--space', '-s', help='限定空间')
+    query_parser.add_argument('--label', help='限定标签')
+    query_parser.add_argument('--limit', type=int, default=10, help='最多返回的结果数（默认: 10）')
+    query_parser.add_argument('--json', action='store_true', help='每个结果输出一行 JSON')
+    query_parser.add_argument('--index', help='索引文件路径')
+
     # extract-id 命令
     extract_parser = subparsers.add_parser('extract-id', help='从 URL 提取页面 ID')
     extract_parser.add_argument('url', help='页面 URL')
 
+    # serve 命令
+    serve_parser = subparsers.add_parser(
+        'serve', help='启动常驻服务器（保持连接池和缓存，后续命令自动通过它执行）'
+    )
+    serve_parser.add_argument('--socket',
+                              help='Unix socket 路径（默认 WIKI_SERVER_SOCKET 或 <缓存目录>/server.sock）')
+    serve_parser.add_argument('--idle-timeout', type=float,
+                              help='空闲多少秒后自动退出（默认 WIKI_SERVER_IDLE_TIMEOUT 或 600，0 表示不退出）')
+    serve_mode = serve_parser.add_mutually_exclusive_group()
+    serve_mode.add_argument('--background', '-d', action='store_true',
+                            help='在后台启动并立即返回')
+    serve_mode.add_argument('--status', action='store_true', help='查看服务器状态')
+    serve_mode.add_argument('--stop', action='store_true', help='停止服务器')
+
+    return parser
+
+
+def main():
+    """主函数"""
+    parser = build_parser()
     args = parser.parse_args()
 
     if not args.command:
@@ -793,14 +6625,63 @@ def main():
         sys.exit(1)
 
     # 执行命令
-    if args.command == 'get':
-        asyncio.run(cmd_get(args))
-    elif args.command == 'update':
-        asyncio.run(cmd_update(args))
-    elif args.command == 'create':
-        asyncio.run(cmd_create(args))
-    elif args.command == 'extract-id':
-        asyncio.run(cmd_extract_id(args))
+    with tracing(args):
+        run_command(args)
+
+
+# 不访问网络的命令：直接同步执行，不启动事件循环（也就不必导入 asyncio、httpx）
+SYNC_COMMANDS = ("extract-id", "query")
+
+
+def run_command(args):
+    """执行子命令"""
+    if args.command in SYNC_COMMANDS:
+        command_handler(args.command)(args)
+    else:
+        asyncio.run(command_handler(args.command)(args))
+
+
+def command_handler(command: str):
+    """子命令对应的处理函数（SYNC_COMMANDS 以外均为异步函数）"""
+    if command == 'get':
+        return cmd_get
+    elif command in ('head', 'version'):
+        return cmd_head
+    elif command == 'history':
+        return cmd_history
+    elif command == 'diff':
+        return cmd_diff
+    elif command == 'update':
+        return cmd_update
+    elif command == 'flush':
+        return cmd_flush
+    elif command == 'create':
+        return cmd_create
+    elif command == 'export':
+        return cmd_export
+    elif command == 'sync':
+        return cmd_sync
+    elif command == 'push':
+        return cmd_push
+    elif command == 'copy-tree':
+        return cmd_copy_tree
+    elif command == 'move-tree':
+        return cmd_move_tree
+    elif command == 'attachments':
+        return cmd_attachments
+    elif command == 'labels':
+        return cmd_labels
+    elif command == 'search':
+        return cmd_search
+    elif command == 'index':
+        return cmd_index
+    elif command == 'query':
+        return cmd_query
+    elif command == 'extract-id':
+        return cmd_extract_id
+    elif command == 'serve':
+        return cmd_serve
+    raise ValueError(f"未知命令: {command}")
 
 
 if __name__ == '__main__':
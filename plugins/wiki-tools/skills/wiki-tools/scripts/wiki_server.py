@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""
+wiki_manager 常驻服务器
+
+常驻进程保持 httpx、markdownify、markdown 等库已导入，连接池（keep-alive/TLS）、
+Markdown 转换缓存和页面缓存处于热状态，通过本地 Unix socket 执行 CLI 命令，
+省去每次运行的解释器启动、库导入和 TLS 握手开销。空闲超时后自动退出。
+
+本模块只依赖标准库：wiki_manager.py 作为脚本运行时先调用 forward()，服务器在线
+则把命令转发过去，不再导入任何第三方库；不在线时返回 None，由 wiki_manager 在
+当前进程中执行。
+
+协议（每行一个 JSON 消息）：
+    客户端 -> 服务器  {"argv": [...], "cwd": "...", "env": {...}, "script": {...}}
+                      或 {"control": "status" | "stop"}
+    服务器 -> 客户端  {"stdout": "..."} / {"stderr": "..."} ... 最后 {"exit": 0}
+                      服务器代码已更新时返回 {"stale": true}，客户端回退到本地执行
+"""
+
+from __future__ import annotations
+
+import os
+import io
+import sys
+import json
+import time
+from typing import TYPE_CHECKING, Optional
+
+# asyncio、socket、traceback 按需导入：客户端转发路径越轻，每次 CLI 调用的启动越快
+if TYPE_CHECKING:
+    import asyncio
+    import socket
+
+# 转发给服务器的环境变量前缀（服务器按请求切换，配置不同的请求使用各自的连接池）
+FORWARD_ENV_PREFIX = "WIKI_"
+
+# 始终在本地执行的命令（extract-id 不访问网络，本地执行比转发更快）
+LOCAL_COMMANDS = ("serve", "extract-id")
+
+DEFAULT_IDLE_TIMEOUT = 600
+
+
+def default_socket_path() -> str:
+    """服务器 socket 路径（WIKI_SERVER_SOCKET > <缓存目录>/server.sock）"""
+    if os.getenv("WIKI_SERVER_SOCKET"):
+        return os.path.expanduser(os.environ["WIKI_SERVER_SOCKET"])
+    if os.getenv("WIKI_CACHE_DIR"):
+        base = os.path.expanduser(os.environ["WIKI_CACHE_DIR"])
+    else:
+        base = os.path.join(
+            os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+            "wiki-tools"
+        )
+    return os.path.join(base, "server.sock")
+
+
+def default_idle_timeout() -> float:
+    """空闲多少秒后自动退出（WIKI_SERVER_IDLE_TIMEOUT，默认 600）"""
+    return float(os.getenv("WIKI_SERVER_IDLE_TIMEOUT", DEFAULT_IDLE_TIMEOUT))
+
+
+def _script_info(script_path: str) -> dict:
+    """脚本路径以及脚本和本模块的修改时间（服务器据此判断自身代码是否过期）"""
+    return {
+        "path": script_path,
+        "mtime": os.stat(script_path).st_mtime,
+        "server_mtime": os.stat(os.path.abspath(__file__)).st_mtime
+    }
+
+
+# ============================================================================
+# 客户端
+# ============================================================================
+
+def _runs_locally(argv: list) -> bool:
+    """是否必须在本地执行：帮助信息、serve 命令、读取标准输入，或显式禁用服务器"""
+    if os.getenv("WIKI_NO_SERVER"):
+        return True
+    if not argv or argv[0].startswith("-") or argv[0] in LOCAL_COMMANDS:
+        return True
+    return "-" in argv
+
+
+def _connect(path: str) -> Optional[socket.socket]:
+    """连接服务器，不在线（socket 不存在或无人监听）时返回 None"""
+    if not os.path.exists(path):
+        return None
+    import socket
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+def _send(sock: socket.socket, message: dict) -> None:
+    sock.sendall(json.dumps(message, ensure_ascii=False).encode("utf-8") + b"\n")
+
+
+def forward(argv: list, script_path: str, socket_path: Optional[str] = None) -> Optional[int]:
+    """把命令转发给常驻服务器执行，返回退出码；服务器不可用时返回 None"""
+    if _runs_locally(argv):
+        return None
+    sock = _connect(socket_path or default_socket_path())
+    if sock is None:
+        return None
+
+    with sock:
+        try:
+            _send(sock, {
+                "argv": argv,
+                "cwd": os.getcwd(),
+                "env": {k: v for k, v in os.environ.items() if k.startswith(FORWARD_ENV_PREFIX)},
+                "script": _script_info(script_path)
+            })
+            started = False
+            for line in sock.makefile("rb"):
+                message = json.loads(line)
+                if "stale" in message and not started:
+                    return None
+                started = True
+                if "stdout" in message:
+                    sys.stdout.write(message["stdout"])
+                    sys.stdout.flush()
+                elif "stderr" in message:
+                    sys.stderr.write(message["stderr"])
+                    sys.stderr.flush()
+                elif "exit" in message:
+                    return message["exit"]
+        except BrokenPipeError:
+            # 输出端已关闭（例如管道到 head），与本地执行一样安静退出
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+            return 1
+        except OSError:
+            if not started:
+                return None
+        except KeyboardInterrupt:
+            return 130
+
+    print("❌ 错误: 与常驻服务器的连接中断", file=sys.stderr)
+    return 1
+
+
+def control(action: str, socket_path: Optional[str] = None) -> Optional[dict]:
+    """发送控制命令（status/stop），服务器不在线时返回 None"""
+    sock = _connect(socket_path or default_socket_path())
+    if sock is None:
+        return None
+    with sock:
+        _send(sock, {"control": action})
+        line = sock.makefile("rb").readline()
+    return json.loads(line) if line else None
+
+
+# ============================================================================
+# 服务器
+# ============================================================================
+
+class _StreamWriter(io.TextIOBase):
+    """把命令的 stdout/stderr 按消息转发给客户端"""
+
+    def __init__(self, writer: asyncio.StreamWriter, stream: str):
+        self._writer = writer
+        self._stream = stream
+
+    @property
+    def encoding(self) -> str:
+        return "utf-8"
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        if text and not self._writer.is_closing():
+            self._writer.write(json.dumps({self._stream: text}, ensure_ascii=False)
+                               .encode("utf-8") + b"\n")
+        return len(text)
+
+
+class ResidentServer:
+    """常驻命令服务器
+
+    命令逐个串行执行：每条命令需要切换工作目录、WIKI_* 环境变量和 stdout/stderr，
+    这些都是进程级状态。连接池、转换缓存等热状态由 run 回调所在的模块负责复用。
+
+    用法：
+        server = ResidentServer(run, script_path=__file__)
+        await server.serve_forever()
+    """
+
+    def __init__(
+        self,
+        run,
+        script_path: str,
+        socket_path: Optional[str] = None,
+        idle_timeout: Optional[float] = None
+    ):
+        """
+        Args:
+            run: 执行一条命令的异步函数 run(argv)，通过 SystemExit 返回非 0 退出码
+            script_path: wiki_manager.py 路径（它或 wiki_server.py 更新后服务器视为过期并退出）
+            socket_path: socket 路径（默认 default_socket_path()）
+            idle_timeout: 空闲多少秒后退出（默认 default_idle_timeout()，0 表示不退出）
+        """
+        self.run = run
+        self.script = _script_info(script_path)
+        self.socket_path = socket_path or default_socket_path()
+        self.idle_timeout = default_idle_timeout() if idle_timeout is None else idle_timeout
+        self.started_at = time.time()
+        self.last_active = time.monotonic()
+        self.commands = 0
+        self.busy = False
+        self._lock = None
+        self._stopped = None
+
+    def status(self) -> dict:
+        return {
+            "pid": os.getpid(),
+            "socket": self.socket_path,
+            "script": self.script["path"],
+            "uptime": round(time.time() - self.started_at, 1),
+            "idle": round(time.monotonic() - self.last_active, 1),
+            "idle_timeout": self.idle_timeout,
+            "commands": self.commands,
+            "busy": self.busy
+        }
+
+    def stop(self) -> None:
+        if self._stopped is not None:
+            self._stopped.set()
+
+    async def serve_forever(self) -> None:
+        """监听 socket，直到空闲超时或收到 stop"""
+        import asyncio
+
+        self._lock = asyncio.Lock()
+        self._stopped = asyncio.Event()
+        existing = _connect(self.socket_path)
+        if existing is not None:
+            existing.close()
+            raise RuntimeError(f"已有服务器在运行: {self.socket_path}")
+        os.makedirs(os.path.dirname(os.path.abspath(self.socket_path)), exist_ok=True)
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)  # 上次异常退出遗留的 socket
+
+        # socket 只允许当前用户访问（请求中带有 WIKI_TOKEN）
+        old_umask = os.umask(0o177)
+        try:
+            server = await asyncio.start_unix_server(self._handle, path=self.socket_path,
+                                                     limit=64 * 1024 * 1024)
+        finally:
+            os.umask(old_umask)
+
+        watchdog = asyncio.ensure_future(self._watch_idle())
+        try:
+            async with server:
+                await self._stopped.wait()
+        finally:
+            watchdog.cancel()
+            try:
+                os.remove(self.socket_path)
+            except OSError:
+                pass
+
+    async def _watch_idle(self) -> None:
+        import asyncio
+
+        if not self.idle_timeout:
+            return
+        while True:
+            await asyncio.sleep(min(self.idle_timeout, 30))
+            if not self.busy and time.monotonic() - self.last_active >= self.idle_timeout:
+                print(f"💤 空闲 {self.idle_timeout:.0f} 秒，服务器退出", file=sys.stderr)
+                self.stop()
+                return
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            line = await reader.readline()
+            if not line:
+                return
+            message = json.loads(line)
+            if "control" in message:
+                await self._handle_control(message["control"], writer)
+            else:
+                await self._handle_command(message, writer)
+        except Exception as e:
+            print(f"⚠️  处理请求出错: {e}", file=sys.stderr)
+        finally:
+            writer.close()
+
+    async def _handle_control(self, action: str, writer: asyncio.StreamWriter) -> None:
+        if action == "stop":
+            reply = {"stopping": True, **self.status()}
+            self.stop()
+        else:
+            reply = self.status()
+        writer.write(json.dumps(reply).encode("utf-8") + b"\n")
+        await writer.drain()
+
+    async def _handle_command(self, message: dict, writer: asyncio.StreamWriter) -> None:
+        script = message.get("script") or {}
+        if script != self.script:
+            # wiki_manager.py 或 wiki_server.py 已更新（或来自另一份安装），让客户端本地执行，服务器退出
+            writer.write(b'{"stale": true}\n')
+            await writer.drain()
+            if script.get("path") == self.script["path"]:
+                print("🔄 脚本已更新，服务器退出", file=sys.stderr)
+                self.stop()
+            return
+
+        async with self._lock:
+            self.busy = True
+            self.commands += 1
+            code = await self._execute(message, writer)
+            self.busy = False
+            self.last_active = time.monotonic()
+
+        writer.write(json.dumps({"exit": code}).encode("utf-8") + b"\n")
+        await writer.drain()
+
+    async def _execute(self, message: dict, writer: asyncio.StreamWriter) -> int:
+        """在请求的工作目录和环境变量下执行命令，返回退出码"""
+        saved_cwd = os.getcwd()
+        saved_env = {k: v for k, v in os.environ.items() if k.startswith(FORWARD_ENV_PREFIX)}
+        saved_streams = sys.stdout, sys.stderr
+        try:
+            os.chdir(message.get("cwd") or saved_cwd)
+            for key in saved_env:
+                del os.environ[key]
+            os.environ.update(message.get("env") or {})
+            sys.stdout = _StreamWriter(writer, "stdout")
+            sys.stderr = _StreamWriter(writer, "stderr")
+            await self.run(message["argv"])
+            return 0
+        except SystemExit as e:
+            if e.code is None or isinstance(e.code, int):
+                return e.code or 0
+            print(e.code, file=sys.stderr)
+            return 1
+        except Exception:
+            import traceback
+            traceback.print_exc()
+            return 1
+        finally:
+            sys.stdout, sys.stderr = saved_streams
+            for key in [k for k in os.environ if k.startswith(FORWARD_ENV_PREFIX)]:
+                del os.environ[key]
+            os.environ.update(saved_env)
+            os.chdir(saved_cwd)
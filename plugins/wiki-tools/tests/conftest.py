@@ -0,0 +1,36 @@
+"""测试公共配置：导入 wiki_manager 和模拟服务器，提供指向模拟服务器的 fixture"""
+
+import os
+import sys
+
+import pytest
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPTS_DIR = os.path.join(PLUGIN_DIR, "skills", "wiki-tools", "scripts")
+BENCHMARKS_DIR = os.path.join(PLUGIN_DIR, "benchmarks")
+sys.path.insert(0, SCRIPTS_DIR)
+sys.path.insert(0, BENCHMARKS_DIR)
+
+from mock_confluence import MockConfluence  # noqa: E402
+
+
+@pytest.fixture
+def server(request, monkeypatch, tmp_path):
+    """启动模拟 Confluence 服务器，WIKI_* 环境变量指向它，缓存目录放在临时目录
+
+    可通过 indirect 参数化传入 MockConfluence 的构造参数（dict）。
+    """
+    mock = MockConfluence(**getattr(request, "param", {})).start()
+    monkeypatch.setenv("WIKI_BASE_URL", mock.base_url)
+    monkeypatch.setenv("WIKI_TOKEN", "test-token")
+    monkeypatch.setenv("WIKI_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setenv("WIKI_NO_SERVER", "1")
+    yield mock
+    mock.stop()
+
+
+@pytest.fixture
+def config(server):
+    import wiki_manager
+
+    return wiki_manager.WikiConfig()
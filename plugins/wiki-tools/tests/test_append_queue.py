@@ -0,0 +1,128 @@
+"""追加队列：queue_append 合并追加，flush_appends 一次 PUT、409 变基和重复检测"""
+
+import asyncio
+
+import pytest
+
+import wiki_manager as wm
+
+
+@pytest.fixture
+def journal(config, tmp_path):
+    return wm.AppendJournal(config, str(tmp_path / "journal"))
+
+
+def queue(config, journal, page_id, lines, **kwargs):
+    async def run():
+        return [await wm.queue_append(config, page_id, line, format="html", journal=journal,
+                                      flush_bytes=kwargs.get("flush_bytes", 1 << 20),
+                                      flush_delay=3600)
+                for line in lines]
+    return asyncio.run(run())
+
+
+def test_appends_are_queued_and_flushed_in_one_put(server, config, journal):
+    page_id = server.add_page("Log", "<p>开始</p>")
+    lines = [f"<p>第 {n} 行</p>" for n in range(5)]
+    results = queue(config, journal, page_id, lines)
+    assert [r["status"] for r in results] == ["queued"] * 5
+    assert server.pages[page_id]["version"] == 1
+
+    result = asyncio.run(wm.flush_appends(config, page_id, journal))
+    assert result["status"] == "written"
+    assert result["entries"] == 5
+    assert result["bytes"] == len("\n".join(lines).encode("utf-8"))
+    assert server.pages[page_id]["version"] == 2
+    assert server.pages[page_id]["body"] == "<p>开始</p>\n" + "\n".join(lines)
+    assert journal.pending(page_id)[0] == []
+
+    empty = asyncio.run(wm.flush_appends(config, page_id, journal))
+    assert empty["status"] == "empty"
+
+
+def test_flush_threshold_sends_immediately(server, config, journal):
+    page_id = server.add_page("Log", "")
+    results = queue(config, journal, page_id, ["<p>aaaa</p>", "<p>bbbb</p>"], flush_bytes=15)
+    assert [r["status"] for r in results] == ["queued", "written"]
+    assert server.pages[page_id]["version"] == 2
+
+
+def test_second_flush_uses_recorded_base_without_get(server, config, journal):
+    page_id = server.add_page("Log", "<p>0</p>")
+    queue(config, journal, page_id, ["<p>1</p>"])
+    asyncio.run(wm.flush_appends(config, page_id, journal))
+    queue(config, journal, page_id, ["<p>2</p>"])
+
+    before = server.snapshot_stats()["requests"]
+    result = asyncio.run(wm.flush_appends(config, page_id, journal))
+    assert result["rebases"] == 0
+    assert server.snapshot_stats()["requests"] - before == 1
+    assert server.pages[page_id]["body"] == "<p>0</p>\n<p>1</p>\n<p>2</p>"
+
+
+def test_conflict_rebases_onto_current_content(server, config, journal):
+    page_id = server.add_page("Log", "<p>0</p>")
+    queue(config, journal, page_id, ["<p>1</p>"])
+    asyncio.run(wm.flush_appends(config, page_id, journal))
+    # 其他人修改了页面：记录的 base 已过期
+    server.add_version(page_id, "<p>0</p>\n<p>1</p>\n<p>他人</p>")
+    queue(config, journal, page_id, ["<p>2</p>"])
+
+    result = asyncio.run(wm.flush_appends(config, page_id, journal))
+    assert result["status"] == "written"
+    assert result["rebases"] == 1
+    assert server.pages[page_id]["body"] == "<p>0</p>\n<p>1</p>\n<p>他人</p>\n<p>2</p>"
+
+
+def test_already_applied_batch_is_reported_as_skipped(server, config, journal):
+    page_id = server.add_page("Log", "")
+    queue(config, journal, page_id, ["<p>0</p>"])
+    asyncio.run(wm.flush_appends(config, page_id, journal))
+    queue(config, journal, page_id, ["<p>1</p>", "<p>2</p>"])
+    # 上次发送已成功但响应丢失：页面已包含本批内容，队列和 base 仍未更新
+    server.add_version(page_id, "\n<p>0</p>\n<p>1</p>\n<p>2</p>")
+
+    result = asyncio.run(wm.flush_appends(config, page_id, journal))
+    assert result["status"] == "skipped"
+    assert result["bytes"] == 0
+    assert result["entries"] == 2
+    assert result["rebases"] == 1
+    assert server.pages[page_id]["version"] == 3
+    assert server.pages[page_id]["body"].count("<p>1</p>") == 1
+    assert journal.pending(page_id)[0] == []
+
+
+def test_concurrent_writers_produce_one_version(server, config, journal):
+    page_id = server.add_page("Log", "")
+    writers = [[f"<p>w{w} l{n}</p>" for n in range(10)] for w in range(4)]
+
+    async def write(lines):
+        for line in lines:
+            await wm.queue_append(config, page_id, line, format="html", journal=journal,
+                                  flush_bytes=1 << 20, flush_delay=3600)
+
+    async def run():
+        await asyncio.gather(*(write(lines) for lines in writers))
+        return await wm.flush_appends(config, page_id, journal)
+
+    result = asyncio.run(run())
+    assert result["entries"] == 40
+    assert server.pages[page_id]["version"] == 2
+    body = server.pages[page_id]["body"]
+    for lines in writers:
+        positions = [body.index(line) for line in lines]
+        assert positions == sorted(positions)
+
+
+@pytest.mark.parametrize("status", [None, 504])
+def test_plain_append_is_not_duplicated_after_lost_response(server, config, status):
+    page_id = server.add_page("Log", "<p>start</p>")
+    # 首次 PUT 已生效但响应丢失，重试得到 409
+    server.inject_fault("PUT", r"/rest/api/content/\d+", status=status)
+
+    result = asyncio.run(wm.update_wiki_page_content(
+        config, page_id, "<p>entry</p>", format="html", append=True))
+
+    assert result["status"] == "written" and result["version"] == 2
+    assert server.pages[page_id]["version"] == 2
+    assert server.pages[page_id]["body"].count("<p>entry</p>") == 1
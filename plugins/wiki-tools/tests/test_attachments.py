@@ -0,0 +1,60 @@
+"""附件下载/上传：本地文件名冲突"""
+
+import asyncio
+import os
+
+import pytest
+
+import wiki_manager as wm
+
+
+def test_pull_disambiguates_colliding_filenames(server, config, tmp_path):
+    page = server.add_page("Page", space="DOC")
+    colon = server.add_attachment(page, "a:b.png", b"colon")
+    question = server.add_attachment(page, "a?b.png", b"question")
+    server.add_attachment(page, "c.png", b"plain")
+    output = tmp_path / "out"
+
+    stats = asyncio.run(wm.pull_attachments(config, page, str(output)))
+
+    assert stats["downloaded"] == 3
+    assert (output / f"a_b_{colon['id']}.png").read_bytes() == b"colon"
+    assert (output / f"a_b_{question['id']}.png").read_bytes() == b"question"
+    assert (output / "c.png").read_bytes() == b"plain"
+
+
+def test_pull_disambiguates_case_only_differences(server, config, tmp_path):
+    page = server.add_page("Page", space="DOC")
+    upper = server.add_attachment(page, "Report.pdf", b"upper")
+    lower = server.add_attachment(page, "report.pdf", b"lower")
+    output = tmp_path / "out"
+
+    asyncio.run(wm.pull_attachments(config, page, str(output)))
+
+    assert sorted(os.listdir(output)) == sorted(
+        [".wiki-attachments.json", f"Report_{upper['id']}.pdf", f"report_{lower['id']}.pdf"])
+
+
+def test_pull_path_does_not_depend_on_filter(server, config, tmp_path):
+    page = server.add_page("Page", space="DOC")
+    server.add_attachment(page, "a:b.png", b"colon")
+    question = server.add_attachment(page, "a?b.png", b"question")
+    output = tmp_path / "out"
+
+    stats = asyncio.run(wm.pull_attachments(config, page, str(output), filenames=["a?b.png"]))
+
+    assert [record["path"] for record in stats["files"]] == [
+        str(output / f"a_b_{question['id']}.png")]
+
+
+def test_push_rejects_duplicate_basenames(server, config, tmp_path):
+    page = server.add_page("Page", space="DOC")
+    for name in ("one", "two"):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / "diagram.png").write_bytes(name.encode())
+
+    with pytest.raises(ValueError, match="diagram.png"):
+        asyncio.run(wm.push_attachments(
+            config, page, [str(tmp_path / "one"), str(tmp_path / "two" / "diagram.png")]))
+
+    assert server.page_attachments(page) == []
@@ -0,0 +1,89 @@
+"""normalize_storage / content_hash 与内容未变化时跳过更新"""
+
+import asyncio
+
+import wiki_manager as wm
+
+CODE = ('<ac:structured-macro ac:name="code"><ac:plain-text-body><![CDATA[<div>\n'
+        '{indent}<p>x</p>\n</div>]]></ac:plain-text-body></ac:structured-macro>')
+
+
+def test_whitespace_between_tags_is_ignored():
+    a = "<h1>标题</h1><p>段落</p><br/>"
+    b = "<h1>标题</h1>\r\n  <p>段落</p>\n<br />\n"
+    assert wm.content_hash(a) == wm.content_hash(b)
+
+
+def test_whitespace_between_inline_elements_is_significant():
+    spaced = "<p><strong>foo</strong> <em>bar</em></p>"
+    assert wm.content_hash(spaced) != wm.content_hash("<p><strong>foo</strong><em>bar</em></p>")
+    # 换行同样渲染为空格，与块级标签相邻的空白仍然忽略
+    assert wm.normalize_storage("<ul>\n <li><b>a</b>\n<i>b</i></li>\n</ul>") == \
+        "<ul><li><b>a</b>\n<i>b</i></li></ul>"
+
+
+def test_text_changes_change_the_hash():
+    assert wm.content_hash("<p>a b</p>") != wm.content_hash("<p>a  b</p>")
+
+
+def test_code_indentation_is_significant():
+    two, four = CODE.format(indent="  "), CODE.format(indent="    ")
+    assert wm.content_hash(two) != wm.content_hash(four)
+    # 宏外的空白仍然忽略
+    assert wm.content_hash(two) == wm.content_hash("\n" + two.replace("><![CDATA", ">\n<![CDATA"))
+
+
+def test_pre_whitespace_is_preserved():
+    assert wm.normalize_storage("<p>a</p>\n <pre>  x\n  <b>y</b> </pre>\n") == \
+        "<p>a</p><pre>  x\n  <b>y</b> </pre>"
+    assert wm.content_hash("<pre>a\n b</pre>") != wm.content_hash("<pre>a\nb</pre>")
+
+
+def test_unchanged_update_is_skipped(server, config):
+    page_id = server.add_page("Page", "<h1>标题</h1><p>段落</p>")
+
+    async def update(content):
+        return await wm.update_wiki_page_content(config, page_id, content, format="html")
+
+    result = asyncio.run(update("<h1>标题</h1>\n\n<p>段落</p>\n"))
+    assert result["status"] == "skipped"
+    assert server.pages[page_id]["version"] == 1
+
+    result = asyncio.run(update("<h1>标题</h1><p>新段落</p>"))
+    assert result["status"] == "written"
+    assert server.pages[page_id]["version"] == 2
+
+
+def test_code_whitespace_edit_is_written(server, config):
+    page_id = server.add_page("Code", CODE.format(indent="  "))
+    result = asyncio.run(wm.update_wiki_page_content(
+        config, page_id, CODE.format(indent="    "), format="html"
+    ))
+    assert result["status"] == "written"
+    assert "    <p>x</p>" in server.pages[page_id]["body"]
+
+
+def test_hash_manifest_skips_without_fetching_body(server, config, tmp_path):
+    page_id = server.add_page("Page", "<p>旧</p>")
+    manifest = wm.HashManifest(str(tmp_path / "hashes.json"))
+
+    async def update():
+        return await wm.update_wiki_page_content(config, page_id, "<p>新</p>", format="html",
+                                                 hash_manifest=manifest)
+
+    assert asyncio.run(update())["status"] == "written"
+    before = server.snapshot_stats()["requests"]
+    assert asyncio.run(update())["status"] == "skipped"
+    # 命中清单时只需一次版本探测
+    assert server.snapshot_stats()["requests"] - before == 1
+
+
+def test_inline_space_edit_is_written(server, config):
+    page_id = server.add_page("Page", "<p><strong>foo</strong><em>bar</em></p>")
+    before = server.snapshot_stats()["requests"]
+    result = asyncio.run(wm.update_wiki_page_content(
+        config, page_id, "<p><strong>foo</strong> <em>bar</em></p>", format="html"
+    ))
+    assert result["status"] == "written"
+    assert server.pages[page_id]["body"] == "<p><strong>foo</strong> <em>bar</em></p>"
+    assert server.snapshot_stats()["requests"] - before == 2
@@ -0,0 +1,43 @@
+"""延迟导入：不需要的库在命令结束时不应已加载（复用 check_import_budget 的 RUNNER）"""
+
+import json
+import subprocess
+import sys
+
+import pytest
+
+from check_import_budget import RUNNER, SCRIPT
+
+
+def loaded_modules(tmp_path, argv):
+    """在子进程中执行 wiki_manager.py，返回结束时真正加载（非延迟占位）的模块集合"""
+    report = tmp_path / "loaded.json"
+    result = subprocess.run([sys.executable, "-c", RUNNER, str(report), SCRIPT] + argv,
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    return set(json.loads(report.read_text()))
+
+
+def test_extract_id_loads_no_network_or_conversion_libraries(tmp_path, monkeypatch):
+    monkeypatch.setenv("WIKI_NO_SERVER", "1")
+    loaded = loaded_modules(
+        tmp_path, ["extract-id", "https://wiki.example.com/pages/viewpage.action?pageId=12345"])
+
+    assert not loaded & {"httpx", "asyncio", "markdownify", "markdown"}
+
+
+def test_metadata_only_get_does_not_load_markdownify(server, tmp_path):
+    page = server.add_page("Page", "<p>hello</p>", space="DOC")
+    loaded = loaded_modules(tmp_path, ["get", "--page-id", page, "--metadata-only", "--json"])
+
+    # 对照：确实访问了网络，检测本身有效
+    assert "httpx" in loaded
+    assert not loaded & {"markdownify", "markdown"}
+
+
+@pytest.mark.parametrize("argv", [["--help"], ["head", "--page-id", "{page}"]])
+def test_lightweight_commands_skip_markdown(server, tmp_path, argv):
+    page = server.add_page("Page", "<p>hello</p>", space="DOC")
+    loaded = loaded_modules(tmp_path, [arg.format(page=page) for arg in argv])
+
+    assert not loaded & {"markdownify", "markdown"}
@@ -0,0 +1,76 @@
+"""本地全文索引：范围内删除、标签过滤转义、导出目录的空间"""
+
+import asyncio
+
+import wiki_manager as wm
+
+
+def open_index(config, tmp_path):
+    return wm.PageIndex(config, str(tmp_path / "index.sqlite"))
+
+
+def seed_tree(server):
+    root = server.add_page("Root", "<p>needle root</p>", space="DOC")
+    child = server.add_page("Child", "<p>needle child</p>", space="DOC", parent_id=root)
+    leaf = server.add_page("Leaf", "<p>needle leaf</p>", space="DOC", parent_id=child)
+    return root, child, leaf
+
+
+def found(index, **filters):
+    return sorted(result["title"] for result in index.query("needle", limit=50, **filters))
+
+
+def test_reindex_removes_pages_gone_from_scope(server, config, tmp_path):
+    root, child, leaf = seed_tree(server)
+    cql = wm._index_scope_cql(root_page_id=root)
+    with open_index(config, tmp_path) as index:
+        asyncio.run(wm.index_pages(config, index, cql))
+        assert found(index) == ["Child", "Leaf", "Root"]
+
+        server.remove_page(leaf)
+        stats = asyncio.run(wm.index_pages(config, index, cql))
+
+        assert stats["removed"] == 1
+        assert found(index) == ["Child", "Root"]
+
+
+def test_page_in_another_scope_is_kept(server, config, tmp_path):
+    root, child, leaf = seed_tree(server)
+    tree = wm._index_scope_cql(root_page_id=root)
+    space = wm._index_scope_cql(space_key="DOC")
+    with open_index(config, tmp_path) as index:
+        asyncio.run(wm.index_pages(config, index, tree))
+        asyncio.run(wm.index_pages(config, index, space))
+
+        # 移出页面树但仍在空间内
+        server.pages[leaf]["parent"] = None
+        stats = asyncio.run(wm.index_pages(config, index, tree))
+        assert stats["removed"] == 0
+        assert "Leaf" in found(index)
+
+        server.remove_page(leaf)
+        stats = asyncio.run(wm.index_pages(config, index, space))
+        assert stats["removed"] == 1
+        assert "Leaf" not in found(index)
+
+
+def test_label_filter_treats_wildcards_literally(config, tmp_path):
+    with open_index(config, tmp_path) as index:
+        for page_id, label in (("1", "run_book"), ("2", "runxbook"), ("3", "100%"), ("4", "1000")):
+            index.add({"id": page_id, "title": f"Page {label}", "version": 1,
+                       "labels": [label], "content": "needle"})
+
+        assert found(index, label="run_book") == ["Page run_book"]
+        assert found(index, label="100%") == ["Page 100%"]
+        assert found(index, label="run%") == []
+
+
+def test_index_export_uses_root_page_space(server, config, tmp_path):
+    root, _, _ = seed_tree(server)
+    output = str(tmp_path / "mirror")
+    asyncio.run(wm.export_page_tree(config, output, root_page_id=root))
+
+    with open_index(config, tmp_path) as index:
+        stats = wm.index_export(config, index, output)
+        assert stats["indexed"] == 3
+        assert found(index, space="DOC") == ["Child", "Leaf", "Root"]
@@ -0,0 +1,53 @@
+"""批量标签：--input-file 接受 export 目录和 manifest.json"""
+
+import asyncio
+import os
+
+import pytest
+
+import wiki_manager as wm
+
+
+def run_labels(*argv):
+    args = wm.build_parser().parse_args(["labels", *argv])
+    asyncio.run(wm.cmd_labels(args))
+
+
+@pytest.fixture
+def exported(server, config, tmp_path):
+    root = server.add_page("Root", "<p>root</p>", space="DOC")
+    child = server.add_page("Child", "<p>child</p>", space="DOC", parent_id=root)
+    server.add_page("Elsewhere", "<p>other</p>", space="DOC")
+    output = str(tmp_path / "mirror")
+    asyncio.run(wm.export_page_tree(config, output, root_page_id=root))
+    return output, [root, child]
+
+
+@pytest.mark.parametrize("use_manifest", [False, True])
+def test_labels_from_export(server, exported, use_manifest):
+    output, page_ids = exported
+    source = os.path.join(output, "manifest.json") if use_manifest else output
+
+    run_labels("add", "reorg", "--input-file", source)
+
+    labelled = sorted(pid for pid, page in server.pages.items() if "reorg" in page["labels"])
+    assert labelled == sorted(page_ids)
+
+
+def test_plain_input_file_still_reads_lines(server, tmp_path):
+    page = server.add_page("Page", space="DOC")
+    refs = tmp_path / "refs.txt"
+    refs.write_text(f"# 注释\n{page}\n\n", encoding="utf-8")
+
+    run_labels("add", "one", "-i", str(refs))
+
+    assert server.pages[page]["labels"] == ["one"]
+
+
+def test_other_json_is_rejected(server, tmp_path):
+    bogus = tmp_path / "data.json"
+    bogus.write_text('{"ids": ["1"]}', encoding="utf-8")
+
+    with pytest.raises(SystemExit) as excinfo:
+        run_labels("add", "one", "-i", str(bogus))
+    assert excinfo.value.code == 1
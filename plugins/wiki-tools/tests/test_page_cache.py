@@ -0,0 +1,88 @@
+"""PageCache：命中、未命中、版本校验、LRU 淘汰与总大小估算"""
+
+import asyncio
+import os
+import time
+
+import wiki_manager as wm
+
+
+def read(config, cache, page_id):
+    return asyncio.run(wm.get_wiki_page_content(config, page_id=page_id, format="storage",
+                                                cache=cache))
+
+
+def cached_files(cache):
+    return sorted(os.path.relpath(os.path.join(dirpath, name), cache.root)
+                  for dirpath, _, names in os.walk(cache.root) for name in names)
+
+
+def test_miss_then_hit_with_version_probe_only(server, config):
+    page_id = server.add_page("Page", "<p>正文</p>")
+    cache = wm.PageCache(config)
+
+    first = read(config, cache, page_id)
+    assert first["cache"] == "miss" and first["content"] == "<p>正文</p>"
+
+    before = server.snapshot_stats()["requests"]
+    second = read(config, cache, page_id)
+    assert second["cache"] == "hit" and second["content"] == "<p>正文</p>"
+    # 命中时只发一次版本探测
+    assert server.snapshot_stats()["requests"] - before == 1
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_new_version_is_revalidated_and_replaces_old_entry(server, config):
+    page_id = server.add_page("Page", "<p>v1</p>")
+    cache = wm.PageCache(config)
+    read(config, cache, page_id)
+
+    server.add_version(page_id, "<p>v2</p>")
+    page = read(config, cache, page_id)
+    assert page["cache"] == "miss" and page["content"] == "<p>v2</p>"
+    assert cached_files(cache) == [os.path.join(page_id, "2.storage.json")]
+    assert read(config, cache, page_id)["cache"] == "hit"
+
+
+def test_evicts_least_recently_used_pages(server, config):
+    page_ids = [server.add_page(f"Page {n}", f"<p>{'x' * 2000}{n}</p>") for n in range(4)]
+    cache = wm.PageCache(config, max_bytes=10 ** 9)
+    for page_id in page_ids:
+        read(config, cache, page_id)
+        time.sleep(0.01)  # 区分访问时间
+    entry_size = os.path.getsize(cache._path(page_ids[0], 1, "storage"))
+
+    # 访问第一个页面后收紧上限，再写入一个页面：淘汰最久未访问的两个页面
+    read(config, cache, page_ids[0])
+    time.sleep(0.01)
+    cache.max_bytes = entry_size * 3 + entry_size // 2
+    read(config, cache, server.add_page("Page 4", f"<p>{'x' * 2000}4</p>"))
+
+    assert cache.stats()["evictions"] == 2
+    assert not cache.has_page(page_ids[1], "storage")
+    assert not cache.has_page(page_ids[2], "storage")
+    assert cache.has_page(page_ids[0], "storage") and cache.has_page(page_ids[3], "storage")
+
+
+def test_put_scans_cache_only_when_estimate_exceeds_limit(config, tmp_path, monkeypatch):
+    walks = []
+    real_walk = os.walk
+    monkeypatch.setattr(wm.os, "walk", lambda top: walks.append(top) or real_walk(top))
+    page = {"content": "x" * 1000}
+    cache = wm.PageCache(config, cache_dir=str(tmp_path), max_bytes=50 * 1024)
+
+    for n in range(30):
+        cache.put(str(n), 1, "storage", page)
+        cache.put(str(n), 2, "storage", page)  # 替换旧版本不增加估算大小
+    assert len(walks) == 1
+    assert cache.evictions == 0
+
+    for n in range(30, 60):
+        cache.put(str(n), 1, "storage", page)
+    total = sum(os.path.getsize(os.path.join(dirpath, name))
+                for dirpath, _, names in real_walk(cache.root) for name in names)
+    assert cache.evictions > 0
+    assert total <= cache.max_bytes
+    assert cache._size == total
+    # 超限后淘汰到上限的 90% 以下，之后几次写入都不需要扫描
+    assert len(walks) <= 4
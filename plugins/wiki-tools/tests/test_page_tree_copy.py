@@ -0,0 +1,153 @@
+"""页面树复制与移动：顺序恢复、断点续传、跨空间移动"""
+
+import asyncio
+import time
+
+import pytest
+
+import wiki_manager as wm
+
+
+def child_titles(server, page_id):
+    return [page["title"] for page in server.children(page_id)]
+
+
+def make_tree(server, space="DOC"):
+    root = server.add_page("模板", '<p><ac:link><ri:page ri:content-title="模板 B" /></ac:link></p>',
+                           space=space)
+    children = [server.add_page(f"模板 {name}", f"<p>{name}</p>", space=space, parent_id=root)
+                for name in "CAB"]
+    grandchild = server.add_page("模板 A1", "<p>a1</p>", space=space, parent_id=children[1])
+    server.pages[children[1]]["labels"] = ["x", "y"]
+    return root, children, grandchild
+
+
+def test_restore_child_order(server, config):
+    parent = server.add_page("Parent", space="DOC")
+    d, c, a, b = (server.add_page(name, space="DOC", parent_id=parent) for name in "dcab")
+    moves = asyncio.run(wm.restore_child_order(config, parent, [a, b, c, d]))
+    assert child_titles(server, parent) == ["a", "b", "c", "d"]
+    assert moves == 2
+    # 已经一致时不再移动
+    assert asyncio.run(wm.restore_child_order(config, parent, [a, b, c, d])) == 0
+
+
+def test_restore_child_order_ignores_pages_missing_from_listing(server, config):
+    parent = server.add_page("Parent", space="DOC")
+    b, a = (server.add_page(name, space="DOC", parent_id=parent) for name in "ba")
+    moves = asyncio.run(wm.restore_child_order(config, parent, [a, "999999", b]))
+    assert child_titles(server, parent) == ["a", "b"]
+    assert moves == 1
+
+
+def test_copy_tree_keeps_order_labels_and_links(server, config):
+    root, _, grandchild = make_tree(server)
+    server.add_attachment(grandchild, "f.txt", b"hello")
+    target = server.add_page("Projects", space="DOC")
+
+    stats = asyncio.run(wm.copy_page_tree(
+        config, root, target_parent_id=target, title_replacements=[("模板", "项目")],
+        attachments=True, concurrency=4
+    ))
+    assert stats["pages"] == stats["created"] == 5
+    assert stats["failed"] == []
+    assert stats["attachments"] == 1
+
+    copy = server.pages[stats["root"]]
+    assert copy["title"] == "项目"
+    assert 'ri:content-title="项目 B"' in copy["body"]
+    assert child_titles(server, copy["id"]) == ["项目 C", "项目 A", "项目 B"]
+    copy_a = server.children(copy["id"])[1]
+    assert copy_a["labels"] == ["x", "y"]
+    copy_a1 = server.children(copy_a["id"])[0]
+    assert [a["title"] for a in server.page_attachments(copy_a1["id"])] == ["f.txt"]
+
+
+def test_copy_attachments_keeps_unsafe_names(server, config, tmp_path, monkeypatch):
+    source = server.add_page("源", space="DOC")
+    target = server.add_page("副本", space="DOC")
+    names = ["../escape.txt", "图/架构.png", "a:b.txt", "f.txt"]
+    for name in names:
+        server.add_attachment(source, name, name.encode())
+    server.add_attachment(target, "f.txt", b"kept")
+    monkeypatch.setattr("tempfile.tempdir", str(tmp_path / "tmp"))
+    (tmp_path / "tmp").mkdir()
+
+    async def main():
+        async with wm.WikiClient(config) as client:
+            return await wm._copy_page_attachments(config, source, target,
+                                                   asyncio.Semaphore(4), client)
+
+    assert asyncio.run(main()) == 3
+    copied = {a["title"]: a["data"] for a in server.page_attachments(target)}
+    assert copied == {"../escape.txt": b"../escape.txt", "图/架构.png": "图/架构.png".encode(),
+                      "a:b.txt": b"a:b.txt", "f.txt": b"kept"}
+    # 临时文件都留在工作目录内并已清理
+    assert list((tmp_path / "tmp").iterdir()) == []
+    assert not (tmp_path / "escape.txt").exists()
+
+
+@pytest.mark.parametrize("server", [{"latency": 0.1}], indirect=True)
+def test_copy_attachments_runs_concurrently(server, config):
+    source = server.add_page("源", space="DOC")
+    target = server.add_page("副本", space="DOC")
+    for i in range(6):
+        server.add_attachment(source, f"{i}.bin", bytes([i]) * 100)
+
+    async def main():
+        async with wm.WikiClient(config) as client:
+            return await wm._copy_page_attachments(config, source, target,
+                                                   asyncio.Semaphore(6), client)
+
+    started = time.monotonic()
+    assert asyncio.run(main()) == 6
+    # 逐个复制需要 12 次以上往返（≥1.2s）
+    assert time.monotonic() - started < 0.9
+    assert len(server.page_attachments(target)) == 6
+
+
+def test_copy_tree_resumes_from_progress(server, config, tmp_path):
+    root, _, _ = make_tree(server)
+    target = server.add_page("Projects", space="DOC")
+    blocker = server.add_page("新 A", space="DOC")
+    progress = wm.CopyProgress(str(tmp_path / "progress.json"))
+
+    def copy():
+        return asyncio.run(wm.copy_page_tree(
+            config, root, target_parent_id=target, title_replacements=[("模板", "新")],
+            progress=wm.CopyProgress(progress.path)
+        ))
+
+    first = copy()
+    # "新 A" 标题冲突：该页面及其子页面失败，其余页面已创建
+    assert len(first["failed"]) == 2
+    assert first["created"] == 3
+
+    server.remove_page(blocker)
+    second = copy()
+    assert second["failed"] == []
+    assert second["resumed"] == 3
+    assert second["created"] == 2
+    copies = [p for p in server.pages.values() if p["title"].startswith("新") and
+              p["status"] == "current"]
+    assert sorted(p["title"] for p in copies) == ["新", "新 A", "新 A1", "新 B", "新 C"]
+    assert child_titles(server, second["root"]) == ["新 C", "新 A", "新 B"]
+
+
+def test_move_tree_to_another_space(server, config):
+    root, children, grandchild = make_tree(server)
+    target = server.add_page("Home", space="OPS")
+
+    result = asyncio.run(wm.move_page_tree(config, root, target))
+    assert result["space"] == "OPS"
+    assert server.pages[root]["parent"] == target
+    assert server.pages[grandchild]["space"]["key"] == "OPS"
+    assert child_titles(server, root) == ["模板 C", "模板 A", "模板 B"]
+    assert server.pages[children[0]]["version"] == 1
+
+
+def test_move_tree_rejects_own_descendant(server, config):
+    root, _, grandchild = make_tree(server)
+    with pytest.raises(ValueError):
+        asyncio.run(wm.move_page_tree(config, root, grandchild))
+    assert server.pages[root]["parent"] is None
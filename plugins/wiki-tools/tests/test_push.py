@@ -0,0 +1,70 @@
+"""本地目录发布：标题唯一性检查与标题前缀"""
+
+import asyncio
+
+import pytest
+
+import wiki_manager as wm
+
+
+def write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+
+
+def test_scan_rejects_duplicate_titles(tmp_path):
+    write(tmp_path / "a" / "intro.md", "# A")
+    write(tmp_path / "b" / "intro.md", "# B")
+    write(tmp_path / "intro.html", "<p>top</p>")
+
+    with pytest.raises(ValueError) as excinfo:
+        wm.scan_push_tree(str(tmp_path))
+
+    message = str(excinfo.value)
+    assert "intro" in message
+    assert "a/intro.md" in message and "b/intro.md" in message and "intro.html" in message
+
+
+def test_scan_rejects_directory_matching_file_elsewhere(tmp_path):
+    write(tmp_path / "guide" / "setup.md", "# Setup")
+    write(tmp_path / "other" / "guide.md", "# Guide")
+
+    with pytest.raises(ValueError, match="guide"):
+        wm.scan_push_tree(str(tmp_path))
+
+
+def test_scan_applies_title_prefix(tmp_path):
+    write(tmp_path / "guide" / "index.md", "# Guide")
+    write(tmp_path / "guide" / "setup.md", "# Setup")
+
+    roots = wm.scan_push_tree(str(tmp_path), title_prefix="v2 ")
+
+    assert [node["title"] for node in roots] == ["v2 guide"]
+    assert [node["title"] for node in roots[0]["children"]] == ["v2 setup"]
+
+
+def test_duplicate_titles_fail_before_any_request(server, config, tmp_path):
+    parent = server.add_page("Docs", space="DOC")
+    source = tmp_path / "src"
+    write(source / "a" / "intro.md", "# A")
+    write(source / "b" / "intro.md", "# B")
+    before = server.snapshot_stats()["requests"]
+
+    with pytest.raises(ValueError, match="intro"):
+        asyncio.run(wm.push_directory(config, str(source), parent))
+
+    assert server.snapshot_stats()["requests"] == before
+    assert server.children(parent) == []
+
+
+def test_push_with_title_prefix_alongside_existing_copy(server, config, tmp_path):
+    docs = server.add_page("Docs", space="DOC")
+    server.add_page("guide", "<p>old</p>", space="DOC", parent_id=docs)
+    archive = server.add_page("Archive", space="DOC")
+    source = tmp_path / "src"
+    write(source / "guide.md", "# Guide")
+
+    stats = asyncio.run(wm.push_directory(config, str(source), archive, title_prefix="v1 "))
+
+    assert stats["created"] == 1 and stats["failed"] == 0
+    assert [page["title"] for page in server.children(archive)] == ["v1 guide"]
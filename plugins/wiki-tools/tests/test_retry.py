@@ -0,0 +1,81 @@
+"""WikiClient 重试策略：Retry-After、POST 不重试、统计计数、响应丢失后的 PUT"""
+
+import asyncio
+import time
+
+import pytest
+
+import wiki_manager as wm
+
+PAGE_PATH = r"/rest/api/content/\d+"
+
+
+def run(config, work):
+    """用退避很短的客户端执行 work(client)，返回（结果，客户端统计）"""
+    async def main():
+        async with wm.WikiClient(config, backoff_base=0.01) as client:
+            return await work(client), client.stats_summary()
+    return asyncio.run(main())
+
+
+def test_retry_after_is_honored(server, config):
+    page_id = server.add_page("Page", "<p>x</p>")
+    server.inject_fault("GET", PAGE_PATH, status=429, applied=False, retry_after=0.3)
+
+    started = time.monotonic()
+    page, stats = run(config, lambda client: wm.get_wiki_page_content(
+        config, page_id=page_id, client=client, fields=("version",)))
+
+    assert page["version"] == 1
+    assert time.monotonic() - started >= 0.3
+    assert stats["retries"] == 1 and stats["throttled"] == 1
+    assert stats["wait_seconds"] >= 0.3
+
+
+def test_throttling_halves_concurrency_limit(server, config):
+    page_id = server.add_page("Page", "<p>x</p>")
+    server.inject_fault("GET", PAGE_PATH, status=503, applied=False)
+
+    _, stats = run(config, lambda client: wm.get_wiki_page_content(
+        config, page_id=page_id, client=client, fields=("version",)))
+
+    assert stats["requests"] == 2 and stats["retries"] == 1 and stats["throttled"] == 1
+    assert stats["concurrency_limit"] < 20
+
+
+def test_post_is_not_retried_on_503(server, config):
+    server.inject_fault("POST", r"/rest/api/content", status=503, applied=False)
+
+    async def create(client):
+        with pytest.raises(RuntimeError):
+            await wm.create_wiki_page(config, "New", "<p>x</p>", "DOC", client=client)
+
+    _, stats = run(config, create)
+
+    assert stats["requests"] == 1 and stats["retries"] == 0
+    assert not [p for p in server.pages.values() if p["title"] == "New"]
+
+
+def test_post_is_retried_on_429(server, config):
+    server.inject_fault("POST", r"/rest/api/content", status=429, applied=False, retry_after=0)
+
+    page, stats = run(config, lambda client: wm.create_wiki_page(
+        config, "New", "<p>x</p>", "DOC", client=client))
+
+    assert stats["retries"] == 1
+    assert [p["id"] for p in server.pages.values() if p["title"] == "New"] == [page["id"]]
+
+
+@pytest.mark.parametrize("status", [None, 502])
+def test_put_applied_before_lost_response_is_reported_written(server, config, status):
+    page_id = server.add_page("Page", "<p>old</p>")
+    # 首次 PUT 已生效，但响应丢失（断开连接）或网关返回 502；重试得到 409
+    server.inject_fault("PUT", PAGE_PATH, status=status)
+
+    result, stats = run(config, lambda client: wm.update_wiki_page_content(
+        config, page_id, "<p>new</p>", format="html", client=client))
+
+    assert result["status"] == "written" and result["version"] == 2
+    assert server.pages[page_id]["version"] == 2
+    assert server.pages[page_id]["body"] == "<p>new</p>"
+    assert stats["retries"] == 1
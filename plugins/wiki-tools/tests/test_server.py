@@ -0,0 +1,66 @@
+"""常驻服务器：过期检测与模块加载"""
+
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+from conftest import SCRIPTS_DIR
+
+
+def copy_scripts(tmp_path):
+    scripts = tmp_path / "scripts"
+    scripts.mkdir()
+    for name in ("wiki_manager.py", "wiki_server.py"):
+        shutil.copy2(os.path.join(SCRIPTS_DIR, name), scripts / name)
+    return scripts
+
+
+def run(scripts, env, *argv):
+    return subprocess.run([sys.executable, str(scripts / "wiki_manager.py"), *argv],
+                          env=env, cwd=str(scripts.parent), capture_output=True, text=True,
+                          timeout=60)
+
+
+def test_server_module_loads_without_script_dir_on_path(tmp_path):
+    scripts = copy_scripts(tmp_path)
+    code = (
+        "import importlib.util, sys\n"
+        f"spec = importlib.util.spec_from_file_location('wiki_manager', {str(scripts / 'wiki_manager.py')!r})\n"
+        "wm = importlib.util.module_from_spec(spec)\n"
+        "spec.loader.exec_module(wm)\n"
+        "server = wm._import_wiki_server()\n"
+        "assert server is wm._import_wiki_server()\n"
+        "print(server.__file__)\n"
+    )
+    result = subprocess.run([sys.executable, "-c", code], cwd=str(tmp_path),
+                            capture_output=True, text=True, timeout=60)
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == str(scripts / "wiki_server.py")
+
+
+def test_server_exits_when_server_module_changes(server, tmp_path):
+    scripts = copy_scripts(tmp_path)
+    page = server.add_page("Page", "<p>hello</p>", space="DOC")
+    env = {k: v for k, v in os.environ.items() if k != "WIKI_NO_SERVER"}
+    env["WIKI_SERVER_SOCKET"] = str(tmp_path / "server.sock")
+
+    started = run(scripts, env, "serve", "--background")
+    assert started.returncode == 0, started.stderr
+    try:
+        assert run(scripts, env, "serve", "--status").returncode == 0
+
+        module = scripts / "wiki_server.py"
+        mtime = module.stat().st_mtime + 10
+        os.utime(module, (mtime, mtime))
+        result = run(scripts, env, "get", "--page-id", page, "--metadata-only")
+        assert result.returncode == 0, result.stderr
+
+        deadline = time.monotonic() + 10
+        while run(scripts, env, "serve", "--status").returncode == 0:
+            assert time.monotonic() < deadline, "服务器未因 wiki_server.py 更新而退出"
+            time.sleep(0.1)
+    finally:
+        run(scripts, env, "serve", "--stop")
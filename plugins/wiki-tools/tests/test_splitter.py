@@ -0,0 +1,149 @@
+"""split_storage_html / iter_storage_chunks：只在顶层元素边界切分；流式请求体"""
+
+import asyncio
+import json
+
+import pytest
+
+import wiki_manager as wm
+
+TABLE = "<table><tbody>" + "<tr><th>键</th><td><p>值 {n}</p></td></tr>" * 6 + "</tbody></table>"
+MACRO = ('<ac:structured-macro ac:name="info"><ac:rich-text-body><p>提示 {n}</p>'
+         '</ac:rich-text-body></ac:structured-macro>')
+CODE = ('<ac:structured-macro ac:name="code"><ac:plain-text-body><![CDATA[if a < b:\n'
+        '    print("</ac:structured-macro><p>{n}</p>")\n]]></ac:plain-text-body>'
+        '</ac:structured-macro>')
+COMMENT = "<!-- <table> {n} </p> -->"
+BLOCKS = ("<h2>章节 {n}</h2>", "<p>段落 {n}：中文 😀 é</p>", TABLE, MACRO, CODE, COMMENT,
+          "<ul><li>项 {n}<br/>换行</li><li><ul><li>嵌套</li></ul></li></ul>")
+
+
+def make_storage(count: int) -> tuple:
+    """生成 count 个顶层元素，返回（正文，各顶层元素的结束位置）"""
+    parts = [BLOCKS[n % len(BLOCKS)].format(n=n) for n in range(count)]
+    ends, total = set(), 0
+    for part in parts:
+        total += len(part)
+        ends.add(total)
+    return "".join(parts), ends
+
+
+def split_in_blocks(text: str, size: int) -> list:
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 64, 333, 1000, 4096, 10 ** 6])
+def test_chunks_join_back_to_input(chunk_size):
+    content, _ = make_storage(70)
+    assert "".join(wm.split_storage_html(content, chunk_size)) == content
+
+
+@pytest.mark.parametrize("block_size", [1, 7, 100, 2048])
+def test_streaming_matches_whole_input(block_size):
+    content, _ = make_storage(70)
+    whole = wm.split_storage_html(content, 500)
+    streamed = list(wm.iter_storage_chunks(split_in_blocks(content, block_size), 500))
+    assert streamed == whole
+
+
+@pytest.mark.parametrize("chunk_size", [50, 333, 1000, 4096])
+def test_cuts_only_at_top_level_boundaries(chunk_size):
+    content, ends = make_storage(70)
+    position = 0
+    for chunk in wm.split_storage_html(content, chunk_size)[:-1]:
+        position += len(chunk)
+        assert position in ends, f"在位置 {position} 处切开了元素: {chunk[-40:]!r}"
+
+
+def test_tags_inside_cdata_and_comments_are_text():
+    # CDATA 和注释中像标签的文本不影响嵌套深度，也不会被切开
+    content = CODE.format(n=1) + COMMENT.format(n=2) + "<p>尾部</p>"
+    chunks = wm.split_storage_html(content, 10)
+    assert chunks == [CODE.format(n=1), COMMENT.format(n=2), "<p>尾部</p>"]
+
+
+def test_unterminated_cdata_across_blocks_waits_for_end():
+    content = CODE.format(n=1) + "<p>x</p>"
+    cut = content.index("<![CDATA[") + 12
+    chunks = list(wm.iter_storage_chunks([content[:cut], content[cut:]], 10))
+    assert chunks == [CODE.format(n=1), "<p>x</p>"]
+
+
+@pytest.mark.parametrize("chunk_size", range(5, 40))
+def test_multibyte_characters_at_chunk_boundaries(chunk_size):
+    content = "".join(f"<p>{'中文😀' * (n % 4 + 1)}</p>" for n in range(30))
+    chunks = wm.split_storage_html(content, chunk_size)
+    assert "".join(chunks) == content
+    for chunk in chunks:
+        encoded = chunk.encode("utf-8")
+        assert encoded.decode("utf-8") == chunk
+        # 单个元素放不下时才允许超过 chunk_size
+        assert len(encoded) <= chunk_size or chunk.count("<p>") == 1
+
+
+def test_element_larger_than_chunk_size_is_its_own_chunk():
+    big = "<table><tbody>" + "<tr><td>单元格</td></tr>" * 500 + "</tbody></table>"
+    content = "<p>前</p>" + big + "<p>后</p>"
+    chunks = wm.split_storage_html(content, 1024)
+    assert chunks == ["<p>前</p>", big, "<p>后</p>"]
+
+
+def test_text_without_markup_is_kept_whole():
+    assert wm.split_storage_html("纯文本" * 100, 10) == ["纯文本" * 100]
+
+
+def test_invalid_chunk_size():
+    with pytest.raises(ValueError):
+        wm.split_storage_html("<p>x</p>", 0)
+
+
+def collect_body(payload: dict, blocks) -> tuple:
+    """收集 _stream_json_body 的输出，返回（请求体字节，记录的发送字节数）"""
+    async def main():
+        sent = {}
+        data = b"".join([part async for part in wm._stream_json_body(payload, blocks, sent)])
+        return data, sent["bytes"]
+    return asyncio.run(main())
+
+
+@pytest.mark.parametrize("block_size", [1, 2, 3, 7, 100])
+def test_streamed_body_decodes_to_file_content(tmp_path, block_size):
+    content = make_storage(30)[0] + '<p>"引号" \\ 反斜杠\t制表\x01</p>'
+    path = tmp_path / "page.html"
+    path.write_text(content, encoding="utf-8")
+    payload = wm._build_update_payload(2, "标题", wm._BODY_PLACEHOLDER)
+
+    body, sent = collect_body(payload, wm.iter_text_file(str(path), block_size))
+    assert sent == len(body)
+    decoded = json.loads(body.decode("utf-8"))
+    assert decoded["body"]["storage"]["value"] == content
+    assert decoded == wm._build_update_payload(2, "标题", content)
+
+
+def test_update_from_file_streams_body(server, config, tmp_path, monkeypatch):
+    monkeypatch.setattr(wm, "_BODY_BLOCK_SIZE", 5)
+    page_id = server.add_page("Page", "<p>old</p>")
+    content = make_storage(40)[0]
+    path = tmp_path / "page.html"
+    path.write_text(content, encoding="utf-8")
+    # 首次 PUT 已执行但响应丢失：重试时重新读取文件，409 后确认版本
+    server.inject_fault("PUT", r"/rest/api/content/\d+")
+
+    result = asyncio.run(wm.update_wiki_page_from_file(config, page_id, str(path), title="新标题"))
+    assert result["status"] == "written" and result["version"] == 2
+    assert server.pages[page_id]["body"] == content
+    assert server.pages[page_id]["title"] == "新标题"
+
+
+def test_update_command_streams_large_html_file(server, config, tmp_path, monkeypatch):
+    monkeypatch.setattr(wm, "STREAM_UPDATE_BYTES", 0)
+    page_id = server.add_page("Page", "<p>old</p>")
+    path = tmp_path / "page.html"
+    path.write_text("<p>新</p>", encoding="utf-8")
+    monkeypatch.setattr(wm, "update_wiki_page_content", None)  # 流式路径不应调用
+
+    args = wm.build_parser().parse_args(["update", "--page-id", page_id, "-f", str(path),
+                                       "--format", "html"])
+    asyncio.run(wm.cmd_update(args))
+    assert server.pages[page_id]["body"] == "<p>新</p>"
+    assert server.pages[page_id]["version"] == 2
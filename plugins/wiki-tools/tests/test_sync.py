@@ -0,0 +1,89 @@
+"""增量同步：水位线取自服务端 version.when，与本机时区无关"""
+
+import asyncio
+import json
+import os
+
+import pytest
+
+import wiki_manager as wm
+
+# 服务器时区与本机不同（UTC-8）：按本机时间拼 CQL 会把查询窗口推到 8 小时之后
+WEST_COAST = [{"utc_offset": -8}]
+
+
+def seed_tree(server):
+    root = server.add_page("Root", "<p>root</p>", space="DOC")
+    child = server.add_page("Child", "<p>child</p>", space="DOC", parent_id=root)
+    other = server.add_page("Other", "<p>other</p>", space="DOC", parent_id=root)
+    # 把已有页面的修改时间提前，使水位线过滤真正生效
+    for page_id in (root, child, other):
+        server.pages[page_id]["when"] = "2026-01-01T00:00:00.000Z"
+    return root, child, other
+
+
+def read_manifest(output_dir):
+    with open(os.path.join(output_dir, "manifest.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+@pytest.mark.parametrize("server", WEST_COAST, indirect=True)
+def test_export_records_server_time_watermark(server, config, tmp_path):
+    root, _, _ = seed_tree(server)
+    server.pages[root]["when"] = "2026-03-01T12:30:00.000Z"
+    output = str(tmp_path / "mirror")
+
+    asyncio.run(wm.export_page_tree(config, output, root_page_id=root, format="storage"))
+
+    assert read_manifest(output)["watermark"] == "2026-03-01T04:30:00.000-08:00"
+
+
+@pytest.mark.parametrize("server", WEST_COAST, indirect=True)
+def test_sync_fetches_change_in_other_timezone(server, config, tmp_path):
+    root, child, _ = seed_tree(server)
+    output = str(tmp_path / "mirror")
+    asyncio.run(wm.export_page_tree(config, output, root_page_id=root, format="storage"))
+
+    server.add_version(child, "<p>child v2</p>")
+    stats = asyncio.run(wm.sync_page_tree(config, output))
+
+    assert stats["changed"] == 1
+    assert stats["fetched"] == 1
+    manifest = read_manifest(output)
+    assert manifest["pages"][child]["version"] == 2
+    with open(wm.ExportManifest(output).file_path(manifest["pages"][child]["path"]),
+              encoding="utf-8") as f:
+        assert "child v2" in f.read()
+    assert manifest["watermark"] == server.local_time(server.pages[child]["when"])
+
+
+@pytest.mark.parametrize("server", WEST_COAST, indirect=True)
+def test_sync_without_changes_keeps_watermark(server, config, tmp_path):
+    root, _, _ = seed_tree(server)
+    output = str(tmp_path / "mirror")
+    asyncio.run(wm.export_page_tree(config, output, root_page_id=root, format="storage"))
+    watermark = read_manifest(output)["watermark"]
+
+    stats = asyncio.run(wm.sync_page_tree(config, output))
+
+    assert stats["changed"] == 0
+    assert read_manifest(output)["watermark"] == watermark
+
+
+def test_legacy_timestamp_watermark_checks_everything(server, config, tmp_path):
+    root, child, _ = seed_tree(server)
+    output = str(tmp_path / "mirror")
+    asyncio.run(wm.export_page_tree(config, output, root_page_id=root, format="storage"))
+
+    # 旧版清单的水位线是本机 Unix 时间戳（这里故意设在未来），不能再用于 CQL
+    path = os.path.join(output, "manifest.json")
+    manifest = read_manifest(output)
+    manifest["watermark"] = 4102444800
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    server.add_version(child, "<p>child v2</p>")
+
+    stats = asyncio.run(wm.sync_page_tree(config, output))
+
+    assert stats["fetched"] == 1
+    assert isinstance(read_manifest(output)["watermark"], str)